@@ -4,4 +4,16 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
-    verbose_name = 'Contas de Usuário'
\ No newline at end of file
+    verbose_name = 'Contas de Usuário'
+    
+    def ready(self):
+        from django.core.signals import request_finished
+        from django.db.models.signals import post_migrate
+        from .catalog import clear_permission_catalog
+        from .presence import flush_if_due
+        
+        # Novas permissões só surgem com migrações
+        post_migrate.connect(clear_permission_catalog, dispatch_uid='accounts.clear_permission_catalog')
+        
+        # Último acesso: gravado em lote depois que a resposta foi enviada
+        request_finished.connect(flush_if_due, dispatch_uid='accounts.flush_last_seen')
\ No newline at end of file
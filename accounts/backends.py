@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db import DEFAULT_DB_ALIAS
+
+from core import sharding
+
+
+class ShardedModelBackend(ModelBackend):
+    """
+    ``ModelBackend`` que, com shards por organização, procura o usuário em
+    todos os bancos antes de verificar a senha. O ``user_logged_in`` guarda a
+    organização na sessão e as requisições seguintes já chegam no shard certo
+    (ver ``core.middleware.TenantShardMiddleware``). Superusuários ficam sem
+    shard e são carregados do banco indicado pelo pk.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if not sharding.fans_out():
+            return super().authenticate(request, username, password, **kwargs)
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        # Usuário inexistente segue para o default: o ModelBackend ainda roda o
+        # hasher e o tempo de resposta não revela quais usuários existem
+        alias = sharding.find(UserModel, **{UserModel.USERNAME_FIELD: username}) if username else None
+        with sharding.use_shard(alias or DEFAULT_DB_ALIAS):
+            return super().authenticate(request, username, password, **kwargs)
+
+    def get_user(self, user_id):
+        if not sharding.fans_out():
+            return super().get_user(user_id)
+        with sharding.use_shard(sharding.shard_for_pk(user_id)):
+            user = super().get_user(user_id)
+        if user is None:
+            # Usuários de organizações movidas ficam fora da faixa do pk
+            with sharding.use_shard(sharding.locate(get_user_model(), user_id)):
+                user = super().get_user(user_id)
+        return user
@@ -0,0 +1,40 @@
+"""
+Catálogo de permissões exibido no formulário de grupos.
+
+As permissões só mudam com migrações, então a lista (com app e modelo de
+cada uma) fica no cache sem expiração e é descartada após ``migrate``.
+"""
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+
+PERMISSION_CATALOG_KEY = 'accounts:permission-catalog'
+
+
+class CatalogPermission:
+    __slots__ = ('pk', 'name', 'codename', 'app_label', 'model')
+    
+    def __init__(self, pk, name, codename, app_label, model):
+        self.pk = pk
+        self.name = name
+        self.codename = codename
+        self.app_label = app_label
+        self.model = model
+
+
+def build_permission_catalog():
+    rows = Permission.objects.order_by(
+        'content_type__app_label', 'content_type__model', 'codename'
+    ).values_list('pk', 'name', 'codename', 'content_type__app_label', 'content_type__model')
+    return [CatalogPermission(*row) for row in rows]
+
+
+def permission_catalog():
+    catalog = cache.get(PERMISSION_CATALOG_KEY)
+    if catalog is None:
+        catalog = build_permission_catalog()
+        cache.set(PERMISSION_CATALOG_KEY, catalog, None)
+    return catalog
+
+
+def clear_permission_catalog(**kwargs):
+    cache.delete(PERMISSION_CATALOG_KEY)
@@ -1,35 +1,53 @@
 from django import forms
+from theme import widgets
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from django.contrib.auth.models import Group
+from core import sharding
 from organizations.models import Company
 from .models import User
 
 
-class CustomUserCreationForm(UserCreationForm):
+class UniqueAcrossShardsMixin:
+    """
+    Com shards por organização, o ``unique`` do banco vale só dentro de um
+    shard: ``username`` (usado no login) e ``email`` são verificados em todos.
+    """
+    unique_across_shards = ('username', 'email')
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        for field in self.unique_across_shards:
+            value = cleaned_data.get(field)
+            if value and field not in self.errors and sharding.taken_elsewhere(self.instance, **{field: value}):
+                self.add_error(field, self.instance.unique_error_message(User, (field,)))
+        return cleaned_data
+
+
+class CustomUserCreationForm(UniqueAcrossShardsMixin, UserCreationForm):
     """
     Formulário para criação de usuários com campos personalizados.
     """
     company = forms.ModelChoiceField(
-        queryset=Company.objects.filter(is_active=True),
+        queryset=Company.objects.active(),
         required=False,
         label='Empresa',
-        widget=forms.Select(attrs={'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'})
+        widget=widgets.Select()
     )
     groups = forms.ModelMultipleChoiceField(
         queryset=Group.objects.all(),
         required=False,
         label='Grupos',
-        widget=forms.SelectMultiple(attrs={'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'})
+        widget=widgets.SelectMultiple()
     )
     
     class Meta:
         model = User
         fields = ('username', 'email', 'first_name', 'last_name', 'password1', 'password2', 'company', 'groups')
         widgets = {
-            'username': forms.TextInput(attrs={'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'}),
-            'email': forms.EmailInput(attrs={'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'}),
-            'first_name': forms.TextInput(attrs={'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'}),
-            'last_name': forms.TextInput(attrs={'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'}),
+            'username': widgets.TextInput(),
+            'email': widgets.EmailInput(),
+            'first_name': widgets.TextInput(),
+            'last_name': widgets.TextInput(),
         }
     
     def __init__(self, *args, **kwargs):
@@ -41,44 +59,41 @@ class CustomUserCreationForm(UserCreationForm):
             self.fields['company'].required = True
             
         # Filtra as empresas disponíveis com base no usuário logado
-        if user and not user.is_superuser and user.company:
-            # Administrador da Organização vê apenas empresas da sua organização
-            self.fields['company'].queryset = Company.objects.filter(
-                organization=user.company.organization,
-                is_active=True
-            )
+        # (Administrador da Organização vê apenas empresas da sua organização)
+        if user:
+            self.fields['company'].queryset = self.fields['company'].queryset.visible_to(user)
 
 
-class CustomUserChangeForm(UserChangeForm):
+class CustomUserChangeForm(UniqueAcrossShardsMixin, UserChangeForm):
     """
     Formulário para edição de usuários com campos personalizados.
     """
     company = forms.ModelChoiceField(
-        queryset=Company.objects.filter(is_active=True),
+        queryset=Company.objects.active(),
         required=False,
         label='Empresa',
-        widget=forms.Select(attrs={'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'})
+        widget=widgets.Select()
     )
     groups = forms.ModelMultipleChoiceField(
         queryset=Group.objects.all(),
         required=False,
         label='Grupos',
-        widget=forms.SelectMultiple(attrs={'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'})
+        widget=widgets.SelectMultiple()
     )
     is_active = forms.BooleanField(
         required=False,
         label='Ativo',
-        widget=forms.CheckboxInput(attrs={'class': 'h-5 w-5 text-blue-600 focus:ring-blue-600 border-gray-400 rounded'})
+        widget=widgets.CheckboxInput()
     )
     
     class Meta:
         model = User
         fields = ('username', 'email', 'first_name', 'last_name', 'company', 'groups', 'is_active')
         widgets = {
-            'username': forms.TextInput(attrs={'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'}),
-            'email': forms.EmailInput(attrs={'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'}),
-            'first_name': forms.TextInput(attrs={'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'}),
-            'last_name': forms.TextInput(attrs={'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'}),
+            'username': widgets.TextInput(),
+            'email': widgets.EmailInput(),
+            'first_name': widgets.TextInput(),
+            'last_name': widgets.TextInput(),
         }
     
     def __init__(self, *args, **kwargs):
@@ -90,12 +105,9 @@ class CustomUserChangeForm(UserChangeForm):
             self.fields.pop('password')
         
         # Filtra as empresas disponíveis com base no usuário logado
-        if user and not user.is_superuser and user.company:
-            # Administrador da Organização vê apenas empresas da sua organização
-            self.fields['company'].queryset = Company.objects.filter(
-                organization=user.company.organization,
-                is_active=True
-            )
+        # (Administrador da Organização vê apenas empresas da sua organização)
+        if user:
+            self.fields['company'].queryset = self.fields['company'].queryset.visible_to(user)
 
 
 class GroupForm(forms.ModelForm):
@@ -106,6 +118,6 @@ class GroupForm(forms.ModelForm):
         model = Group
         fields = ('name', 'permissions')
         widgets = {
-            'name': forms.TextInput(attrs={'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'}),
-            'permissions': forms.CheckboxSelectMultiple(attrs={'class': 'h-5 w-5 text-blue-600 focus:ring-blue-600 border-gray-400 rounded'}),
+            'name': widgets.TextInput(),
+            'permissions': widgets.CheckboxSelectMultiple(),
         }
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+Hashers de senha com custo configurável em ``PASSWORD_HASHER_PARAMS``.
+
+Os parâmetros são lidos das configurações a cada uso. Quando mudam (ou
+quando o algoritmo principal em ``PASSWORD_HASHERS`` muda), ``must_update``
+acusa os hashes antigos e o Django refaz o hash da senha no próximo login
+bem-sucedido. Use ``manage.py calibrate_hashers`` para escolher os valores.
+"""
+import base64
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, ScryptPasswordHasher
+
+
+def hasher_params(algorithm):
+    return settings.PASSWORD_HASHER_PARAMS.get(algorithm, {})
+
+
+def _scrypt_maxmem(n, r, p):
+    # O limite padrão do OpenSSL (32 MB) não comporta work_factor >= 2 ** 15;
+    # reserva o dobro da memória exigida (128 * n * r * p)
+    return 2 * 128 * n * r * p
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """
+    scrypt (biblioteca padrão) com ``work_factor``, ``block_size`` e ``parallelism`` configuráveis.
+    """
+    
+    @property
+    def work_factor(self):
+        return hasher_params('scrypt').get('work_factor', ScryptPasswordHasher.work_factor)
+    
+    @property
+    def block_size(self):
+        return hasher_params('scrypt').get('block_size', ScryptPasswordHasher.block_size)
+    
+    @property
+    def parallelism(self):
+        return hasher_params('scrypt').get('parallelism', ScryptPasswordHasher.parallelism)
+    
+    def encode(self, password, salt, n=None, r=None, p=None):
+        # Também usado por verify() com os parâmetros gravados no hash: o limite
+        # de memória vem deles, não das configurações atuais (que podem ter baixado)
+        self._check_encode_args(password, salt)
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = hashlib.scrypt(
+            password.encode(),
+            salt=salt.encode(),
+            n=n,
+            r=r,
+            p=p,
+            maxmem=_scrypt_maxmem(n, r, p),
+            dklen=64,
+        )
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return '%s$%d$%s$%d$%d$%s' % (self.algorithm, n, salt, r, p, hash_)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id com ``time_cost``, ``memory_cost`` (KiB) e ``parallelism`` configuráveis.
+
+    Requer o pacote ``argon2-cffi``.
+    """
+    
+    @property
+    def time_cost(self):
+        return hasher_params('argon2').get('time_cost', Argon2PasswordHasher.time_cost)
+    
+    @property
+    def memory_cost(self):
+        return hasher_params('argon2').get('memory_cost', Argon2PasswordHasher.memory_cost)
+    
+    @property
+    def parallelism(self):
+        return hasher_params('argon2').get('parallelism', Argon2PasswordHasher.parallelism)
@@ -0,0 +1,28 @@
+"""
+Pool de threads para o hash de senhas em lote.
+
+A API (criação de usuários em lote) e o provisionamento de organizações
+calculam os hashes das novas senhas em paralelo, antes da transação, em um
+pool limitado a ``PASSWORD_HASHING_THREADS``: no máximo esse número de hashes
+roda ao mesmo tempo e os demais esperam na fila do pool. O login e a troca de
+senha continuam fazendo o hash na thread da própria requisição.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASHING_THREADS,
+                    thread_name_prefix='password-hashing',
+                )
+    return _executor
@@ -0,0 +1,94 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, ScryptPasswordHasher
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o tempo do hash de senha nesta máquina e sugere o maior custo '
+        'que fica dentro da latência alvo.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--algorithm', choices=('scrypt', 'argon2'), default=settings.PASSWORD_HASHER,
+            help='Algoritmo a calibrar (padrão: o configurado em PASSWORD_HASHER).'
+        )
+        parser.add_argument(
+            '--target-ms', type=float, default=250,
+            help='Latência alvo de um hash, em milissegundos.'
+        )
+        parser.add_argument(
+            '--samples', type=int, default=3,
+            help='Medições por configuração (usa a mediana).'
+        )
+        parser.add_argument(
+            '--max-memory-mb', type=int, default=256,
+            help='Memória máxima por hash que pode ser sugerida.'
+        )
+    
+    def handle(self, *args, **options):
+        self.samples = max(1, options['samples'])
+        target = options['target_ms']
+        max_memory = options['max_memory_mb'] * 1024 * 1024
+        
+        if options['algorithm'] == 'scrypt':
+            candidates = self.scrypt_candidates(max_memory)
+        else:
+            candidates = self.argon2_candidates(max_memory)
+        
+        chosen = None
+        for params, hasher in candidates:
+            elapsed = self.measure(hasher)
+            self.stdout.write(f'  {params}: {elapsed:.0f} ms')
+            if elapsed > target:
+                break
+            chosen = params
+        
+        if chosen is None:
+            raise CommandError(f'Nenhuma configuração ficou abaixo de {target:.0f} ms nesta máquina.')
+        self.stdout.write(self.style.SUCCESS(
+            f"PASSWORD_HASHER_PARAMS['{options['algorithm']}'] = {chosen}"
+        ))
+    
+    def measure(self, hasher):
+        salt = hasher.salt()
+        timings = []
+        for _ in range(self.samples):
+            started = time.perf_counter()
+            hasher.encode('calibração-de-senha', salt)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+    
+    def scrypt_candidates(self, max_memory):
+        params = settings.PASSWORD_HASHER_PARAMS.get('scrypt', {})
+        block_size = params.get('block_size', ScryptPasswordHasher.block_size)
+        parallelism = params.get('parallelism', ScryptPasswordHasher.parallelism)
+        for exponent in range(12, 25):
+            memory = 128 * 2 ** exponent * block_size * parallelism
+            if memory > max_memory:
+                return
+            hasher = ScryptPasswordHasher()
+            hasher.work_factor = 2 ** exponent
+            hasher.block_size = block_size
+            hasher.parallelism = parallelism
+            hasher.maxmem = 2 * memory
+            yield {'work_factor': 2 ** exponent, 'block_size': block_size, 'parallelism': parallelism}, hasher
+    
+    def argon2_candidates(self, max_memory):
+        try:
+            import argon2  # noqa: F401
+        except ImportError:
+            raise CommandError('O pacote argon2-cffi não está instalado.')
+        params = settings.PASSWORD_HASHER_PARAMS.get('argon2', {})
+        memory_cost = min(params.get('memory_cost', Argon2PasswordHasher.memory_cost), max_memory // 1024)
+        parallelism = params.get('parallelism', Argon2PasswordHasher.parallelism)
+        for time_cost in range(1, 21):
+            hasher = Argon2PasswordHasher()
+            hasher.time_cost = time_cost
+            hasher.memory_cost = memory_cost
+            hasher.parallelism = parallelism
+            yield {'time_cost': time_cost, 'memory_cost': memory_cost, 'parallelism': parallelism}, hasher
@@ -0,0 +1,23 @@
+from django.utils.functional import empty
+
+from . import presence
+
+
+class LastSeenMiddleware:
+    """
+    Anota o último acesso do usuário logado (``accounts.presence``), sem
+    consultas: a gravação no banco é feita em lote depois da resposta.
+    Requisições que nem chegaram a carregar o usuário (ex.: arquivos
+    estáticos) são ignoradas.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # request.user é um SimpleLazyObject: só interessa se a requisição o carregou
+        user = getattr(getattr(request, 'user', None), '_wrapped', empty)
+        if user is not empty and user.is_authenticated:
+            presence.touch(user)
+        return response
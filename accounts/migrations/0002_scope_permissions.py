@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-19 14:49
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='user',
+            options={'permissions': [('view_all_users', 'Can view users of own organization'), ('view_company_users', 'Can view users of own company'), ('change_organization_users', 'Can change users of own organization'), ('change_company_users', 'Can change users of own company'), ('delete_organization_users', 'Can deactivate users of own organization'), ('delete_company_users', 'Can deactivate users of own company')], 'verbose_name': 'user', 'verbose_name_plural': 'users'},
+        ),
+    ]
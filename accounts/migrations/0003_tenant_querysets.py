@@ -0,0 +1,20 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:02
+
+import accounts.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_scope_permissions'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', accounts.models.TenantUserManager()),
+            ],
+        ),
+    ]
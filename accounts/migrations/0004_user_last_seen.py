@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_tenant_querysets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='last_seen',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='last seen'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:40
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_last_seen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedUser',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('username', models.CharField(db_index=True, max_length=150, verbose_name='username')),
+                ('email', models.EmailField(max_length=254, verbose_name='email address')),
+                ('company_id', models.BigIntegerField(db_index=True, null=True, verbose_name='company')),
+                ('organization_id', models.BigIntegerField(db_index=True, null=True, verbose_name='organization')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='archived at')),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='data')),
+            ],
+            options={
+                'verbose_name': 'archived user',
+                'verbose_name_plural': 'archived users',
+            },
+        ),
+    ]
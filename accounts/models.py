@@ -1,7 +1,75 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
-from django.contrib.auth.models import AbstractUser, Group, Permission
+from django.contrib.auth.models import AbstractUser, Group, Permission, UserManager
+from django.db.models import Prefetch, Q
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from core.sharding import ShardedQuerySetMixin
 from organizations.models import Company
+from .projections import USER_LIST
+
+
+class UserQuerySet(ShardedQuerySetMixin, models.QuerySet):
+    """
+    Consultas de usuários na hierarquia Organização -> Empresa.
+    """
+    def active(self):
+        return self.filter(is_active=True)
+    
+    def for_org(self, organization):
+        return self.filter(company__organization=organization)
+    
+    def for_company(self, company):
+        return self.filter(company=company)
+    
+    def for_scope(self, scope):
+        """
+        Restringe a um escopo de ``accounts.permissions`` (ex.: ``get_scope(user, User, 'change')``).
+        """
+        return self.filter(scope.q)
+    
+    def visible_to(self, user, action='view'):
+        from .permissions import get_scope
+        return self.for_scope(get_scope(user, self.model, action))
+    
+    def seen_since(self, when):
+        return self.filter(last_seen__gte=when)
+    
+    def not_seen_since(self, when):
+        """
+        Usuários sem acesso desde ``when``, incluindo os que nunca acessaram.
+        """
+        return self.filter(Q(last_seen__lt=when) | Q(last_seen__isnull=True))
+    
+    def search(self, q):
+        if not q:
+            return self
+        return self.filter(
+            Q(username__icontains=q) |
+            Q(first_name__icontains=q) |
+            Q(last_name__icontains=q) |
+            Q(email__icontains=q)
+        )
+    
+    def with_company(self):
+        """
+        Empresa e organização na mesma consulta (LEFT JOIN, usuários sem empresa incluídos).
+        """
+        return self.select_related('company__organization')
+    
+    def with_groups(self):
+        return self.prefetch_related(Prefetch('groups', queryset=Group.objects.only('pk', 'name')))
+    
+    def for_listing(self):
+        """
+        Colunas da listagem de usuários, com empresa, organização e grupos
+        (ver ``projections.py``).
+        """
+        return USER_LIST.apply(self)
+
+
+class TenantUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
 
 
 class User(AbstractUser):
@@ -19,12 +87,48 @@ class User(AbstractUser):
         null=True,
         blank=True
     )
+    # Gravado em lote, com atraso de até LAST_SEEN_FLUSH_SECONDS (accounts.presence)
+    last_seen = models.DateTimeField(_('last seen'), null=True, blank=True, db_index=True)
     
     # Campos adicionais podem ser adicionados conforme necessário
     
+    objects = TenantUserManager()
+    
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
+        # Escopo das permissões por objeto (ver accounts.permissions)
+        permissions = [
+            ('view_all_users', 'Can view users of own organization'),
+            ('view_company_users', 'Can view users of own company'),
+            ('change_organization_users', 'Can change users of own organization'),
+            ('change_company_users', 'Can change users of own company'),
+            ('delete_organization_users', 'Can deactivate users of own organization'),
+            ('delete_company_users', 'Can deactivate users of own company'),
+        ]
         
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+
+class ArchivedUser(models.Model):
+    """
+    Usuário inativo arquivado (``core.archive``): a linha sai de
+    ``accounts_user`` (e das listagens, contagens e buscas) e fica aqui, com o
+    mesmo pk, até ser restaurada.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    username = models.CharField(_('username'), max_length=150, db_index=True)
+    email = models.EmailField(_('email address'))
+    company_id = models.BigIntegerField(_('company'), null=True, db_index=True)
+    organization_id = models.BigIntegerField(_('organization'), null=True, db_index=True)
+    archived_at = models.DateTimeField(_('archived at'), default=timezone.now)
+    # Campos do usuário (com grupos e permissões) como no serializador "python" do Django
+    data = models.JSONField(_('data'), encoder=DjangoJSONEncoder)
+    
+    class Meta:
+        verbose_name = _('archived user')
+        verbose_name_plural = _('archived users')
+    
+    def __str__(self):
+        return self.username
@@ -0,0 +1,212 @@
+"""
+Permissões por objeto na hierarquia Organização → Empresa → Usuário.
+
+As permissões de modelo (``accounts.change_user`` etc.) continuam decidindo
+*se* o usuário pode executar a ação; este módulo decide *sobre quais objetos*.
+O mesmo escopo é usado de três formas:
+
+* ``visible_to(user, queryset, action)`` filtra listagens no SQL;
+* ``permitted_ids(user, perm, objs)`` responde para N objetos em uma consulta;
+* ``TenantPermissionBackend`` atende ``user.has_perm(perm, obj)`` nas views.
+
+Regras por ação sobre usuários (quem não é superusuário):
+
+* permissão de organização (ex.: ``change_organization_users``): usuários da organização;
+* permissão de empresa (ex.: ``change_company_users``): usuários da empresa;
+* sem nenhuma delas: apenas o próprio usuário (exceto para desativar).
+
+Organizações e empresas ficam restritas à organização do usuário; desativar
+organizações é exclusivo do superusuário.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import BaseBackend
+from django.db.models import Q
+
+from organizations.models import Organization, Company
+
+# ação -> (permissão de organização, permissão de empresa, pode agir sobre si mesmo)
+USER_SCOPE_PERMISSIONS = {
+    'view': ('accounts.view_all_users', 'accounts.view_company_users', True),
+    'change': ('accounts.change_organization_users', 'accounts.change_company_users', True),
+    'delete': ('accounts.delete_organization_users', 'accounts.delete_company_users', False),
+}
+
+NOTHING = Q(pk__in=[])
+
+
+class Scope:
+    """
+    Conjunto de objetos de um modelo sobre os quais o usuário pode agir.
+    ``q`` é usado nas consultas e ``allows`` verifica um objeto já carregado.
+    """
+    
+    def __init__(self, q=None, organization_id=None, company_id=None, user_id=None, unrestricted=False, empty=False):
+        self.q = q if q is not None else (NOTHING if empty else Q())
+        self.organization_id = organization_id
+        self.company_id = company_id
+        self.user_id = user_id
+        self.unrestricted = unrestricted
+        self.empty = empty
+    
+    def covers_organization(self, organization_id):
+        """
+        Indica se o escopo alcança objetos da organização informada.
+        """
+        if self.unrestricted:
+            return True
+        return not self.empty and self.organization_id is not None and self.organization_id == organization_id
+    
+    def allows(self, obj):
+        if self.unrestricted:
+            return True
+        if self.empty:
+            return False
+        return self._predicate(obj)
+    
+    def _predicate(self, obj):
+        raise NotImplementedError
+
+
+class OrganizationScope(Scope):
+    def _predicate(self, obj):
+        return obj.pk == self.organization_id
+
+
+class CompanyScope(Scope):
+    def _predicate(self, obj):
+        return obj.organization_id == self.organization_id
+
+
+class UserScope(Scope):
+    def __init__(self, *args, exclude_user_id=None, allow_superusers=True, include_orphan_superusers=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exclude_user_id = exclude_user_id
+        self.allow_superusers = allow_superusers
+        self.include_orphan_superusers = include_orphan_superusers
+    
+    def allows(self, obj):
+        if self.exclude_user_id is not None and obj.pk == self.exclude_user_id:
+            return False
+        if not self.allow_superusers and obj.is_superuser:
+            return False
+        return super().allows(obj)
+    
+    def _predicate(self, obj):
+        if self.user_id is not None:
+            return obj.pk == self.user_id
+        if self.company_id is not None:
+            return obj.company_id == self.company_id
+        if obj.company_id is None:
+            return self.include_orphan_superusers and obj.is_superuser
+        return obj.company.organization_id == self.organization_id
+
+
+def _organization_id(user):
+    return user.company.organization_id if user.company_id else None
+
+
+def get_scope(user, model, action='view'):
+    """
+    Retorna o escopo do usuário para a ação (view, add, change, delete) no modelo.
+    """
+    if not user.is_authenticated or not user.is_active:
+        return Scope(empty=True)
+    
+    if model is get_user_model():
+        return _user_scope(user, action)
+    
+    if user.is_superuser:
+        return Scope(unrestricted=True)
+    
+    organization_id = _organization_id(user)
+    if model is Organization:
+        if action == 'delete' or organization_id is None:
+            return OrganizationScope(empty=True)
+        return OrganizationScope(Q(pk=organization_id), organization_id=organization_id)
+    if model is Company:
+        if organization_id is None:
+            return CompanyScope(empty=True)
+        return CompanyScope(Q(organization_id=organization_id), organization_id=organization_id)
+    
+    # Modelos fora da hierarquia (ex.: grupos) não têm restrição por objeto
+    return Scope(unrestricted=True)
+
+
+def _user_scope(user, action):
+    restrictions = {}
+    if action == 'delete':
+        # Ninguém desativa a si mesmo; só superusuários desativam superusuários
+        exclusions = ~Q(pk=user.pk) if user.is_superuser else ~Q(pk=user.pk) & Q(is_superuser=False)
+        restrictions = {'exclude_user_id': user.pk, 'allow_superusers': user.is_superuser}
+    else:
+        exclusions = Q()
+    
+    if user.is_superuser:
+        return UserScope(exclusions, unrestricted=True, **restrictions)
+    
+    organization_perm, company_perm, allows_self = USER_SCOPE_PERMISSIONS.get(action, (None, None, False))
+    organization_id = _organization_id(user)
+    
+    if organization_perm and organization_id is not None and user.has_perm(organization_perm):
+        q = Q(company__organization_id=organization_id)
+        if action == 'view':
+            # Administradores da organização também enxergam os superusuários sem empresa
+            q |= Q(company__isnull=True, is_superuser=True)
+        return UserScope(
+            q & exclusions,
+            organization_id=organization_id,
+            include_orphan_superusers=action == 'view',
+            **restrictions
+        )
+    if company_perm and user.company_id is not None and user.has_perm(company_perm):
+        return UserScope(
+            Q(company_id=user.company_id) & exclusions,
+            organization_id=organization_id,
+            company_id=user.company_id,
+            **restrictions
+        )
+    if allows_self:
+        return UserScope(Q(pk=user.pk), organization_id=organization_id, user_id=user.pk)
+    return UserScope(empty=True)
+
+
+def split_perm(perm):
+    """
+    ``'accounts.change_user'`` -> ``'change'``.
+    """
+    return perm.split('.', 1)[-1].split('_', 1)[0]
+
+
+def visible_to(user, queryset, action='view'):
+    """
+    Restringe o queryset aos objetos do escopo do usuário para a ação.
+    """
+    return queryset.filter(get_scope(user, queryset.model, action).q)
+
+
+def permitted_ids(user, perm, objs, model=None):
+    """
+    Retorna os pks dos objetos (instâncias ou pks de ``model``) sobre os quais
+    o usuário tem a permissão, resolvendo todos em uma única consulta.
+    """
+    objs = list(objs)
+    if not objs or not user.has_perm(perm):
+        return set()
+    model = model or type(objs[0])
+    pks = [getattr(obj, 'pk', obj) for obj in objs]
+    queryset = visible_to(user, model._default_manager.filter(pk__in=pks), split_perm(perm))
+    return set(queryset.values_list('pk', flat=True))
+
+
+class TenantPermissionBackend(BaseBackend):
+    """
+    Backend de autorização por objeto. Só responde a ``has_perm(perm, obj)``
+    com objeto; as permissões de modelo continuam com o ``ModelBackend``.
+    """
+    
+    def has_perm(self, user_obj, perm, obj=None):
+        if obj is None or not user_obj.is_active:
+            return False
+        if not user_obj.has_perm(perm):
+            return False
+        return get_scope(user_obj, type(obj), split_perm(perm)).allows(obj)
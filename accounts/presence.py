@@ -0,0 +1,116 @@
+"""
+Último acesso dos usuários (``User.last_seen``) com escrita adiada.
+
+Gravar o último acesso a cada requisição transformaria toda página em um
+UPDATE. Em vez disso, ``touch`` só anota o horário em um dicionário do
+processo (custo de uma atribuição) e ``flush`` grava os pendentes em lote,
+um ``UPDATE ... SET last_seen = CASE ...`` por banco a cada
+``LAST_SEEN_BATCH_SIZE`` usuários, no máximo a cada ``LAST_SEEN_FLUSH_SECONDS``.
+O flush roda no ``request_finished``, depois que a resposta já foi enviada.
+
+O valor no banco pode estar atrasado em até ``LAST_SEEN_FLUSH_SECONDS`` (ou
+até a próxima requisição do processo); para "ativo hoje" ou "nos últimos 30
+dias" isso não faz diferença.
+"""
+import datetime
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, router
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = {}  # (banco, pk) -> último acesso
+_next_flush = time.monotonic()
+
+# Filtros da listagem de usuários (?seen=): rótulo, janela e se são os que
+# acessaram dentro dela ou os que não acessaram
+SEEN_FILTERS = {
+    '24h': ('Acessaram nas últimas 24 horas', datetime.timedelta(hours=24), True),
+    '7d': ('Acessaram nos últimos 7 dias', datetime.timedelta(days=7), True),
+    '30d': ('Acessaram nos últimos 30 dias', datetime.timedelta(days=30), True),
+    'inactive': ('Sem acesso há mais de 30 dias', datetime.timedelta(days=30), False),
+}
+
+
+def filter_seen(queryset, key):
+    """
+    Aplica um filtro de ``SEEN_FILTERS``; chaves desconhecidas não filtram.
+    """
+    if key not in SEEN_FILTERS:
+        return queryset
+    _, window, seen = SEEN_FILTERS[key]
+    since = timezone.now() - window
+    return queryset.seen_since(since) if seen else queryset.not_seen_since(since)
+
+
+def touch(user):
+    """
+    Anota o acesso do usuário agora; gravado no próximo ``flush``.
+    """
+    alias = router.db_for_write(type(user), instance=user)
+    now = timezone.now()
+    with _lock:
+        _pending[(alias, user.pk)] = now
+
+
+def pending():
+    with _lock:
+        return dict(_pending)
+
+
+def flush():
+    """
+    Grava os acessos pendentes. Retorna a quantidade de usuários atualizados.
+    """
+    global _pending, _next_flush
+    with _lock:
+        seen, _pending = _pending, {}
+        _next_flush = time.monotonic() + settings.LAST_SEEN_FLUSH_SECONDS
+
+    by_alias = {}
+    for (alias, pk), when in seen.items():
+        by_alias.setdefault(alias, {})[pk] = when
+
+    User = get_user_model()
+    updated = 0
+    for alias, users in by_alias.items():
+        items = sorted(users.items())
+        for start in range(0, len(items), settings.LAST_SEEN_BATCH_SIZE):
+            batch = items[start:start + settings.LAST_SEEN_BATCH_SIZE]
+            # Outro processo pode ter gravado um horário mais recente: nunca retrocede
+            whens = [
+                When(Q(pk=pk) & (Q(last_seen__isnull=True) | Q(last_seen__lt=when)), then=Value(when))
+                for pk, when in batch
+            ]
+            try:
+                updated += User._base_manager.using(alias).filter(pk__in=[pk for pk, _ in batch]).update(
+                    last_seen=Case(*whens, default=F('last_seen'))
+                )
+            except DatabaseError:
+                logger.warning('Falha ao gravar o último acesso de %s usuário(s) em "%s".', len(batch), alias,
+                               exc_info=True)
+                _requeue(alias, batch)
+    return updated
+
+
+def _requeue(alias, batch):
+    # Volta para a fila sem sobrescrever acessos mais novos anotados nesse meio-tempo
+    with _lock:
+        for pk, when in batch:
+            _pending.setdefault((alias, pk), when)
+
+
+def flush_if_due(**kwargs):
+    """
+    Receptor do ``request_finished``: grava os pendentes se o intervalo já passou.
+    """
+    if _pending and time.monotonic() >= _next_flush:
+        flush()
+
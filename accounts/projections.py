@@ -0,0 +1,13 @@
+from core.projections import Column, Projection
+
+USER_LIST = Projection(
+    Column('username', 'Usuário'),
+    Column('first_name', 'Nome'),
+    Column('last_name', 'Sobrenome'),
+    Column('email', 'E-mail'),
+    Column('company', 'Empresa', field='company__name'),
+    Column('organization', 'Organização', field='company__organization__name'),
+    Column('groups', 'Grupos', field='groups__name', many=True),
+    Column('is_active', 'Ativo'),
+    Column('last_seen', 'Último acesso', export=False),
+)
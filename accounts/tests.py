@@ -1,6 +1,18 @@
-from django.test import TestCase
+import datetime
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+from django.core.cache import cache
+from django.utils import timezone
+from django.test import TestCase, override_settings
+from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
 from organizations.models import Organization, Company
+from core import metrics
+from .permissions import permitted_ids, visible_to
+from . import presence, throttling
+from .hashing import get_executor
 
 User = get_user_model()
 
@@ -65,4 +77,317 @@ class UserModelTest(TestCase):
             password='testpass123'
         )
         
-        self.assertEqual(str(user), 'test@example.com')
\ No newline at end of file
+        self.assertEqual(str(user), 'test@example.com')
+
+class TenantPermissionTest(TestCase):
+    """
+    Testes para as permissões por objeto na hierarquia Organização -> Empresa -> Usuário.
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Organização Teste')
+        self.other_organization = Organization.objects.create(name='Outra Organização')
+        self.company = Company.objects.create(organization=self.organization, name='Empresa Teste')
+        self.sister_company = Company.objects.create(organization=self.organization, name='Empresa Irmã')
+        self.other_company = Company.objects.create(organization=self.other_organization, name='Empresa Externa')
+        
+        self.org_admin = self.create_user('orgadmin', self.company, [
+            'view_user', 'change_user', 'delete_user',
+            'view_all_users', 'change_organization_users', 'delete_organization_users',
+        ])
+        self.manager = self.create_user('manager', self.company, [
+            'view_user', 'change_user', 'view_company_users', 'change_company_users',
+        ])
+        self.member = self.create_user('member', self.sister_company, ['view_user', 'change_user'])
+        self.outsider = self.create_user('outsider', self.other_company, [])
+        self.superuser = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+    
+    def create_user(self, username, company, codenames):
+        user = User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='testpass123',
+            company=company
+        )
+        user.user_permissions.set(Permission.objects.filter(codename__in=codenames))
+        return User.objects.get(pk=user.pk)
+    
+    def test_visible_to_by_scope(self):
+        """
+        Testa o filtro de usuários visíveis para cada nível da hierarquia.
+        """
+        def usernames(user):
+            return set(visible_to(user, User.objects.all()).values_list('username', flat=True))
+        
+        self.assertEqual(usernames(self.org_admin), {'orgadmin', 'manager', 'member', 'admin'})
+        self.assertEqual(usernames(self.manager), {'orgadmin', 'manager'})
+        self.assertEqual(usernames(self.member), {'member'})
+        self.assertEqual(len(usernames(self.superuser)), 5)
+    
+    def test_has_perm_on_objects(self):
+        """
+        Testa o backend de permissões por objeto.
+        """
+        self.assertTrue(self.org_admin.has_perm('accounts.change_user', self.member))
+        self.assertFalse(self.org_admin.has_perm('accounts.change_user', self.outsider))
+        self.assertFalse(self.manager.has_perm('accounts.change_user', self.member))
+        self.assertTrue(self.member.has_perm('accounts.change_user', self.member))
+        self.assertFalse(self.member.has_perm('accounts.delete_user', self.member))
+        self.assertFalse(self.org_admin.has_perm('accounts.delete_user', self.org_admin))
+        self.assertFalse(self.org_admin.has_perm('accounts.delete_user', self.superuser))
+        self.assertFalse(self.outsider.has_perm('accounts.view_user', self.outsider))
+    
+    def test_permitted_ids_in_one_query(self):
+        """
+        Testa a verificação em lote com uma única consulta.
+        """
+        users = [self.member, self.manager, self.outsider, self.superuser]
+        # Carrega o cache de permissões e a empresa, como acontece no início de cada requisição
+        self.org_admin.has_perm('accounts.change_user')
+        self.org_admin.company
+        with self.assertNumQueries(1):
+            allowed = permitted_ids(self.org_admin, 'accounts.change_user', users)
+        self.assertEqual(allowed, {self.member.pk, self.manager.pk})
+    
+    def test_user_edit_outside_scope_is_refused(self):
+        """
+        Testa se a view de edição recusa usuários fora do escopo.
+        """
+        self.client.login(username='orgadmin', password='testpass123')
+        response = self.client.get(reverse('accounts:user_edit', args=[self.outsider.pk]))
+        self.assertRedirects(response, reverse('accounts:user_list'))
+        
+        response = self.client.get(reverse('accounts:user_list'))
+        self.assertNotContains(response, 'outsider@example.com')
+        self.assertContains(response, 'member@example.com')
+
+
+class GroupFormViewTest(TestCase):
+    """
+    Testes do formulário de grupos com o catálogo de permissões em cache.
+    """
+    
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.admin = User.objects.create_superuser(username='admin', password='adminpass123')
+        self.permission = Permission.objects.get(codename='view_company')
+        self.group = Group.objects.create(name='Leitores')
+        self.group.permissions.add(self.permission)
+        self.client.force_login(self.admin)
+    
+    def test_edit_lists_catalog_and_marks_selected(self):
+        """
+        Testa se a edição lista todas as permissões e marca as do grupo, reutilizando o catálogo.
+        """
+        url = reverse('accounts:group_edit', args=[self.group.pk])
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertContains(response, 'name="permissions"', count=Permission.objects.count())
+        self.assertContains(response, 'organizations.company')
+        self.assertEqual(len(response.context['selected_permissions']), 1)
+        self.assertIn(self.permission.pk, response.context['selected_permissions'])
+
+
+@override_settings(LOGIN_THROTTLE={
+    'cache': 'default',
+    'ip_header': 'REMOTE_ADDR',
+    'ip': {'capacity': 5, 'refill_per_minute': 1},
+    'username': {'capacity': 2, 'refill_per_minute': 1},
+})
+class LoginThrottleTest(TestCase):
+    """
+    Testes do limite de tentativas de login (cache em memória local).
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.url = reverse('accounts:login')
+    
+    def login(self, username='testuser', password='wrong', ip='10.0.0.1'):
+        return self.client.post(self.url, {'username': username, 'password': password}, REMOTE_ADDR=ip)
+    
+    def test_username_limit_fails_fast(self):
+        """
+        Testa se o limite por usuário responde 429 sem consultar o banco (sem hash).
+        """
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.login(ip='10.0.0.2').status_code, 200)
+        
+        with self.assertNumQueries(0):
+            response = self.login(ip='10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(metrics.snapshot()['login.throttled.username'], 1)
+        self.assertEqual(metrics.snapshot()['login.failures'], 2)
+        
+        # Outros usuários do mesmo IP continuam podendo entrar
+        self.assertEqual(self.login(username='other', ip='10.0.0.3').status_code, 200)
+    
+    def test_ip_limit(self):
+        """
+        Testa se o limite por IP vale para qualquer nome de usuário.
+        """
+        for index in range(5):
+            self.assertEqual(self.login(username=f'user{index}').status_code, 200)
+        self.assertEqual(self.login(username='user9').status_code, 429)
+        self.assertEqual(self.login(username='user9', ip='10.0.0.2').status_code, 200)
+    
+    def test_success_resets_username_bucket(self):
+        """
+        Testa se o login correto devolve as tentativas do usuário.
+        """
+        self.login()
+        response = self.login(password='testpass123')
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.client.logout()
+        self.assertEqual(self.login(ip='10.0.0.2').status_code, 200)
+        self.assertEqual(self.login(ip='10.0.0.3').status_code, 200)
+    
+    def test_bucket_refills(self):
+        """
+        Testa a reposição das tentativas com o passar do tempo.
+        """
+        bucket = throttling.TokenBucket('login-throttle:test', capacity=1, refill_per_minute=6)
+        bucket.consume(now=1000)
+        self.assertEqual(bucket.retry_after(now=1000), 10)
+        self.assertEqual(bucket.retry_after(now=1005), 5)
+        self.assertEqual(bucket.retry_after(now=1010), 0)
+
+
+FAST_SCRYPT = {'scrypt': {'work_factor': 2 ** 10, 'block_size': 8, 'parallelism': 1}}
+
+
+@override_settings(PASSWORD_HASHER_PARAMS=FAST_SCRYPT)
+class PasswordHashingTest(TestCase):
+    """
+    Testes dos hashers com custo configurável e do pool de hash em lote.
+    """
+    
+    def test_new_password_uses_configured_cost(self):
+        """
+        Testa se novas senhas usam o scrypt com os parâmetros configurados.
+        """
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        algorithm, work_factor = user.password.split('$')[:2]
+        self.assertEqual(algorithm, 'scrypt')
+        self.assertEqual(int(work_factor), 2 ** 10)
+    
+    def test_rehash_on_login_when_cost_changes(self):
+        """
+        Testa se o login refaz o hash quando o custo configurado muda.
+        """
+        User.objects.create_user(username='testuser', password='testpass123')
+        stronger = {'scrypt': {'work_factor': 2 ** 11, 'block_size': 8, 'parallelism': 1}}
+        with self.settings(PASSWORD_HASHER_PARAMS=stronger):
+            self.assertTrue(self.client.login(username='testuser', password='testpass123'))
+        user = User.objects.get(username='testuser')
+        self.assertEqual(int(user.password.split('$')[1]), 2 ** 11)
+    
+    def test_login_after_cost_is_lowered(self):
+        """
+        Testa se hashes com custo maior que o configurado ainda são verificados (e refeitos).
+        """
+        stronger = {'scrypt': {'work_factor': 2 ** 15, 'block_size': 8, 'parallelism': 1}}
+        with self.settings(PASSWORD_HASHER_PARAMS=stronger):
+            User.objects.create_user(username='testuser', password='testpass123')
+        self.assertTrue(self.client.login(username='testuser', password='testpass123'))
+        user = User.objects.get(username='testuser')
+        self.assertEqual(int(user.password.split('$')[1]), 2 ** 10)
+    
+    def test_legacy_pbkdf2_hash_is_upgraded(self):
+        """
+        Testa se hashes PBKDF2 existentes passam para scrypt no login.
+        """
+        user = User.objects.create_user(username='testuser')
+        user.password = make_password('testpass123', hasher='pbkdf2_sha256')
+        user.save(update_fields=['password'])
+        
+        self.assertTrue(self.client.login(username='testuser', password='testpass123'))
+        user.refresh_from_db()
+        self.assertEqual(identify_hasher(user.password).algorithm, 'scrypt')
+    
+    def test_batch_hashing_pool(self):
+        """
+        Testa o hash em lote no pool de threads limitado por ``PASSWORD_HASHING_THREADS``.
+        """
+        executor = get_executor()
+        self.assertEqual(executor._max_workers, settings.PASSWORD_HASHING_THREADS)
+        encoded = list(executor.map(make_password, ['senha-1', 'senha-2']))
+        self.assertEqual([identify_hasher(value).algorithm for value in encoded], ['scrypt', 'scrypt'])
+        self.assertTrue(check_password('senha-2', encoded[1]))
+
+
+class LastSeenTest(TestCase):
+    """
+    Testes do último acesso com escrita adiada (accounts.presence).
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        # Grava (antes de criar os usuários deste teste) os acessos anotados por
+        # outros testes e adia o próximo flush automático
+        presence.flush()
+        cache.clear()
+        self.organization = Organization.objects.create(name='Organização Teste')
+        self.company = Company.objects.create(organization=self.organization, name='Empresa Teste')
+        self.user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpass123', company=self.company
+        )
+        self.idle = User.objects.create_user(
+            username='idle', email='idle@example.com', password='testpass123', company=self.company
+        )
+    
+    def test_requests_are_buffered_and_flushed_in_batch(self):
+        """
+        Testa se as requisições só anotam o acesso e se o flush grava todos em uma consulta.
+        """
+        self.client.force_login(self.user)
+        self.client.get(reverse('core:dashboard'))
+        self.client.get(reverse('accounts:user_list'))
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_seen)
+        self.assertIn(('default', self.user.pk), presence.pending())
+        
+        presence.touch(self.idle)
+        with self.assertNumQueries(1):
+            self.assertEqual(presence.flush(), 2)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_seen)
+        self.assertEqual(presence.pending(), {})
+    
+    def test_flush_never_moves_backwards(self):
+        """
+        Testa se um horário mais antigo (de outro processo) não sobrescreve o gravado.
+        """
+        later = timezone.now() + datetime.timedelta(hours=1)
+        User.objects.filter(pk=self.user.pk).update(last_seen=later)
+        presence.touch(self.user)
+        presence.flush()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_seen, later)
+    
+    def test_list_filter_and_dashboard_count(self):
+        """
+        Testa o filtro de último acesso da listagem e a contagem de ativos no dashboard.
+        """
+        User.objects.filter(pk=self.user.pk).update(last_seen=timezone.now())
+        User.objects.filter(pk=self.idle.pk).update(last_seen=timezone.now() - datetime.timedelta(days=40))
+        self.client.force_login(self.user)
+        
+        response = self.client.get(reverse('accounts:user_list'), {'seen': '24h'})
+        self.assertEqual([user.username for user in response.context['users']], ['admin'])
+        response = self.client.get(reverse('accounts:user_list'), {'seen': 'inactive'})
+        self.assertEqual([user.username for user in response.context['users']], ['idle'])
+        
+        response = self.client.get(reverse('core:dashboard'))
+        self.assertEqual(response.context['active_user_count'], 1)
+        self.assertContains(response, '1 ativo nas últimas 24 h')
@@ -0,0 +1,131 @@
+"""
+Limite de tentativas de login por IP e por nome de usuário.
+
+Cada chave tem um token bucket (``capacity`` tentativas, repostas a
+``refill_per_minute`` por minuto) guardado no cache configurado em
+``LOGIN_THROTTLE['cache']``. A verificação acontece antes da autenticação,
+então uma rajada de tentativas recebe 429 sem calcular o hash da senha.
+
+Se o cache estiver indisponível, os buckets passam para um cache em memória
+do próprio processo: o limite fica por worker, mas continua valendo.
+"""
+import hashlib
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+ATTEMPTS = metrics.register('login.attempts', 'Tentativas de login recebidas')
+FAILURES = metrics.register('login.failures', 'Tentativas de login com credenciais inválidas')
+THROTTLED = {
+    'ip': metrics.register('login.throttled.ip', 'Tentativas recusadas pelo limite por IP'),
+    'username': metrics.register('login.throttled.username', 'Tentativas recusadas pelo limite por usuário'),
+}
+CACHE_FALLBACKS = metrics.register('login.throttle.cache_fallback', 'Operações feitas no cache local por falha do cache principal')
+
+_local_cache = LocMemCache('login-throttle', {})
+
+
+def _cache_call(method, *args, **kwargs):
+    try:
+        return getattr(caches[settings.LOGIN_THROTTLE['cache']], method)(*args, **kwargs)
+    except Exception:
+        logger.warning('Cache do limite de login indisponível; usando memória local', exc_info=True)
+        metrics.increment(CACHE_FALLBACKS)
+        return getattr(_local_cache, method)(*args, **kwargs)
+
+
+class TokenBucket:
+    """
+    Bucket de tentativas guardado no cache como ``(tokens, atualizado_em)``.
+
+    A leitura e a gravação não são atômicas; sob concorrência algumas
+    tentativas a mais podem passar, o que é aceitável para este limite.
+    """
+    
+    def __init__(self, key, capacity, refill_per_minute):
+        self.key = key
+        self.capacity = capacity
+        self.rate = refill_per_minute / 60
+    
+    def _tokens(self, now):
+        state = _cache_call('get', self.key)
+        if state is None:
+            return self.capacity
+        tokens, updated_at = state
+        return min(self.capacity, tokens + (now - updated_at) * self.rate)
+    
+    def retry_after(self, now=None):
+        """
+        Segundos até haver uma tentativa disponível (0 se já houver).
+        """
+        tokens = self._tokens(now or time.time())
+        if tokens >= 1:
+            return 0
+        return math.ceil((1 - tokens) / self.rate)
+    
+    def consume(self, now=None):
+        now = now or time.time()
+        tokens = max(0, self._tokens(now) - 1)
+        # Expira quando o bucket estaria cheio de novo
+        timeout = math.ceil((self.capacity - tokens) / self.rate) + 1
+        _cache_call('set', self.key, (tokens, now), timeout)
+    
+    def reset(self):
+        _cache_call('delete', self.key)
+
+
+def client_ip(request):
+    header = settings.LOGIN_THROTTLE.get('ip_header', 'REMOTE_ADDR')
+    # X-Forwarded-For pode ter a cadeia de proxies; o primeiro é o cliente
+    return request.META.get(header, '').split(',')[0].strip() or 'unknown'
+
+
+def _bucket(scope, value):
+    digest = hashlib.sha256(value.encode()).hexdigest()
+    config = settings.LOGIN_THROTTLE[scope]
+    return TokenBucket(f'login-throttle:{scope}:{digest}', config['capacity'], config['refill_per_minute'])
+
+
+class LoginThrottle:
+    """
+    Buckets de uma tentativa de login: o do IP e, se informado, o do usuário.
+    """
+    
+    def __init__(self, request, username):
+        self.buckets = {'ip': _bucket('ip', client_ip(request))}
+        username = (username or '').strip().lower()
+        if username:
+            self.buckets['username'] = _bucket('username', username)
+    
+    def check(self):
+        """
+        Retorna ``(escopo, segundos)`` do primeiro limite esgotado ou ``None``.
+        Não consome tentativas: um bucket esgotado não gasta o do outro escopo.
+        """
+        now = time.time()
+        for scope, bucket in self.buckets.items():
+            retry_after = bucket.retry_after(now)
+            if retry_after:
+                metrics.increment(THROTTLED[scope])
+                return scope, retry_after
+        return None
+    
+    def consume(self):
+        now = time.time()
+        for bucket in self.buckets.values():
+            bucket.consume(now)
+    
+    def succeeded(self):
+        """
+        Login bem-sucedido devolve as tentativas do usuário (o IP continua contando).
+        """
+        if 'username' in self.buckets:
+            self.buckets['username'].reset()
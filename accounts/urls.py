@@ -6,13 +6,15 @@ app_name = 'accounts'
 
 urlpatterns = [
     # Autenticação
-    path('login/', auth_views.LoginView.as_view(template_name='accounts/login.html'), name='login'),
+    path('login/', views.ThrottledLoginView.as_view(), name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='accounts:login'), name='logout'),
     path('password/change/', views.CustomPasswordChangeView.as_view(), name='password_change'),
     path('password/change/done/', views.password_change_done, name='password_change_done'),
     
     # Gerenciamento de usuários
     path('users/', views.user_list, name='user_list'),
+    path('users/export.csv', views.user_export, name='user_export'),
+    path('users/<int:pk>/row/', views.user_row, name='user_row'),
     path('users/create/', views.user_create, name='user_create'),
     path('users/<int:pk>/edit/', views.user_edit, name='user_edit'),
     path('users/<int:pk>/delete/', views.user_delete, name='user_delete'),
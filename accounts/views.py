@@ -1,64 +1,83 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
 from django.contrib.auth.models import Group, Permission
 from django.contrib.auth import get_user_model
 from django.http import HttpResponse
-from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
-from django.db.models import Q
-from django.contrib.auth.views import PasswordChangeView
+from django.contrib.auth.views import LoginView, PasswordChangeView
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import router, transaction
 
 from .models import User
 from organizations.models import Company
+from core import metrics
+from core import sharding
+from core.decorators import read_from_replica, route_to_shard
+from core.projections import csv_response
+from core.rendering import render
+from audit import log as audit
+from audit.models import AuditEvent
 from .forms import CustomUserCreationForm, CustomUserChangeForm, GroupForm
+from .catalog import permission_catalog
+from .projections import USER_LIST
+from . import presence, throttling
 
 # Views para gerenciamento de usuários
 
 @login_required
 @permission_required('accounts.view_user', raise_exception=True)
+@read_from_replica
 def user_list(request):
     """
     Lista todos os usuários do sistema, filtrados de acordo com as permissões do usuário logado.
     """
-    user = request.user
-    
-    if user.is_superuser:
-        # Superusuário vê todos os usuários
-        users = User.objects.all().order_by('username')
-    elif user.has_perm('accounts.view_all_users') and user.company and user.company.organization:
-        # Administrador da Organização vê usuários da sua organização
-        users = User.objects.filter(
-            Q(company__organization=user.company.organization) | 
-            Q(company__isnull=True, is_superuser=True)
-        ).order_by('username')
-    elif user.has_perm('accounts.view_company_users') and user.company:
-        # Gerente da Empresa vê usuários da sua empresa
-        users = User.objects.filter(company=user.company).order_by('username')
-    else:
-        # Usuário comum vê apenas seu próprio usuário
-        users = User.objects.filter(pk=user.pk)
-    
-    # Busca
+    # Superusuário vê todos, Administrador da Organização a organização,
+    # Gerente da Empresa a empresa e os demais apenas o próprio usuário
     q = request.GET.get('q', '').strip()
-    if q:
-        users = users.filter(
-            Q(username__icontains=q) | 
-            Q(first_name__icontains=q) | 
-            Q(last_name__icontains=q) |
-            Q(email__icontains=q)
-        )
-    
-    context = {'users': users, 'q': q}
+    seen = request.GET.get('seen', '')
+    users = User.objects.visible_to(request.user).search(q)
+    users = presence.filter_seen(users, seen).for_listing().order_by('username').across_shards()
     
-    if request.htmx:
-        return HttpResponse(render_to_string('accounts/partials/user_list.html', context))
+    context = {
+        'users': users,
+        'q': q,
+        'seen': seen,
+        'seen_filters': [(key, label) for key, (label, _, _) in presence.SEEN_FILTERS.items()],
+    }
     
-    return render(request, 'accounts/user_list.html', context)
+    return render(request, 'accounts/user_list.html', context,
+                  partial_template='accounts/partials/user_list.html')
+
+@login_required
+@permission_required('accounts.view_user', raise_exception=True)
+@read_from_replica
+def user_export(request):
+    """
+    Exporta em CSV os usuários da listagem (mesmo escopo e busca), com as colunas de ``USER_LIST``.
+    """
+    q = request.GET.get('q', '').strip()
+    users = presence.filter_seen(User.objects.visible_to(request.user).search(q), request.GET.get('seen', ''))
+    users = users.order_by('username')
+    return csv_response('usuarios.csv', USER_LIST, users.across_shards())
+
+@login_required
+@permission_required('accounts.view_user', raise_exception=True)
+@read_from_replica
+@route_to_shard(sharding.by_object(User))
+def user_row(request, pk):
+    """
+    Linha de um usuário na listagem, buscada pelo navegador ao receber um evento ao vivo.
+    Fora do escopo do usuário logado a resposta é vazia e a linha sai da tabela.
+    """
+    user = User.objects.visible_to(request.user).for_listing().filter(pk=pk).first()
+    if user is None:
+        return HttpResponse('')
+    return render(request, 'accounts/partials/user_row.html', {'user': user})
 
 @login_required
 @permission_required('accounts.add_user', raise_exception=True)
+@route_to_shard(sharding.by_query_param('organization'))
 def user_create(request):
     """
     Cria um novo usuário no sistema.
@@ -66,17 +85,12 @@ def user_create(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST, user=request.user)
         if form.is_valid():
-            user = form.save()
-            
-            # Adiciona o usuário aos grupos selecionados
-            if form.cleaned_data.get('groups'):
-                user.groups.set(form.cleaned_data['groups'])
-            
-            # Define a empresa do usuário
-            if form.cleaned_data.get('company'):
-                user.company = form.cleaned_data['company']
-                user.save()
+            # O formulário já grava empresa e grupos; o usuário e os eventos dos
+            # webhooks (webhooks.outbox) vão no mesmo commit
+            with transaction.atomic(using=router.db_for_write(User)):
+                user = form.save()
             
+            audit.record(request.user, AuditEvent.CREATE, user, audit.form_changes(form))
             messages.success(request, 'Usuário criado com sucesso!')
             return redirect('accounts:user_list')
     else:
@@ -86,45 +100,27 @@ def user_create(request):
 
 @login_required
 @permission_required('accounts.change_user', raise_exception=True)
+@route_to_shard(sharding.by_object(User))
 def user_edit(request, pk):
     """
     Edita um usuário existente.
     """
-    user = get_object_or_404(User, pk=pk)
+    user = get_object_or_404(User.objects.select_related('company'), pk=pk)
     
     # Verifica se o usuário tem permissão para editar este usuário específico
-    if not request.user.is_superuser:
-        if request.user.has_perm('accounts.change_organization_users'):
-            # Administrador da Organização só pode editar usuários da sua organização
-            if not (user.company and user.company.organization == request.user.company.organization):
-                messages.error(request, 'Você não tem permissão para editar este usuário.')
-                return redirect('accounts:user_list')
-        elif request.user.has_perm('accounts.change_company_users'):
-            # Gerente da Empresa só pode editar usuários da sua empresa
-            if user.company != request.user.company:
-                messages.error(request, 'Você não tem permissão para editar este usuário.')
-                return redirect('accounts:user_list')
-        else:
-            # Usuário comum só pode editar seu próprio usuário
-            if user.pk != request.user.pk:
-                messages.error(request, 'Você não tem permissão para editar este usuário.')
-                return redirect('accounts:user_list')
+    if not request.user.has_perm('accounts.change_user', user):
+        messages.error(request, 'Você não tem permissão para editar este usuário.')
+        return redirect('accounts:user_list')
     
     if request.method == 'POST':
         form = CustomUserChangeForm(request.POST, instance=user, user=request.user)
         if form.is_valid():
-            user = form.save()
-            
-            # Atualiza os grupos do usuário
-            if form.cleaned_data.get('groups'):
-                user.groups.set(form.cleaned_data['groups'])
-            else:
-                user.groups.clear()
-            
-            # Atualiza a empresa do usuário
-            user.company = form.cleaned_data.get('company')
-            user.save()
+            changes = audit.form_changes(form)
+            # O formulário já grava empresa e grupos (um save só, um evento só)
+            with transaction.atomic(using=router.db_for_write(User)):
+                user = form.save()
             
+            audit.record(request.user, AuditEvent.UPDATE, user, changes)
             messages.success(request, 'Usuário atualizado com sucesso!')
             return redirect('accounts:user_list')
     else:
@@ -137,27 +133,12 @@ def user_edit(request, pk):
 
 @login_required
 @permission_required('accounts.delete_user', raise_exception=True)
+@route_to_shard(sharding.by_object(User))
 def user_delete(request, pk):
     """
     Desativa um usuário (não exclui do banco de dados).
     """
-    user = get_object_or_404(User, pk=pk)
-    
-    # Verifica se o usuário tem permissão para desativar este usuário específico
-    if not request.user.is_superuser:
-        if request.user.has_perm('accounts.delete_organization_users'):
-            # Administrador da Organização só pode desativar usuários da sua organização
-            if not (user.company and user.company.organization == request.user.company.organization):
-                messages.error(request, 'Você não tem permissão para desativar este usuário.')
-                return redirect('accounts:user_list')
-        elif request.user.has_perm('accounts.delete_company_users'):
-            # Gerente da Empresa só pode desativar usuários da sua empresa
-            if user.company != request.user.company:
-                messages.error(request, 'Você não tem permissão para desativar este usuário.')
-                return redirect('accounts:user_list')
-        else:
-            messages.error(request, 'Você não tem permissão para desativar usuários.')
-            return redirect('accounts:user_list')
+    user = get_object_or_404(User.objects.select_related('company'), pk=pk)
     
     # Não permite desativar o próprio usuário
     if user == request.user:
@@ -169,9 +150,16 @@ def user_delete(request, pk):
         messages.error(request, 'Você não tem permissão para desativar um superusuário.')
         return redirect('accounts:user_list')
     
+    # Verifica se o usuário tem permissão para desativar este usuário específico
+    if not request.user.has_perm('accounts.delete_user', user):
+        messages.error(request, 'Você não tem permissão para desativar este usuário.')
+        return redirect('accounts:user_list')
+    
     if request.method == 'POST':
         user.is_active = False
-        user.save()
+        with transaction.atomic(using=router.db_for_write(User)):
+            user.save()
+        audit.record(request.user, AuditEvent.DEACTIVATE, user, {'is_active': [True, False]})
         messages.success(request, f'Usuário {user.username} desativado com sucesso!')
         return redirect('accounts:user_list')
     
@@ -179,8 +167,19 @@ def user_delete(request, pk):
 
 # Views para gerenciamento de grupos
 
+def _selected_permissions(form, group=None):
+    """
+    Pks marcados no formulário: os enviados (formulário com erro) ou os do grupo.
+    """
+    if form.is_bound:
+        return {int(pk) for pk in form.data.getlist('permissions') if pk.isdigit()}
+    if group is not None:
+        return set(group.permissions.values_list('pk', flat=True))
+    return set()
+
 @login_required
 @permission_required('auth.view_group', raise_exception=True)
+@read_from_replica
 def group_list(request):
     """
     Lista todos os grupos de permissões.
@@ -188,10 +187,8 @@ def group_list(request):
     groups = Group.objects.all()
     context = {'groups': groups}
     
-    if request.htmx:
-        return HttpResponse(render_to_string('accounts/partials/group_list.html', context))
-    
-    return render(request, 'accounts/group_list.html', context)
+    return render(request, 'accounts/group_list.html', context,
+                  partial_template='accounts/partials/group_list.html')
 
 @login_required
 @permission_required('auth.add_group', raise_exception=True)
@@ -203,12 +200,17 @@ def group_create(request):
         form = GroupForm(request.POST)
         if form.is_valid():
             group = form.save()
+            audit.record(request.user, AuditEvent.CREATE, group, audit.form_changes(form))
             messages.success(request, f'Grupo "{group.name}" criado com sucesso!')
             return redirect('accounts:group_list')
     else:
         form = GroupForm()
     
-    return render(request, 'accounts/group_form.html', {'form': form})
+    return render(request, 'accounts/group_form.html', {
+        'form': form,
+        'permissions': permission_catalog(),
+        'selected_permissions': _selected_permissions(form),
+    })
 
 @login_required
 @permission_required('auth.change_group', raise_exception=True)
@@ -221,13 +223,20 @@ def group_edit(request, pk):
     if request.method == 'POST':
         form = GroupForm(request.POST, instance=group)
         if form.is_valid():
+            changes = audit.form_changes(form)
             group = form.save()
+            audit.record(request.user, AuditEvent.UPDATE, group, changes)
             messages.success(request, f'Grupo "{group.name}" atualizado com sucesso!')
             return redirect('accounts:group_list')
     else:
         form = GroupForm(instance=group)
     
-    return render(request, 'accounts/group_form.html', {'form': form, 'group': group})
+    return render(request, 'accounts/group_form.html', {
+        'form': form,
+        'group': group,
+        'permissions': permission_catalog(),
+        'selected_permissions': _selected_permissions(form, group),
+    })
 
 @login_required
 @permission_required('auth.delete_group', raise_exception=True)
@@ -238,6 +247,7 @@ def group_delete(request, pk):
     group = get_object_or_404(Group, pk=pk)
     
     if request.method == 'POST':
+        audit.record(request.user, AuditEvent.DELETE, group)
         group.delete()
         messages.success(request, f'Grupo "{group.name}" excluído com sucesso!')
         return redirect('accounts:group_list')
@@ -253,6 +263,43 @@ def profile(request):
     """
     return render(request, 'accounts/profile.html', {'user': request.user})
 
+# View de login com limite de tentativas
+
+class ThrottledLoginView(LoginView):
+    """
+    Login que recusa com 429, antes de verificar a senha, as tentativas
+    acima do limite por IP ou por usuário (ver ``accounts.throttling``).
+    """
+    template_name = 'accounts/login.html'
+    
+    def post(self, request, *args, **kwargs):
+        metrics.increment(throttling.ATTEMPTS)
+        self.throttle = throttling.LoginThrottle(request, request.POST.get('username'))
+        blocked = self.throttle.check()
+        if blocked:
+            return self.throttled(*blocked)
+        self.throttle.consume()
+        return super().post(request, *args, **kwargs)
+    
+    def form_valid(self, form):
+        self.throttle.succeeded()
+        return super().form_valid(form)
+    
+    def form_invalid(self, form):
+        metrics.increment(throttling.FAILURES)
+        return super().form_invalid(form)
+    
+    def throttled(self, scope, retry_after):
+        messages.error(
+            self.request,
+            f'Muitas tentativas de login. Tente novamente em {retry_after} segundo(s).'
+        )
+        # Formulário não vinculado: nada de validação (e de hash) nesta resposta
+        context = self.get_context_data(form=self.get_form_class()(self.request))
+        response = self.render_to_response(context, status=429)
+        response['Retry-After'] = str(retry_after)
+        return response
+
 # Views para alteração de senha
 
 class CustomPasswordChangeView(LoginRequiredMixin, PasswordChangeView):
@@ -3,6 +3,9 @@ ASGI config for admin_panel project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+O stream de eventos ao vivo (``core:live_events``) só é servido por este
+ponto de entrada, por exemplo ``uvicorn admin_panel.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +16,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'admin_panel.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
+
+# Aquece os caches em segundo plano quando PANEL_WARM_CACHES=1
+from django.conf import settings  # noqa: E402
+
+if settings.WARM_CACHES_ON_STARTUP:
+    from core.warmup import warm_on_startup
+    
+    warm_on_startup()
\ No newline at end of file
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -50,20 +51,44 @@ INSTALLED_APPS = [
     'accounts',
     'organizations',
     'theme',
+    'audit',
+    'api',
+    'webhooks',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.TenantShardMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.LastSeenMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django_htmx.middleware.HtmxMiddleware',
     'django_browser_reload.middleware.BrowserReloadMiddleware',
+    'core.middleware.ReplicaStickinessMiddleware',
 ]
 
+# Perfil de apps: 'full' (padrão; desenvolvimento, build e comandos de
+# manutenção) ou 'serve' (PANEL_APP_PROFILE=serve nos workers web de produção,
+# sem os apps de build/desenvolvimento nem o admin do Django). O compressor
+# continua instalado porque os templates usam {% compress %}
+APP_PROFILE = os.environ.get('PANEL_APP_PROFILE', 'full')
+BUILD_ONLY_APPS = [
+    'django.contrib.admin',
+    'tailwind',
+    'django_browser_reload',
+    'panel_tailwind',
+]
+if APP_PROFILE == 'serve':
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in BUILD_ONLY_APPS]
+    MIDDLEWARE = [
+        middleware for middleware in MIDDLEWARE
+        if middleware != 'django_browser_reload.middleware.BrowserReloadMiddleware'
+    ]
+
 ROOT_URLCONF = 'admin_panel.urls'
 
 TEMPLATES = [
@@ -76,11 +101,16 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.assets',
+                'core.context_processors.layout',
             ],
         },
     },
 ]
 
+# Widgets e renderer de formulários do tema (theme/widgets.py)
+FORM_RENDERER = 'theme.renderers.ThemeFormRenderer'
+
 WSGI_APPLICATION = 'admin_panel.wsgi.application'
 
 
@@ -94,6 +124,56 @@ DATABASES = {
     }
 }
 
+# Réplicas de leitura
+# Aliases separados por vírgula em DATABASE_REPLICAS (ex.: "replica1,replica2").
+# Sem configuração adicional cada réplica é um arquivo SQLite ao lado do banco
+# principal, útil como substituto local; em produção defina as conexões reais.
+DATABASE_REPLICAS = [
+    alias.strip() for alias in os.environ.get('DATABASE_REPLICAS', '').split(',') if alias.strip()
+]
+for _alias in DATABASE_REPLICAS:
+    DATABASES.setdefault(_alias, {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{_alias}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    })
+
+# Shards por organização (core.sharding)
+# Aliases separados por vírgula em PANEL_TENANT_SHARDS (ex.: "shard1,shard2").
+# O 'default' é sempre o primeiro shard e guarda também os modelos globais
+# (sessões, jobs, auditoria e atividade). Sem configuração adicional cada shard
+# é um arquivo SQLite ao lado do banco principal; em produção defina as conexões
+# reais. As réplicas de leitura valem apenas para o 'default'
+TENANT_SHARDS = [
+    alias.strip() for alias in os.environ.get('PANEL_TENANT_SHARDS', '').split(',') if alias.strip()
+]
+for _alias in TENANT_SHARDS:
+    DATABASES.setdefault(_alias, {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{_alias}.sqlite3',
+    })
+# Tamanho da faixa de pks de cada shard (o shard N numera a partir de N * faixa)
+TENANT_SHARD_ID_SPAN = 10 ** 12
+
+DATABASE_ROUTERS = ['core.routers.ShardRouter', 'core.routers.ReplicaRouter']
+
+# Executor dos testes: as réplicas (espelhos do default) enxergam os dados de cada teste
+TEST_RUNNER = 'core.testing.PanelTestRunner'
+
+# Tempo (em segundos) em que as leituras de um cliente ficam presas ao banco
+# principal após uma escrita, garantindo que ele veja as próprias alterações.
+REPLICA_STICKY_SECONDS = 10
+REPLICA_STICKY_COOKIE = 'use_primary_db'
+
+# SQLite em produção (core.sqlite): com PANEL_SQLITE_TUNED=1 os bancos SQLite
+# usam WAL, synchronous=NORMAL, mmap, busy timeout e BEGIN IMMEDIATE, para
+# vários workers gravando no mesmo arquivo sem "database is locked"
+SQLITE_TUNED = os.environ.get('PANEL_SQLITE_TUNED') == '1'
+if SQLITE_TUNED:
+    for _database in DATABASES.values():
+        if _database['ENGINE'] == 'django.db.backends.sqlite3':
+            _database['ENGINE'] = 'core.sqlite'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -153,7 +233,143 @@ LOGOUT_REDIRECT_URL = '/accounts/login/'
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
+# Hash de senhas: algoritmo principal (scrypt ou argon2, que requer argon2-cffi)
+# e custo; calibre com manage.py calibrate_hashers. Hashes em outro algoritmo
+# ou com outro custo são refeitos no próximo login
+PASSWORD_HASHER = os.environ.get('PANEL_PASSWORD_HASHER', 'scrypt')
+PASSWORD_HASHER_PARAMS = {
+    'scrypt': {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1},
+    'argon2': {'time_cost': 2, 'memory_cost': 102400, 'parallelism': 8},
+}
+TUNED_PASSWORD_HASHERS = {
+    'scrypt': 'accounts.hashers.TunedScryptPasswordHasher',
+    'argon2': 'accounts.hashers.TunedArgon2PasswordHasher',
+}
+PASSWORD_HASHERS = [TUNED_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for algorithm, path in TUNED_PASSWORD_HASHERS.items() if algorithm != PASSWORD_HASHER
+] + [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+# Threads usadas para o hash de senhas em lote na API e no provisionamento (accounts/hashing.py)
+PASSWORD_HASHING_THREADS = 4
+
+# Login em qualquer shard e permissões por objeto na hierarquia
+# Organização -> Empresa -> Usuário
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.ShardedModelBackend',
+    'accounts.permissions.TenantPermissionBackend',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Jobs em segundo plano (manage.py run_jobs)
+JOBS_CONCURRENCY = 2
+JOBS_POLL_INTERVAL = 1.0
+JOBS_MAX_ATTEMPTS = 3
+JOBS_RETRY_BACKOFF = 30  # segundos; dobra a cada nova tentativa
+JOBS_LOCK_TIMEOUT = 60 * 30  # jobs em execução há mais tempo voltam para a fila
+
+# Auditoria: eventos são gravados em lote (bulk_create) ao atingir o tamanho
+# do lote ou quando o evento mais antigo passa do intervalo (em segundos)
+AUDIT_BATCH_SIZE = 100
+AUDIT_FLUSH_INTERVAL = 5
+
+# Séries de atividade do dashboard (segundos em cache)
+ACTIVITY_SERIES_CACHE_SECONDS = 300
+
+# Contagens dos cards do dashboard (segundos em cache; core.stats)
+DASHBOARD_STATS_CACHE_SECONDS = 60
+
+# Assets: em produção (PANEL_ASSET_MODE=production) o CSS do Tailwind é o
+# compilado por panel_tailwind, os blocos {% compress %} são gerados no build
+# (compress --offline) e o collectstatic grava nomes com hash e variantes .gz/.br
+ASSET_MODE = os.environ.get('PANEL_ASSET_MODE', 'development')
+if ASSET_MODE == 'production':
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'core.storage.PrecompressedManifestStaticFilesStorage'},
+    }
+    COMPRESS_ENABLED = True
+    COMPRESS_OFFLINE = True
+    COMPRESS_ROOT = STATIC_ROOT
+    COMPRESS_STORAGE = 'core.storage.PrecompressedCompressorFileStorage'
+
+# Serve STATIC_ROOT pelo próprio Django (core.static.serve) quando não há
+# servidor web na frente
+SERVE_STATIC = os.environ.get('PANEL_SERVE_STATIC') == '1'
+
+# Orçamento verificado por manage.py benchmark assets (tamanhos comprimidos)
+ASSET_BUDGETS = {
+    'critical_css_kb': 50,
+    'critical_js_kb': 30,
+    'first_paint_ms': 1800,
+}
+# Rede de referência para a estimativa de first paint (perfil "3G rápido")
+ASSET_REFERENCE_NETWORK = {
+    'rtt_ms': 150,
+    'kbps': 1600,
+}
+
+# Limite de tentativas de login (token bucket por IP e por usuário). Atrás de
+# um proxy, use o cabeçalho com o IP do cliente em 'ip_header' (ex.: HTTP_X_REAL_IP)
+LOGIN_THROTTLE = {
+    'cache': 'default',
+    'ip_header': 'REMOTE_ADDR',
+    'ip': {'capacity': 30, 'refill_per_minute': 10},
+    'username': {'capacity': 5, 'refill_per_minute': 1},
+}
+
+# Último acesso dos usuários (accounts.presence): anotado em memória a cada
+# requisição e gravado em lote no máximo a cada LAST_SEEN_FLUSH_SECONDS
+LAST_SEEN_FLUSH_SECONDS = 60
+LAST_SEEN_BATCH_SIZE = 500
+# Janela dos "usuários ativos" do dashboard
+LAST_SEEN_ACTIVE_HOURS = 24
+
+# Arquivamento (core.archive, manage.py archive_inactive): usuários e empresas
+# desativados há mais de ARCHIVE_AFTER_DAYS dias saem das tabelas principais,
+# em lotes de ARCHIVE_BATCH_SIZE com ARCHIVE_BATCH_PAUSE segundos entre eles
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_BATCH_PAUSE = 0.5
+
+# API de integrações (/api/v1/, autenticação por token): itens por página
+# (padrão e máximo de ?limit=) e registros por chamada nos endpoints em lote
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 500
+API_BATCH_LIMIT = 500
+# Intervalo mínimo entre gravações do "último uso" de cada token
+API_TOKEN_TOUCH_SECONDS = 60
+
+# Webhooks de saída (manage.py run_webhooks): threads do worker, tentativas
+# por mensagem, recuo do endpoint após falhas (dobra a cada falha seguida, até
+# o máximo), timeout de cada POST e prazo para devolver à fila lotes de
+# workers que morreram (todos em segundos)
+WEBHOOKS_CONCURRENCY = 4
+WEBHOOKS_POLL_INTERVAL = 1.0
+WEBHOOKS_MAX_ATTEMPTS = 10
+WEBHOOKS_RETRY_BACKOFF = 10
+WEBHOOKS_MAX_BACKOFF = 60 * 60
+WEBHOOKS_TIMEOUT = 10
+WEBHOOKS_LOCK_TIMEOUT = 60 * 5
+
+# Aquecimento de caches (manage.py warm_caches). Com PANEL_WARM_CACHES=1 o
+# processo web compila os templates e carrega o catálogo de permissões em
+# segundo plano logo após iniciar
+WARM_CACHES_ON_STARTUP = os.environ.get('PANEL_WARM_CACHES') == '1'
+WARM_CACHES_WORKERS = 4
+
+# Eventos ao vivo (SSE em /events/, servido pelo ASGI). Com mais de um
+# processo web use 'core.live.RedisBackend' com options={'url': 'redis://...'}
+LIVE_EVENTS = {
+    'backend': 'core.live.LocalBackend',
+    'options': {},
+    'keepalive': 15,  # segundos entre comentários de keep-alive
+    'max_age': 300,  # segundos até encerrar a conexão (o navegador reconecta)
+    'queue_size': 100,  # eventos pendentes por conexão antes do reset
+}
@@ -14,18 +14,34 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
-from django.urls import path, include
+import re
+
+from django.apps import apps
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core import static as static_files
+
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('', include('core.urls')),
     path('accounts/', include('accounts.urls')),
     path('organizations/', include('organizations.urls')),
-    path('__reload__/', include('django_browser_reload.urls')),
+    path('audit/', include('audit.urls')),
+    path('api/v1/', include('api.urls')),
 ]
 
-if settings.DEBUG:
+# Ausentes no perfil 'serve' (ver APP_PROFILE em settings.py)
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+    
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
+if apps.is_installed('django_browser_reload'):
+    urlpatterns.append(path('__reload__/', include('django_browser_reload.urls')))
+
+if settings.SERVE_STATIC:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.STATIC_URL.lstrip('/')), static_files.serve),
+    ]
+elif settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
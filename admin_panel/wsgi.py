@@ -13,4 +13,12 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'admin_panel.settings')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Aquece os caches em segundo plano quando PANEL_WARM_CACHES=1
+from django.conf import settings  # noqa: E402
+
+if settings.WARM_CACHES_ON_STARTUP:
+    from core.warmup import warm_on_startup
+    
+    warm_on_startup()
\ No newline at end of file
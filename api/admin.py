@@ -0,0 +1,18 @@
+from django.contrib import admin
+from .models import ApiToken
+
+
+@admin.register(ApiToken)
+class ApiTokenAdmin(admin.ModelAdmin):
+    """
+    Tokens da API. São emitidos pelo comando ``create_api_token``; aqui
+    apenas são consultados ou revogados (``is_active``).
+    """
+    list_display = ('name', 'prefix', 'user_id', 'organization_id', 'is_active', 'created_at', 'last_used_at')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'prefix')
+    fields = ('name', 'prefix', 'user_id', 'organization_id', 'is_active', 'created_at', 'last_used_at')
+    readonly_fields = ('prefix', 'user_id', 'organization_id', 'created_at', 'last_used_at')
+    
+    def has_add_permission(self, request):
+        return False
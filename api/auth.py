@@ -0,0 +1,88 @@
+"""
+Autenticação da API por token.
+
+Apenas tokens: cookies de sessão são ignorados (e o CSRF não se aplica), então
+a API não herda o login do navegador. O cliente envia
+``Authorization: Bearer <token>``; o banco guarda só o hash SHA-256, e revogar
+(``is_active = False`` no admin) corta o acesso na próxima requisição.
+
+A requisição executa no shard da organização do token (ver ``core.sharding``),
+como as do navegador executam no shard da organização da sessão.
+"""
+import hashlib
+import secrets
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+
+from accounts import presence
+from core import sharding
+from .models import ApiToken
+from .responses import error_response
+
+
+def _hash(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def issue_token(user, name):
+    """
+    Emite um token para o usuário. Retorna o ``ApiToken`` e o valor em texto,
+    que não pode ser recuperado depois.
+    """
+    key = secrets.token_urlsafe(32)
+    token = ApiToken.objects.create(
+        name=name,
+        user_id=user.pk,
+        organization_id=user.company.organization_id if user.company_id else None,
+        prefix=key[:8],
+        key_hash=_hash(key),
+    )
+    return token, key
+
+
+def _bearer(request):
+    scheme, _, key = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme.lower() != 'bearer' or not key.strip():
+        return None
+    return key.strip()
+
+
+def _touch(token):
+    # "Último uso" gravado no máximo a cada API_TOKEN_TOUCH_SECONDS por token
+    now = timezone.now()
+    if token.last_used_at is None or (now - token.last_used_at).total_seconds() >= settings.API_TOKEN_TOUCH_SECONDS:
+        ApiToken.objects.filter(pk=token.pk).update(last_used_at=now)
+
+
+def token_required(view_func):
+    """
+    Autentica a requisição pelo token e a executa no shard da organização
+    dele, com ``request.user`` e ``request.api_token`` definidos.
+    """
+    @csrf_exempt
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        key = _bearer(request)
+        token = ApiToken.objects.filter(key_hash=_hash(key), is_active=True).first() if key else None
+        if token is None:
+            response = error_response('Token ausente, inválido ou revogado.', status=401)
+            response['WWW-Authenticate'] = 'Bearer'
+            return response
+
+        alias = sharding.shard_for_organization(token.organization_id) if token.organization_id else None
+        with sharding.use_shard(alias):
+            user = get_user_model().objects.select_related('company').filter(
+                pk=token.user_id, is_active=True
+            ).first()
+            if user is None:
+                return error_response('O usuário do token não existe ou está inativo.', status=401)
+            _touch(token)
+            presence.touch(user)
+            request.user = user
+            request.api_token = token
+            return view_func(request, *args, **kwargs)
+    return _wrapped_view
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+from api.auth import issue_token
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Emite um token da API em nome de um usuário (o token é exibido uma única vez).'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Usuário em nome de quem a integração age.')
+        parser.add_argument('--name', required=True, help='Identificação do token (ex.: "Sincronização RH").')
+    
+    def handle(self, *args, **options):
+        alias = sharding.find(User, username=options['username']) if sharding.is_enabled() else None
+        user = User.objects.db_manager(alias).select_related('company').filter(
+            username=options['username'], is_active=True
+        ).first()
+        if user is None:
+            raise CommandError(f'Usuário ativo "{options["username"]}" não encontrado.')
+        token, key = issue_token(user, options['name'])
+        self.stdout.write(self.style.SUCCESS(f'Token "{token.name}" emitido para {user.username}:'))
+        self.stdout.write(key)
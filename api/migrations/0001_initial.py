@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:50
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='name')),
+                ('user_id', models.BigIntegerField(db_index=True, verbose_name='user')),
+                ('organization_id', models.BigIntegerField(blank=True, null=True, verbose_name='organization')),
+                ('prefix', models.CharField(max_length=8, verbose_name='prefix')),
+                ('key_hash', models.CharField(max_length=64, unique=True, verbose_name='key hash')),
+                ('is_active', models.BooleanField(default=True, verbose_name='active')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('last_used_at', models.DateTimeField(blank=True, null=True, verbose_name='last used at')),
+            ],
+            options={
+                'verbose_name': 'API token',
+                'verbose_name_plural': 'API tokens',
+            },
+        ),
+    ]
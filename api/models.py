@@ -0,0 +1,29 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class ApiToken(models.Model):
+    """
+    Token de acesso à API de integrações, em nome de um usuário.
+
+    Fica sempre no ``default`` (ver ``core.sharding.GLOBAL_MODELS``); por isso
+    guarda o usuário e a organização como ids, sem chave estrangeira, e a
+    organização indica o shard em que a requisição executa. Só o hash SHA-256
+    do token é gravado: o valor aparece uma única vez, ao ser emitido.
+    """
+    name = models.CharField(_('name'), max_length=100)
+    user_id = models.BigIntegerField(_('user'), db_index=True)
+    organization_id = models.BigIntegerField(_('organization'), null=True, blank=True)
+    prefix = models.CharField(_('prefix'), max_length=8)
+    key_hash = models.CharField(_('key hash'), max_length=64, unique=True)
+    is_active = models.BooleanField(_('active'), default=True)
+    created_at = models.DateTimeField(_('created at'), default=timezone.now)
+    last_used_at = models.DateTimeField(_('last used at'), null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('API token')
+        verbose_name_plural = _('API tokens')
+    
+    def __str__(self):
+        return f'{self.name} ({self.prefix}...)'
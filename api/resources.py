@@ -0,0 +1,817 @@
+"""
+Recursos da API: campos, filtros e escritas em lote de cada modelo.
+
+Os campos pedidos em ``?fields=`` definem a consulta: só as colunas deles
+entram no ``only()`` e contagens ou grupos só são anotados/pré-carregados
+quando pedidos. As escritas em lote validam todos os itens antes de gravar
+(com uma consulta por verificação para o lote inteiro, não por item) e gravam
+tudo em uma transação com ``bulk_create``/``bulk_update``/``update``. Como
+essas operações não disparam sinais, totais, contagens do dashboard, eventos
+ao vivo, eventos dos webhooks, séries de atividade e auditoria são tratados
+aqui, uma vez por lote.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from functools import partial
+
+from django import forms
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, Permission
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models import F, Prefetch, Q
+from django.utils import timezone
+
+from accounts.permissions import get_scope
+from audit import log as audit
+from audit.models import AuditEvent
+from core import activity, live, rollups, sharding, stats
+from core.jobs import enqueue
+from core.models import ActivityBucket
+from organizations.models import Organization, Company
+from webhooks import outbox
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+NOT_FOUND = 'Não encontrado ou fora do seu escopo.'
+
+
+class ApiError(Exception):
+    """
+    Erro devolvido ao cliente como ``{"error": ..., "errors": ...}``.
+    ``errors`` detalha os itens inválidos de um lote, pelo índice.
+    """
+
+    def __init__(self, message, status=400, errors=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.errors = errors or {}
+
+
+class IdListField(forms.Field):
+    """
+    Lista de ids inteiros (ex.: os grupos de um usuário).
+    """
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return []
+        if not isinstance(value, list) or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in value):
+            raise forms.ValidationError('Informe uma lista de ids.')
+        return sorted(set(value))
+
+
+class Field:
+    """
+    Campo de um recurso.
+
+    ``column`` é o atributo carregado com ``only()`` (padrão: ``name``);
+    ``annotate`` recebe o queryset e o devolve anotado com ``name``;
+    ``prefetch`` é pré-carregado e lido por ``value(obj)``. Campos com
+    ``default=False`` só vêm quando pedidos em ``?fields=``.
+    """
+
+    def __init__(self, name, column=None, annotate=None, prefetch=None, value=None, default=True):
+        self.name = name
+        self.column = column or (None if annotate or prefetch else name)
+        self.annotate = annotate
+        self.prefetch = prefetch
+        self.value = value
+        self.default = default
+
+    def read(self, obj):
+        if self.value is not None:
+            return self.value(obj)
+        return getattr(obj, self.column or self.name)
+
+
+# Utilitários das escritas em lote
+
+def clean_items(form_fields, items, partial=False):
+    """
+    Valida os itens com campos de formulário (sem consultas). Em ``partial``
+    (atualizações) apenas as chaves enviadas são validadas. Retorna os dados
+    limpos e os erros por índice.
+    """
+    cleaned, errors = [], {}
+    for index, item in enumerate(items):
+        data, item_errors = {}, {}
+        if not isinstance(item, dict):
+            errors[index] = {'__all__': ['Cada item deve ser um objeto.']}
+            cleaned.append(data)
+            continue
+        unknown = set(item) - set(form_fields) - ({'id'} if partial else set())
+        if unknown:
+            item_errors['__all__'] = [f'Campos desconhecidos ou somente leitura: {", ".join(sorted(unknown))}.']
+        for name, field in form_fields.items():
+            if name not in item:
+                if field.required and not partial:
+                    item_errors[name] = [field.error_messages['required']]
+                continue
+            try:
+                data[name] = field.clean(item[name])
+            except forms.ValidationError as exc:
+                item_errors[name] = exc.messages
+        if partial:
+            pk = item.get('id')
+            if not isinstance(pk, int) or isinstance(pk, bool):
+                item_errors['id'] = ['Informe o id do objeto.']
+            else:
+                data['id'] = pk
+        if item_errors:
+            errors[index] = item_errors
+        cleaned.append(data)
+    if partial:
+        _duplicates(cleaned, 'id', errors)
+    return cleaned, errors
+
+
+def clean_ids(items):
+    """
+    Ids de um lote de desativação (lista de inteiros, sem repetições).
+    """
+    errors = {
+        index: {'id': ['Informe o id do objeto.']}
+        for index, pk in enumerate(items) if not isinstance(pk, int) or isinstance(pk, bool)
+    }
+    raise_if(errors)
+    _duplicates([{'id': pk} for pk in items], 'id', errors)
+    raise_if(errors)
+    return items
+
+
+def raise_if(errors):
+    if errors:
+        raise ApiError('Lote inválido; nada foi gravado.', errors=errors)
+
+
+def add_error(errors, index, field, message):
+    errors.setdefault(index, {}).setdefault(field, []).append(message)
+
+
+def _duplicates(cleaned, field, errors):
+    counts = Counter(data[field] for data in cleaned if data.get(field) is not None)
+    for index, data in enumerate(cleaned):
+        if counts.get(data.get(field), 0) > 1:
+            add_error(errors, index, field, 'Valor repetido no lote.')
+
+
+def _across(queryset):
+    """
+    Objetos do queryset em todos os shards, quando o contexto não tem shard.
+    """
+    return list(queryset.order_by('pk').across_shards())
+
+
+def _aliases(model):
+    return sharding.aliases() if sharding.is_enabled() else [router.db_for_write(model)]
+
+
+@contextmanager
+def _in_shard(organization_ids):
+    """
+    Executa a gravação no shard das organizações do lote. Sem shard no
+    contexto (superusuário), todas precisam estar no mesmo banco.
+    """
+    if not sharding.fans_out():
+        yield
+        return
+    shards = {sharding.shard_for_organization(pk) for pk in organization_ids if pk is not None}
+    if len(shards) > 1:
+        raise ApiError('Os itens do lote pertencem a organizações em bancos diferentes; envie um lote por banco.')
+    with sharding.use_shard(shards.pop() if shards else DEFAULT_DB_ALIAS):
+        yield
+
+
+def _insert(model, objs):
+    """
+    Insere em lote preenchendo os pks. Bancos sem ``RETURNING`` no insert em
+    lote (MySQL) inserem um a um com ``save_base(raw=True)``, que também não
+    dispara os sinais de totais.
+    """
+    using = router.db_for_write(model)
+    if connections[using].features.can_return_rows_from_bulk_insert:
+        model.objects.using(using).bulk_create(objs, batch_size=BATCH_SIZE)
+    else:
+        for obj in objs:
+            obj.save_base(using=using, raw=True, force_insert=True)
+
+
+def _changes(obj, data, fields):
+    """
+    Aplica ``data`` ao objeto e devolve o diff ``{campo: [antes, depois]}``.
+    """
+    changes = {}
+    for name in fields:
+        if name not in data:
+            continue
+        attname = obj._meta.get_field(name).attname
+        before, after = getattr(obj, attname), data[name]
+        if hasattr(after, 'pk'):
+            after = after.pk
+        if before != after:
+            changes[name] = [before, after]
+            setattr(obj, attname, after)
+    return changes
+
+
+def _after_commit(organization_ids, company_ids=()):
+    organization_ids = {pk for pk in organization_ids if pk is not None}
+    company_ids = {pk for pk in company_ids if pk is not None}
+    # Totais recalculados uma vez por organização; contagens do dashboard descartadas
+    rollups.schedule_refresh(*organization_ids)
+    transaction.on_commit(
+        lambda: stats.invalidate(organization_ids, company_ids), using=router.db_for_write(Company)
+    )
+
+
+def _capture(kind, changed, snapshot=None):
+    """
+    Eventos dos webhooks de ``changed`` (pares objeto e diff): desativações
+    são um evento próprio, como nos signals.
+    """
+    snapshot = snapshot or partial(outbox.snapshot, kind)
+    deactivated = [obj for obj, changes in changed if changes.get('is_active') == [True, False]]
+    updated = [obj for obj, changes in changed if changes.get('is_active') != [True, False]]
+    outbox.capture(kind, outbox.UPDATED, [snapshot(obj) for obj in updated])
+    outbox.capture(kind, outbox.DEACTIVATED, [snapshot(obj) for obj in deactivated])
+
+
+class Resource:
+    """
+    Recurso exposto em ``/api/v1/<name>/``.
+    """
+    name = None
+    model = None
+    kind = None
+    fields = ()
+    # ?parâmetro -> (lookup, campo de formulário que converte o valor)
+    filters = {}
+    # operação -> permissão de modelo exigida
+    permissions = {}
+    create_fields = {}
+    update_fields = {}
+
+    def __init__(self):
+        self.field_map = {field.name: field for field in self.fields}
+
+    # Leitura
+
+    def parse_fields(self, value):
+        if not value:
+            return [field.name for field in self.fields if field.default]
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.field_map]
+        if unknown:
+            raise ApiError(f'Campos desconhecidos: {", ".join(unknown)}. Disponíveis: {", ".join(self.field_map)}.')
+        return list(dict.fromkeys(['id', *names]))
+
+    def queryset(self, user):
+        return self.model.objects.visible_to(user)
+
+    def filter(self, queryset, params):
+        for param, (lookup, form_field) in self.filters.items():
+            value = params.get(param, '')
+            if value == '':
+                continue
+            try:
+                value = form_field.clean(value)
+            except forms.ValidationError as exc:
+                raise ApiError(f'Filtro "{param}" inválido: {" ".join(exc.messages)}')
+            if value is None:
+                continue
+            queryset = queryset.search(value) if lookup == 'search' else queryset.filter(**{lookup: value})
+        return queryset
+
+    def select(self, queryset, names):
+        """
+        Carrega apenas o necessário para os campos pedidos.
+        """
+        columns = ['pk']
+        for name in names:
+            field = self.field_map[name]
+            if field.annotate is not None:
+                queryset = field.annotate(queryset)
+            elif field.prefetch is not None:
+                queryset = queryset.prefetch_related(field.prefetch)
+            else:
+                columns.append(field.column)
+        return queryset.only(*columns)
+
+    def serialize(self, obj, names):
+        return {name: self.field_map[name].read(obj) for name in names}
+
+    # Escrita
+
+    def create(self, items, actor):
+        raise ApiError('Operação não suportada por este recurso.', status=405)
+
+    def update(self, items, actor):
+        raise ApiError('Operação não suportada por este recurso.', status=405)
+
+    def deactivate(self, ids, actor):
+        raise ApiError('Operação não suportada por este recurso.', status=405)
+
+    def _targets(self, actor, action, pks, queryset=None):
+        """
+        Objetos do lote dentro do escopo do usuário para a ação, por pk.
+        """
+        queryset = self.model.objects.all() if queryset is None else queryset
+        scope = get_scope(actor, self.model, action)
+        objs = {obj.pk: obj for obj in _across(queryset.filter(scope.q, pk__in=pks))}
+        errors = {}
+        for index, pk in enumerate(pks):
+            if pk is not None and pk not in objs:
+                add_error(errors, index, 'id', NOT_FOUND)
+        raise_if(errors)
+        return objs
+
+
+# Organizações
+
+class OrganizationResource(Resource):
+    name = 'organizations'
+    model = Organization
+    kind = 'organization'
+    fields = (
+        Field('id', 'pk'),
+        Field('name'),
+        Field('description'),
+        Field('is_active'),
+        Field('created_at'),
+        Field('updated_at'),
+        Field('company_count', annotate=lambda queryset: queryset.with_company_counts(), default=False),
+        Field('user_count', annotate=lambda queryset: queryset.with_user_counts(), default=False),
+        Field(
+            'groups',
+            prefetch=Prefetch('groups', queryset=Group.objects.only('pk')),
+            value=lambda obj: [group.pk for group in obj.groups.all()],
+            default=False,
+        ),
+    )
+    filters = {
+        'is_active': ('is_active', forms.NullBooleanField()),
+        'q': ('search', forms.CharField()),
+    }
+    permissions = {
+        'view': 'organizations.view_organization',
+        'create': 'organizations.add_organization',
+        'update': 'organizations.change_organization',
+        'deactivate': 'organizations.delete_organization',
+    }
+    create_fields = {
+        'name': forms.CharField(max_length=100),
+        'description': forms.CharField(required=False),
+        'is_active': forms.BooleanField(required=False),
+    }
+    update_fields = create_fields
+
+    def create(self, items, actor):
+        cleaned, errors = clean_items(self.create_fields, items)
+        raise_if(errors)
+        now = timezone.now()
+        shard = sharding.choose_shard() if sharding.fans_out() else sharding.current_alias()
+        with sharding.use_shard(shard):
+            organizations = [
+                Organization(created_at=now, updated_at=now, **{'is_active': True, **data}) for data in cleaned
+            ]
+            with transaction.atomic(using=router.db_for_write(Organization)):
+                _insert(Organization, organizations)
+                for organization in organizations:
+                    live.publish('organization', live.CREATED, organization.pk, [organization.pk])
+                outbox.capture('organization', outbox.CREATED, [
+                    outbox.snapshot('organization', organization) for organization in organizations
+                ])
+                _after_commit([organization.pk for organization in organizations])
+        for organization, data in zip(organizations, cleaned):
+            audit.record(actor, AuditEvent.CREATE, organization, {
+                name: [None, value] for name, value in data.items()
+            })
+        return {'created': [organization.pk for organization in organizations]}
+
+    def update(self, items, actor):
+        cleaned, errors = clean_items(self.update_fields, items, partial=True)
+        raise_if(errors)
+        targets = self._targets(actor, 'change', [data['id'] for data in cleaned])
+        now = timezone.now()
+        with _in_shard(targets):
+            changed = []
+            for data in cleaned:
+                organization = targets[data['id']]
+                changes = _changes(organization, data, self.update_fields)
+                if changes:
+                    organization.updated_at = now
+                    changed.append((organization, changes))
+            fields = sorted({name for _, changes in changed for name in changes} | {'updated_at'})
+            with transaction.atomic(using=router.db_for_write(Organization)):
+                Organization.objects.bulk_update([obj for obj, _ in changed], fields, batch_size=BATCH_SIZE)
+                for organization, _ in changed:
+                    live.publish('organization', live.UPDATED, organization.pk, [organization.pk])
+                _capture('organization', changed)
+                _after_commit([organization.pk for organization, _ in changed])
+        for organization, changes in changed:
+            audit.record(actor, AuditEvent.UPDATE, organization, changes)
+        return {'updated': [organization.pk for organization, _ in changed]}
+
+    def deactivate(self, ids, actor):
+        ids = clean_ids(ids)
+        targets = self._targets(actor, 'delete', ids)
+        # Como na tela: organizações grandes são desativadas em segundo plano
+        jobs = {}
+        for pk in ids:
+            organization = targets[pk]
+            if not organization.is_active:
+                continue
+            job = enqueue('organizations.deactivate_organization', {'organization_id': pk}, user=actor)
+            audit.record(actor, AuditEvent.DEACTIVATE, organization, {'is_active': [True, False], 'job': job.pk})
+            jobs[pk] = job.pk
+        return {'deactivated': list(jobs), 'jobs': jobs}
+
+
+# Empresas
+
+class CompanyResource(Resource):
+    name = 'companies'
+    model = Company
+    kind = 'company'
+    fields = (
+        Field('id', 'pk'),
+        Field('organization', 'organization_id'),
+        Field('name'),
+        Field('description'),
+        Field('is_active'),
+        Field('created_at'),
+        Field('updated_at'),
+        Field('user_count', annotate=lambda queryset: queryset.with_user_counts(), default=False),
+    )
+    filters = {
+        'organization': ('organization_id', forms.IntegerField()),
+        'is_active': ('is_active', forms.NullBooleanField()),
+        'q': ('search', forms.CharField()),
+    }
+    permissions = {
+        'view': 'organizations.view_company',
+        'create': 'organizations.add_company',
+        'update': 'organizations.change_company',
+        'deactivate': 'organizations.delete_company',
+    }
+    create_fields = {
+        'organization': forms.IntegerField(),
+        'name': forms.CharField(max_length=100),
+        'description': forms.CharField(required=False),
+        'is_active': forms.BooleanField(required=False),
+    }
+    update_fields = {
+        'name': forms.CharField(max_length=100),
+        'description': forms.CharField(required=False),
+        'is_active': forms.BooleanField(required=False),
+    }
+
+    def create(self, items, actor):
+        cleaned, errors = clean_items(self.create_fields, items)
+        raise_if(errors)
+        scope = get_scope(actor, Company, 'add')
+        organizations = {
+            organization.pk: organization for organization in _across(
+                Organization.objects.filter(pk__in={data['organization'] for data in cleaned}).only('pk', 'name')
+            )
+        }
+        for index, data in enumerate(cleaned):
+            if data['organization'] not in organizations or not scope.covers_organization(data['organization']):
+                add_error(errors, index, 'organization', NOT_FOUND)
+        raise_if(errors)
+
+        now = timezone.now()
+        with _in_shard(organizations):
+            companies = [
+                Company(
+                    created_at=now, updated_at=now,
+                    **{'is_active': True, **data, 'organization': organizations[data['organization']]}
+                )
+                for data in cleaned
+            ]
+            with transaction.atomic(using=router.db_for_write(Company)):
+                _insert(Company, companies)
+                for organization_id, count in Counter(company.organization_id for company in companies).items():
+                    activity.record(ActivityBucket.COMPANIES_CREATED, now, organization_id, count)
+                for company in companies:
+                    live.publish('company', live.CREATED, company.pk, [company.organization_id], [company.pk])
+                outbox.capture('company', outbox.CREATED, [outbox.snapshot('company', company) for company in companies])
+                _after_commit(organizations, [company.pk for company in companies])
+        for company, data in zip(companies, cleaned):
+            audit.record(actor, AuditEvent.CREATE, company, {
+                name: [None, value] for name, value in data.items()
+            }, organization_id=company.organization_id)
+        return {'created': [company.pk for company in companies]}
+
+    def update(self, items, actor):
+        cleaned, errors = clean_items(self.update_fields, items, partial=True)
+        raise_if(errors)
+        targets = self._targets(actor, 'change', [data['id'] for data in cleaned],
+                                Company.objects.with_organization())
+        return self._save(targets, cleaned, actor, AuditEvent.UPDATE)
+
+    def deactivate(self, ids, actor):
+        ids = clean_ids(ids)
+        targets = self._targets(actor, 'delete', ids, Company.objects.with_organization())
+        result = self._save(targets, [{'id': pk, 'is_active': False} for pk in ids], actor, AuditEvent.DEACTIVATE)
+        return {'deactivated': result['updated']}
+
+    def _save(self, targets, cleaned, actor, action):
+        now = timezone.now()
+        with _in_shard({company.organization_id for company in targets.values()}):
+            changed = []
+            for data in cleaned:
+                company = targets[data['id']]
+                changes = _changes(company, data, self.update_fields)
+                if changes:
+                    company.updated_at = now
+                    changed.append((company, changes))
+            fields = sorted({name for _, changes in changed for name in changes} | {'updated_at'})
+            with transaction.atomic(using=router.db_for_write(Company)):
+                Company.objects.bulk_update([obj for obj, _ in changed], fields, batch_size=BATCH_SIZE)
+                for company, _ in changed:
+                    live.publish('company', live.UPDATED, company.pk, [company.organization_id], [company.pk])
+                _capture('company', changed)
+                _after_commit(
+                    [company.organization_id for company, _ in changed],
+                    [company.pk for company, _ in changed]
+                )
+        for company, changes in changed:
+            audit.record(actor, action, company, changes, organization_id=company.organization_id)
+        return {'updated': [company.pk for company, _ in changed]}
+
+
+# Usuários
+
+class UserResource(Resource):
+    name = 'users'
+    model = User
+    kind = 'user'
+    fields = (
+        Field('id', 'pk'),
+        Field('username'),
+        Field('email'),
+        Field('first_name'),
+        Field('last_name'),
+        Field('company', 'company_id'),
+        Field('organization', annotate=lambda queryset: queryset.annotate(organization=F('company__organization_id'))),
+        Field(
+            'groups',
+            prefetch=Prefetch('groups', queryset=Group.objects.only('pk')),
+            value=lambda obj: [group.pk for group in obj.groups.all()],
+        ),
+        Field('is_active'),
+        Field('date_joined'),
+        Field('last_login'),
+        Field('last_seen'),
+    )
+    filters = {
+        'organization': ('company__organization_id', forms.IntegerField()),
+        'company': ('company_id', forms.IntegerField()),
+        'is_active': ('is_active', forms.NullBooleanField()),
+        'q': ('search', forms.CharField()),
+    }
+    permissions = {
+        'view': 'accounts.view_user',
+        'create': 'accounts.add_user',
+        'update': 'accounts.change_user',
+        'deactivate': 'accounts.delete_user',
+    }
+    update_fields = {
+        'username': forms.CharField(max_length=150, validators=[UnicodeUsernameValidator()]),
+        'email': forms.EmailField(),
+        'first_name': forms.CharField(max_length=150, required=False),
+        'last_name': forms.CharField(max_length=150, required=False),
+        'company': forms.IntegerField(required=False),
+        'groups': IdListField(required=False),
+        'is_active': forms.BooleanField(required=False),
+    }
+    # Sem senha o usuário é criado com senha inutilizável (acesso via redefinição)
+    create_fields = {**update_fields, 'password': forms.CharField(required=False)}
+
+    def create(self, items, actor):
+        cleaned, errors = clean_items(self.create_fields, items)
+        for index, data in enumerate(cleaned):
+            # Como no formulário: quem não é superusuário cria usuários sempre em uma empresa
+            if not actor.is_superuser and not data.get('company') and 'company' not in errors.get(index, {}):
+                add_error(errors, index, 'company', forms.Field.default_error_messages['required'])
+        _duplicates(cleaned, 'username', errors)
+        _duplicates(cleaned, 'email', errors)
+        companies = self._companies(actor, cleaned, errors)
+        self._check_unique(cleaned, errors)
+        raise_if(errors)
+        organization_ids = {company.organization_id for company in companies.values()}
+
+        # O hash das senhas é a parte cara: roda em paralelo e antes da transação
+        from accounts.hashing import get_executor
+        passwords = list(get_executor().map(make_password, [data.get('password') or None for data in cleaned]))
+
+        now = timezone.now()
+        with _in_shard(organization_ids):
+            self._check_groups(cleaned)
+            users = [
+                User(
+                    username=data['username'],
+                    email=data['email'],
+                    first_name=data.get('first_name', ''),
+                    last_name=data.get('last_name', ''),
+                    company=companies.get(data.get('company')),
+                    is_active=data.get('is_active', True),
+                    password=password,
+                    date_joined=now,
+                )
+                for data, password in zip(cleaned, passwords)
+            ]
+            with transaction.atomic(using=router.db_for_write(User)):
+                _insert(User, users)
+                User.groups.through.objects.bulk_create([
+                    User.groups.through(user_id=user.pk, group_id=group_id)
+                    for user, data in zip(users, cleaned) for group_id in data.get('groups') or []
+                ], batch_size=BATCH_SIZE)
+                joined = Counter(self._organization_id(user) for user in users)
+                for organization_id, count in joined.items():
+                    activity.record(ActivityBucket.USERS_JOINED, now, organization_id, count)
+                for user in users:
+                    live.publish('user', live.CREATED, user.pk, [self._organization_id(user)], [user.company_id])
+                outbox.capture('user', outbox.CREATED, [self._snapshot(user) for user in users])
+                _after_commit(organization_ids, [user.company_id for user in users])
+        for user, data in zip(users, cleaned):
+            audit.record(actor, AuditEvent.CREATE, user, {
+                name: [None, value] for name, value in data.items() if name != 'password'
+            }, organization_id=self._organization_id(user))
+        return {'created': [user.pk for user in users]}
+
+    def update(self, items, actor):
+        cleaned, errors = clean_items(self.update_fields, items, partial=True)
+        raise_if(errors)
+        queryset = User.objects.select_related('company')
+        if any('groups' in data for data in cleaned):
+            queryset = queryset.prefetch_related(Prefetch('groups', queryset=Group.objects.only('pk')))
+        targets = self._targets(actor, 'change', [data['id'] for data in cleaned], queryset)
+        companies = self._companies(actor, cleaned, errors)
+        self._check_unique(cleaned, errors)
+        raise_if(errors)
+        organization_ids = {self._organization_id(user) for user in targets.values()}
+        organization_ids |= {company.organization_id for company in companies.values()}
+
+        with _in_shard(organization_ids):
+            self._check_groups(cleaned)
+            changed, previous, groups = [], {}, {}
+            for data in cleaned:
+                user = targets[data['id']]
+                previous[user.pk] = (self._organization_id(user), user.company_id)
+                if 'company' in data:
+                    data = {**data, 'company': companies.get(data['company'])}
+                changes = _changes(user, data, [name for name in self.update_fields if name != 'groups'])
+                if 'company' in changes:
+                    user.company = data['company']
+                if 'groups' in data:
+                    current = sorted(group.pk for group in user.groups.all())
+                    if current != data['groups']:
+                        changes['groups'] = [current, data['groups']]
+                        groups[user.pk] = data['groups']
+                if changes:
+                    changed.append((user, changes))
+            fields = sorted({name for _, changes in changed for name in changes} - {'groups'})
+            with transaction.atomic(using=router.db_for_write(User)):
+                if fields:
+                    User.objects.bulk_update(
+                        [user for user, changes in changed if set(changes) - {'groups'}], fields, batch_size=BATCH_SIZE
+                    )
+                if groups:
+                    # Como na tela de edição: os grupos enviados substituem os atuais
+                    User.groups.through.objects.filter(user_id__in=list(groups)).delete()
+                    User.groups.through.objects.bulk_create([
+                        User.groups.through(user_id=pk, group_id=group_id)
+                        for pk, group_ids in groups.items() for group_id in group_ids
+                    ], batch_size=BATCH_SIZE)
+                for user, _ in changed:
+                    organization_id, company_id = previous[user.pk]
+                    live.publish('user', live.UPDATED, user.pk,
+                                 [organization_id, self._organization_id(user)], [company_id, user.company_id])
+                _capture('user', changed, self._snapshot)
+                _after_commit(
+                    [pk for user, _ in changed for pk in (previous[user.pk][0], self._organization_id(user))],
+                    [pk for user, _ in changed for pk in (previous[user.pk][1], user.company_id)],
+                )
+        for user, changes in changed:
+            audit.record(actor, AuditEvent.UPDATE, user, changes, organization_id=self._organization_id(user))
+        return {'updated': [user.pk for user, _ in changed]}
+
+    def deactivate(self, ids, actor):
+        ids = clean_ids(ids)
+        targets = self._targets(actor, 'delete', ids, User.objects.select_related('company'))
+        users = [targets[pk] for pk in ids if targets[pk].is_active]
+        with _in_shard({self._organization_id(user) for user in users}):
+            with transaction.atomic(using=router.db_for_write(User)):
+                User.objects.filter(pk__in=[user.pk for user in users]).update(is_active=False)
+                for user in users:
+                    live.publish('user', live.UPDATED, user.pk, [self._organization_id(user)], [user.company_id])
+                for user in users:
+                    user.is_active = False
+                outbox.capture('user', outbox.DEACTIVATED, [self._snapshot(user) for user in users])
+                _after_commit([self._organization_id(user) for user in users], [user.company_id for user in users])
+        for user in users:
+            audit.record(actor, AuditEvent.DEACTIVATE, user, {'is_active': [True, False]},
+                         organization_id=self._organization_id(user))
+        return {'deactivated': [user.pk for user in users]}
+
+    @staticmethod
+    def _organization_id(user):
+        return user.company.organization_id if user.company_id else None
+
+    def _snapshot(self, user):
+        return outbox.snapshot('user', user, self._organization_id(user))
+
+    def _companies(self, actor, cleaned, errors):
+        """
+        Empresas informadas no lote, ativas e no escopo do usuário (uma consulta).
+        """
+        pks = {data['company'] for data in cleaned if data.get('company')}
+        if not pks:
+            return {}
+        companies = {
+            company.pk: company for company in _across(
+                Company.objects.active().visible_to(actor).filter(pk__in=pks).with_organization()
+            )
+        }
+        for index, data in enumerate(cleaned):
+            if data.get('company') and data['company'] not in companies:
+                add_error(errors, index, 'company', NOT_FOUND)
+        return companies
+
+    def _check_unique(self, cleaned, errors):
+        """
+        ``username`` e ``email`` livres em todos os bancos, exceto nos próprios
+        objetos atualizados (uma consulta por banco para o lote).
+        """
+        usernames = {data['username'] for data in cleaned if 'username' in data}
+        emails = {data['email'] for data in cleaned if 'email' in data}
+        if not usernames and not emails:
+            return
+        taken = {}
+        for alias in _aliases(User):
+            rows = User._base_manager.using(alias).filter(
+                Q(username__in=usernames) | Q(email__in=emails)
+            ).values_list('pk', 'username', 'email')
+            for pk, username, email in rows:
+                taken.setdefault(('username', username), set()).add(pk)
+                taken.setdefault(('email', email), set()).add(pk)
+        for index, data in enumerate(cleaned):
+            for field in ('username', 'email'):
+                owners = taken.get((field, data.get(field)), set()) - {data.get('id')}
+                if field in data and owners:
+                    add_error(errors, index, field, 'Já está em uso.')
+
+    def _check_groups(self, cleaned):
+        # Grupos são locais a cada banco: verificados já no shard da gravação
+        pks = {pk for data in cleaned for pk in data.get('groups') or []}
+        if not pks:
+            return
+        found = set(Group.objects.filter(pk__in=pks).values_list('pk', flat=True))
+        errors = {}
+        for index, data in enumerate(cleaned):
+            missing = set(data.get('groups') or []) - found
+            if missing:
+                add_error(errors, index, 'groups', f'Grupos inexistentes: {", ".join(map(str, sorted(missing)))}.')
+        raise_if(errors)
+
+
+# Grupos (somente leitura: usados para montar os usuários)
+
+class GroupResource(Resource):
+    name = 'groups'
+    model = Group
+    fields = (
+        Field('id', 'pk'),
+        Field('name'),
+        Field(
+            'permissions',
+            prefetch=Prefetch('permissions', queryset=Permission.objects.select_related('content_type')),
+            value=lambda obj: sorted(
+                f'{permission.content_type.app_label}.{permission.codename}' for permission in obj.permissions.all()
+            ),
+            default=False,
+        ),
+    )
+    filters = {
+        'q': ('name__icontains', forms.CharField()),
+    }
+    permissions = {
+        'view': 'auth.view_group',
+    }
+
+    def queryset(self, user):
+        # Como na listagem de grupos: os grupos são compartilhados
+        return Group.objects.all()
+
+
+RESOURCES = {
+    resource.name: resource
+    for resource in (OrganizationResource(), CompanyResource(), UserResource(), GroupResource())
+}
@@ -0,0 +1,37 @@
+"""
+Respostas JSON da API.
+
+As leituras levam um ``ETag`` (hash do corpo); com ``If-None-Match`` igual a
+resposta é um ``304`` sem corpo, poupando a transferência e o processamento
+no cliente quando nada mudou entre duas sincronizações.
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+
+
+def json_response(request, data, status=200, conditional=False):
+    body = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+    response = HttpResponse(body, status=status, content_type='application/json')
+    # Cada token enxerga um escopo diferente
+    patch_vary_headers(response, ('Authorization',))
+    if conditional:
+        etag = quote_etag(hashlib.sha256(body).hexdigest()[:32])
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        not_modified = get_conditional_response(request, etag=etag, response=response)
+        if not_modified is not response:
+            return not_modified
+    return response
+
+
+def error_response(message, status=400, errors=None):
+    data = {'error': message}
+    if errors:
+        data['errors'] = errors
+    body = json.dumps(data, ensure_ascii=False).encode()
+    return HttpResponse(body, status=status, content_type='application/json')
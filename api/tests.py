@@ -0,0 +1,269 @@
+import json
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from audit.buffer import audit_buffer
+from audit.models import AuditEvent
+from core.models import OrganizationRollup
+from core.paging import encode_cursor
+from organizations.models import Organization, Company
+from .auth import issue_token
+from .models import ApiToken
+
+User = get_user_model()
+
+
+class ApiTestMixin:
+    
+    def setUp(self):
+        audit_buffer.flush()
+        self.organization = Organization.objects.create(name='Organização A')
+        self.other = Organization.objects.create(name='Organização B')
+        self.company = Company.objects.create(organization=self.organization, name='Empresa A1')
+        self.other_company = Company.objects.create(organization=self.other, name='Empresa B1')
+        self.group = Group.objects.create(name='Operadores')
+        self.admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        _, self.admin_key = issue_token(self.admin, 'Testes')
+        self.manager = User.objects.create_user(username='gestor', email='gestor@example.com', company=self.company)
+        self.manager.user_permissions.add(*Permission.objects.filter(codename__in=[
+            'view_company', 'view_user', 'add_user', 'change_user', 'delete_user',
+            'view_all_users', 'change_organization_users', 'delete_organization_users',
+        ]))
+        _, self.manager_key = issue_token(self.manager, 'Integração RH')
+    
+    def tearDown(self):
+        audit_buffer.flush()
+    
+    def get(self, url, key=None, **params):
+        return self.client.get(url, params, HTTP_AUTHORIZATION=f'Bearer {key or self.admin_key}')
+    
+    def batch(self, resource, operation, items, key=None):
+        return self.client.post(
+            reverse('api:resource_batch', args=[resource, operation]),
+            json.dumps({'items': items}), content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {key or self.admin_key}'
+        )
+
+
+class ApiAuthTest(ApiTestMixin, TestCase):
+    """
+    Testes da autenticação por token.
+    """
+    databases = '__all__'
+    
+    def test_only_tokens_are_accepted(self):
+        """
+        Testa se a sessão do navegador não vale na API e se tokens revogados são recusados.
+        """
+        url = reverse('api:resource_list', args=['companies'])
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer invalido').status_code, 401)
+        
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        token = ApiToken.objects.get(user_id=self.admin.pk)
+        self.assertIsNotNone(token.last_used_at)
+        self.assertNotEqual(token.key_hash, self.admin_key)
+        
+        ApiToken.objects.filter(pk=token.pk).update(is_active=False)
+        self.assertEqual(self.get(url).status_code, 401)
+    
+    def test_model_permissions_are_required(self):
+        """
+        Testa se cada operação exige a permissão de modelo correspondente.
+        """
+        response = self.get(reverse('api:resource_list', args=['organizations']), key=self.manager_key)
+        self.assertEqual(response.status_code, 403)
+        response = self.batch('companies', 'create', [{'organization': self.organization.pk, 'name': 'X'}],
+                              key=self.manager_key)
+        self.assertEqual(response.status_code, 403)
+        response = self.batch('groups', 'create', [{'name': 'X'}])
+        self.assertEqual(response.status_code, 405)
+
+
+class ApiReadTest(ApiTestMixin, TestCase):
+    """
+    Testes das leituras: campos, paginação por chave, ETag e escopo.
+    """
+    databases = '__all__'
+    
+    def test_sparse_fieldsets(self):
+        """
+        Testa se apenas os campos pedidos são devolvidos e as contagens só quando pedidas.
+        """
+        url = reverse('api:resource_list', args=['companies'])
+        results = self.get(url, organization=self.organization.pk).json()['results']
+        self.assertNotIn('user_count', results[0])
+        
+        results = self.get(url, fields='name,user_count', organization=self.organization.pk).json()['results']
+        self.assertEqual(results, [{'id': self.company.pk, 'name': 'Empresa A1', 'user_count': 1}])
+        
+        response = self.get(url, fields='name,password')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_keyset_pagination(self):
+        """
+        Testa se as páginas seguem o cursor de "next" sem repetir nem pular usuários.
+        """
+        for index in range(7):
+            User.objects.create_user(username=f'api{index}', email=f'api{index}@example.com', company=self.company)
+        url = reverse('api:resource_list', args=['users'])
+        seen, params = [], {'fields': 'username', 'limit': '3'}
+        while True:
+            data = self.get(url, **params).json()
+            self.assertLessEqual(len(data['results']), 3)
+            seen += [user['id'] for user in data['results']]
+            if not data['next']:
+                break
+            params['after'] = data['next'].split('after=')[1].split('&')[0]
+        self.assertEqual(seen, sorted(User.objects.values_list('pk', flat=True)))
+        
+        for cursor in ['x!', encode_cursor(['abc']), encode_cursor([[1]]), encode_cursor([None])]:
+            self.assertEqual(self.get(url, after=cursor).status_code, 400)
+    
+    # Contagem no banco principal: com réplicas, parte das leituras iria para elas
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_list_query_count_does_not_grow_with_rows(self):
+        """
+        Testa se a listagem com grupos não faz uma consulta por usuário.
+        """
+        # Eventos de auditoria de outros testes ainda em memória seriam gravados durante a contagem
+        audit_buffer.flush()
+        url = reverse('api:resource_list', args=['users'])
+        # token, registro do último uso, usuário do token, página e grupos
+        with self.assertNumQueries(5):
+            self.get(url)
+        for index in range(20):
+            User.objects.create_user(username=f'api{index}', email=f'api{index}@example.com',
+                                     company=self.company).groups.add(self.group)
+        # o último uso do token já foi gravado há menos de API_TOKEN_TOUCH_SECONDS
+        with self.assertNumQueries(4):
+            self.assertEqual(len(self.get(url).json()['results']), 22)
+    
+    def test_conditional_requests(self):
+        """
+        Testa o ETag e o 304 com If-None-Match enquanto nada muda.
+        """
+        url = reverse('api:resource_detail', args=['companies', self.company.pk])
+        response = self.get(url)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {self.admin_key}', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        Company.objects.filter(pk=self.company.pk).update(name='Empresa Renomeada')
+        response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {self.admin_key}', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'Empresa Renomeada')
+    
+    def test_tenant_scope(self):
+        """
+        Testa se o token enxerga apenas o escopo do usuário, como nas telas.
+        """
+        results = self.get(reverse('api:resource_list', args=['companies']), key=self.manager_key).json()['results']
+        self.assertEqual([company['id'] for company in results], [self.company.pk])
+        response = self.get(reverse('api:resource_detail', args=['companies', self.other_company.pk]),
+                            key=self.manager_key)
+        self.assertEqual(response.status_code, 404)
+
+
+class ApiBatchTest(ApiTestMixin, TestCase):
+    """
+    Testes das escritas em lote.
+    """
+    databases = '__all__'
+    
+    def test_create_users_in_batch(self):
+        """
+        Testa a criação em lote com grupos, totais e auditoria.
+        """
+        items = [
+            {'username': f'rh{index}', 'email': f'rh{index}@example.com', 'company': self.company.pk,
+             'groups': [self.group.pk]}
+            for index in range(30)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.batch('users', 'create', items, key=self.manager_key)
+        self.assertEqual(response.status_code, 201)
+        created = response.json()['created']
+        self.assertEqual(len(created), 30)
+        self.assertEqual(self.group.user_set.count(), 30)
+        self.assertFalse(User.objects.get(pk=created[0]).has_usable_password())
+        self.assertEqual(OrganizationRollup.objects.get(organization=self.organization).active_users, 31)
+        audit_buffer.flush()
+        self.assertEqual(AuditEvent.objects.filter(action=AuditEvent.CREATE, model='accounts.user').count(), 30)
+    
+    def test_invalid_batch_writes_nothing(self):
+        """
+        Testa se um item inválido cancela o lote inteiro, com os erros por índice.
+        """
+        response = self.batch('users', 'create', [
+            {'username': 'novo1', 'email': 'novo1@example.com', 'company': self.company.pk},
+            {'username': 'gestor', 'email': 'novo2@example.com', 'company': self.company.pk},
+            {'username': 'novo3', 'email': 'novo1@example.com', 'company': self.other_company.pk},
+        ], key=self.manager_key)
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual(set(errors), {'0', '1', '2'})
+        self.assertIn('username', errors['1'])
+        self.assertIn('company', errors['2'])
+        self.assertFalse(User.objects.filter(username__startswith='novo').exists())
+    
+    @override_settings(API_BATCH_LIMIT=5)
+    def test_batch_limit(self):
+        """
+        Testa o limite de itens por lote.
+        """
+        response = self.batch('companies', 'deactivate', list(range(1, 7)))
+        self.assertEqual(response.status_code, 413)
+    
+    @override_settings(API_TOKEN_TOUCH_SECONDS=0)
+    def test_update_and_deactivate_are_set_based(self):
+        """
+        Testa se alteração e desativação não fazem consultas por item.
+        """
+        users = [
+            User.objects.create_user(username=f'lote{index}', email=f'lote{index}@example.com', company=self.company)
+            for index in range(40)
+        ]
+        
+        def update(batch):
+            return self.batch('users', 'update', [
+                {'id': user.pk, 'first_name': 'Nome', 'company': self.company.pk} for user in batch
+            ], key=self.manager_key)
+        
+        # token, último uso, usuário, permissões, usuários do lote, empresas e um UPDATE
+        with self.assertNumQueries(10):
+            self.assertEqual(len(update(users[:10]).json()['updated']), 10)
+        with self.assertNumQueries(10):
+            self.assertEqual(len(update(users[10:]).json()['updated']), 30)
+        self.assertEqual(User.objects.filter(first_name='Nome').count(), 40)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.batch('users', 'deactivate', [user.pk for user in users], key=self.manager_key)
+        self.assertEqual(len(response.json()['deactivated']), 40)
+        self.assertEqual(OrganizationRollup.objects.get(organization=self.organization).inactive_users, 40)
+        
+        # O gestor não desativa a si mesmo nem usuários de outra organização
+        outsider = User.objects.create_user(username='fora', email='fora@example.com', company=self.other_company)
+        response = self.batch('users', 'deactivate', [self.manager.pk, outsider.pk], key=self.manager_key)
+        self.assertEqual(set(response.json()['errors']), {'0', '1'})
+    
+    def test_companies_batch(self):
+        """
+        Testa criação, alteração e desativação de empresas em lote.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.batch('companies', 'create', [
+                {'organization': self.other.pk, 'name': f'Filial {index}'} for index in range(3)
+            ])
+        created = response.json()['created']
+        self.assertEqual(Company.objects.for_org(self.other).count(), 4)
+        self.assertEqual(OrganizationRollup.objects.get(organization=self.other).active_companies, 4)
+        
+        response = self.batch('companies', 'update', [{'id': created[0], 'name': 'Filial Centro'}])
+        self.assertEqual(response.json()['updated'], [created[0]])
+        response = self.batch('companies', 'deactivate', created)
+        self.assertEqual(Company.objects.for_org(self.other).active().count(), 1)
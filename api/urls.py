@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('<str:resource>/', views.resource_list, name='resource_list'),
+    path('<str:resource>/<int:pk>/', views.resource_detail, name='resource_detail'),
+    path('<str:resource>/batch/<str:operation>/', views.resource_batch, name='resource_batch'),
+]
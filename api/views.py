@@ -0,0 +1,120 @@
+import json
+
+from django.conf import settings
+from django.views.decorators.http import require_GET, require_POST
+
+from core import sharding
+from core.decorators import read_from_replica
+from core.paging import InvalidCursor, keyset_page
+from .auth import token_required
+from .resources import RESOURCES, ApiError
+from .responses import error_response, json_response
+
+BATCH_OPERATIONS = ('create', 'update', 'deactivate')
+
+
+def _resource(name, user, operation):
+    """
+    Recurso da URL, se o usuário tiver a permissão de modelo da operação.
+    """
+    resource = RESOURCES.get(name)
+    if resource is None:
+        raise ApiError(f'Recurso desconhecido: "{name}".', status=404)
+    perm = resource.permissions.get(operation)
+    if perm is None:
+        raise ApiError('Operação não suportada por este recurso.', status=405)
+    if not user.has_perm(perm):
+        raise ApiError('Sem permissão para esta operação.', status=403)
+    return resource
+
+
+def _limit(value):
+    if not value:
+        return settings.API_PAGE_SIZE
+    if not value.isdigit() or int(value) < 1:
+        raise ApiError('"limit" deve ser um inteiro positivo.')
+    return min(int(value), settings.API_MAX_PAGE_SIZE)
+
+
+@token_required
+@require_GET
+@read_from_replica
+def resource_list(request, resource):
+    """
+    Uma página do recurso, ordenada por id (``?after=<cursor>`` segue para a
+    próxima), com os campos de ``?fields=`` e os filtros do recurso.
+    """
+    try:
+        resource = _resource(resource, request.user, 'view')
+        names = resource.parse_fields(request.GET.get('fields'))
+        queryset = resource.filter(resource.queryset(request.user), request.GET)
+        queryset = resource.select(queryset, names)
+        page = keyset_page(queryset, ('pk',), request.GET.get('after'), _limit(request.GET.get('limit')),
+                           across_shards=hasattr(queryset, 'across_shards'))
+    except ApiError as exc:
+        return error_response(exc.message, status=exc.status, errors=exc.errors)
+    except InvalidCursor:
+        return error_response('Cursor inválido.')
+    
+    next_url = None
+    if page.next_cursor:
+        params = request.GET.copy()
+        params['after'] = page.next_cursor
+        next_url = f'{request.path}?{params.urlencode()}'
+    
+    return json_response(request, {
+        'results': [resource.serialize(obj, names) for obj in page.items],
+        'next': next_url,
+    }, conditional=True)
+
+
+@token_required
+@require_GET
+@read_from_replica
+def resource_detail(request, resource, pk):
+    """
+    Um objeto do recurso, dentro do escopo do token.
+    """
+    try:
+        resource = _resource(resource, request.user, 'view')
+        names = resource.parse_fields(request.GET.get('fields'))
+    except ApiError as exc:
+        return error_response(exc.message, status=exc.status, errors=exc.errors)
+    
+    queryset = resource.select(resource.queryset(request.user).filter(pk=pk), names)
+    if sharding.fans_out() and hasattr(queryset, 'across_shards'):
+        with sharding.use_shard(sharding.locate(resource.model, pk)):
+            obj = queryset.first()
+    else:
+        obj = queryset.first()
+    if obj is None:
+        return error_response('Não encontrado ou fora do seu escopo.', status=404)
+    
+    return json_response(request, resource.serialize(obj, names), conditional=True)
+
+
+@token_required
+@require_POST
+def resource_batch(request, resource, operation):
+    """
+    Criação, alteração ou desativação em lote: ``{"items": [...]}`` com até
+    ``API_BATCH_LIMIT`` itens. O lote é gravado inteiro ou, com qualquer item
+    inválido, nada é gravado e os erros vêm por índice.
+    """
+    if operation not in BATCH_OPERATIONS:
+        return error_response(f'Operação desconhecida: "{operation}".', status=404)
+    try:
+        resource = _resource(resource, request.user, operation)
+        try:
+            items = json.loads(request.body or b'{}').get('items')
+        except (ValueError, AttributeError):
+            raise ApiError('O corpo deve ser um objeto JSON com a lista "items".')
+        if not isinstance(items, list) or not items:
+            raise ApiError('Informe os itens do lote em "items".')
+        if len(items) > settings.API_BATCH_LIMIT:
+            raise ApiError(f'No máximo {settings.API_BATCH_LIMIT} itens por lote.', status=413)
+        result = getattr(resource, operation)(items, request.user)
+    except ApiError as exc:
+        return error_response(exc.message, status=exc.status, errors=exc.errors)
+    
+    return json_response(request, result, status=201 if operation == 'create' else 200)
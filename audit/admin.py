@@ -0,0 +1,21 @@
+from django.contrib import admin
+from .models import AuditEvent
+
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(admin.ModelAdmin):
+    """
+    Configuração do admin para o modelo AuditEvent (somente leitura).
+    """
+    list_display = ('created_at', 'actor_repr', 'action', 'model', 'object_repr', 'organization_id')
+    list_filter = ('action', 'model')
+    search_fields = ('actor_repr', 'object_repr')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,91 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+
+class AuditBuffer:
+    """
+    Acumula eventos de auditoria em memória e os grava com ``bulk_create``.
+
+    A gravação acontece quando o lote atinge ``AUDIT_BATCH_SIZE`` eventos ou
+    quando o evento mais antigo passa de ``AUDIT_FLUSH_INTERVAL`` segundos
+    (verificado a cada novo evento e ao final de cada requisição), além do
+    encerramento do processo. Assim a requisição que audita não paga um
+    INSERT síncrono por evento. Se a gravação falhar, os eventos voltam para
+    o buffer e são tentados de novo no próximo intervalo; o erro só vai para
+    o log, sem afetar a requisição (cuja alteração já foi gravada).
+    """
+    
+    def __init__(self):
+        self._events = []
+        self._oldest = None
+        self._retry_at = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._events)
+    
+    def add(self, event):
+        with self._lock:
+            self._events.append(event)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+        if self._is_due():
+            self.flush()
+    
+    def _is_due(self):
+        if time.monotonic() < self._retry_at:
+            return False
+        if len(self._events) >= settings.AUDIT_BATCH_SIZE:
+            return True
+        oldest = self._oldest
+        return oldest is not None and time.monotonic() - oldest >= settings.AUDIT_FLUSH_INTERVAL
+    
+    def flush_if_due(self):
+        if self._events and self._is_due():
+            self.flush()
+    
+    def flush(self):
+        """
+        Grava todos os eventos pendentes. Retorna a quantidade gravada.
+        """
+        from .models import AuditEvent
+        
+        with self._lock:
+            events, self._events, self._oldest = self._events, [], None
+        if not events:
+            return 0
+        try:
+            AuditEvent.objects.bulk_create(events, batch_size=settings.AUDIT_BATCH_SIZE)
+        except DatabaseError:
+            logger.warning('Falha ao gravar %s evento(s) de auditoria.', len(events), exc_info=True)
+            self._requeue(events)
+            return 0
+        self._retry_at = 0
+        return len(events)
+    
+    def _requeue(self, events):
+        # Antes dos eventos chegados nesse meio-tempo; a próxima tentativa espera o
+        # intervalo, em vez de repetir o INSERT a cada novo evento
+        with self._lock:
+            self._events[:0] = events
+            self._oldest = self._oldest or time.monotonic()
+            self._retry_at = time.monotonic() + settings.AUDIT_FLUSH_INTERVAL
+
+
+audit_buffer = AuditBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        audit_buffer.flush()
+    except Exception:
+        # O banco pode já estar indisponível no encerramento do processo
+        pass
@@ -0,0 +1,81 @@
+import datetime
+import decimal
+
+from django.db import models
+from django.utils import timezone
+
+from .buffer import audit_buffer
+from .models import AuditEvent
+
+# Campos que nunca entram no diff de auditoria
+EXCLUDED_FIELDS = {'password', 'password1', 'password2'}
+
+
+def _jsonable(value):
+    """
+    Converte valores de formulário em representações JSON compactas.
+    """
+    if isinstance(value, models.Model):
+        return value.pk
+    if isinstance(value, (models.QuerySet, list, tuple, set)):
+        return sorted(_jsonable(v) for v in value)
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def form_changes(form):
+    """
+    Retorna o diff compacto ``{campo: [antes, depois]}`` dos campos alterados
+    de um formulário já validado.
+    """
+    changes = {}
+    for name in form.changed_data:
+        if name in EXCLUDED_FIELDS or name not in form.cleaned_data:
+            continue
+        before = _jsonable(form.initial.get(name))
+        after = _jsonable(form.cleaned_data[name])
+        if before != after:
+            changes[name] = [before, after]
+    return changes
+
+
+def instance_organization_id(instance):
+    """
+    Descobre a organização dona do objeto (para o escopo do navegador de auditoria).
+    """
+    from organizations.models import Organization, Company
+    
+    if isinstance(instance, Organization):
+        return instance.pk
+    if isinstance(instance, Company):
+        return instance.organization_id
+    company = getattr(instance, 'company', None)
+    if company is not None:
+        return company.organization_id
+    return None
+
+
+def record(actor, action, instance, changes=None, organization_id=None):
+    """
+    Registra um evento de auditoria. O evento é apenas enfileirado em memória;
+    a gravação acontece em lote (ver ``AuditBuffer``).
+    """
+    if organization_id is None:
+        organization_id = instance_organization_id(instance)
+    authenticated = actor is not None and actor.is_authenticated
+    audit_buffer.add(AuditEvent(
+        actor_id=actor.pk if authenticated else None,
+        actor_repr=(actor.get_username() if authenticated else '')[:254],
+        organization_id=organization_id,
+        action=action,
+        model=instance._meta.label_lower,
+        object_id=str(instance.pk),
+        object_repr=str(instance)[:200],
+        changes=changes or {},
+        created_at=timezone.now(),
+    ))
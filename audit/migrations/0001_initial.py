@@ -0,0 +1,40 @@
+# Generated by Django 4.2.16 on 2026-10-19 14:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('organizations', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actor_repr', models.CharField(blank=True, max_length=254, verbose_name='actor')),
+                ('action', models.CharField(choices=[('create', 'create'), ('update', 'update'), ('deactivate', 'deactivate'), ('delete', 'delete')], max_length=20, verbose_name='action')),
+                ('model', models.CharField(max_length=100, verbose_name='model')),
+                ('object_id', models.CharField(max_length=64, verbose_name='object id')),
+                ('object_repr', models.CharField(max_length=200, verbose_name='object')),
+                ('changes', models.JSONField(blank=True, default=dict, verbose_name='changes')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('actor', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='actor')),
+                ('organization', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='organizations.organization', verbose_name='organization')),
+            ],
+            options={
+                'verbose_name': 'audit event',
+                'verbose_name_plural': 'audit events',
+                'ordering': ['-pk'],
+                'indexes': [models.Index(fields=['organization', '-id'], name='audit_org_id_idx'), models.Index(fields=['model', 'object_id'], name='audit_object_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+from django.db import models
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from organizations.models import Organization
+
+
+class AuditEvent(models.Model):
+    """
+    Registro de auditoria (somente inserção) de quem criou, alterou ou
+    desativou usuários, grupos, empresas e organizações.
+    
+    As chaves estrangeiras não têm restrição no banco nem cascata: o registro
+    nunca é alterado depois de gravado, mesmo que o autor ou a organização
+    deixem de existir (``actor_repr`` preserva o nome do autor).
+    """
+    CREATE = 'create'
+    UPDATE = 'update'
+    DEACTIVATE = 'deactivate'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (CREATE, _('create')),
+        (UPDATE, _('update')),
+        (DEACTIVATE, _('deactivate')),
+        (DELETE, _('delete')),
+    ]
+    
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        related_name='+',
+        verbose_name=_('actor'),
+        null=True,
+        blank=True,
+        db_constraint=False
+    )
+    actor_repr = models.CharField(_('actor'), max_length=254, blank=True)
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.DO_NOTHING,
+        related_name='+',
+        verbose_name=_('organization'),
+        null=True,
+        blank=True,
+        db_index=False,
+        db_constraint=False
+    )
+    action = models.CharField(_('action'), max_length=20, choices=ACTION_CHOICES)
+    model = models.CharField(_('model'), max_length=100)
+    object_id = models.CharField(_('object id'), max_length=64)
+    object_repr = models.CharField(_('object'), max_length=200)
+    changes = models.JSONField(_('changes'), default=dict, blank=True)
+    created_at = models.DateTimeField(_('created at'), default=timezone.now)
+    
+    class Meta:
+        verbose_name = _('audit event')
+        verbose_name_plural = _('audit events')
+        ordering = ['-pk']
+        indexes = [
+            # Navegação por organização, da mais recente para a mais antiga (keyset por pk)
+            models.Index(fields=['organization', '-id'], name='audit_org_id_idx'),
+            models.Index(fields=['model', 'object_id'], name='audit_object_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.actor_repr} {self.action} {self.model} #{self.object_id}"
@@ -0,0 +1,9 @@
+from django.core.signals import request_finished
+from django.dispatch import receiver
+
+from .buffer import audit_buffer
+
+
+@receiver(request_finished, dispatch_uid='audit_flush_if_due')
+def flush_audit_buffer(sender, **kwargs):
+    audit_buffer.flush_if_due()
@@ -0,0 +1,133 @@
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from organizations.models import Organization, Company
+from .buffer import audit_buffer
+from .models import AuditEvent
+
+User = get_user_model()
+
+
+@override_settings(AUDIT_BATCH_SIZE=100, AUDIT_FLUSH_INTERVAL=3600)
+class AuditLogTest(TestCase):
+    """
+    Testes para o registro de auditoria.
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        audit_buffer.flush()
+        self.organization = Organization.objects.create(name='Organização Teste')
+        self.other_organization = Organization.objects.create(name='Outra Organização')
+        self.company = Company.objects.create(organization=self.organization, name='Empresa Teste')
+        self.superuser = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+        self.client.login(username='admin', password='adminpass123')
+    
+    def tearDown(self):
+        audit_buffer.flush()
+    
+    def test_events_are_buffered_until_flush(self):
+        """
+        Testa se os eventos ficam em memória e são gravados em lote.
+        """
+        self.client.post(reverse('organizations:company_edit', args=[self.organization.pk, self.company.pk]), {
+            'name': 'Empresa Renomeada',
+            'description': '',
+            'is_active': 'on',
+        })
+        self.assertEqual(AuditEvent.objects.count(), 0)
+        self.assertEqual(audit_buffer.flush(), 1)
+        
+        event = AuditEvent.objects.get()
+        self.assertEqual(event.action, AuditEvent.UPDATE)
+        self.assertEqual(event.model, 'organizations.company')
+        self.assertEqual(event.organization_id, self.organization.pk)
+        self.assertEqual(event.actor_repr, 'admin')
+        self.assertEqual(event.changes, {'name': ['Empresa Teste', 'Empresa Renomeada']})
+    
+    @override_settings(AUDIT_BATCH_SIZE=1)
+    def test_failed_flush_keeps_events(self):
+        """
+        Testa se uma falha na gravação não afeta a requisição e mantém os eventos para a próxima tentativa.
+        """
+        url = reverse('organizations:company_edit', args=[self.organization.pk, self.company.pk])
+        data = {'name': 'Empresa Renomeada', 'description': '', 'is_active': 'on'}
+        failure = OperationalError('database is locked')
+        with mock.patch.object(AuditEvent.objects, 'bulk_create', side_effect=failure), \
+                self.assertLogs('audit.buffer', 'WARNING'):
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Company.objects.get(pk=self.company.pk).name, 'Empresa Renomeada')
+        self.assertEqual(len(audit_buffer), 1)
+        
+        self.assertEqual(audit_buffer.flush(), 1)
+        self.assertEqual(AuditEvent.objects.get().changes, {'name': ['Empresa Teste', 'Empresa Renomeada']})
+    
+    @override_settings(AUDIT_BATCH_SIZE=2)
+    def test_flush_when_batch_is_full(self):
+        """
+        Testa se o lote é gravado ao atingir o tamanho configurado.
+        """
+        url = reverse('organizations:company_delete', args=[self.organization.pk, self.company.pk])
+        self.client.post(url)
+        self.assertEqual(AuditEvent.objects.count(), 0)
+        self.client.post(url)
+        self.assertEqual(AuditEvent.objects.count(), 2)
+    
+    def test_browser_is_scoped_by_organization(self):
+        """
+        Testa se o navegador de auditoria mostra apenas a organização do usuário.
+        """
+        manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            company=self.company
+        )
+        manager.user_permissions.add(Permission.objects.get(codename='view_auditevent'))
+        AuditEvent.objects.create(action='update', model='organizations.company', object_id='1',
+                                  object_repr='Visível', organization=self.organization)
+        AuditEvent.objects.create(action='update', model='organizations.company', object_id='2',
+                                  object_repr='Oculto', organization=self.other_organization)
+        
+        self.client.login(username='manager', password='managerpass123')
+        response = self.client.get(reverse('audit:event_list'))
+        self.assertContains(response, 'Visível')
+        self.assertNotContains(response, 'Oculto')
+    
+    def test_invalid_organization_filter_is_ignored(self):
+        """
+        Testa se um filtro de organização inválido é ignorado em vez de causar erro.
+        """
+        AuditEvent.objects.create(action='update', model='organizations.company', object_id='1',
+                                  object_repr='Visível', organization=self.organization)
+        response = self.client.get(reverse('audit:event_list'), {'organization': 'abc'})
+        self.assertContains(response, 'Visível')
+        response = self.client.get(reverse('audit:event_list'), {'organization': self.other_organization.pk})
+        self.assertNotContains(response, 'Visível')
+    
+    def test_keyset_pagination(self):
+        """
+        Testa a paginação por chave do navegador de auditoria.
+        """
+        AuditEvent.objects.bulk_create([
+            AuditEvent(action='create', model='accounts.user', object_id=str(i), object_repr=f'evento-{i:03d}')
+            for i in range(60)
+        ])
+        response = self.client.get(reverse('audit:event_list'))
+        self.assertContains(response, 'evento-059')
+        self.assertNotContains(response, 'evento-009')
+        
+        before = response.context['next_before']
+        response = self.client.get(reverse('audit:event_list'), {'before': before}, HTTP_HX_REQUEST='true')
+        self.assertContains(response, 'evento-009')
+        self.assertNotContains(response, 'evento-059')
+        self.assertIsNone(response.context['next_before'])
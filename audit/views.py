@@ -0,0 +1,64 @@
+from django.contrib.auth.decorators import login_required, permission_required
+from django.db import router, transaction
+
+from core.rendering import render
+from organizations.models import Organization
+from .buffer import audit_buffer
+from .models import AuditEvent
+
+PAGE_SIZE = 50
+
+
+@login_required
+@permission_required('audit.view_auditevent', raise_exception=True)
+def event_list(request):
+    """
+    Navegador de auditoria com paginação por chave (``?before=<id>``),
+    restrito à organização do usuário logado (superusuários veem todas).
+    """
+    # Eventos ainda em memória neste processo aparecem imediatamente. Dentro de
+    # uma transação não: os eventos de outras requisições seriam perdidos com
+    # um rollback desta (ficam para o flush ao final da requisição)
+    if not transaction.get_connection(router.db_for_write(AuditEvent)).in_atomic_block:
+        audit_buffer.flush()
+    
+    events = AuditEvent.objects.all()
+    organizations = None
+    organization_id = None
+    
+    if request.user.is_superuser:
+        organizations = Organization.objects.order_by('name').only('pk', 'name').across_shards()
+        organization = request.GET.get('organization', '')
+        organization_id = int(organization) if organization.isdigit() else None
+    elif request.user.company:
+        organization_id = request.user.company.organization_id
+    else:
+        events = events.none()
+    
+    if organization_id:
+        events = events.filter(organization_id=organization_id)
+    
+    action = request.GET.get('action', '')
+    if action:
+        events = events.filter(action=action)
+    
+    before = request.GET.get('before', '')
+    if before.isdigit():
+        events = events.filter(pk__lt=int(before))
+    
+    # Uma linha extra indica se existe próxima página, sem COUNT(*)
+    page = list(events.order_by('-pk')[:PAGE_SIZE + 1])
+    has_next = len(page) > PAGE_SIZE
+    page = page[:PAGE_SIZE]
+    
+    context = {
+        'events': page,
+        'next_before': page[-1].pk if has_next else None,
+        'organizations': organizations,
+        'organization_id': str(organization_id or ''),
+        'action': action,
+        'action_choices': AuditEvent.ACTION_CHOICES,
+    }
+    
+    return render(request, 'audit/event_list.html', context,
+                  partial_template='audit/partials/event_rows.html')
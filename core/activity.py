@@ -0,0 +1,169 @@
+"""
+Séries temporais de atividade (cadastros de usuários, criação de empresas e
+logins) servidas a partir de ``ActivityBucket``.
+
+Cada evento incrementa um balde por período (dia, semana e mês) no escopo
+global e no da organização; a leitura de um ano de dados semanais são 52
+linhas de um índice, nunca uma varredura das tabelas de origem.
+``rebuild`` reconstrói os baldes a partir dos dados existentes (de todos os shards)
+e ``transfer`` leva os eventos de empresas movidas para a nova organização.
+"""
+import datetime
+import itertools
+
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.db.models import Count, DateField
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from organizations.models import Company
+from . import sharding
+from .models import ActivityBucket
+from .rollups import increment
+
+PERIODS = (ActivityBucket.DAY, ActivityBucket.WEEK, ActivityBucket.MONTH)
+
+# Quantidade máxima de pontos por série (aprox. um ano de dias, dois de semanas, cinco de meses)
+MAX_POINTS = {
+    ActivityBucket.DAY: 366,
+    ActivityBucket.WEEK: 104,
+    ActivityBucket.MONTH: 60,
+}
+
+TRUNC_FUNCTIONS = {
+    ActivityBucket.DAY: TruncDay,
+    ActivityBucket.WEEK: TruncWeek,
+    ActivityBucket.MONTH: TruncMonth,
+}
+
+
+def bucket_start(value, period):
+    """
+    Início do intervalo (no fuso atual) que contém a data/hora informada.
+    """
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    if period == ActivityBucket.WEEK:
+        return value - datetime.timedelta(days=value.weekday())
+    if period == ActivityBucket.MONTH:
+        return value.replace(day=1)
+    return value
+
+
+def previous_start(start, period):
+    if period == ActivityBucket.DAY:
+        return start - datetime.timedelta(days=1)
+    if period == ActivityBucket.WEEK:
+        return start - datetime.timedelta(weeks=1)
+    return (start - datetime.timedelta(days=1)).replace(day=1)
+
+
+def record(metric, when, organization_id=None, delta=1):
+    """
+    Incrementa os baldes de todos os períodos para o escopo global e,
+    se informado, para a organização.
+    """
+    scopes = [ActivityBucket.GLOBAL_SCOPE]
+    if organization_id:
+        scopes.append(organization_id)
+    for period in PERIODS:
+        start = bucket_start(when, period)
+        for scope in scopes:
+            increment(
+                ActivityBucket,
+                {'metric': metric, 'period': period, 'scope': scope, 'start': start},
+                'count',
+                delta
+            )
+
+
+def series(metric, period, scope=ActivityBucket.GLOBAL_SCOPE, points=None):
+    """
+    Retorna ``(labels, data)`` com os últimos ``points`` intervalos até hoje,
+    preenchendo com zero os intervalos sem eventos.
+    """
+    points = min(points or MAX_POINTS[period], MAX_POINTS[period])
+    starts = [bucket_start(timezone.localdate(), period)]
+    for _ in range(points - 1):
+        starts.append(previous_start(starts[-1], period))
+    starts.reverse()
+    
+    counts = dict(ActivityBucket.objects.filter(
+        metric=metric, period=period, scope=scope, start__gte=starts[0]
+    ).values_list('start', 'count'))
+    return [start.isoformat() for start in starts], [counts.get(start, 0) for start in starts]
+
+
+def _sources():
+    """
+    Consulta de origem e campos (data, organização) de cada métrica.
+    O histórico de logins não é guardado; a reconstrução considera apenas
+    o último login de cada usuário.
+    """
+    User = get_user_model()
+    return {
+        ActivityBucket.USERS_JOINED: (User.objects.all(), 'date_joined', 'company__organization_id'),
+        ActivityBucket.COMPANIES_CREATED: (Company.objects.all(), 'created_at', 'organization_id'),
+        ActivityBucket.LOGINS: (User.objects.filter(last_login__isnull=False), 'last_login', 'company__organization_id'),
+    }
+
+
+def rebuild():
+    """
+    Reconstrói todos os baldes com consultas agrupadas. Retorna a quantidade de baldes.
+    """
+    buckets = {}
+    for metric, (queryset, date_field, organization_field) in _sources().items():
+        for period, alias in itertools.product(PERIODS, sharding.aliases()):
+            rows = queryset.using(alias).annotate(
+                bucket=TRUNC_FUNCTIONS[period](date_field, output_field=DateField())
+            ).values('bucket', organization_field).annotate(total=Count('pk')).order_by()
+            for row in rows:
+                scopes = [ActivityBucket.GLOBAL_SCOPE]
+                if row[organization_field]:
+                    scopes.append(row[organization_field])
+                for scope in scopes:
+                    key = (metric, period, scope, row['bucket'])
+                    buckets[key] = buckets.get(key, 0) + row['total']
+    
+    with transaction.atomic(using=router.db_for_write(ActivityBucket)):
+        ActivityBucket.objects.all().delete()
+        ActivityBucket.objects.bulk_create([
+            ActivityBucket(metric=metric, period=period, scope=scope, start=start, count=count)
+            for (metric, period, scope, start), count in buckets.items()
+        ], batch_size=1000)
+    return len(buckets)
+
+
+def transfer(company_ids, organization_id):
+    """
+    Leva para os baldes de ``organization_id`` os eventos das empresas (e dos
+    seus usuários) que estão mudando de organização; o escopo global não muda.
+    Deve ser chamada antes da mudança; os baldes são alterados após o commit.
+    """
+    moved = {}
+    for metric, (queryset, date_field, organization_field) in _sources().items():
+        # Caminho até a empresa: 'organization_id' -> 'id', 'company__organization_id' -> 'company__id'
+        company_field = organization_field[:-len('organization_id')] + 'id'
+        for period in PERIODS:
+            rows = queryset.filter(**{f'{company_field}__in': company_ids}).annotate(
+                bucket=TRUNC_FUNCTIONS[period](date_field, output_field=DateField())
+            ).values('bucket', organization_field).annotate(total=Count('pk')).order_by()
+            for row in rows:
+                if row[organization_field] != organization_id:
+                    moved[(metric, period, row[organization_field], row['bucket'])] = row['total']
+    
+    def apply():
+        for (metric, period, source, start), total in moved.items():
+            for scope, delta in ((source, -total), (organization_id, total)):
+                increment(
+                    ActivityBucket,
+                    {'metric': metric, 'period': period, 'scope': scope, 'start': start},
+                    'count',
+                    delta
+                )
+    
+    if moved:
+        transaction.on_commit(apply, using=router.db_for_write(Company))
+    return len(moved)
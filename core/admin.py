@@ -1,3 +1,13 @@
 from django.contrib import admin
+from .models import Job
 
-# Register your models here.
\ No newline at end of file
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """
+    Configuração do admin para o modelo Job.
+    """
+    list_display = ('name', 'status', 'progress', 'attempts', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'locked_by', 'locked_at')
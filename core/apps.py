@@ -1,7 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
-    verbose_name = 'Núcleo do Sistema'
\ No newline at end of file
+    verbose_name = 'Núcleo do Sistema'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .sharding import reserve_id_range
+        
+        # Cada shard numera as chaves a partir da própria faixa (core.sharding)
+        post_migrate.connect(reserve_id_range, dispatch_uid='sharding_reserve_id_range')
+        
+        # As tarefas de <app>/tasks.py são registradas no primeiro uso da fila
+        # (core.jobs.get_task), e não na inicialização de cada worker web
@@ -0,0 +1,232 @@
+"""
+Arquivamento de usuários e empresas inativos em tabelas frias.
+
+Desativar só muda ``is_active``: as linhas continuam nas tabelas quentes e
+pesam em toda listagem, contagem e busca. ``archive_inactive`` move para
+``ArchivedUser`` e ``ArchivedCompany`` (mesmo pk, campos serializados em
+JSON) o que está inativo há mais de ``ARCHIVE_AFTER_DAYS`` dias:
+
+* usuários desativados (exceto superusuários) sem acesso nesse período
+  (``last_seen``, ``last_login`` ou, sem nenhum dos dois, ``date_joined``);
+* empresas desativadas, sem alterações nesse período e sem usuários
+  (os usuários são arquivados antes, na mesma execução).
+
+Cada lote é uma transação curta, com pausa entre lotes, para rodar em horário
+comercial sem segurar o banco. As exclusões disparam os sinais de sempre
+(totais da organização, eventos ao vivo e contagens do dashboard).
+``restore_user`` e ``restore_company`` devolvem os registros às tabelas quentes.
+"""
+import datetime
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core import serializers
+from django.db import router, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.deletion import Collector
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts.models import ArchivedUser
+from organizations.models import ArchivedCompany, Company, Organization
+from . import live, sharding, stats
+from .rollups import refresh_organization
+
+Batch = namedtuple('Batch', 'alias model count seconds')
+
+
+class ArchiveError(Exception):
+    """
+    Restauração impossível (ex.: username já usado por outro usuário).
+    """
+
+
+def _aliases(model):
+    return sharding.aliases() if sharding.is_enabled() else [router.db_for_write(model)]
+
+
+def cutoff(days=None):
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.now() - datetime.timedelta(days=days)
+
+
+def archivable_users(before):
+    User = get_user_model()
+    return User._base_manager.filter(is_active=False, is_superuser=False).annotate(
+        seen=Coalesce('last_seen', 'last_login', 'date_joined')
+    ).filter(seen__lt=before)
+
+
+def archivable_companies(before):
+    User = get_user_model()
+    return Company._base_manager.filter(is_active=False, updated_at__lt=before).exclude(
+        Exists(User._base_manager.filter(company=OuterRef('pk')))
+    )
+
+
+def _snapshot(instance):
+    """
+    Campos do objeto no formato do serializador "python" (FKs e M2M como pks).
+    """
+    return serializers.serialize('python', [instance])[0]['fields']
+
+
+def _delete(instances, using):
+    # O Collector recebe os objetos já carregados (com a empresa), então os
+    # sinais de exclusão não consultam o banco objeto a objeto
+    collector = Collector(using=using)
+    collector.collect(instances)
+    collector.delete()
+
+
+def _archive_users(before, batch_size, using):
+    with transaction.atomic(using=using):
+        users = list(
+            archivable_users(before).using(using).select_related('company')
+            .prefetch_related('groups', 'user_permissions').order_by('pk')[:batch_size]
+        )
+        ArchivedUser.objects.using(using).bulk_create([
+            ArchivedUser(
+                id=user.pk,
+                username=user.username,
+                email=user.email,
+                company_id=user.company_id,
+                organization_id=user.company.organization_id if user.company_id else None,
+                data=_snapshot(user),
+            )
+            for user in users
+        ])
+        if users:
+            _delete(users, using)
+    return len(users)
+
+
+def _archive_companies(before, batch_size, using):
+    with transaction.atomic(using=using):
+        companies = list(archivable_companies(before).using(using).order_by('pk')[:batch_size])
+        ArchivedCompany.objects.using(using).bulk_create([
+            ArchivedCompany(
+                id=company.pk,
+                organization_id=company.organization_id,
+                name=company.name,
+                data=_snapshot(company),
+            )
+            for company in companies
+        ])
+        if companies:
+            _delete(companies, using)
+    return len(companies)
+
+
+def archive_inactive(before=None, batch_size=None, pause=None, max_batches=None):
+    """
+    Arquiva usuários e depois empresas inativos, lote a lote, em todos os
+    bancos. Gera um ``Batch`` por lote gravado.
+    """
+    before = cutoff() if before is None else before
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    pause = settings.ARCHIVE_BATCH_PAUSE if pause is None else pause
+    batches = 0
+    for model, archive in ((get_user_model(), _archive_users), (Company, _archive_companies)):
+        for alias in _aliases(model):
+            while max_batches is None or batches < max_batches:
+                started = time.perf_counter()
+                with sharding.use_shard(alias):
+                    count = archive(before, batch_size, alias)
+                if not count:
+                    break
+                batches += 1
+                yield Batch(alias, model._meta.label_lower, count, time.perf_counter() - started)
+                if count < batch_size:
+                    break
+                time.sleep(pause)
+
+
+# Restauração
+
+def _find(model, pk):
+    for alias in _aliases(model):
+        archived = model.objects.using(alias).filter(pk=pk).first()
+        if archived is not None:
+            return alias, archived
+    raise ArchiveError(f'{model._meta.verbose_name.capitalize()} {pk} não está arquivado(a).')
+
+
+def _load(model, archived, using, **overrides):
+    fields = {**archived.data, **overrides}
+    obj = next(serializers.deserialize('python', [{'model': model._meta.label_lower, 'pk': archived.pk, 'fields': fields}]))
+    obj.save(using=using)
+    archived.delete()
+    return obj.object
+
+
+def restore_company(pk, with_users=True):
+    """
+    Devolve uma empresa arquivada (e, por padrão, os usuários dela) às tabelas
+    quentes. Retorna a empresa restaurada.
+    """
+    alias, archived = _find(ArchivedCompany, pk)
+    with sharding.use_shard(alias), transaction.atomic(using=alias):
+        company = _restore_company(archived, alias)
+        user_ids = []
+        if with_users:
+            for archived_user in ArchivedUser.objects.using(alias).filter(company_id=pk).order_by('pk'):
+                user_ids.append(_restore_user(archived_user, alias).pk)
+    _restored(company.organization_id, [company.pk], company_id=company.pk, user_ids=user_ids)
+    return company
+
+
+def _restore_company(archived, using):
+    if Company._base_manager.using(using).filter(pk=archived.pk).exists():
+        raise ArchiveError(f'A empresa {archived.pk} já existe.')
+    if not Organization._base_manager.using(using).filter(pk=archived.organization_id).exists():
+        raise ArchiveError(f'A organização {archived.organization_id} da empresa "{archived.name}" não existe mais.')
+    return _load(Company, archived, using)
+
+
+def restore_user(pk):
+    """
+    Devolve um usuário arquivado à tabela de usuários (restaurando antes a
+    empresa, se ela também estiver arquivada). Retorna o usuário restaurado.
+    """
+    alias, archived = _find(ArchivedUser, pk)
+    with sharding.use_shard(alias), transaction.atomic(using=alias):
+        company_ids = []
+        if archived.company_id and not Company._base_manager.using(alias).filter(pk=archived.company_id).exists():
+            company_archive = ArchivedCompany.objects.using(alias).filter(pk=archived.company_id).first()
+            if company_archive is None:
+                raise ArchiveError(f'A empresa {archived.company_id} do usuário "{archived.username}" não existe mais.')
+            company_ids.append(_restore_company(company_archive, alias).pk)
+        user = _restore_user(archived, alias)
+    _restored(archived.organization_id, company_ids, company_id=archived.company_id, user_ids=[user.pk])
+    return user
+
+
+def _restore_user(archived, using):
+    User = get_user_model()
+    # username e email podem ter sido reaproveitados (em qualquer shard) enquanto arquivado
+    lookup = Q(pk=archived.pk) | Q(username=archived.username) | Q(email=archived.email)
+    if any(User._base_manager.using(alias).filter(lookup).exists() for alias in _aliases(User)):
+        raise ArchiveError(f'O usuário "{archived.username}" ({archived.email}) já existe; restauração cancelada.')
+    # Grupos ou permissões excluídos desde o arquivamento são ignorados
+    groups = Group.objects.using(using).filter(pk__in=archived.data.get('groups', []))
+    permissions = Permission.objects.using(using).filter(pk__in=archived.data.get('user_permissions', []))
+    return _load(
+        User, archived, using,
+        groups=list(groups.values_list('pk', flat=True)),
+        user_permissions=list(permissions.values_list('pk', flat=True)),
+    )
+
+
+def _restored(organization_id, company_ids, company_id=None, user_ids=()):
+    # Gravados com save(raw=True): totais, eventos ao vivo e contagens são feitos aqui
+    if organization_id:
+        refresh_organization(organization_id)
+    for pk in company_ids:
+        live.publish('company', live.CREATED, pk, [organization_id], [pk])
+    for pk in user_ids:
+        live.publish('user', live.CREATED, pk, [organization_id], [company_id])
+    stats.invalidate([organization_id] if organization_id else [], [company_id] if company_id else [])
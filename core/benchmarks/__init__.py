@@ -0,0 +1,45 @@
+"""
+Suítes de benchmark executadas por ``manage.py benchmark <suíte>``.
+
+Cada suíte é um módulo deste pacote com uma função ``run()`` que devolve um
+``Report``; itens acima do orçamento viram falhas e o comando termina com erro,
+o que permite usar a suíte como verificação no CI.
+"""
+from importlib import import_module
+
+SUITES = ('assets', 'forms')
+
+
+class Report:
+    """
+    Linhas de medição de uma suíte e as violações de orçamento encontradas.
+    """
+    
+    def __init__(self, title):
+        self.title = title
+        self.rows = []
+        self.failures = []
+    
+    def add(self, label, value):
+        self.rows.append((label, value))
+    
+    def check(self, label, value, limit, unit):
+        """
+        Registra a medição e falha se ``value`` ultrapassar ``limit``.
+        """
+        self.add(label, f'{value:.1f} {unit} (limite {limit} {unit})')
+        if value > limit:
+            self.failures.append(f'{label}: {value:.1f} {unit} acima do limite de {limit} {unit}')
+    
+    def fail(self, message):
+        self.failures.append(message)
+    
+    @property
+    def ok(self):
+        return not self.failures
+
+
+def run(name):
+    if name not in SUITES:
+        raise LookupError(f'Suíte de benchmark desconhecida: {name}')
+    return import_module(f'{__name__}.{name}').run()
@@ -0,0 +1,138 @@
+"""
+Orçamento de tamanho e de first paint dos assets carregados no ``<head>``.
+
+Renderiza as páginas de entrada (login e layout base), identifica CSS e
+scripts bloqueantes, mede o tamanho de cada um depois do gzip (usando a
+variante ``.gz`` gerada no build quando existir) e estima o first paint na
+rede de referência de ``ASSET_REFERENCE_NETWORK``.
+"""
+import gzip
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from . import Report
+
+PAGES = (
+    ('login', 'accounts/login.html'),
+    ('base', 'base/base.html'),
+)
+
+
+class HeadAssetParser(HTMLParser):
+    """
+    Coleta ``(tipo, url, bloqueante)`` das folhas de estilo e scripts do ``<head>``.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.assets = []
+        self.in_head = True
+    
+    def handle_starttag(self, tag, attrs):
+        if tag == 'body':
+            self.in_head = False
+        if not self.in_head:
+            return
+        attrs = dict(attrs)
+        if tag == 'link' and attrs.get('rel') == 'stylesheet' and attrs.get('href'):
+            self.assets.append(('css', attrs['href'], attrs.get('media', 'all') in ('all', 'screen')))
+        elif tag == 'script' and attrs.get('src'):
+            deferred = 'defer' in attrs or 'async' in attrs or attrs.get('type') == 'module'
+            self.assets.append(('js', attrs['src'], not deferred))
+
+
+def render_page(template_name):
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    return render_to_string(template_name, request=request)
+
+
+def is_external(url):
+    return url.startswith(('http://', 'https://', '//'))
+
+
+def local_path(url):
+    """
+    Caminho no disco de uma URL de ``STATIC_URL``: primeiro em ``STATIC_ROOT``
+    (build de produção), depois pelos finders (desenvolvimento).
+    """
+    static_url = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+    path = url.split('?', 1)[0]
+    if not path.startswith(static_url):
+        return None
+    name = path[len(static_url):]
+    if settings.STATIC_ROOT and staticfiles_storage.exists(name):
+        return staticfiles_storage.path(name)
+    return finders.find(name)
+
+
+def transfer_size(path):
+    """
+    Bytes trafegados: o ``.gz`` pré-comprimido se existir, senão o gzip do original.
+    """
+    try:
+        with open(path + '.gz', 'rb') as compressed:
+            return len(compressed.read())
+    except FileNotFoundError:
+        with open(path, 'rb') as original:
+            return len(gzip.compress(original.read(), compresslevel=9))
+
+
+def estimate_first_paint(html_bytes, blocking_bytes, network):
+    """
+    Modelo simplificado: DNS/TCP/TLS (3 RTTs), o documento e, em paralelo,
+    os recursos bloqueantes (mais 1 RTT) antes do primeiro paint.
+    """
+    rtt = network['rtt_ms']
+    bytes_per_ms = network['kbps'] * 1000 / 8 / 1000
+    elapsed = 3 * rtt + html_bytes / bytes_per_ms
+    if blocking_bytes:
+        elapsed += rtt + blocking_bytes / bytes_per_ms
+    return elapsed
+
+
+def run():
+    report = Report('Assets')
+    budgets = settings.ASSET_BUDGETS
+    network = settings.ASSET_REFERENCE_NETWORK
+    
+    for label, template_name in PAGES:
+        html = render_page(template_name).encode()
+        html_bytes = len(gzip.compress(html))
+        parser = HeadAssetParser()
+        parser.feed(html.decode())
+        
+        sizes = {'css': 0, 'js': 0}
+        blocking_bytes = 0
+        for kind, url, blocking in parser.assets:
+            if is_external(url):
+                # Não há como medir nem versionar recursos de terceiros
+                if blocking:
+                    report.fail(f'{label}: recurso externo bloqueante {url}')
+                else:
+                    report.add(f'{label}: {url}', 'externo (não medido)')
+                continue
+            path = local_path(url)
+            if path is None:
+                report.fail(f'{label}: arquivo não encontrado para {url}')
+                continue
+            size = transfer_size(path)
+            sizes[kind] += size
+            if blocking:
+                blocking_bytes += size
+            report.add(f'{label}: {url}', f'{size / 1024:.1f} KB gzip' + (' (bloqueante)' if blocking else ''))
+        
+        report.check(f'{label}: CSS crítico', sizes['css'] / 1024, budgets['critical_css_kb'], 'KB')
+        report.check(f'{label}: JavaScript', sizes['js'] / 1024, budgets['critical_js_kb'], 'KB')
+        report.check(
+            f'{label}: first paint estimado',
+            estimate_first_paint(html_bytes, blocking_bytes, network),
+            budgets['first_paint_ms'], 'ms'
+        )
+    return report
@@ -0,0 +1,78 @@
+"""
+Renderização dos formulários de usuário e grupo: widgets do tema com o
+``ThemeFormRenderer`` contra os widgets e o renderer padrão do Django.
+
+Os tempos são apenas informados; a suíte falha só se as duas formas não
+produzirem a mesma marcação (ignorando espaços em branco entre as tags).
+"""
+import copy
+import re
+import time
+
+from django.forms.renderers import DjangoTemplates
+
+from accounts.forms import CustomUserChangeForm, GroupForm
+from organizations.forms import OrganizationForm
+from theme.renderers import ThemeFormRenderer
+
+from . import Report
+
+ROUNDS = 200
+
+FORMS = (
+    ('usuário', CustomUserChangeForm),
+    ('grupo', GroupForm),
+    ('organização', OrganizationForm),
+)
+
+
+def django_widget(widget):
+    """
+    Cópia do widget com a classe original do Django (mesmos atributos).
+    """
+    clone = copy.copy(widget)
+    clone.__class__ = next(cls for cls in type(widget).__mro__ if cls.__module__ == 'django.forms.widgets')
+    return clone
+
+
+def normalize(html):
+    return [re.sub(r'\s+', ' ', re.sub(r'>\s+<', '><', fragment)) for fragment in html]
+
+
+def render_fields(form, renderer, widget_for=None):
+    html = []
+    for bound_field in form:
+        widget = bound_field.field.widget
+        if widget_for:
+            widget = widget_for(widget)
+        html.append(bound_field.as_widget(widget=widget))
+    return html
+
+
+def measure(callback):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = callback()
+    return (time.perf_counter() - started) * 1000 / ROUNDS, result
+
+
+def run():
+    report = Report('Formulários')
+    theme_renderer = ThemeFormRenderer()
+    django_renderer = DjangoTemplates()
+    
+    for label, form_class in FORMS:
+        theme_form = form_class(renderer=theme_renderer)
+        django_form = form_class(renderer=django_renderer)
+        # Aquece os caches (querysets das escolhas e templates compilados)
+        render_fields(theme_form, theme_renderer)
+        render_fields(django_form, django_renderer, django_widget)
+        
+        django_ms, django_html = measure(lambda: render_fields(django_form, django_renderer, django_widget))
+        theme_ms, theme_html = measure(lambda: render_fields(theme_form, theme_renderer))
+        
+        report.add(f'{label}: Django', f'{django_ms:.3f} ms')
+        report.add(f'{label}: tema', f'{theme_ms:.3f} ms ({django_ms / theme_ms:.1f}x)')
+        if normalize(theme_html) != normalize(django_html):
+            report.fail(f'{label}: o HTML dos widgets do tema difere do renderer do Django')
+    return report
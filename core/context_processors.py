@@ -0,0 +1,18 @@
+from django.conf import settings
+
+from .rendering import base_template, nav_section
+
+
+def assets(request):
+    """
+    Expõe o modo de assets (development ou production) para os templates.
+    """
+    return {'ASSET_MODE': settings.ASSET_MODE}
+
+
+def layout(request):
+    """
+    Layout estendido pelas páginas: completo ou apenas o conteúdo principal
+    nas navegações HTMX (ver ``core.rendering``), e o item ativo do menu.
+    """
+    return {'base_template': base_template(request), 'nav_section': nav_section(request)}
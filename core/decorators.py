@@ -0,0 +1,42 @@
+from functools import wraps
+
+from . import sharding
+from .middleware import SAFE_METHODS
+from .routers import prefer_replica, reset_read_target
+
+
+def read_from_replica(view_func):
+    """
+    Marca uma view somente leitura para consultar as réplicas de leitura.
+
+    Vale apenas para métodos seguros; clientes que acabaram de escrever
+    continuam no banco principal (ver ``ReplicaStickinessMiddleware``).
+    """
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return view_func(request, *args, **kwargs)
+        token = prefer_replica()
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            reset_read_target(token)
+    return _wrapped_view
+
+
+
+def route_to_shard(resolve):
+    """
+    Executa a view no shard devolvido por ``resolve(request, **kwargs)`` (ver
+    os resolvedores em ``core.sharding``) quando a requisição ainda não tem
+    shard, como nas views de superusuário sobre objetos de qualquer organização.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if not sharding.fans_out():
+                return view_func(request, *args, **kwargs)
+            with sharding.use_shard(resolve(request, **kwargs)):
+                return view_func(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
@@ -0,0 +1,194 @@
+"""
+Fila de tarefas em segundo plano baseada no banco de dados.
+
+As tarefas são funções registradas com ``@task('app.nome')`` em módulos
+``tasks.py`` de cada app (carregados no primeiro uso da fila) e recebem o ``Job`` em
+execução seguido dos argumentos do payload::
+
+    @task('organizations.deactivate_organization')
+    def deactivate_organization(job, organization_id):
+        ...
+        job.set_progress(done, total)
+
+As views enfileiram com ``enqueue('organizations.deactivate_organization',
+{'organization_id': pk}, user=request.user)`` e o worker (``manage.py
+run_jobs``) executa, com novas tentativas e recuo exponencial em caso de erro.
+Tarefas longas devem chamar ``job.set_progress`` (ou ``job.heartbeat``) com
+frequência: jobs sem sinal de vida por ``JOBS_LOCK_TIMEOUT`` são considerados
+abandonados e voltam para a fila.
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_discovered = False
+_discover_lock = threading.Lock()
+
+
+def task(name):
+    """
+    Registra uma função como tarefa executável pelo worker.
+    """
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def _discover():
+    """
+    Importa os ``tasks.py`` dos apps uma única vez, no primeiro uso do registro.
+    """
+    global _discovered
+    if _discovered:
+        return
+    with _discover_lock:
+        if not _discovered:
+            autodiscover_modules('tasks')
+            _discovered = True
+
+
+def get_task(name):
+    _discover()
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f'Tarefa "{name}" não registrada.')
+
+
+def enqueue(name, payload=None, user=None, max_attempts=None, run_after=None):
+    """
+    Coloca uma tarefa na fila e retorna o ``Job`` criado.
+    """
+    get_task(name)  # Falha cedo para nomes inválidos
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        created_by=user if user is not None and user.is_authenticated else None,
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def claim_next(worker):
+    """
+    Reserva o próximo job pendente para o worker informado.
+
+    A reserva é um UPDATE condicional (status ainda pendente), o que evita que
+    dois workers peguem o mesmo job em qualquer banco suportado, sem depender
+    de ``SELECT ... FOR UPDATE SKIP LOCKED``.
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        status=Job.PENDING, run_after__lte=now
+    ).order_by('run_after', 'pk').values_list('pk', flat=True)[:10]
+    
+    for pk in candidates:
+        claimed = Job.objects.filter(pk=pk, status=Job.PENDING).update(
+            status=Job.RUNNING,
+            locked_by=worker[:100],
+            locked_at=now,
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(job):
+    """
+    Executa um job já reservado e registra o resultado, agendando uma nova
+    tentativa com recuo exponencial enquanto houver tentativas disponíveis.
+    """
+    try:
+        result = get_task(job.name)(job, **job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Falha no job %s', job)
+        if job.attempts < job.max_attempts:
+            delay = settings.JOBS_RETRY_BACKOFF * (2 ** (job.attempts - 1))
+            _release(
+                job,
+                status=Job.PENDING,
+                error=error,
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+        else:
+            _release(job, status=Job.FAILED, error=error, finished_at=timezone.now())
+        return False
+    
+    return _release(
+        job,
+        status=Job.SUCCEEDED,
+        result=result,
+        progress=100,
+        error='',
+        finished_at=timezone.now(),
+    )
+
+
+def _release(job, **fields):
+    """
+    Grava o resultado e libera a reserva, desde que o job ainda seja deste
+    worker. Retorna ``False`` se ele foi devolvido à fila (``requeue_stale``)
+    e reservado por outro worker nesse meio tempo.
+    """
+    released = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by).update(
+        locked_by='', locked_at=None, **fields
+    )
+    if not released:
+        logger.warning('Job %s foi reservado por outro worker; resultado descartado', job)
+    return bool(released)
+
+
+def requeue_stale(timeout=None):
+    """
+    Devolve para a fila jobs presos em execução por workers que morreram.
+    A execução interrompida conta como tentativa (``attempts`` é somado na
+    reserva): jobs que já esgotaram as tentativas falham em vez de voltar.
+    """
+    timeout = timeout if timeout is not None else settings.JOBS_LOCK_TIMEOUT
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=timeout))
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED,
+        error='Execução interrompida: o worker parou de responder.',
+        locked_by='',
+        locked_at=None,
+        finished_at=now,
+    )
+    return stale.update(status=Job.PENDING, locked_by='', locked_at=None)
+
+
+def run_pending(worker=None, limit=None):
+    """
+    Executa, na thread atual, os jobs pendentes até esvaziar a fila
+    (ou até ``limit`` jobs). Retorna a quantidade executada.
+    """
+    worker = worker or worker_id()
+    count = 0
+    while limit is None or count < limit:
+        job = claim_next(worker)
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
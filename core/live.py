@@ -0,0 +1,255 @@
+"""
+Eventos ao vivo das listagens e do dashboard (Server-Sent Events).
+
+Os signals de ``User``, ``Company`` e ``Organization`` publicam um ``Event``
+após o commit. O backend configurado em ``LIVE_EVENTS['backend']`` leva o
+evento aos processos web — ``LocalBackend`` apenas ao próprio processo,
+``RedisBackend`` a todos por um canal do Redis — e o ``Broker`` de cada
+processo entrega a cópia para as conexões SSE (``core:live_events``) cujo
+escopo de tenant alcança o evento.
+
+O evento só diz *o que* mudou (tipo, ação e pk); o navegador busca a linha
+alterada nas views ``*_row``, que aplicam as permissões normalmente.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import router, transaction
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+PUBLISHED = metrics.register('live.events', 'Eventos ao vivo publicados')
+OVERFLOWS = metrics.register('live.overflows', 'Conexões SSE que perderam eventos por fila cheia')
+
+CREATED, UPDATED, DELETED = 'created', 'updated', 'deleted'
+
+
+class Event(namedtuple('Event', 'kind action pk organization_ids company_ids')):
+    """
+    Mudança em um objeto: ``kind`` é ``user``, ``company`` ou ``organization``
+    e os ids indicam os tenants afetados (origem e destino, em mudanças de tenant).
+    """
+    __slots__ = ()
+    
+    def to_json(self):
+        return json.dumps(self._asdict())
+    
+    @classmethod
+    def from_json(cls, data):
+        values = json.loads(data)
+        values['organization_ids'] = tuple(values['organization_ids'])
+        values['company_ids'] = tuple(values['company_ids'])
+        return cls(**values)
+
+
+# Enviado quando a fila de uma conexão transborda: o navegador recarrega as listagens
+RESET = Event('reset', 'reset', None, (), ())
+
+
+class Subscription:
+    """
+    Conexão SSE: fila asyncio alimentada por outras threads via ``call_soon_threadsafe``.
+    """
+    
+    def __init__(self, accepts, loop, queue_size):
+        self.accepts = accepts
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+    
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Descarta o atraso acumulado; o RESET faz o cliente recarregar tudo
+            metrics.increment(OVERFLOWS)
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+    
+    async def get(self):
+        return await self.queue.get()
+
+
+class Broker:
+    """
+    Assinantes do processo atual.
+    """
+    
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+    
+    def subscribe(self, accepts, queue_size=None):
+        subscription = Subscription(
+            accepts, asyncio.get_running_loop(), queue_size or settings.LIVE_EVENTS['queue_size']
+        )
+        get_backend().start()
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+    
+    def deliver(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if not subscription.accepts(event):
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # Loop encerrado sem passar pelo unsubscribe
+                self.unsubscribe(subscription)
+
+
+broker = Broker()
+
+
+class LocalBackend:
+    """
+    Entrega os eventos apenas aos assinantes do próprio processo
+    (desenvolvimento ou um único processo ASGI).
+    """
+    
+    def __init__(self, broker):
+        self.broker = broker
+    
+    def start(self):
+        pass
+    
+    def publish(self, event):
+        self.broker.deliver(event)
+
+
+class RedisBackend:
+    """
+    Publica os eventos em um canal do Redis; cada processo assina o canal em
+    uma thread e entrega aos seus assinantes. Requer o pacote ``redis``.
+    """
+    
+    def __init__(self, broker, url='redis://localhost:6379/0', channel='panel:live'):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('O RedisBackend de LIVE_EVENTS requer o pacote "redis".')
+        self.broker = broker
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self._listener = None
+        self._lock = threading.Lock()
+    
+    def start(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='live-events', daemon=True)
+                self._listener.start()
+    
+    def publish(self, event):
+        self.client.publish(self.channel, event.to_json())
+    
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    self.broker.deliver(Event.from_json(message['data']))
+            except Exception:
+                logger.warning('Falha na assinatura do canal de eventos ao vivo; reconectando', exc_info=True)
+                time.sleep(1)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = settings.LIVE_EVENTS
+                _backend = import_string(config['backend'])(broker, **config.get('options', {}))
+    return _backend
+
+
+def _dispatch(event):
+    metrics.increment(PUBLISHED)
+    try:
+        get_backend().publish(event)
+    except Exception:
+        # Um backend fora do ar não pode derrubar a gravação que originou o evento
+        logger.warning('Falha ao publicar o evento ao vivo %s', event, exc_info=True)
+
+
+def _model(kind):
+    from django.contrib.auth import get_user_model
+    from organizations.models import Organization, Company
+    
+    return {'organization': Organization, 'company': Company, 'user': get_user_model()}[kind]
+
+
+def publish(kind, action, pk, organization_ids=(), company_ids=(), using=None):
+    """
+    Publica a mudança depois do commit da transação atual de ``using`` (por
+    padrão, o banco de escrita do modelo no contexto atual, como o shard).
+    """
+    event = Event(
+        kind, action, pk,
+        tuple(sorted({value for value in organization_ids if value is not None})),
+        tuple(sorted({value for value in company_ids if value is not None})),
+    )
+    transaction.on_commit(lambda: _dispatch(event), using=using or router.db_for_write(_model(kind)))
+    return event
+
+
+def event_filter(user):
+    """
+    Predicado que diz se um evento pertence ao escopo de visualização do
+    usuário (o mesmo de ``accounts.permissions.get_scope``).
+    """
+    from django.contrib.auth import get_user_model
+    from accounts.permissions import get_scope
+    from organizations.models import Organization, Company
+    
+    scopes = {
+        'user': get_scope(user, get_user_model()),
+        'company': get_scope(user, Company),
+        'organization': get_scope(user, Organization),
+    }
+    
+    def accepts(event):
+        if event is RESET or event.kind == RESET.kind:
+            return True
+        scope = scopes.get(event.kind)
+        if scope is None or scope.empty:
+            return False
+        if scope.unrestricted:
+            return True
+        if scope.user_id is not None:
+            return event.pk == scope.user_id
+        if scope.company_id is not None:
+            return scope.company_id in event.company_ids
+        return scope.organization_id in event.organization_ids
+    
+    return accepts
+
+
+def format_event(event):
+    """
+    Mensagem SSE com o evento em JSON.
+    """
+    data = json.dumps({'kind': event.kind, 'action': event.action, 'pk': event.pk})
+    return f'data: {data}\n\n'
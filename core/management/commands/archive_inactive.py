@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from core import archive, sharding
+
+
+class Command(BaseCommand):
+    help = (
+        'Move usuários e empresas desativados há mais de ARCHIVE_AFTER_DAYS dias para as tabelas '
+        'de arquivo, em lotes curtos com pausa entre eles (pode rodar em horário comercial).'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help='Dias de inatividade (padrão: ARCHIVE_AFTER_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE,
+                            help='Registros por lote (padrão: ARCHIVE_BATCH_SIZE).')
+        parser.add_argument('--sleep', type=float, default=settings.ARCHIVE_BATCH_PAUSE,
+                            help='Segundos de pausa entre lotes (padrão: ARCHIVE_BATCH_PAUSE).')
+        parser.add_argument('--max-batches', type=int, help='Para depois de N lotes (continua na próxima execução).')
+        parser.add_argument('--dry-run', action='store_true', help='Só mostra quantos registros seriam arquivados.')
+    
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--days e --batch-size devem ser maiores que zero.')
+        before = archive.cutoff(options['days'])
+        
+        if options['dry_run']:
+            for alias in (sharding.aliases() if sharding.is_enabled() else [DEFAULT_DB_ALIAS]):
+                users = archive.archivable_users(before).using(alias).count()
+                # Empresas com usuários a arquivar só entram depois deles, na execução real
+                companies = archive.archivable_companies(before).using(alias).count()
+                self.stdout.write(f'{alias}: {users} usuário(s) e {companies} empresa(s) sem usuários para arquivar.')
+            return
+        
+        started = time.perf_counter()
+        totals = {}
+        for batch in archive.archive_inactive(before, options['batch_size'], options['sleep'], options['max_batches']):
+            totals[batch.model] = totals.get(batch.model, 0) + batch.count
+            self.stdout.write(f'{batch.alias}: {batch.count} {batch.model} arquivado(s) em {batch.seconds * 1000:.0f} ms')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{sum(totals.values())} registro(s) arquivado(s) em {elapsed:.2f}s '
+            f'({", ".join(f"{model}: {count}" for model, count in totals.items()) or "nada a arquivar"}).'
+        ))
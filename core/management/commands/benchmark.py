@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Executa uma suíte de benchmark e falha se algum orçamento for excedido.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=benchmarks.SUITES, help='Suíte a executar.')
+    
+    def handle(self, *args, **options):
+        report = benchmarks.run(options['suite'])
+        self.stdout.write(report.title)
+        for label, value in report.rows:
+            self.stdout.write(f'  {label}: {value}')
+        if not report.ok:
+            raise CommandError(
+                'Orçamento excedido:\n' + '\n'.join(f'  {failure}' for failure in report.failures)
+            )
+        self.stdout.write(self.style.SUCCESS('Todos os orçamentos foram respeitados.'))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+from organizations.models import Company
+from organizations.transfers import MoveError, move_companies
+
+
+class Command(BaseCommand):
+    help = 'Move empresas, com seus usuários, para outra organização (no mesmo shard).'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('organization', type=int, help='Id da organização de destino.')
+        parser.add_argument('companies', nargs='*', type=int, help='Ids das empresas.')
+        parser.add_argument('--from', type=int, dest='source', help='Move todas as empresas desta organização.')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas simula e informa as linhas afetadas.')
+        parser.add_argument(
+            '--adopt-groups', action='store_true',
+            help='Adiciona ao destino os grupos dos usuários que ainda não fazem parte dele.'
+        )
+        parser.add_argument(
+            '--prune-groups', action='store_true',
+            help='Remove os vínculos dos usuários com grupos de fora do destino (por padrão são mantidos).'
+        )
+    
+    def handle(self, *args, **options):
+        if bool(options['companies']) == bool(options['source']):
+            raise CommandError('Informe os ids das empresas ou --from (apenas um).')
+        company_ids = options['companies']
+        if options['source']:
+            with sharding.for_organization(options['source']):
+                company_ids = list(Company.objects.filter(organization_id=options['source']).values_list(
+                    'pk', flat=True
+                ))
+            if not company_ids:
+                raise CommandError(f'A organização {options["source"]} não tem empresas.')
+        try:
+            report = move_companies(
+                company_ids, options['organization'],
+                dry_run=options['dry_run'], adopt_groups=options['adopt_groups'],
+                prune_groups=options['prune_groups'],
+            )
+        except MoveError as exc:
+            raise CommandError(str(exc))
+        
+        for line in report.lines():
+            self.stdout.write(line)
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'{len(report.moved)} empresa(s) movida(s) para "{report.organization.name}".'
+            ))
@@ -0,0 +1,139 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+
+from audit import log as audit
+from audit.models import AuditEvent
+from core import rollups, sharding, stats
+from organizations.models import Organization, Company
+
+User = get_user_model()
+
+
+def _copy(model, objects, using):
+    """
+    Insere os objetos em ``using`` com os mesmos pks, preservando também os
+    campos ``auto_now``/``auto_now_add`` (o ``bulk_create`` os sobrescreveria).
+    """
+    if not objects:
+        return
+    stamps = [
+        field.attname for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    original = [[getattr(obj, name) for name in stamps] for obj in objects]
+    model._base_manager.using(using).bulk_create(objects, batch_size=500)
+    if stamps:
+        for obj, values in zip(objects, original):
+            for name, value in zip(stamps, values):
+                setattr(obj, name, value)
+        model._base_manager.using(using).bulk_update(objects, stamps, batch_size=500)
+
+
+class Command(BaseCommand):
+    help = (
+        'Move uma organização, com empresas, usuários e totais, para outro shard (TENANT_SHARDS). '
+        'Escritas na organização aguardam o fim da cópia.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('organization', type=int, help='Id da organização.')
+        parser.add_argument('shard', help='Alias do banco de destino.')
+    
+    def handle(self, *args, **options):
+        if not sharding.is_enabled():
+            raise CommandError('Shards não configurados (PANEL_TENANT_SHARDS).')
+        organization_id, target = options['organization'], options['shard']
+        if target not in sharding.aliases():
+            raise CommandError(f'Shard desconhecido: "{target}". Opções: {", ".join(sharding.aliases())}.')
+        source = sharding.shard_for_organization(organization_id)
+        if source == target:
+            raise CommandError(f'A organização {organization_id} já está em "{target}".')
+        
+        started = time.perf_counter()
+        # A origem fica congelada da leitura até a remoção: escritas na organização
+        # durante a cópia esperam o commit em vez de irem para linhas já copiadas
+        with sharding.use_shard(source), transaction.atomic(using=source):
+            # Escrita sem efeito: no SQLite, que ignora o select_for_update, bloqueia
+            # o banco para escrita até o commit; no PostgreSQL, a linha da organização
+            if not Organization.objects.filter(pk=organization_id).update(name=F('name')):
+                raise CommandError(f'Organização {organization_id} não encontrada em "{source}".')
+            organization = Organization.objects.prefetch_related(
+                'groups__permissions__content_type'
+            ).get(pk=organization_id)
+            companies = list(Company.objects.for_org(organization_id).select_for_update())
+            users = list(User.objects.for_org(organization_id).select_for_update(of=('self',)).prefetch_related(
+                'groups__permissions__content_type', 'user_permissions__content_type'
+            ))
+            
+            # O AUTOINCREMENT do SQLite continua a partir do maior pk da tabela: pks
+            # acima da faixa do destino levariam as próximas chaves para a faixa de outro shard
+            range_end = (sharding.aliases().index(target) + 1) * settings.TENANT_SHARD_ID_SPAN
+            if connections[target].vendor == 'sqlite' and any(
+                obj.pk >= range_end for obj in [organization, *companies, *users]
+            ):
+                raise CommandError(
+                    f'No SQLite a organização {organization_id} só pode ir para shards com faixa de pks '
+                    f'maior que as das suas chaves; "{target}" tem faixa menor.'
+                )
+            
+            with sharding.use_shard(target), transaction.atomic(using=target):
+                self._copy_tenant(target, organization, companies, users)
+                # Os totais são recalculados no destino a partir dos dados copiados
+                rollups.refresh_organization(organization_id)
+            
+            # Daqui em diante as requisições da organização vão para o destino
+            sharding.assign_organization(organization_id, target)
+            Organization.objects.filter(pk=organization_id).delete()
+        
+        stats.invalidate([organization_id], [company.pk for company in companies])
+        audit.record(None, AuditEvent.UPDATE, organization, {'shard': [source, target]})
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Organização {organization_id} movida de "{source}" para "{target}" '
+            f'({len(companies)} empresa(s), {len(users)} usuário(s)) em {elapsed:.2f}s.'
+        ))
+    
+    def _copy_tenant(self, target, organization, companies, users):
+        # Grupos e permissões são locais a cada banco: associados pelo nome e
+        # pela chave natural; grupos inexistentes no destino são criados
+        permissions = {
+            (permission.content_type.app_label, permission.codename): permission
+            for permission in Permission.objects.using(target).select_related('content_type')
+        }
+        
+        def local_permissions(source_permissions):
+            return [
+                permissions[key] for key in (
+                    (permission.content_type.app_label, permission.codename) for permission in source_permissions
+                ) if key in permissions
+            ]
+        
+        source_groups = {group.name: group for group in organization.groups.all()}
+        source_groups.update({group.name: group for user in users for group in user.groups.all()})
+        groups = {group.name: group for group in Group.objects.using(target).filter(name__in=source_groups)}
+        for name, source_group in source_groups.items():
+            if name not in groups:
+                groups[name] = Group.objects.using(target).create(name=name)
+                groups[name].permissions.set(local_permissions(source_group.permissions.all()))
+        
+        _copy(Organization, [organization], target)
+        _copy(Company, companies, target)
+        _copy(User, users, target)
+        Organization.groups.through.objects.using(target).bulk_create([
+            Organization.groups.through(organization_id=organization.pk, group_id=groups[group.name].pk)
+            for group in organization.groups.all()
+        ], batch_size=500)
+        User.groups.through.objects.using(target).bulk_create([
+            User.groups.through(user_id=user.pk, group_id=groups[group.name].pk)
+            for user in users for group in user.groups.all()
+        ], batch_size=500)
+        User.user_permissions.through.objects.using(target).bulk_create([
+            User.user_permissions.through(user_id=user.pk, permission_id=permission.pk)
+            for user in users for permission in local_permissions(user.user_permissions.all())
+        ], batch_size=500)
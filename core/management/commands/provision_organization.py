@@ -0,0 +1,43 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+from organizations.models import Organization
+from organizations.provisioning import SpecError, load_spec, provision, spec_from_organization
+
+
+class Command(BaseCommand):
+    help = 'Provisiona uma organização a partir de uma especificação (JSON/YAML) ou de outra organização.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('spec', nargs='?', help='Arquivo da especificação ("-" lê da entrada padrão).')
+        parser.add_argument('--from', type=int, dest='template', help='Id da organização usada como modelo.')
+        parser.add_argument('--name', help='Nome da nova organização (com --from).')
+    
+    def handle(self, *args, **options):
+        if bool(options['spec']) == bool(options['template']):
+            raise CommandError('Informe um arquivo de especificação ou --from (apenas um).')
+        try:
+            if options['template']:
+                if not options['name']:
+                    raise CommandError('--from exige --name.')
+                with sharding.for_organization(options['template']):
+                    template = Organization.objects.filter(pk=options['template']).first()
+                    if template is None:
+                        raise CommandError(f'Organização {options["template"]} não encontrada.')
+                    spec = spec_from_organization(template, options['name'])
+            elif options['spec'] == '-':
+                spec = load_spec(sys.stdin.read())
+            else:
+                with open(options['spec'], encoding='utf-8') as spec_file:
+                    spec = load_spec(spec_file.read())
+            report = provision(spec)
+        except (OSError, SpecError) as exc:
+            raise CommandError(str(exc))
+        
+        for line in report.lines():
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(
+            f'Organização "{report.organization.name}" (id {report.organization.pk}) provisionada.'
+        ))
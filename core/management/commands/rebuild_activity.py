@@ -0,0 +1,15 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.activity import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os baldes pré-agregados das séries de atividade do dashboard.'
+    
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'{count} balde(s) reconstruído(s) em {elapsed:.2f}s.'))
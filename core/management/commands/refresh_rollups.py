@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.rollups import refresh_all, refresh_organization
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os totais materializados por organização usados nos relatórios.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organization', type=int, action='append', dest='organizations',
+            help='Recalcula apenas a organização informada (pode ser repetido).'
+        )
+    
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['organizations']:
+            for organization_id in options['organizations']:
+                refresh_organization(organization_id)
+            count = len(options['organizations'])
+        else:
+            count = refresh_all()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Totais de {count} organização(ões) atualizados em {elapsed:.2f}s.'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import archive
+
+
+class Command(BaseCommand):
+    help = 'Devolve um usuário ou uma empresa (com seus usuários) do arquivo às tabelas principais.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['user', 'company'], help='Tipo do registro arquivado.')
+        parser.add_argument('pk', type=int, help='Id do registro (o mesmo de antes do arquivamento).')
+        parser.add_argument('--without-users', action='store_true',
+                            help='Com "company", não restaura os usuários arquivados da empresa.')
+    
+    def handle(self, *args, **options):
+        try:
+            if options['kind'] == 'user':
+                user = archive.restore_user(options['pk'])
+                message = f'Usuário "{user.username}" restaurado (inativo).'
+            else:
+                company = archive.restore_company(options['pk'], with_users=not options['without_users'])
+                message = f'Empresa "{company.name}" restaurada (inativa).'
+        except archive.ArchiveError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(message))
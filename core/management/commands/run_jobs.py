@@ -0,0 +1,63 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.jobs import requeue_stale, run_pending, worker_id
+
+
+class Command(BaseCommand):
+    help = 'Executa os jobs em segundo plano enfileirados no banco de dados.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.JOBS_CONCURRENCY,
+            help='Quantidade de threads executando jobs em paralelo.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=settings.JOBS_POLL_INTERVAL,
+            help='Intervalo (em segundos) entre consultas à fila quando ela está vazia.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Processa os jobs pendentes e encerra quando a fila esvaziar.'
+        )
+    
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        self.poll_interval = options['poll_interval']
+        self.once = options['once']
+        self.stopping = False
+        
+        self.stdout.write(f'Worker iniciado com {concurrency} thread(s).')
+        requeue_stale()
+        
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='jobs') as executor:
+            futures = [executor.submit(self._loop) for _ in range(concurrency)]
+            try:
+                processed = sum(future.result() for future in futures)
+            except KeyboardInterrupt:
+                self.stopping = True
+                processed = sum(future.result() for future in futures)
+        
+        self.stdout.write(self.style.SUCCESS(f'{processed} job(s) processado(s).'))
+    
+    def _loop(self):
+        worker = worker_id()
+        processed = 0
+        try:
+            while not self.stopping:
+                close_old_connections()
+                count = run_pending(worker, limit=1)
+                processed += count
+                if count:
+                    continue
+                if self.once:
+                    break
+                time.sleep(self.poll_interval)
+                requeue_stale()
+        finally:
+            close_old_connections()
+        return processed
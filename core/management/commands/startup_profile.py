@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import startup
+
+
+class Command(BaseCommand):
+    help = 'Mede o tempo de importação na inicialização de um worker, agrupado por app.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile', choices=('full', 'serve'),
+            help='Perfil de apps a medir (padrão: o de PANEL_APP_PROFILE).'
+        )
+        parser.add_argument(
+            '--top', type=int, default=15,
+            help='Quantidade de apps e de módulos listados.'
+        )
+    
+    def handle(self, *args, **options):
+        try:
+            seconds, installed_apps, entries = startup.profile(options['profile'])
+        except RuntimeError as exc:
+            raise CommandError(f'Falha ao iniciar o Django: {exc}')
+        
+        top = options['top']
+        self.stdout.write(f'Inicialização: {seconds * 1000:.0f} ms, {len(entries)} módulos importados')
+        self.stdout.write('Por app (tempo próprio dos módulos):')
+        for app, micros in startup.group_by_app(entries, installed_apps)[:top]:
+            self.stdout.write(f'  {app}: {micros / 1000:.1f} ms')
+        self.stdout.write('Módulos mais lentos (tempo acumulado):')
+        for entry in sorted(entries, key=lambda entry: entry.cumulative_us, reverse=True)[:top]:
+            self.stdout.write(f'  {entry.module}: {entry.cumulative_us / 1000:.1f} ms')
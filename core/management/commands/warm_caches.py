@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import warmup
+
+
+class Command(BaseCommand):
+    help = 'Aquece os caches (templates, catálogo de permissões, dashboard e listagens) após o deploy.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.WARM_CACHES_WORKERS,
+            help='Threads usadas para aquecer os dados das organizações em paralelo.'
+        )
+        parser.add_argument(
+            '--skip', action='append', choices=warmup.STEPS, default=[],
+            help='Etapa a pular (pode ser repetido).'
+        )
+    
+    def handle(self, *args, **options):
+        steps = [step for step in warmup.STEPS if step not in options['skip']]
+        results = warmup.warm(steps, workers=options['workers'])
+        
+        errors = []
+        for result in results:
+            self.stdout.write(f'{result.name}: {result.items} item(ns) em {result.seconds * 1000:.0f} ms')
+            errors.extend(f'{result.name}: {error}' for error in result.errors)
+        self.stdout.write(f'Total: {sum(result.seconds for result in results) * 1000:.0f} ms')
+        
+        if errors:
+            raise CommandError('Falhas no aquecimento:\n' + '\n'.join(f'  {error}' for error in errors))
+        self.stdout.write(self.style.SUCCESS('Caches aquecidos.'))
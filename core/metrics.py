@@ -0,0 +1,45 @@
+"""
+Contadores operacionais compartilhados entre os processos.
+
+Os valores ficam no cache padrão (``cache.incr``), então somam as
+requisições de todos os workers quando o cache é compartilhado (Redis,
+Memcached). Cada módulo registra os nomes que publica com ``register`` e
+``snapshot`` devolve todos eles, como faz a view ``core:metrics``.
+"""
+import logging
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'metrics:'
+
+_registry = {}
+
+
+def register(name, description=''):
+    _registry[name] = description
+    return name
+
+
+def increment(name, delta=1):
+    key = KEY_PREFIX + name
+    try:
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # Primeira ocorrência: add evita sobrescrever o valor de outro worker
+            if not cache.add(key, delta, timeout=None):
+                cache.incr(key, delta)
+    except Exception:
+        # Métricas nunca devem derrubar a requisição
+        logger.warning('Falha ao incrementar a métrica %s', name, exc_info=True)
+
+
+def snapshot():
+    values = cache.get_many([KEY_PREFIX + name for name in _registry])
+    return {name: values.get(KEY_PREFIX + name, 0) for name in sorted(_registry)}
+
+
+def descriptions():
+    return dict(sorted(_registry.items()))
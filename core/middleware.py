@@ -0,0 +1,77 @@
+import time
+
+from django.conf import settings
+
+from . import sharding
+from .routers import pin_primary, reset_read_target
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Garante "read-your-writes" quando há réplicas de leitura.
+
+    Requisições que escrevem (POST, PUT, PATCH, DELETE) usam apenas o banco
+    principal e marcam o cliente com um cookie; enquanto o cookie for válido,
+    as leituras seguintes desse cliente também vão para o principal, mesmo nas
+    views marcadas com ``read_from_replica``, evitando que ele veja dados
+    desatualizados pelo atraso de replicação.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'DATABASE_REPLICAS', []):
+            return self.get_response(request)
+
+        cookie_name = settings.REPLICA_STICKY_COOKIE
+        writes = request.method not in SAFE_METHODS
+        sticky = self._cookie_is_valid(request.COOKIES.get(cookie_name))
+
+        token = pin_primary() if writes or sticky else None
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_read_target(token)
+
+        if writes:
+            response.set_cookie(
+                cookie_name,
+                str(int(time.time()) + settings.REPLICA_STICKY_SECONDS),
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    @staticmethod
+    def _cookie_is_valid(value):
+        try:
+            return int(value) >= time.time()
+        except (TypeError, ValueError):
+            return False
+
+
+
+class TenantShardMiddleware:
+    """
+    Prende a requisição ao shard da organização do usuário logado (guardada
+    na sessão no login), antes de o ``AuthenticationMiddleware`` carregar o
+    usuário. Superusuários e anônimos ficam sem shard: as listagens consultam
+    todos os bancos e as views de objetos usam ``route_to_shard``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not sharding.is_enabled():
+            return self.get_response(request)
+
+        organization_id = request.session.get(sharding.SESSION_KEY)
+        alias = sharding.shard_for_organization(organization_id) if organization_id else None
+        # Sempre define (e restaura) o valor: nada vaza entre requisições da mesma thread
+        with sharding.use_shard(alias):
+            return self.get_response(request)
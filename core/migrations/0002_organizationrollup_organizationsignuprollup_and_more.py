@@ -0,0 +1,66 @@
+# Generated by Django 4.2.16 on 2026-10-19 14:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrganizationRollup',
+            fields=[
+                ('organization', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rollup', serialize=False, to='organizations.organization', verbose_name='organization')),
+                ('active_companies', models.IntegerField(default=0, verbose_name='active companies')),
+                ('inactive_companies', models.IntegerField(default=0, verbose_name='inactive companies')),
+                ('active_users', models.IntegerField(default=0, verbose_name='active users')),
+                ('inactive_users', models.IntegerField(default=0, verbose_name='inactive users')),
+                ('refreshed_at', models.DateTimeField(auto_now=True, verbose_name='refreshed at')),
+            ],
+            options={
+                'verbose_name': 'organization rollup',
+                'verbose_name_plural': 'organization rollups',
+            },
+        ),
+        migrations.CreateModel(
+            name='OrganizationSignupRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField(verbose_name='week')),
+                ('signups', models.IntegerField(default=0, verbose_name='signups')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='signup_rollups', to='organizations.organization', verbose_name='organization')),
+            ],
+            options={
+                'verbose_name': 'organization signup rollup',
+                'verbose_name_plural': 'organization signup rollups',
+                'ordering': ['-week'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrganizationGroupRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('users', models.IntegerField(default=0, verbose_name='users')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='auth.group', verbose_name='group')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_rollups', to='organizations.organization', verbose_name='organization')),
+            ],
+            options={
+                'verbose_name': 'organization group rollup',
+                'verbose_name_plural': 'organization group rollups',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='organizationsignuprollup',
+            constraint=models.UniqueConstraint(fields=('organization', 'week'), name='core_org_signup_rollup_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='organizationgrouprollup',
+            constraint=models.UniqueConstraint(fields=('organization', 'group'), name='core_org_group_rollup_uniq'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.16 on 2026-10-19 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_organizationrollup_organizationsignuprollup_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('users_joined', 'users joined'), ('companies_created', 'companies created'), ('logins', 'logins')], max_length=20, verbose_name='metric')),
+                ('period', models.CharField(choices=[('day', 'day'), ('week', 'week'), ('month', 'month')], max_length=5, verbose_name='period')),
+                ('scope', models.PositiveBigIntegerField(default=0, verbose_name='scope')),
+                ('start', models.DateField(verbose_name='start')),
+                ('count', models.IntegerField(default=0, verbose_name='count')),
+            ],
+            options={
+                'verbose_name': 'activity bucket',
+                'verbose_name_plural': 'activity buckets',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='activitybucket',
+            constraint=models.UniqueConstraint(fields=('metric', 'period', 'scope', 'start'), name='core_activity_bucket_uniq'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0003_activitybucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardAssignment',
+            fields=[
+                ('organization_id', models.PositiveBigIntegerField(primary_key=True, serialize=False, verbose_name='organization')),
+                ('alias', models.CharField(max_length=100, verbose_name='database alias')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'shard assignment',
+                'verbose_name_plural': 'shard assignments',
+            },
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='created_by',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='jobs', to=settings.AUTH_USER_MODEL, verbose_name='created by'),
+        ),
+    ]
@@ -1,3 +1,230 @@
+from datetime import timedelta
+
 from django.db import models
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class Job(models.Model):
+    """
+    Tarefa em segundo plano executada pelo worker (``manage.py run_jobs``).
+    A própria tabela funciona como fila, sem depender de brokers externos.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, _('pending')),
+        (RUNNING, _('running')),
+        (SUCCEEDED, _('succeeded')),
+        (FAILED, _('failed')),
+    ]
+    
+    name = models.CharField(_('name'), max_length=100)
+    payload = models.JSONField(_('payload'), default=dict, blank=True)
+    status = models.CharField(_('status'), max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    progress = models.PositiveSmallIntegerField(_('progress'), default=0)
+    progress_message = models.CharField(_('progress message'), max_length=255, blank=True)
+    result = models.JSONField(_('result'), null=True, blank=True)
+    error = models.TextField(_('error'), blank=True)
+    attempts = models.PositiveSmallIntegerField(_('attempts'), default=0)
+    max_attempts = models.PositiveSmallIntegerField(_('max attempts'), default=3)
+    run_after = models.DateTimeField(_('run after'), default=timezone.now)
+    locked_by = models.CharField(_('locked by'), max_length=100, blank=True)
+    locked_at = models.DateTimeField(_('locked at'), null=True, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        related_name='jobs',
+        verbose_name=_('created by'),
+        null=True,
+        blank=True,
+        # Referência solta, como em AuditEvent: com shards (core.sharding) o
+        # usuário pode estar em outro banco ou ser movido para outro shard
+        db_constraint=False
+    )
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    started_at = models.DateTimeField(_('started at'), null=True, blank=True)
+    finished_at = models.DateTimeField(_('finished at'), null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('job')
+        verbose_name_plural = _('jobs')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='core_job_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+    
+    def _heartbeat_due(self, now):
+        # A reserva é renovada a cada décimo de JOBS_LOCK_TIMEOUT
+        interval = timedelta(seconds=settings.JOBS_LOCK_TIMEOUT / 10)
+        return bool(self.locked_by) and (self.locked_at is None or now - self.locked_at >= interval)
+    
+    def heartbeat(self):
+        """
+        Renova a reserva do job em execução, para que ``requeue_stale`` não o
+        devolva à fila enquanto o worker ainda trabalha nele.
+        """
+        now = timezone.now()
+        if self._heartbeat_due(now):
+            self.locked_at = now
+            Job.objects.filter(pk=self.pk, locked_by=self.locked_by).update(locked_at=now)
+    
+    def set_progress(self, done, total, message=''):
+        """
+        Atualiza o progresso (0-100) sem tocar nas demais colunas e renova a
+        reserva (``heartbeat``). Só grava quando o percentual ou a mensagem
+        mudam.
+        """
+        percent = min(100, int(done * 100 / total)) if total else 100
+        if percent != self.progress or message != self.progress_message:
+            self.progress = percent
+            self.progress_message = message[:255]
+            Job.objects.filter(pk=self.pk).update(progress=percent, progress_message=self.progress_message)
+        self.heartbeat()
+
+
+class OrganizationRollup(models.Model):
+    """
+    Totais materializados por organização, usados pelos relatórios.
+    Atualizados incrementalmente por sinais (ver ``core.rollups``) e
+    reconstruídos por ``manage.py refresh_rollups``.
+    """
+    organization = models.OneToOneField(
+        'organizations.Organization',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rollup',
+        verbose_name=_('organization')
+    )
+    active_companies = models.IntegerField(_('active companies'), default=0)
+    inactive_companies = models.IntegerField(_('inactive companies'), default=0)
+    active_users = models.IntegerField(_('active users'), default=0)
+    inactive_users = models.IntegerField(_('inactive users'), default=0)
+    refreshed_at = models.DateTimeField(_('refreshed at'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('organization rollup')
+        verbose_name_plural = _('organization rollups')
+    
+    def __str__(self):
+        return f"Rollup {self.organization_id}"
+
+
+class OrganizationGroupRollup(models.Model):
+    """
+    Quantidade de usuários de uma organização em cada grupo.
+    """
+    organization = models.ForeignKey(
+        'organizations.Organization',
+        on_delete=models.CASCADE,
+        related_name='group_rollups',
+        verbose_name=_('organization')
+    )
+    group = models.ForeignKey(
+        'auth.Group',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('group')
+    )
+    users = models.IntegerField(_('users'), default=0)
+    
+    class Meta:
+        verbose_name = _('organization group rollup')
+        verbose_name_plural = _('organization group rollups')
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'group'], name='core_org_group_rollup_uniq'),
+        ]
+
+
+class OrganizationSignupRollup(models.Model):
+    """
+    Cadastros de usuários por semana (segunda-feira de início) em uma organização.
+    """
+    organization = models.ForeignKey(
+        'organizations.Organization',
+        on_delete=models.CASCADE,
+        related_name='signup_rollups',
+        verbose_name=_('organization')
+    )
+    week = models.DateField(_('week'))
+    signups = models.IntegerField(_('signups'), default=0)
+    
+    class Meta:
+        verbose_name = _('organization signup rollup')
+        verbose_name_plural = _('organization signup rollups')
+        ordering = ['-week']
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'week'], name='core_org_signup_rollup_uniq'),
+        ]
+
+
+class ActivityBucket(models.Model):
+    """
+    Contagem pré-agregada de uma métrica de atividade em um intervalo
+    (dia, semana ou mês) para todo o sistema (``scope=0``) ou para uma
+    organização (``scope`` = id da organização). Alimenta os gráficos do dashboard.
+    """
+    USERS_JOINED = 'users_joined'
+    COMPANIES_CREATED = 'companies_created'
+    LOGINS = 'logins'
+    METRIC_CHOICES = [
+        (USERS_JOINED, _('users joined')),
+        (COMPANIES_CREATED, _('companies created')),
+        (LOGINS, _('logins')),
+    ]
+    
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+    PERIOD_CHOICES = [
+        (DAY, _('day')),
+        (WEEK, _('week')),
+        (MONTH, _('month')),
+    ]
+    
+    GLOBAL_SCOPE = 0
+    
+    metric = models.CharField(_('metric'), max_length=20, choices=METRIC_CHOICES)
+    period = models.CharField(_('period'), max_length=5, choices=PERIOD_CHOICES)
+    scope = models.PositiveBigIntegerField(_('scope'), default=GLOBAL_SCOPE)
+    start = models.DateField(_('start'))
+    count = models.IntegerField(_('count'), default=0)
+    
+    class Meta:
+        verbose_name = _('activity bucket')
+        verbose_name_plural = _('activity buckets')
+        constraints = [
+            # Também serve de índice para a leitura por intervalo de datas
+            models.UniqueConstraint(fields=['metric', 'period', 'scope', 'start'], name='core_activity_bucket_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.metric}/{self.period}/{self.scope}/{self.start}: {self.count}"
+
+
 
-# Create your models here.
\ No newline at end of file
+class ShardAssignment(models.Model):
+    """
+    Diretório das organizações movidas de shard (``manage.py move_organization``).
+    As demais ficam no shard indicado pela faixa do próprio pk (ver ``core.sharding``).
+    """
+    organization_id = models.PositiveBigIntegerField(_('organization'), primary_key=True)
+    alias = models.CharField(_('database alias'), max_length=100)
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('shard assignment')
+        verbose_name_plural = _('shard assignments')
+    
+    def __str__(self):
+        return f"{self.organization_id} -> {self.alias}"
@@ -0,0 +1,93 @@
+"""
+Paginação por chave (keyset) para listas longas.
+
+Com ``OFFSET`` o banco percorre e descarta todas as linhas anteriores à
+página. Aqui cada página é ``WHERE (nome, pk) > (último nome, último pk)
+ORDER BY nome, pk LIMIT n + 1``: usa o índice da ordenação e custa o mesmo na
+primeira ou na centésima página, e a linha extra indica se existe próxima
+página sem ``COUNT(*)``.
+
+O cursor é opaco para o cliente: os valores da última linha em JSON,
+codificados em base64 para ir na URL (``?after=<cursor>``).
+"""
+import base64
+import binascii
+import json
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+Page = namedtuple('Page', 'items next_cursor')
+
+
+class InvalidCursor(ValueError):
+    """
+    Cursor que não foi gerado por ``encode_cursor`` para a mesma ordenação.
+    """
+
+
+def _field(model, name):
+    return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+
+def encode_cursor(values):
+    data = json.dumps(list(values), cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields, model):
+    """
+    Valores do cursor convertidos pelos campos de ``model`` (um pk que não é
+    número, por exemplo, é um cursor inválido e não um erro na consulta).
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(data)
+    except (binascii.Error, ValueError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor(cursor)
+    try:
+        values = [_field(model, field).to_python(value) for field, value in zip(fields, values)]
+    except (TypeError, ValueError, ValidationError):
+        raise InvalidCursor(cursor)
+    if None in values:
+        raise InvalidCursor(cursor)
+    return values
+
+
+def after(fields, values):
+    """
+    Linhas posteriores a ``values`` na ordenação crescente por ``fields``:
+    ``(a > x) OR (a = x AND b > y) OR ...``.
+    """
+    condition = Q(pk__in=[])
+    for index, field in enumerate(fields):
+        equal = dict(zip(fields[:index], values))
+        condition |= Q(**equal, **{f'{field}__gt': values[index]})
+    return condition
+
+
+def keyset_page(queryset, fields, cursor=None, size=50, across_shards=False):
+    """
+    Uma página de ``queryset`` ordenado por ``fields`` (crescente; o último
+    deve ser único, normalmente ``pk``) a partir de ``cursor``.
+
+    Com ``across_shards`` a consulta vai a todos os bancos quando o usuário
+    não está preso a um shard (ver ``core.sharding``). Levanta
+    ``InvalidCursor`` para cursores malformados.
+    """
+    fields = tuple(fields)
+    if cursor:
+        queryset = queryset.filter(after(fields, decode_cursor(cursor, fields, queryset.model)))
+    queryset = queryset.order_by(*fields)
+    if across_shards:
+        queryset = queryset.across_shards()
+    rows = list(queryset[:size + 1])
+    items = rows[:size]
+    next_cursor = None
+    if len(rows) > size:
+        next_cursor = encode_cursor(getattr(items[-1], field) for field in fields)
+    return Page(items, next_cursor)
@@ -0,0 +1,169 @@
+"""
+Projeções de colunas das listagens.
+
+Uma ``Projection`` declara as colunas de uma tabela uma única vez. A mesma
+declaração define o que a página HTML carrega (``apply``: ``only()``,
+``select_related`` e ``prefetch_related`` apenas das colunas exibidas) e o
+que a exportação CSV lê (``rows``: ``values_list`` em lotes, sem instanciar
+modelos).
+"""
+import csv
+
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Column:
+    """
+    Coluna de uma listagem.
+
+    ``field`` é o caminho no ORM (padrão: ``name``); ``expression`` transforma a
+    coluna em anotação (ex.: um trecho da descrição); ``many`` indica uma relação
+    com vários valores (ex.: ``groups__name``); ``annotated`` indica um valor
+    anotado pelo próprio queryset (ex.: ``with_company_counts``). ``listing`` e
+    ``export`` dizem onde a coluna aparece.
+    """
+    
+    def __init__(self, name, label, field=None, expression=None, many=False, annotated=False,
+                 listing=True, export=True):
+        self.name = name
+        self.label = label
+        self.field = field or name
+        self.expression = expression
+        self.many = many
+        self.annotated = annotated
+        self.listing = listing
+        self.export = export
+    
+    @property
+    def relation(self):
+        return self.field.rsplit('__', 1)[0] if '__' in self.field else None
+
+
+class Projection:
+    
+    def __init__(self, *columns):
+        self.columns = columns
+    
+    def _annotations(self, columns):
+        return {column.name: column.expression for column in columns if column.expression is not None}
+    
+    def apply(self, queryset):
+        """
+        Carrega apenas as colunas exibidas na listagem HTML.
+        """
+        columns = [column for column in self.columns if column.listing]
+        annotations = self._annotations(columns)
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        
+        fields = ['pk']
+        related = set()
+        for column in columns:
+            if column.expression is not None or column.annotated:
+                continue
+            if column.many:
+                relation, attribute = column.field.rsplit('__', 1)
+                related_model = queryset.model._meta.get_field(relation).related_model
+                queryset = queryset.prefetch_related(
+                    Prefetch(relation, queryset=related_model._default_manager.only('pk', attribute))
+                )
+                continue
+            fields.append(column.field)
+            if column.relation:
+                related.add(column.relation)
+        if related:
+            # only() precisa das próprias chaves estrangeiras percorridas
+            fields.extend(sorted(related))
+            queryset = queryset.select_related(*sorted(related))
+        return queryset.only(*fields)
+    
+    @property
+    def headers(self):
+        return [column.label for column in self.columns if column.export]
+    
+    def rows(self, queryset, chunk_size=EXPORT_CHUNK_SIZE):
+        """
+        Linhas da exportação, em lotes, sem instanciar modelos. Colunas com
+        vários valores são resolvidas com uma consulta por lote e unidas por ``, ``.
+        """
+        columns = [column for column in self.columns if column.export]
+        single = [column for column in columns if not column.many]
+        many = [column for column in columns if column.many]
+        annotations = self._annotations(single)
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        values = queryset.values_list('pk', *[
+            column.name if column.expression is not None or column.annotated else column.field
+            for column in single
+        ])
+        
+        chunk = []
+        for row in values.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield from self._chunk_rows(queryset, chunk, columns, many)
+                chunk = []
+        if chunk:
+            yield from self._chunk_rows(queryset, chunk, columns, many)
+    
+    def _chunk_rows(self, queryset, chunk, columns, many):
+        pks = [row[0] for row in chunk]
+        many_values = {}
+        for column in many:
+            values = {}
+            manager = queryset.model._default_manager.db_manager(queryset.db)
+            pairs = manager.filter(pk__in=pks, **{f'{column.field}__isnull': False}).values_list(
+                'pk', column.field
+            ).order_by(column.field)
+            for pk, value in pairs:
+                values.setdefault(pk, []).append(str(value))
+            many_values[column.name] = values
+        
+        for row in chunk:
+            single_values = iter(row[1:])
+            yield [
+                ', '.join(many_values[column.name].get(row[0], [])) if column.many else next(single_values)
+                for column in columns
+            ]
+
+
+def export_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'Sim' if value else 'Não'
+    return value
+
+
+class _Echo:
+    """
+    Pseudo-arquivo para o ``csv.writer`` devolver cada linha em vez de gravá-la.
+    """
+    
+    def write(self, value):
+        return value
+
+
+def csv_response(filename, projection, queryset):
+    """
+    Exportação CSV em streaming (não monta o arquivo inteiro em memória).
+    Com um ``MergedQuerySet`` (``across_shards()``) as linhas saem shard a shard.
+    """
+    writer = csv.writer(_Echo())
+    # O corpo é gerado depois que a view retorna: o banco (réplica ou shard) é
+    # escolhido agora, enquanto o contexto da view ainda vale
+    querysets = getattr(queryset, 'querysets', None) or [queryset.using(queryset.db)]
+    
+    def lines():
+        yield '\ufeff'  # BOM para o Excel reconhecer UTF-8
+        yield writer.writerow(projection.headers)
+        for part in querysets:
+            for row in projection.rows(part):
+                yield writer.writerow([export_value(value) for value in row])
+    
+    response = StreamingHttpResponse(lines(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
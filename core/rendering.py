@@ -0,0 +1,75 @@
+"""
+Renderização compartilhada pelas views para a navegação com HTMX.
+
+Há três formas de resposta para o mesmo template de página:
+
+* página completa, com ``base/base.html`` (acesso direto, F5 ou restauração
+  do histórico do HTMX);
+* troca de conteúdo (link com ``hx-boost`` ou requisição para ``#main-content``):
+  apenas os blocos da página via ``base/partial.html``, mais atualizações
+  out-of-band das mensagens e do marcador da seção ativa do menu
+  (``nav_section``), sem renderizar o layout nem o menu de novo;
+* fragmento (busca e paginação com ``hx-get`` para um contêiner da própria
+  página): apenas o ``partial_template`` informado pela view.
+"""
+from django.shortcuts import render as django_render
+from django.utils.cache import patch_vary_headers
+
+MAIN_TARGET = 'main-content'
+
+FULL_LAYOUT = 'base/base.html'
+PARTIAL_LAYOUT = 'base/partial.html'
+
+# Trecho do caminho -> item do menu lateral
+NAV_PREFIXES = (
+    ('organizations', 'organizations'),
+    ('accounts/users', 'users'),
+    ('accounts/groups', 'groups'),
+    ('/audit/', 'audit'),
+)
+
+# A resposta muda conforme esses cabeçalhos; caches intermediários precisam saber
+HTMX_VARY_HEADERS = ('HX-Request', 'HX-Boosted', 'HX-Target')
+
+
+def is_content_swap(request):
+    """
+    Indica se o layout já está na página e só o conteúdo principal será trocado.
+    """
+    htmx = getattr(request, 'htmx', None)
+    if not htmx or htmx.history_restore_request:
+        return False
+    return htmx.boosted or htmx.target == MAIN_TARGET
+
+
+def base_template(request):
+    return PARTIAL_LAYOUT if is_content_swap(request) else FULL_LAYOUT
+
+
+def nav_section(request):
+    """
+    Item do menu lateral que corresponde à página (``data-nav`` em ``base/partials/nav.html``).
+    """
+    match = request.resolver_match
+    url_name = match.url_name if match else None
+    if url_name in ('dashboard', 'organization_report'):
+        return url_name
+    for prefix, section in NAV_PREFIXES:
+        if prefix in request.path:
+            return section
+    return ''
+
+
+def render(request, template_name, context=None, partial_template=None, **kwargs):
+    """
+    Substitui ``django.shortcuts.render`` nas views de página.
+
+    ``partial_template`` é usado nas requisições HTMX que atualizam apenas
+    um trecho da página (sem boost e fora de ``#main-content``).
+    """
+    htmx = getattr(request, 'htmx', None)
+    if partial_template and htmx and not htmx.history_restore_request and not is_content_swap(request):
+        template_name = partial_template
+    response = django_render(request, template_name, context, **kwargs)
+    patch_vary_headers(response, HTMX_VARY_HEADERS)
+    return response
@@ -0,0 +1,218 @@
+"""
+Manutenção das tabelas de totais por organização (``OrganizationRollup``,
+``OrganizationGroupRollup`` e ``OrganizationSignupRollup``).
+
+Os sinais aplicam apenas deltas (+1/-1 com ``F()``) nas linhas afetadas;
+mudanças estruturais raras (troca de organização, exclusões, alterações em
+massa com ``update()``) recalculam a organização inteira após o commit.
+``refresh_all`` reconstrói tudo com poucas consultas agregadas (por shard,
+ver ``core.sharding``).
+"""
+import datetime
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, DateField, F, Q
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from organizations.models import Organization, Company
+from . import sharding
+from .models import OrganizationRollup, OrganizationGroupRollup, OrganizationSignupRollup
+
+_pending = threading.local()
+
+
+def week_start(value):
+    """
+    Retorna a segunda-feira da semana (no fuso atual) de uma data ou data/hora.
+    """
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value - datetime.timedelta(days=value.weekday())
+
+
+def _user_counts(users):
+    return users.aggregate(
+        active=Count('pk', filter=Q(is_active=True)),
+        inactive=Count('pk', filter=Q(is_active=False)),
+    )
+
+
+def refresh_organization(organization_id):
+    """
+    Recalcula todos os totais de uma organização.
+    """
+    with sharding.for_organization(organization_id):
+        _refresh_organization(organization_id)
+
+
+def _refresh_organization(organization_id):
+    User = get_user_model()
+    companies = Company.objects.filter(organization_id=organization_id).aggregate(
+        active=Count('pk', filter=Q(is_active=True)),
+        inactive=Count('pk', filter=Q(is_active=False)),
+    )
+    users = User.objects.filter(company__organization_id=organization_id)
+    user_counts = _user_counts(users)
+    groups = User.groups.through.objects.filter(
+        user__company__organization_id=organization_id
+    ).values('group_id').annotate(total=Count('user_id'))
+    signups = users.annotate(
+        week=TruncWeek('date_joined', output_field=DateField())
+    ).values('week').annotate(total=Count('pk')).order_by()
+    
+    with transaction.atomic(using=router.db_for_write(OrganizationRollup)):
+        OrganizationRollup.objects.update_or_create(
+            organization_id=organization_id,
+            defaults={
+                'active_companies': companies['active'],
+                'inactive_companies': companies['inactive'],
+                'active_users': user_counts['active'],
+                'inactive_users': user_counts['inactive'],
+            }
+        )
+        OrganizationGroupRollup.objects.filter(organization_id=organization_id).delete()
+        OrganizationGroupRollup.objects.bulk_create([
+            OrganizationGroupRollup(organization_id=organization_id, group_id=row['group_id'], users=row['total'])
+            for row in groups
+        ])
+        OrganizationSignupRollup.objects.filter(organization_id=organization_id).delete()
+        OrganizationSignupRollup.objects.bulk_create([
+            OrganizationSignupRollup(organization_id=organization_id, week=row['week'], signups=row['total'])
+            for row in signups
+        ])
+
+
+def refresh_all():
+    """
+    Reconstrói os totais de todas as organizações com consultas agrupadas
+    (uma por métrica e por shard, independentemente da quantidade de organizações).
+    Retorna a quantidade de organizações processadas.
+    """
+    count = 0
+    for alias in sharding.aliases():
+        with sharding.use_shard(alias):
+            count += _refresh_shard(alias)
+    return count
+
+
+def _refresh_shard(using):
+    User = get_user_model()
+    rollups = {
+        pk: OrganizationRollup(organization_id=pk)
+        for pk in Organization.objects.values_list('pk', flat=True)
+    }
+    
+    company_rows = Company.objects.values('organization_id').annotate(
+        active=Count('pk', filter=Q(is_active=True)),
+        inactive=Count('pk', filter=Q(is_active=False)),
+    ).order_by()
+    for row in company_rows:
+        rollups[row['organization_id']].active_companies = row['active']
+        rollups[row['organization_id']].inactive_companies = row['inactive']
+    
+    user_rows = User.objects.filter(company__isnull=False).values('company__organization_id').annotate(
+        active=Count('pk', filter=Q(is_active=True)),
+        inactive=Count('pk', filter=Q(is_active=False)),
+    ).order_by()
+    for row in user_rows:
+        rollups[row['company__organization_id']].active_users = row['active']
+        rollups[row['company__organization_id']].inactive_users = row['inactive']
+    
+    group_rows = User.groups.through.objects.filter(user__company__isnull=False).values(
+        'user__company__organization_id', 'group_id'
+    ).annotate(total=Count('user_id')).order_by()
+    signup_rows = User.objects.filter(company__isnull=False).annotate(
+        week=TruncWeek('date_joined', output_field=DateField())
+    ).values('company__organization_id', 'week').annotate(total=Count('pk')).order_by()
+    
+    with transaction.atomic(using=using):
+        OrganizationRollup.objects.all().delete()
+        OrganizationRollup.objects.bulk_create(rollups.values(), batch_size=1000)
+        OrganizationGroupRollup.objects.all().delete()
+        OrganizationGroupRollup.objects.bulk_create([
+            OrganizationGroupRollup(
+                organization_id=row['user__company__organization_id'],
+                group_id=row['group_id'],
+                users=row['total']
+            )
+            for row in group_rows
+        ], batch_size=1000)
+        OrganizationSignupRollup.objects.all().delete()
+        OrganizationSignupRollup.objects.bulk_create([
+            OrganizationSignupRollup(
+                organization_id=row['company__organization_id'],
+                week=row['week'],
+                signups=row['total']
+            )
+            for row in signup_rows
+        ], batch_size=1000)
+    return len(rollups)
+
+
+def schedule_refresh(*organization_ids):
+    """
+    Agenda o recálculo das organizações para depois do commit atual,
+    agrupando vários pedidos da mesma transação em um só recálculo.
+    """
+    ids = {pk for pk in organization_ids if pk is not None}
+    if not ids:
+        return
+    if getattr(_pending, 'ids', None) is None:
+        _pending.ids = set()
+    _pending.ids.update(ids)
+    # Cada chamada registra um callback, mas só o primeiro encontra ids pendentes
+    transaction.on_commit(_run_scheduled, using=router.db_for_write(OrganizationRollup))
+
+
+def _run_scheduled():
+    ids, _pending.ids = getattr(_pending, 'ids', None) or set(), set()
+    for organization_id in ids:
+        with sharding.for_organization(organization_id):
+            # Organizações excluídas (ou movidas para outro shard) não têm mais totais aqui
+            if Organization.objects.filter(pk=organization_id).exists():
+                _refresh_organization(organization_id)
+
+
+def increment(model, lookup, field, delta):
+    """
+    Soma ``delta`` em uma linha de totais, criando-a se ainda não existir.
+    """
+    if model.objects.filter(**lookup).update(**{field: F(field) + delta}):
+        return
+    try:
+        with transaction.atomic(using=router.db_for_write(model)):
+            model.objects.create(**lookup, **{field: delta})
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**{field: F(field) + delta})
+
+
+def apply_delta(organization_id, **deltas):
+    """
+    Aplica deltas nos contadores de ``OrganizationRollup``. Se a organização
+    ainda não tem linha de totais, ela é calculada do zero. Retorna ``False``
+    nesse caso, indicando que deltas complementares não devem ser aplicados.
+    """
+    if organization_id is None:
+        return False
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not updates or OrganizationRollup.objects.filter(pk=organization_id).update(**updates):
+        return True
+    refresh_organization(organization_id)
+    return False
+
+
+def bump_groups(organization_id, group_ids, delta):
+    for group_id in group_ids:
+        increment(OrganizationGroupRollup, {'organization_id': organization_id, 'group_id': group_id}, 'users', delta)
+
+
+def bump_signups(organization_id, date_joined, delta=1):
+    increment(
+        OrganizationSignupRollup,
+        {'organization_id': organization_id, 'week': week_start(date_joined)},
+        'signups',
+        delta
+    )
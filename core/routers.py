@@ -0,0 +1,149 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from . import sharding
+
+PRIMARY = 'primary'
+REPLICA = 'replica'
+
+# Destino das leituras no contexto atual (requisição ou thread): ``PRIMARY``
+# ou o alias da réplica escolhida. ``None`` mantém o comportamento padrão do
+# Django (banco principal).
+_read_target = ContextVar('read_target', default=None)
+
+
+def pin_primary():
+    """
+    Força as leituras do contexto atual para o banco principal, inclusive em
+    views marcadas para ler das réplicas. Retorna um token para ``reset_read_target``.
+    """
+    return _read_target.set(PRIMARY)
+
+
+def prefer_replica():
+    """
+    Envia as leituras do contexto atual para uma das réplicas, a menos que o
+    contexto já esteja preso ao banco principal. A réplica é escolhida uma vez
+    por contexto: as leituras de uma requisição não misturam réplicas com
+    atrasos de replicação diferentes.
+    """
+    if _read_target.get() is not None:
+        return None
+    replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+    return _read_target.set(random.choice(replicas) if replicas else REPLICA)
+
+
+def reset_read_target(token):
+    if token is not None:
+        _read_target.reset(token)
+
+
+def is_pinned_to_primary():
+    return _read_target.get() == PRIMARY
+
+
+@contextmanager
+def use_primary():
+    """
+    Gerenciador de contexto para leituras que precisam de consistência imediata.
+    """
+    token = pin_primary()
+    try:
+        yield
+    finally:
+        reset_read_target(token)
+
+
+@contextmanager
+def use_replica():
+    """
+    Gerenciador de contexto para blocos somente leitura que toleram atraso de replicação.
+    """
+    token = prefer_replica()
+    try:
+        yield
+    finally:
+        reset_read_target(token)
+
+
+class ReplicaRouter:
+    """
+    Envia para uma das réplicas de ``settings.DATABASE_REPLICAS`` as leituras
+    feitas em contextos marcados com ``use_replica`` (ex.: listagens e dashboard)
+    e mantém todo o resto no banco principal.
+
+    Sem réplicas configuradas o roteador não interfere (retorna ``None``).
+    """
+
+    def _replicas(self):
+        return getattr(settings, 'DATABASE_REPLICAS', [])
+
+    def db_for_read(self, model, **hints):
+        replicas = self._replicas()
+        target = _read_target.get()
+        if not replicas or target in (None, PRIMARY):
+            return None
+        # Objetos já carregados do principal continuam lá (ex.: relações após um save)
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db == DEFAULT_DB_ALIAS:
+            return DEFAULT_DB_ALIAS
+        return target if target in replicas else random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS if self._replicas() else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *self._replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # As réplicas recebem o esquema por replicação, nunca por migrate
+        if db in self._replicas():
+            return False
+        return None
+
+
+
+class ShardRouter:
+    """
+    Envia as consultas dos modelos de tenant para o shard do contexto atual
+    (ver ``core.sharding``) e as dos ``GLOBAL_MODELS`` para o ``default``.
+
+    Objetos já carregados continuam no banco de onde vieram (relações,
+    ``save()`` e ``delete()``). Sem shard no contexto o roteador passa a
+    decisão adiante (``ReplicaRouter``); sem ``TENANT_SHARDS`` não interfere.
+    """
+
+    def _route(self, model, hints):
+        if not sharding.is_enabled():
+            return None
+        if sharding.is_global(model):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db and not sharding.is_global(instance):
+            return instance._state.db
+        return sharding.current_alias()
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not sharding.is_enabled():
+            return None
+        # Modelos globais referenciam tenants sem constraint (ex.: Job.created_by)
+        if sharding.is_global(obj1) or sharding.is_global(obj2):
+            return True
+        return obj1._state.db == obj2._state.db
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Todos os shards recebem o esquema completo
+        return None
@@ -0,0 +1,374 @@
+"""
+Shards por organização (opcional).
+
+Com ``TENANT_SHARDS`` configurado, cada organização vive — com suas empresas,
+usuários, grupos e totais — em um dos bancos ``['default', *TENANT_SHARDS]``.
+Todos os bancos têm o esquema completo; o que muda é para onde as consultas vão:
+
+* requisições de usuários de uma organização ficam presas ao shard dela
+  (``TenantShardMiddleware``) e o ``ShardRouter`` envia tudo para lá;
+* views de objetos de outra organização (superusuário) usam
+  ``route_to_shard`` para executar no shard do objeto da URL;
+* fora de um shard (superusuário), ``across_shards()`` consulta todos os bancos
+  e mescla os resultados na ordem do ``order_by``;
+* ``GLOBAL_MODELS`` (sessões, jobs, auditoria, séries de atividade, tokens
+  da API, endpoints de webhooks e o diretório) ficam sempre no ``default``;
+  o outbox dos webhooks fica em cada shard, junto das mudanças que registra.
+
+Cada shard numera as chaves a partir de ``índice * TENANT_SHARD_ID_SPAN``, então
+os pks são únicos entre bancos e o pk de um objeto indica onde ele foi criado.
+Organizações movidas com ``manage.py move_organization`` ganham uma entrada no
+diretório (``ShardAssignment``), consultado antes da faixa de pks.
+
+Sem ``TENANT_SHARDS`` nada disso interfere: o router devolve ``None`` e
+``across_shards()`` devolve o próprio queryset.
+"""
+import heapq
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, models
+
+GLOBAL_MODELS = {
+    'sessions.session',
+    'core.job',
+    'core.activitybucket',
+    'core.shardassignment',
+    'audit.auditevent',
+    'api.apitoken',
+    'webhooks.endpoint',
+}
+
+# Chave da sessão com a organização do usuário logado
+SESSION_KEY = '_tenant_organization'
+
+# Validade do diretório em cache. Com cache local por processo, outros workers
+# só enxergam uma organização movida depois desse prazo
+DIRECTORY_CACHE_SECONDS = 300
+
+# Linhas lidas por vez de cada shard ao iterar uma consulta mesclada (padrão do iterator())
+ITERATOR_CHUNK_SIZE = 2000
+
+_bound_alias = ContextVar('tenant_shard', default=None)
+
+
+def is_enabled():
+    return bool(settings.TENANT_SHARDS)
+
+
+def aliases():
+    """
+    Bancos de tenants, na ordem que define a faixa de pks de cada um.
+    """
+    return [DEFAULT_DB_ALIAS, *settings.TENANT_SHARDS]
+
+
+def is_global(model):
+    """
+    Aceita o modelo ou uma instância (inclusive ``request.user``, um
+    ``SimpleLazyObject``, que repassa o ``_meta`` mas não o ``type()``).
+    """
+    return model._meta.label_lower in GLOBAL_MODELS
+
+
+def current_alias():
+    return _bound_alias.get()
+
+
+def fans_out():
+    """
+    Indica se as consultas do contexto atual devem percorrer todos os shards.
+    """
+    return is_enabled() and _bound_alias.get() is None
+
+
+@contextmanager
+def use_shard(alias):
+    """
+    Envia as consultas do bloco para o shard informado.
+    """
+    token = _bound_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _bound_alias.reset(token)
+
+
+@contextmanager
+def for_organization(organization_id):
+    """
+    Executa o bloco no shard da organização quando o contexto ainda não tem
+    shard (comandos, jobs e views de superusuário); caso contrário, não interfere.
+    """
+    if not fans_out() or organization_id is None:
+        yield
+        return
+    with use_shard(shard_for_organization(organization_id)):
+        yield
+
+
+# Localização
+
+def shard_for_pk(pk):
+    """
+    Shard em que o objeto foi criado, pela faixa do pk.
+    """
+    index = int(pk) // settings.TENANT_SHARD_ID_SPAN
+    shards = aliases()
+    return shards[index] if index < len(shards) else DEFAULT_DB_ALIAS
+
+
+def _directory_key(organization_id):
+    return f'sharding:organization:{organization_id}'
+
+
+def shard_for_organization(organization_id):
+    """
+    Shard atual da organização: o diretório (organizações movidas) ou a faixa do pk.
+    """
+    if not is_enabled() or organization_id is None:
+        return DEFAULT_DB_ALIAS
+    key = _directory_key(organization_id)
+    alias = cache.get(key)
+    if alias is None:
+        from .models import ShardAssignment
+
+        alias = ShardAssignment.objects.filter(organization_id=organization_id).values_list(
+            'alias', flat=True
+        ).first() or shard_for_pk(organization_id)
+        cache.set(key, alias, DIRECTORY_CACHE_SECONDS)
+    return alias
+
+
+def assign_organization(organization_id, alias):
+    """
+    Registra no diretório que a organização passou a viver em ``alias``.
+    """
+    from .models import ShardAssignment
+
+    ShardAssignment.objects.update_or_create(organization_id=organization_id, defaults={'alias': alias})
+    cache.delete(_directory_key(organization_id))
+
+
+def locate(model, pk):
+    """
+    Shard que contém o objeto, começando pela faixa do pk (objetos de
+    organizações movidas estão em outro banco).
+    """
+    guess = shard_for_pk(pk)
+    for alias in [guess, *(alias for alias in aliases() if alias != guess)]:
+        if model._default_manager.using(alias).filter(pk=pk).exists():
+            return alias
+    return guess
+
+
+def find(model, **lookup):
+    """
+    Primeiro shard com um objeto que atenda ao filtro (ex.: ``username``), ou ``None``.
+    """
+    for alias in aliases():
+        if model._default_manager.using(alias).filter(**lookup).exists():
+            return alias
+    return None
+
+
+def taken_elsewhere(instance, **lookup):
+    """
+    Indica se outro objeto, em qualquer shard, já usa os valores informados.
+    Os formulários usam para manter ``username`` e ``email`` únicos entre bancos.
+    """
+    if not is_enabled():
+        return False
+    model = type(instance)
+    return any(
+        model._default_manager.using(alias).filter(**lookup).exclude(pk=instance.pk).exists()
+        for alias in aliases()
+    )
+
+
+def choose_shard():
+    """
+    Shard para uma nova organização: o que tem menos organizações.
+    """
+    from organizations.models import Organization
+
+    counts = {alias: Organization.objects.using(alias).count() for alias in aliases()}
+    return min(aliases(), key=lambda alias: counts[alias])
+
+
+# Faixas de pks
+
+def _sequenced_models(model_list):
+    for model in model_list:
+        if model._meta.proxy or not model._meta.managed:
+            continue
+        if isinstance(model._meta.pk, models.BigAutoField):
+            yield model
+
+
+def align_sequences(using, model_list):
+    """
+    Faz a próxima chave ``BigAutoField`` de cada modelo no shard ``using`` ser a
+    seguinte à maior já usada dentro da faixa do shard (ou o início da faixa).
+    """
+    start = aliases().index(using) * settings.TENANT_SHARD_ID_SPAN
+    end = start + settings.TENANT_SHARD_ID_SPAN
+    connection = connections[using]
+    for model in _sequenced_models(model_list):
+        top = model._base_manager.using(using).filter(pk__gte=start, pk__lt=end).aggregate(
+            top=models.Max('pk')
+        )['top']
+        _set_sequence(connection, model._meta.db_table, model._meta.pk.column, top or start)
+
+
+def _set_sequence(connection, table, column, last):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [last, table])
+            if not cursor.rowcount:
+                cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, last])
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT setval(pg_get_serial_sequence(%s, %s), %s, false)',
+                [connection.ops.quote_name(table), column, last + 1]
+            )
+        else:
+            raise ImproperlyConfigured(f'Shards não suportam o banco "{connection.vendor}".')
+
+
+def reserve_id_range(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Handler de ``post_migrate``: posiciona as sequências do app na faixa do shard.
+    """
+    if is_enabled() and using in aliases():
+        align_sequences(using, sender.get_models(include_auto_created=True))
+
+
+# Resolvedores para ``core.decorators.route_to_shard``
+
+def by_organization(kwarg='pk'):
+    """
+    Shard da organização cujo pk está no argumento ``kwarg`` da URL.
+    """
+    def resolve(request, **kwargs):
+        return shard_for_organization(kwargs[kwarg])
+    return resolve
+
+
+def by_object(model, kwarg='pk'):
+    """
+    Shard que contém o objeto cujo pk está no argumento ``kwarg`` da URL.
+    """
+    def resolve(request, **kwargs):
+        return locate(model, kwargs[kwarg])
+    return resolve
+
+
+def by_query_param(name='organization'):
+    """
+    Shard da organização informada em ``?organization=<pk>`` (ou o ``default``).
+    """
+    def resolve(request, **kwargs):
+        value = request.GET.get(name, '')
+        return shard_for_organization(int(value)) if value.isdigit() else DEFAULT_DB_ALIAS
+    return resolve
+
+
+def new_organization(request, **kwargs):
+    return choose_shard()
+
+
+# Consultas em todos os shards
+
+def _ordering(queryset):
+    fields = list(queryset.query.order_by or queryset.model._meta.ordering)
+    if not fields:
+        raise ValueError('Consultas em todos os shards precisam de order_by.')
+    descending = {field.startswith('-') for field in fields}
+    if len(descending) > 1:
+        raise ValueError('Consultas em todos os shards exigem a mesma direção em todos os campos de ordenação.')
+    return [field.lstrip('-') for field in fields], descending.pop()
+
+
+def _sort_key(model, fields):
+    for field in fields:
+        try:
+            relation = '__' in field or model._meta.get_field(field).is_relation
+        except FieldDoesNotExist:
+            relation = False  # pk e anotações
+        if relation:
+            raise ValueError(f'Consultas em todos os shards não ordenam por relações ("{field}").')
+
+    def key(obj):
+        # Nulos por último, como no PostgreSQL em ordem crescente
+        return tuple((getattr(obj, field) is None, getattr(obj, field)) for field in fields)
+    return key
+
+
+class MergedQuerySet:
+    """
+    Resultado de um queryset em todos os shards, mesclado pela ordenação.
+
+    Atende o que as listagens usam (``count``, fatias e iteração, inclusive
+    pelo ``Paginator``): uma fatia ``[a:b]`` busca os ``b`` primeiros de cada
+    shard e mescla, sem trazer as tabelas inteiras.
+    """
+    ordered = True
+
+    def __init__(self, queryset):
+        self.model = queryset.model
+        self.querysets = [queryset.using(alias) for alias in aliases()]
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = sum(queryset.count() for queryset in self.querysets)
+        return self._count
+
+    def exists(self):
+        return any(queryset.exists() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __bool__(self):
+        return self.exists()
+
+    def _merge(self, querysets):
+        # A ordenação só é necessária para mesclar (count() não depende dela)
+        fields, descending = _ordering(self.querysets[0])
+        return heapq.merge(*querysets, key=_sort_key(self.model, fields), reverse=descending)
+
+    def __iter__(self):
+        # Sem chunk_size, iterator() ignora o prefetch_related
+        return self._merge(queryset.iterator(chunk_size=ITERATOR_CHUNK_SIZE) for queryset in self.querysets)
+
+    def __getitem__(self, item):
+        if isinstance(item, int):
+            if item < 0:
+                raise ValueError('Índices negativos não são suportados.')
+            return self[item:item + 1][0]
+        if item.step is not None or (item.start or 0) < 0 or item.stop is None:
+            raise ValueError('Apenas fatias [início:fim] são suportadas.')
+        start = item.start or 0
+        merged = self._merge(list(queryset[:item.stop]) for queryset in self.querysets)
+        return list(islice(merged, start, item.stop))
+
+
+class ShardedQuerySetMixin:
+    """
+    ``across_shards()`` para os querysets dos modelos de tenant.
+    """
+
+    def across_shards(self):
+        """
+        Em contexto sem shard (superusuário com shards ativos), consulta todos
+        os bancos e mescla pela ordenação; nos demais casos devolve o próprio queryset.
+        """
+        if not fans_out() or self._db is not None:
+            return self
+        return MergedQuerySet(self)
@@ -0,0 +1,246 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from organizations.models import Organization, Company
+from . import activity, live, rollups, sharding, stats
+from .models import ActivityBucket
+
+User = get_user_model()
+
+# Campos que influenciam os totais; saves restritos a outros campos
+# (ex.: ``last_login`` no login) não custam nenhuma consulta extra
+ROLLUP_COMPANY_FIELDS = {'organization', 'organization_id', 'is_active'}
+ROLLUP_USER_FIELDS = {'company', 'company_id', 'is_active'}
+
+
+def _touches(update_fields, fields):
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+def user_organization_id(user):
+    """
+    Organização da empresa do usuário, evitando consulta se a empresa já foi carregada.
+    """
+    if user.company_id is None:
+        return None
+    if User.company.is_cached(user):
+        return user.company.organization_id
+    # A empresa está no mesmo banco (shard) do usuário
+    return Company.objects.db_manager(user._state.db).filter(pk=user.company_id).values_list(
+        'organization_id', flat=True
+    ).first()
+
+
+def _counter_deltas(prefix, was_active, is_active):
+    if was_active == is_active:
+        return {}
+    sign = 1 if is_active else -1
+    return {f'active_{prefix}': sign, f'inactive_{prefix}': -sign}
+
+
+# Empresas
+
+@receiver(pre_save, sender=Company, dispatch_uid='rollup_company_pre_save')
+def company_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._rollup_previous = None
+    if raw or instance.pk is None or not _touches(update_fields, ROLLUP_COMPANY_FIELDS):
+        return
+    instance._rollup_previous = Company.objects.filter(pk=instance.pk).values(
+        'organization_id', 'is_active'
+    ).first()
+
+
+@receiver(post_save, sender=Company, dispatch_uid='rollup_company_post_save')
+def company_post_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        field = 'active_companies' if instance.is_active else 'inactive_companies'
+        rollups.apply_delta(instance.organization_id, **{field: 1})
+        activity.record(ActivityBucket.COMPANIES_CREATED, instance.created_at, instance.organization_id)
+        return
+    
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is None:
+        return
+    if previous['organization_id'] != instance.organization_id:
+        # Os usuários da empresa mudam de organização junto: recalcula as duas
+        rollups.schedule_refresh(previous['organization_id'], instance.organization_id)
+    else:
+        rollups.apply_delta(
+            instance.organization_id,
+            **_counter_deltas('companies', previous['is_active'], instance.is_active)
+        )
+
+
+@receiver(post_delete, sender=Company, dispatch_uid='rollup_company_post_delete')
+def company_post_delete(sender, instance, **kwargs):
+    rollups.schedule_refresh(instance.organization_id)
+
+
+# Usuários
+
+@receiver(pre_save, sender=User, dispatch_uid='rollup_user_pre_save')
+def user_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._rollup_previous = None
+    if raw or instance.pk is None or not _touches(update_fields, ROLLUP_USER_FIELDS):
+        return
+    instance._rollup_previous = User.objects.filter(pk=instance.pk).values(
+        'company_id', 'company__organization_id', 'is_active'
+    ).first()
+
+
+@receiver(post_save, sender=User, dispatch_uid='rollup_user_post_save')
+def user_post_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        organization_id = user_organization_id(instance)
+        field = 'active_users' if instance.is_active else 'inactive_users'
+        if rollups.apply_delta(organization_id, **{field: 1}):
+            rollups.bump_signups(organization_id, instance.date_joined)
+        activity.record(ActivityBucket.USERS_JOINED, instance.date_joined, organization_id)
+        return
+    
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is None:
+        return
+    organization_id = user_organization_id(instance)
+    if previous['company__organization_id'] != organization_id:
+        rollups.schedule_refresh(previous['company__organization_id'], organization_id)
+    else:
+        rollups.apply_delta(
+            organization_id,
+            **_counter_deltas('users', previous['is_active'], instance.is_active)
+        )
+
+
+@receiver(user_logged_in, dispatch_uid='activity_user_logged_in')
+def user_logged_in_activity(sender, request, user, **kwargs):
+    activity.record(ActivityBucket.LOGINS, user.last_login or timezone.now(), user_organization_id(user))
+
+
+@receiver(user_logged_in, dispatch_uid='sharding_user_logged_in')
+def remember_tenant_shard(sender, request, user, **kwargs):
+    # A sessão guarda a organização para o TenantShardMiddleware achar o shard;
+    # superusuários ficam sem shard (consultam todos), mesmo com empresa
+    if sharding.is_enabled() and request is not None and hasattr(request, 'session'):
+        if user.is_superuser:
+            request.session.pop(sharding.SESSION_KEY, None)
+        else:
+            request.session[sharding.SESSION_KEY] = user_organization_id(user)
+
+
+@receiver(pre_delete, sender=User, dispatch_uid='rollup_user_pre_delete')
+def user_pre_delete(sender, instance, **kwargs):
+    instance._rollup_organization_id = user_organization_id(instance)
+
+
+@receiver(post_delete, sender=User, dispatch_uid='rollup_user_post_delete')
+def user_post_delete(sender, instance, **kwargs):
+    rollups.schedule_refresh(getattr(instance, '_rollup_organization_id', None))
+
+
+# Grupos dos usuários
+
+@receiver(m2m_changed, sender=User.groups.through, dispatch_uid='rollup_user_groups_changed')
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # group.user_set.add(...) pode envolver várias organizações
+        if action in ('post_add', 'post_remove') and pk_set:
+            organization_ids = User.objects.filter(pk__in=pk_set).values_list('company__organization_id', flat=True)
+            rollups.schedule_refresh(*set(organization_ids))
+        elif action == 'pre_clear':
+            instance._rollup_organization_ids = set(
+                User.objects.filter(groups=instance).values_list('company__organization_id', flat=True)
+            )
+        elif action == 'post_clear':
+            rollups.schedule_refresh(*getattr(instance, '_rollup_organization_ids', ()))
+        return
+    
+    if action == 'pre_clear':
+        instance._rollup_cleared_groups = list(instance.groups.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    
+    organization_id = user_organization_id(instance)
+    if organization_id is None:
+        return
+    if action == 'post_add':
+        rollups.bump_groups(organization_id, pk_set or (), 1)
+    elif action == 'post_remove':
+        rollups.bump_groups(organization_id, pk_set or (), -1)
+    else:
+        rollups.bump_groups(organization_id, getattr(instance, '_rollup_cleared_groups', ()), -1)
+
+
+
+# Eventos ao vivo (core.live) e contagens do dashboard
+
+# Saves restritos a estes campos não aparecem nas listagens
+LIVE_IGNORED_FIELDS = {'last_login'}
+
+
+def _publish_change(kind, action, pk, organization_ids, company_ids=(), using=None):
+    # No banco que gravou a instância: com shards, a transação aberta é a do shard
+    event = live.publish(kind, action, pk, organization_ids, company_ids, using=using)
+    transaction.on_commit(lambda: stats.invalidate(event.organization_ids, event.company_ids), using=using)
+
+
+def _saved(created):
+    return live.CREATED if created else live.UPDATED
+
+
+@receiver(post_save, sender=Organization, dispatch_uid='live_organization_post_save')
+def organization_post_save_live(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    _publish_change('organization', _saved(created), instance.pk, [instance.pk], using=using)
+
+
+@receiver(post_delete, sender=Organization, dispatch_uid='live_organization_post_delete')
+def organization_post_delete_live(sender, instance, using=None, **kwargs):
+    _publish_change('organization', live.DELETED, instance.pk, [instance.pk], using=using)
+
+
+@receiver(post_save, sender=Company, dispatch_uid='live_company_post_save')
+def company_post_save_live(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None) or {}
+    _publish_change(
+        'company', _saved(created), instance.pk,
+        [instance.organization_id, previous.get('organization_id')], [instance.pk], using=using
+    )
+
+
+@receiver(post_delete, sender=Company, dispatch_uid='live_company_post_delete')
+def company_post_delete_live(sender, instance, using=None, **kwargs):
+    _publish_change(
+        'company', live.DELETED, instance.pk, [instance.organization_id], [instance.pk], using=using
+    )
+
+
+@receiver(post_save, sender=User, dispatch_uid='live_user_post_save')
+def user_post_save_live(sender, instance, created, raw=False, update_fields=None, using=None, **kwargs):
+    if raw or (update_fields and set(update_fields) <= LIVE_IGNORED_FIELDS):
+        return
+    previous = getattr(instance, '_rollup_previous', None) or {}
+    _publish_change(
+        'user', _saved(created), instance.pk,
+        [user_organization_id(instance), previous.get('company__organization_id')],
+        [instance.company_id, previous.get('company_id')], using=using,
+    )
+
+
+@receiver(post_delete, sender=User, dispatch_uid='live_user_post_delete')
+def user_post_delete_live(sender, instance, using=None, **kwargs):
+    _publish_change(
+        'user', live.DELETED, instance.pk,
+        [getattr(instance, '_rollup_organization_id', None)], [instance.company_id], using=using
+    )
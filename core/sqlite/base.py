@@ -0,0 +1,50 @@
+"""
+Backend SQLite para produção (ENGINE ``core.sqlite``, ativado por PANEL_SQLITE_TUNED).
+
+É o backend do Django com duas mudanças para vários workers no mesmo arquivo:
+
+* cada conexão nova roda os ``PRAGMA`` de ``PRAGMAS``: WAL (leitores não
+  bloqueiam o escritor e vice-versa), ``synchronous=NORMAL`` (seguro com WAL),
+  mmap e um busy timeout, para que escritas concorrentes esperem pela vez em
+  vez de falharem com "database is locked";
+* as transações (``atomic``) começam com ``BEGIN IMMEDIATE``: o lock de escrita
+  é pego na abertura, onde o busy timeout vale. Com o ``BEGIN`` padrão (deferred)
+  uma transação que leu e depois tenta escrever enquanto outra escreve falha na
+  hora, sem esperar.
+
+Ambos podem ser ajustados por banco em ``OPTIONS``: ``{'pragmas': {...},
+'transaction_mode': 'DEFERRED'}``.
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'busy_timeout': 5000,  # ms; o primeiro, para que os seguintes também esperem
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 128 * 1024 * 1024,
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, settings_dict, *args, **kwargs):
+        super().__init__(settings_dict, *args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = {**PRAGMAS, **options.get('pragmas', {})}
+        self.transaction_mode = options.get('transaction_mode', 'IMMEDIATE').upper()
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # Opções deste backend, não do sqlite3.connect
+        kwargs.pop('pragmas', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
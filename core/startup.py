@@ -0,0 +1,82 @@
+"""
+Perfil de inicialização: tempo de importação por app, a partir da saída de
+``python -X importtime`` de um processo que só executa ``django.setup()`` e
+cria a aplicação WSGI (o mesmo trabalho de um worker recém-criado).
+"""
+import json
+import os
+import subprocess
+import sys
+from collections import namedtuple
+
+ImportEntry = namedtuple('ImportEntry', 'module self_us cumulative_us')
+
+# Executado no subprocesso: imprime os apps instalados e o tempo total do setup
+PROBE = '''
+import json, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+elapsed = time.perf_counter() - started
+from django.conf import settings
+print(json.dumps({'apps': settings.INSTALLED_APPS, 'seconds': elapsed}))
+'''
+
+
+def parse_importtime(text):
+    """
+    Converte as linhas ``import time: self | cumulative | módulo`` em ``ImportEntry``.
+    """
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # cabeçalho
+        entries.append(ImportEntry(parts[2].strip(), int(parts[0]), int(parts[1])))
+    return entries
+
+
+def owner(module, installed_apps):
+    """
+    App instalado dono do módulo (prefixo mais longo) ou o pacote de topo.
+    """
+    best = None
+    for app in installed_apps:
+        if module == app or module.startswith(app + '.'):
+            if best is None or len(app) > len(best):
+                best = app
+    return best or module.split('.')[0]
+
+
+def group_by_app(entries, installed_apps):
+    """
+    Soma o tempo próprio (em microssegundos) dos módulos de cada dono,
+    do maior para o menor.
+    """
+    totals = {}
+    for entry in entries:
+        key = owner(entry.module, installed_apps)
+        totals[key] = totals.get(key, 0) + entry.self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def profile(app_profile=None):
+    """
+    Executa a inicialização em um subprocesso e retorna
+    ``(segundos, apps instalados, entradas de importação)``.
+    """
+    env = os.environ.copy()
+    if app_profile:
+        env['PANEL_APP_PROFILE'] = app_profile
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'falha no subprocesso')
+    summary = json.loads(result.stdout.strip().splitlines()[-1])
+    return summary['seconds'], summary['apps'], parse_importtime(result.stderr)
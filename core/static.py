@@ -0,0 +1,55 @@
+import mimetypes
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, Http404
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils._os import safe_join
+
+# Nomes gerados pelo ManifestStaticFilesStorage (styles.3f2a9c1b7d4e.css)
+# e pelo django-compressor (output.3f2a9c1b7d4e.css) nunca mudam de conteúdo
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[A-Za-z0-9]+$')
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+MUTABLE_MAX_AGE = 60
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def serve(request, path):
+    """
+    Entrega arquivos de ``STATIC_ROOT`` preferindo as variantes pré-comprimidas
+    aceitas pelo cliente, com cache de longa duração para nomes com hash.
+
+    Destinado a instalações sem servidor web na frente; com nginx, prefira
+    ``gzip_static``/``brotli_static`` e o mesmo cabeçalho ``Cache-Control``.
+    """
+    try:
+        full_path = Path(safe_join(settings.STATIC_ROOT, path))
+    except ValueError:
+        raise Http404
+    if not full_path.is_file():
+        raise Http404
+    
+    content_type, _ = mimetypes.guess_type(full_path.name)
+    accepted = request.headers.get('Accept-Encoding', '')
+    selected, encoding = full_path, None
+    for name, suffix in ENCODINGS:
+        candidate = full_path.with_name(full_path.name + suffix)
+        if name in accepted and candidate.is_file():
+            selected, encoding = candidate, name
+            break
+    
+    # O nome é o do arquivo pedido, não o da variante comprimida (.gz/.br)
+    response = FileResponse(
+        selected.open('rb'), filename=full_path.name, content_type=content_type or 'application/octet-stream'
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if HASHED_NAME.search(full_path.name):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=MUTABLE_MAX_AGE)
+    return response
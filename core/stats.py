@@ -0,0 +1,76 @@
+"""
+Contagens do dashboard em cache, por escopo.
+
+Cada escopo (global, organização ou empresa) guarda as três contagens por
+``DASHBOARD_STATS_CACHE_SECONDS``; o ``warm_caches`` as calcula no deploy
+para que o primeiro acesso de cada organização não pague os COUNTs. As
+mudanças publicadas como eventos ao vivo descartam os escopos afetados.
+``active_user_count`` são os usuários com acesso nas últimas
+``LAST_SEEN_ACTIVE_HOURS`` horas (``accounts.presence``).
+"""
+import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+
+from organizations.models import Organization, Company
+
+
+def _cache_key(scope):
+    return f'dashboard-stats:{scope}'
+
+
+def _cached(scope, compute):
+    key = _cache_key(scope)
+    counts = cache.get(key)
+    if counts is None:
+        counts = compute()
+        cache.set(key, counts, settings.DASHBOARD_STATS_CACHE_SECONDS)
+    return counts
+
+
+def _active_since():
+    return timezone.now() - datetime.timedelta(hours=settings.LAST_SEEN_ACTIVE_HOURS)
+
+
+def invalidate(organization_ids=(), company_ids=()):
+    """
+    Descarta as contagens afetadas por uma mudança (o escopo global sempre).
+    """
+    keys = [_cache_key('all')]
+    keys += [_cache_key(f'org:{pk}') for pk in organization_ids]
+    keys += [_cache_key(f'company:{pk}') for pk in company_ids]
+    cache.delete_many(keys)
+
+
+def global_counts():
+    User = get_user_model()
+    # Com shards, a soma de todos os bancos (core.sharding)
+    return _cached('all', lambda: {
+        'organization_count': Organization.objects.all().across_shards().count(),
+        'company_count': Company.objects.all().across_shards().count(),
+        'user_count': User.objects.all().across_shards().count(),
+        'active_user_count': User.objects.seen_since(_active_since()).across_shards().count(),
+    })
+
+
+def organization_counts(organization_id):
+    User = get_user_model()
+    return _cached(f'org:{organization_id}', lambda: {
+        'organization_count': 1,
+        'company_count': Company.objects.for_org(organization_id).count(),
+        'user_count': User.objects.for_org(organization_id).count(),
+        'active_user_count': User.objects.for_org(organization_id).seen_since(_active_since()).count(),
+    })
+
+
+def company_counts(company_id):
+    User = get_user_model()
+    return _cached(f'company:{company_id}', lambda: {
+        'organization_count': 1,
+        'company_count': 1,
+        'user_count': User.objects.for_company(company_id).count(),
+        'active_user_count': User.objects.for_company(company_id).seen_since(_active_since()).count(),
+    })
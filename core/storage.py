@@ -0,0 +1,72 @@
+"""
+Armazenamentos de arquivos estáticos para o modo de produção
+(``PANEL_ASSET_MODE=production``).
+
+Além dos nomes com hash do ``ManifestStaticFilesStorage``, cada arquivo de
+texto ganha variantes ``.gz`` e ``.br`` (quando o pacote ``brotli`` está
+instalado) geradas uma única vez no build, para que o servidor web
+(``gzip_static``/``brotli_static`` no nginx ou ``core.static.serve``) entregue
+o arquivo já comprimido, sem custo de CPU por requisição.
+"""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+from compressor.storage import CompressorFileStorage
+
+try:
+    import brotli
+except ImportError:  # Dependência opcional: sem ela, apenas .gz é gerado
+    brotli = None
+
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map', '.ico')
+
+# Arquivos muito pequenos não compensam a variante comprimida
+PRECOMPRESS_MIN_SIZE = 256
+
+
+def compress_variants(data):
+    """
+    Retorna ``{sufixo: conteúdo}`` com as variantes menores que o original.
+    """
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return {suffix: content for suffix, content in variants.items() if len(content) < len(data)}
+
+
+class PrecompressMixin:
+    """
+    Grava as variantes comprimidas ao lado de cada arquivo salvo.
+    """
+    
+    def _save(self, name, content):
+        name = super()._save(name, content)
+        if name.endswith(PRECOMPRESS_EXTENSIONS):
+            self._precompress(name)
+        return name
+    
+    def _precompress(self, name):
+        with self.open(name) as original:
+            data = original.read()
+        if len(data) < PRECOMPRESS_MIN_SIZE:
+            return
+        for suffix, content in compress_variants(data).items():
+            compressed_name = name + suffix
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            # Chama o _save da classe base para não recomprimir a variante
+            super()._save(compressed_name, ContentFile(content))
+
+
+class PrecompressedManifestStaticFilesStorage(PrecompressMixin, ManifestStaticFilesStorage):
+    """
+    ``collectstatic`` com nomes com hash (cache de longa duração) e variantes comprimidas.
+    """
+
+
+class PrecompressedCompressorFileStorage(PrecompressMixin, CompressorFileStorage):
+    """
+    Saída da compressão offline do django-compressor, também pré-comprimida.
+    """
@@ -0,0 +1,39 @@
+"""
+Executor dos testes (``TEST_RUNNER``).
+
+Nos testes, as réplicas de leitura (``DATABASE_REPLICAS``) são espelhos do
+``default`` (``TEST['MIRROR']``), mas com uma conexão própria: sem ajuste, as
+leituras roteadas para elas não enxergam os dados criados na transação de cada
+``TestCase``. Com o SQLite em memória dos testes (cache compartilhado), as
+conexões dos espelhos leem sem lock os dados ainda não confirmados
+(``PRAGMA read_uncommitted``), como se fossem réplicas sem atraso. Os testes
+que leem das réplicas precisam declarar ``databases = '__all__'``.
+"""
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.runner import DiscoverRunner
+
+
+def _mirrors():
+    return {alias for alias in connections if connections.settings[alias].get('TEST', {}).get('MIRROR')}
+
+
+def _read_uncommitted(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite' and connection.alias in _mirrors():
+        connection.connection.execute('PRAGMA read_uncommitted = 1')
+
+
+class PanelTestRunner(DiscoverRunner):
+
+    def setup_databases(self, **kwargs):
+        config = super().setup_databases(**kwargs)
+        connection_created.connect(_read_uncommitted, dispatch_uid='core_testing_read_uncommitted')
+        for alias in _mirrors():
+            # Conexões abertas durante a criação dos bancos
+            if connections[alias].connection is not None:
+                _read_uncommitted(None, connections[alias])
+        return config
+
+    def teardown_databases(self, old_config, **kwargs):
+        connection_created.disconnect(dispatch_uid='core_testing_read_uncommitted')
+        super().teardown_databases(old_config, **kwargs)
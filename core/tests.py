@@ -1,7 +1,38 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import gzip
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from unittest import mock, skipUnless
+
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth import get_user_model
-from organizations.models import Organization, Company
+from django.contrib.auth.models import Group, Permission
+from organizations.models import ArchivedCompany, Organization, Company
+from accounts.models import ArchivedUser
+from accounts.catalog import PERMISSION_CATALOG_KEY
+from accounts.forms import CustomUserCreationForm
+from . import activity, archive, live, sharding, startup, stats, warmup
+from .jobs import claim_next, enqueue, requeue_stale, run_job, run_pending
+from .models import ActivityBucket, Job, OrganizationRollup, OrganizationGroupRollup, OrganizationSignupRollup
+from .rollups import refresh_all
+from .static import serve as serve_static
+from .storage import PrecompressedManifestStaticFilesStorage
+from .routers import ReplicaRouter, use_primary, use_replica
 
 User = get_user_model()
 
@@ -10,6 +41,7 @@ class DashboardViewTest(TestCase):
     """
     Testes para a view do dashboard.
     """
+    databases = '__all__'
     
     def setUp(self):
         self.organization = Organization.objects.create(
@@ -62,4 +94,1001 @@ class DashboardViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn('organization_count', response.context)
         self.assertIn('company_count', response.context)
-        self.assertIn('user_count', response.context)
\ No newline at end of file
+        self.assertIn('user_count', response.context)
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(TestCase):
+    """
+    Testes para o roteamento de leituras para as réplicas.
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        self.router = ReplicaRouter()
+    
+    def test_reads_default_to_primary(self):
+        """
+        Testa se leituras fora de views marcadas continuam no banco principal.
+        """
+        self.assertIsNone(self.router.db_for_read(Organization))
+        self.assertEqual(self.router.db_for_write(Organization), 'default')
+    
+    def test_replica_reads_when_preferred(self):
+        """
+        Testa se leituras marcadas vão para a réplica.
+        """
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Organization), 'replica')
+    
+    @override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+    def test_one_replica_per_context(self):
+        """
+        Testa se todas as leituras de um contexto vão para a mesma réplica.
+        """
+        for _ in range(5):
+            with use_replica():
+                chosen = {self.router.db_for_read(Organization) for _ in range(20)}
+                with use_replica():
+                    chosen.add(self.router.db_for_read(Company))
+            self.assertEqual(len(chosen), 1)
+            self.assertIn(chosen.pop(), ['replica1', 'replica2'])
+    
+    def test_primary_pin_overrides_replica(self):
+        """
+        Testa se um contexto preso ao principal ignora a preferência pela réplica.
+        """
+        with use_primary(), use_replica():
+            self.assertIsNone(self.router.db_for_read(Organization))
+    
+    def test_replicas_are_never_migrated(self):
+        """
+        Testa se o migrate ignora as réplicas.
+        """
+        self.assertFalse(self.router.allow_migrate('replica', 'organizations'))
+        self.assertIsNone(self.router.allow_migrate('default', 'organizations'))
+    
+    def test_write_sets_sticky_cookie(self):
+        """
+        Testa se uma escrita prende as leituras seguintes do cliente ao principal.
+        """
+        response = self.client.post(reverse('accounts:login'), {'username': 'x', 'password': 'y'})
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        
+        response = self.client.get(reverse('core:dashboard'))
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+
+class JobQueueTest(TestCase):
+    """
+    Testes para a fila de jobs em segundo plano.
+    """
+    
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Organização Teste')
+        self.company = Company.objects.create(organization=self.organization, name='Empresa Teste')
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            company=self.company
+        )
+        self.superuser = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+    
+    def test_enqueue_unknown_task(self):
+        """
+        Testa se enfileirar uma tarefa inexistente falha imediatamente.
+        """
+        with self.assertRaises(LookupError):
+            enqueue('tarefa.inexistente')
+    
+    def test_deactivate_organization_job(self):
+        """
+        Testa a desativação da organização, empresas e usuários pelo worker.
+        """
+        job = enqueue('organizations.deactivate_organization', {'organization_id': self.organization.pk})
+        self.assertEqual(run_pending(), 1)
+        
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(job.result, {'companies': 1, 'users': 1})
+        self.organization.refresh_from_db()
+        self.company.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertFalse(self.organization.is_active)
+        self.assertFalse(self.company.is_active)
+        self.assertFalse(self.user.is_active)
+    
+    def test_failed_job_is_retried(self):
+        """
+        Testa se um job com erro volta para a fila até esgotar as tentativas.
+        """
+        job = enqueue('organizations.deactivate_organization', {'unexpected': 1}, max_attempts=2)
+        with self.assertLogs('core.jobs', level='ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_after, timezone.now())
+        
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('core.jobs', level='ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('TypeError', job.error)
+    
+    def test_stale_jobs_are_requeued(self):
+        """
+        Testa se o batimento mantém a reserva e se jobs abandonados voltam à fila até esgotar as tentativas.
+        """
+        enqueue('organizations.deactivate_organization', {'organization_id': self.organization.pk}, max_attempts=2)
+        job = claim_next('worker-1')
+        expired = timezone.now() - datetime.timedelta(seconds=settings.JOBS_LOCK_TIMEOUT + 1)
+        Job.objects.filter(pk=job.pk).update(locked_at=expired)
+        job.locked_at = expired
+        job.set_progress(1, 2)
+        self.assertEqual(requeue_stale(), 0)
+        
+        Job.objects.filter(pk=job.pk).update(locked_at=expired)
+        self.assertEqual(requeue_stale(), 1)
+        other = claim_next('worker-2')
+        self.assertEqual(other.attempts, 2)
+        # O primeiro worker termina depois: o resultado não sobrescreve a nova reserva
+        with self.assertLogs('core.jobs', level='WARNING'):
+            self.assertFalse(run_job(job))
+        self.assertEqual(Job.objects.get(pk=job.pk).locked_by, 'worker-2')
+        
+        Job.objects.filter(pk=job.pk).update(locked_at=expired)
+        requeue_stale()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNone(claim_next('worker-3'))
+    
+    def test_organization_delete_enqueues_job(self):
+        """
+        Testa se a desativação de organização pela view é agendada, não executada.
+        """
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.post(reverse('organizations:organization_delete', args=[self.organization.pk]))
+        
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('core:job_detail', args=[job.pk]))
+        self.organization.refresh_from_db()
+        self.assertTrue(self.organization.is_active)
+        
+        response = self.client.get(reverse('core:job_status', args=[job.pk]), HTTP_HX_REQUEST='true')
+        self.assertContains(response, 'hx-trigger="every 2s"')
+    
+    def test_job_status_is_private(self):
+        """
+        Testa se um usuário não acessa jobs criados por outro usuário.
+        """
+        job = enqueue('organizations.deactivate_organization', {'organization_id': self.organization.pk}, user=self.superuser)
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('core:job_detail', args=[job.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+class OrganizationRollupTest(TestCase):
+    """
+    Testes para os totais materializados por organização.
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Organização Teste')
+        self.company = Company.objects.create(organization=self.organization, name='Empresa Teste')
+        self.group = Group.objects.create(name='Gerente da Empresa')
+    
+    def snapshot(self):
+        rollup = OrganizationRollup.objects.get(organization=self.organization)
+        return {
+            'counts': (rollup.active_companies, rollup.inactive_companies, rollup.active_users, rollup.inactive_users),
+            'groups': dict(OrganizationGroupRollup.objects.filter(
+                organization=self.organization, users__gt=0
+            ).values_list('group_id', 'users')),
+            'signups': sum(OrganizationSignupRollup.objects.filter(
+                organization=self.organization
+            ).values_list('signups', flat=True)),
+        }
+    
+    def test_incremental_updates_match_full_refresh(self):
+        """
+        Testa se os deltas aplicados pelos sinais resultam nos mesmos totais do recálculo completo.
+        """
+        Company.objects.create(organization=self.organization, name='Empresa Inativa', is_active=False)
+        users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', company=self.company)
+            for i in range(3)
+        ]
+        users[0].groups.add(self.group)
+        users[1].groups.add(self.group)
+        users[1].groups.clear()
+        users[2].is_active = False
+        users[2].save()
+        self.company.is_active = False
+        self.company.save()
+        
+        incremental = self.snapshot()
+        self.assertEqual(incremental['counts'], (0, 2, 2, 1))
+        self.assertEqual(incremental['groups'], {self.group.pk: 1})
+        self.assertEqual(incremental['signups'], 3)
+        
+        refresh_all()
+        self.assertEqual(self.snapshot(), incremental)
+    
+    def test_login_does_not_touch_rollups(self):
+        """
+        Testa se saves restritos a outros campos (como o login) não consultam os totais.
+        """
+        User.objects.create_user(username='testuser', email='test@example.com', password='testpass123', company=self.company)
+        user = User.objects.get(username='testuser')
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+    
+    def test_company_move_refreshes_both_organizations(self):
+        """
+        Testa se mover uma empresa de organização recalcula as duas organizações após o commit.
+        """
+        User.objects.create_user(username='testuser', email='test@example.com', company=self.company)
+        other = Organization.objects.create(name='Outra Organização')
+        self.company.organization = other
+        with self.captureOnCommitCallbacks(execute=True):
+            self.company.save()
+        
+        self.assertEqual(self.snapshot()['counts'], (0, 0, 0, 0))
+        moved = OrganizationRollup.objects.get(organization=other)
+        self.assertEqual((moved.active_companies, moved.active_users), (1, 1))
+    
+    def test_report_reads_rollup(self):
+        """
+        Testa o relatório da organização para o administrador.
+        """
+        admin = User.objects.create_user(
+            username='orgadmin',
+            email='orgadmin@example.com',
+            password='testpass123',
+            company=self.company
+        )
+        admin.user_permissions.add(Permission.objects.get(codename='view_organization'))
+        self.client.login(username='orgadmin', password='testpass123')
+        
+        response = self.client.get(reverse('core:organization_report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['rollup'].active_users, 1)
+    
+    def test_report_ignores_invalid_organization(self):
+        """
+        Testa se um ``?organization=`` inválido mostra a primeira organização em vez de causar erro.
+        """
+        User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.get(reverse('core:organization_report'), {'organization': 'abc'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['rollup'].organization, self.organization)
+
+
+class ActivitySeriesTest(TestCase):
+    """
+    Testes para as séries de atividade pré-agregadas.
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        cache.clear()
+        self.organization = Organization.objects.create(name='Organização Teste')
+        self.company = Company.objects.create(organization=self.organization, name='Empresa Teste')
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            company=self.company
+        )
+    
+    def test_buckets_are_updated_incrementally(self):
+        """
+        Testa se criações e logins incrementam os baldes globais e da organização.
+        """
+        self.client.login(username='testuser', password='testpass123')
+        today = timezone.localdate()
+        
+        for scope in (ActivityBucket.GLOBAL_SCOPE, self.organization.pk):
+            for metric in (ActivityBucket.USERS_JOINED, ActivityBucket.COMPANIES_CREATED, ActivityBucket.LOGINS):
+                bucket = ActivityBucket.objects.get(metric=metric, period=ActivityBucket.DAY, scope=scope, start=today)
+                self.assertEqual(bucket.count, 1)
+    
+    def test_rebuild_matches_incremental(self):
+        """
+        Testa se a reconstrução completa gera os mesmos baldes de cadastro.
+        """
+        before = set(ActivityBucket.objects.filter(
+            metric=ActivityBucket.USERS_JOINED
+        ).values_list('period', 'scope', 'start', 'count'))
+        activity.rebuild()
+        after = set(ActivityBucket.objects.filter(
+            metric=ActivityBucket.USERS_JOINED
+        ).values_list('period', 'scope', 'start', 'count'))
+        self.assertEqual(before, after)
+    
+    def test_series_endpoint(self):
+        """
+        Testa o endpoint JSON, com intervalos vazios preenchidos com zero.
+        """
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('core:activity_series'), {
+            'metric': 'users_joined',
+            'period': 'day',
+            'points': 7,
+        })
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(len(payload['labels']), 7)
+        self.assertEqual(payload['labels'][-1], timezone.localdate().isoformat())
+        self.assertEqual(payload['data'], [0, 0, 0, 0, 0, 0, 1])
+        
+        response = self.client.get(reverse('core:activity_series'), {'metric': 'invalid'})
+        self.assertEqual(response.status_code, 400)
+
+
+
+class StaticAssetsTest(TestCase):
+    """
+    Testes dos arquivos estáticos pré-comprimidos do modo de produção.
+    """
+    
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        self.css = b'.card { padding: 1rem; margin: 0 auto; }\n' * 100
+    
+    def test_storage_writes_gzip_variant(self):
+        """
+        Testa se o armazenamento grava a variante .gz ao lado do arquivo.
+        """
+        storage = PrecompressedManifestStaticFilesStorage(location=self.static_root)
+        storage.save('css/app.css', ContentFile(self.css))
+        with open(Path(self.static_root) / 'css' / 'app.css.gz', 'rb') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), self.css)
+    
+    def test_serve_prefers_precompressed_file(self):
+        """
+        Testa se a view entrega o .gz aceito pelo cliente com cache imutável.
+        """
+        css_dir = Path(self.static_root) / 'css'
+        css_dir.mkdir()
+        (css_dir / 'app.0123456789ab.css').write_bytes(self.css)
+        (css_dir / 'app.0123456789ab.css.gz').write_bytes(gzip.compress(self.css))
+        
+        with override_settings(STATIC_ROOT=self.static_root):
+            request = RequestFactory().get('/static/css/app.0123456789ab.css', HTTP_ACCEPT_ENCODING='gzip, deflate')
+            response = serve_static(request, 'css/app.0123456789ab.css')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Content-Disposition'], 'inline; filename="app.0123456789ab.css"')
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.css)
+            
+            request = RequestFactory().get('/static/css/app.0123456789ab.css')
+            response = serve_static(request, 'css/app.0123456789ab.css')
+            self.assertNotIn('Content-Encoding', response)
+            response.close()
+
+
+class HtmxNavigationTest(TestCase):
+    """
+    Testes da renderização parcial nas navegações com HTMX.
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+        self.client.login(username='admin', password='adminpass123')
+        self.url = reverse('accounts:user_list')
+    
+    def test_full_page_renders_layout(self):
+        """
+        Testa se o acesso direto renderiza o layout completo.
+        """
+        response = self.client.get(self.url)
+        self.assertContains(response, '<html')
+        self.assertContains(response, 'id="main-content"')
+        self.assertContains(response, 'data-nav="users" class="active"')
+        self.assertIn('HX-Boosted', response['Vary'])
+    
+    def test_boosted_navigation_skips_layout(self):
+        """
+        Testa se a navegação boosted devolve só o conteúdo e as trocas out-of-band.
+        """
+        response = self.client.get(self.url, HTTP_HX_REQUEST='true', HTTP_HX_BOOSTED='true',
+                                   HTTP_HX_TARGET='main-content')
+        self.assertNotContains(response, '<html')
+        self.assertNotContains(response, 'id="main-content"')
+        self.assertContains(response, '<title>Usuários - Painel Administrativo</title>', html=True)
+        # Do menu, só o marcador do item ativo
+        self.assertNotContains(response, 'sidebar-nav')
+        self.assertContains(response, '<span id="nav-section" data-section="users" hidden hx-swap-oob="true"></span>',
+                            html=True)
+        self.assertContains(response, 'hx-swap-oob="true"', count=2)
+        self.assertContains(response, 'Adicionar Usuário')
+    
+    def test_fragment_request_renders_partial(self):
+        """
+        Testa se requisições HTMX para um trecho da página usam só o template parcial.
+        """
+        response = self.client.get(self.url, {'q': 'admin'}, HTTP_HX_REQUEST='true',
+                                   HTTP_HX_TARGET='user-list')
+        self.assertNotContains(response, 'sidebar-nav')
+        self.assertNotContains(response, 'Adicionar Usuário')
+        self.assertContains(response, 'admin@example.com')
+    
+    def test_history_restore_renders_full_page(self):
+        """
+        Testa se a restauração do histórico recebe a página completa.
+        """
+        response = self.client.get(self.url, HTTP_HX_REQUEST='true', HTTP_HX_BOOSTED='true',
+                                   HTTP_HX_HISTORY_RESTORE_REQUEST='true')
+        self.assertContains(response, '<html')
+
+
+
+class WarmCachesTest(TransactionTestCase):
+    """
+    Testes para o aquecimento de caches (warm_caches).
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.organization = Organization.objects.create(name='Organização Quente')
+        self.company = Company.objects.create(organization=self.organization, name='Empresa Quente')
+        User.objects.create_user(username='quente', password='senha-123', company=self.company)
+    
+    def test_command_fills_caches(self):
+        """
+        Testa se o comando compila os templates e preenche catálogo e contagens.
+        """
+        out = StringIO()
+        call_command('warm_caches', workers=2, stdout=out)
+        output = out.getvalue()
+        self.assertIn('templates:', output)
+        self.assertIn('data: 1 item(ns)', output)
+        self.assertIsNotNone(cache.get(PERMISSION_CATALOG_KEY))
+        with self.assertNumQueries(0):
+            self.assertEqual(stats.organization_counts(self.organization.pk)['user_count'], 1)
+            self.assertEqual(stats.company_counts(self.company.pk)['user_count'], 1)
+            self.assertEqual(stats.global_counts()['organization_count'], 1)
+    
+    def test_all_templates_compile(self):
+        """
+        Testa se todos os templates do projeto compilam sem erros.
+        """
+        count, errors = warmup.compile_templates()
+        self.assertEqual(errors, [])
+        self.assertGreater(count, 20)
+    
+    def test_catalog_is_cleared_after_migrate(self):
+        """
+        Testa se o catálogo de permissões é descartado pelo post_migrate.
+        """
+        warmup.load_permission_catalog()
+        call_command('migrate', verbosity=0)
+        self.assertIsNone(cache.get(PERMISSION_CATALOG_KEY))
+    
+    @override_settings(WARM_CACHES_ON_STARTUP=True)
+    def test_startup_skips_data_step(self):
+        """
+        Testa se o aquecimento na inicialização não calcula as contagens das organizações.
+        """
+        warmup.warm_on_startup().join()
+        self.assertIsNotNone(cache.get(PERMISSION_CATALOG_KEY))
+        self.assertIsNone(cache.get(f'dashboard-stats:org:{self.organization.pk}'))
+
+
+
+class StartupProfileTest(TestCase):
+    """
+    Testes para o perfil de inicialização (startup_profile).
+    """
+    
+    OUTPUT = (
+        'import time: self [us] | cumulative | imported package\n'
+        'import time:       300 |        300 |   django.contrib.admin.sites\n'
+        'import time:       700 |       1000 | django.contrib.admin\n'
+        'import time:       200 |        200 |     organizations.models\n'
+        'import time:       100 |        100 |   core.signals\n'
+        'import time:        50 |         50 | json.decoder\n'
+    )
+    
+    def test_groups_self_time_by_installed_app(self):
+        """
+        Testa se o tempo próprio é somado por app instalado (prefixo mais longo) ou pacote de topo.
+        """
+        entries = startup.parse_importtime(self.OUTPUT)
+        self.assertEqual(len(entries), 5)
+        self.assertEqual(entries[1], startup.ImportEntry('django.contrib.admin', 700, 1000))
+        
+        installed_apps = ['django.contrib.admin', 'core', 'organizations']
+        self.assertEqual(startup.group_by_app(entries, installed_apps), [
+            ('django.contrib.admin', 1000),
+            ('organizations', 200),
+            ('core', 100),
+            ('json', 50),
+        ])
+
+
+
+class LiveEventsTest(TestCase):
+    """
+    Testes para os eventos ao vivo (SSE) das listagens.
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.organization = Organization.objects.create(name='Organização Ao Vivo')
+        self.company = Company.objects.create(organization=self.organization, name='Empresa Ao Vivo')
+        self.other_organization = Organization.objects.create(name='Outra Organização')
+        self.other_company = Company.objects.create(organization=self.other_organization, name='Outra Empresa')
+        self.manager = User.objects.create_user(username='gestor', password='senha-123', company=self.company)
+        self.manager.user_permissions.add(*Permission.objects.filter(
+            codename__in=['view_company', 'view_user', 'view_all_users']
+        ))
+    
+    def test_filter_follows_tenant_scope(self):
+        """
+        Testa se o filtro aceita apenas eventos da organização do usuário.
+        """
+        accepts = live.event_filter(User.objects.get(pk=self.manager.pk))
+        self.assertTrue(accepts(live.Event('company', live.UPDATED, self.company.pk,
+                                           (self.organization.pk,), (self.company.pk,))))
+        self.assertFalse(accepts(live.Event('company', live.UPDATED, self.other_company.pk,
+                                            (self.other_organization.pk,), (self.other_company.pk,))))
+        # Mudança de organização: vale para a origem e para o destino
+        self.assertTrue(accepts(live.Event('user', live.UPDATED, 99,
+                                           (self.organization.pk, self.other_organization.pk), ())))
+        self.assertTrue(accepts(live.RESET))
+    
+    def test_stream_requires_asgi(self):
+        """
+        Testa se, sob WSGI, o stream responde 204 para o EventSource não reconectar.
+        """
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('core:live_events'))
+        self.assertEqual(response.status_code, 204)
+    
+    def _change_companies(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_company.name = 'Outra Empresa (editada)'
+            self.other_company.save()
+            self.company.name = 'Empresa Ao Vivo (editada)'
+            self.company.save()
+    
+    async def test_stream_delivers_scoped_events(self):
+        """
+        Testa se o stream entrega, após o commit, apenas as mudanças do escopo do usuário.
+        """
+        await sync_to_async(self.async_client.force_login)(self.manager)
+        response = await self.async_client.get(reverse('core:live_events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        
+        await sync_to_async(self._change_companies)()
+        message = await asyncio.wait_for(anext(stream), timeout=1)
+        self.assertEqual(
+            message,
+            f'data: {{"kind": "company", "action": "updated", "pk": {self.company.pk}}}\n\n'.encode()
+        )
+        await stream.aclose()
+    
+    def test_row_view_respects_scope(self):
+        """
+        Testa se a linha é renderizada no escopo do usuário e vem vazia fora dele.
+        """
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('organizations:company_row', args=[self.organization.pk, self.company.pk]))
+        self.assertContains(response, f'data-live-row="company:{self.company.pk}"')
+        self.assertContains(response, 'Empresa Ao Vivo')
+        
+        response = self.client.get(
+            reverse('organizations:company_row', args=[self.other_organization.pk, self.other_company.pk])
+        )
+        self.assertEqual(response.content, b'')
+    
+    def test_changes_invalidate_dashboard_counts(self):
+        """
+        Testa se a criação de uma empresa descarta as contagens em cache da organização.
+        """
+        self.assertEqual(stats.organization_counts(self.organization.pk)['company_count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Company.objects.create(organization=self.organization, name='Nova Empresa')
+        self.assertEqual(stats.organization_counts(self.organization.pk)['company_count'], 2)
+
+
+@override_settings(TENANT_SHARDS=['default'])
+class MergedQuerySetTest(TestCase):
+    """
+    Testes para a mescla de resultados entre shards. O banco de testes aparece
+    duas vezes na lista de shards, simulando dois bancos com o mesmo conteúdo.
+    """
+    
+    def setUp(self):
+        for name in ('Beta', 'Alfa', 'Gama'):
+            Organization.objects.create(name=name)
+    
+    def test_slices_are_merged_in_order(self):
+        """
+        Testa se contagem, fatias e iteração percorrem os shards na ordem do order_by.
+        """
+        merged = Organization.objects.order_by('name').across_shards()
+        self.assertEqual(merged.count(), 6)
+        self.assertEqual([organization.name for organization in merged[1:4]], ['Alfa', 'Beta', 'Beta'])
+        
+        descending = Organization.objects.order_by('-name').across_shards()
+        self.assertEqual(
+            [organization.name for organization in descending],
+            ['Gama', 'Gama', 'Beta', 'Beta', 'Alfa', 'Alfa']
+        )
+    
+    def test_mixed_directions_are_rejected(self):
+        """
+        Testa se ordenações com direções diferentes são recusadas.
+        """
+        with self.assertRaises(ValueError):
+            Organization.objects.order_by('name', '-created_at').across_shards()[:5]
+    
+    def test_bound_context_does_not_fan_out(self):
+        """
+        Testa se, com um shard no contexto, a consulta continua sendo um queryset comum.
+        """
+        queryset = Organization.objects.order_by('name')
+        with sharding.use_shard('default'):
+            self.assertIs(queryset.across_shards(), queryset)
+
+
+@skipUnless(settings.TENANT_SHARDS, 'Defina PANEL_TENANT_SHARDS (ex.: shard1) para testar os shards.')
+class TenantShardingTest(TestCase):
+    """
+    Testes para os shards por organização com bancos SQLite locais.
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        cache.clear()
+        self.shard = settings.TENANT_SHARDS[0]
+        self.superuser = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpass123'
+        )
+        self.local = Organization.objects.create(name='Organização Local')
+        with sharding.use_shard(self.shard):
+            self.remote = Organization.objects.create(name='Organização Remota')
+            self.company = Company.objects.create(organization=self.remote, name='Empresa Remota')
+            self.manager = User.objects.create_user(
+                username='remoto', email='remoto@example.com', password='testpass123', company=self.company
+            )
+            self.manager.user_permissions.add(*Permission.objects.filter(
+                codename__in=['view_organization', 'view_company']
+            ))
+    
+    def test_ids_identify_the_shard(self):
+        """
+        Testa se cada shard numera os pks na própria faixa.
+        """
+        self.assertLess(self.local.pk, settings.TENANT_SHARD_ID_SPAN)
+        self.assertGreaterEqual(self.remote.pk, settings.TENANT_SHARD_ID_SPAN)
+        self.assertEqual(sharding.shard_for_organization(self.local.pk), 'default')
+        self.assertEqual(sharding.shard_for_organization(self.remote.pk), self.shard)
+    
+    def test_superuser_sees_all_shards(self):
+        """
+        Testa se o superusuário lista e acessa organizações de todos os shards.
+        """
+        self.client.force_login(self.superuser)
+        response = self.client.get(reverse('organizations:organization_list'))
+        self.assertContains(response, 'Organização Local')
+        self.assertContains(response, 'Organização Remota')
+        
+        response = self.client.get(reverse('organizations:company_list', args=[self.remote.pk]))
+        self.assertContains(response, 'Empresa Remota')
+        
+        response = self.client.get(reverse('core:dashboard'))
+        self.assertEqual(response.context['organization_count'], 2)
+        self.assertEqual(response.context['user_count'], 2)
+    
+    def test_superuser_with_company_is_not_pinned(self):
+        """
+        Testa se o superusuário com empresa continua consultando todos os shards após o login.
+        """
+        with sharding.use_shard(self.shard):
+            User.objects.create_superuser(
+                username='admin-remoto', email='admin-remoto@example.com', password='adminpass123',
+                company=self.company
+            )
+        self.assertTrue(self.client.login(username='admin-remoto', password='adminpass123'))
+        self.assertNotIn(sharding.SESSION_KEY, self.client.session)
+        response = self.client.get(reverse('organizations:organization_list'))
+        self.assertContains(response, 'Organização Local')
+        self.assertContains(response, 'Organização Remota')
+    
+    def test_tenant_requests_use_their_shard(self):
+        """
+        Testa se o login encontra o usuário no shard dele e prende as requisições seguintes ao shard.
+        """
+        self.assertTrue(self.client.login(username='remoto', password='testpass123'))
+        response = self.client.get(reverse('organizations:company_list', args=[self.remote.pk]))
+        self.assertContains(response, 'Empresa Remota')
+    
+    def test_username_is_unique_across_shards(self):
+        """
+        Testa se o cadastro recusa um username já usado em outro shard.
+        """
+        form = CustomUserCreationForm(data={
+            'username': 'remoto',
+            'email': 'novo@example.com',
+            'password1': 'Senha-forte-123',
+            'password2': 'Senha-forte-123',
+        }, user=self.superuser)
+        self.assertFalse(form.is_valid())
+        self.assertIn('username', form.errors)
+    
+    def test_move_organization(self):
+        """
+        Testa se o comando move a organização com empresas, usuários, grupos e totais.
+        """
+        company = Company.objects.create(organization=self.local, name='Empresa Local')
+        user = User.objects.create_user(
+            username='local', email='local@example.com', password='testpass123', company=company
+        )
+        user.groups.add(Group.objects.create(name='Operadores'))
+        
+        call_command('move_organization', self.local.pk, self.shard, stdout=StringIO())
+        
+        self.assertEqual(sharding.shard_for_organization(self.local.pk), self.shard)
+        self.assertFalse(Organization.objects.filter(pk=self.local.pk).exists())
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        moved = User.objects.using(self.shard).get(pk=user.pk)
+        self.assertEqual(moved.company_id, company.pk)
+        self.assertEqual(list(moved.groups.values_list('name', flat=True)), ['Operadores'])
+        self.assertEqual(OrganizationRollup.objects.using(self.shard).get(pk=self.local.pk).active_users, 1)
+        self.assertTrue(self.client.login(username='local', password='testpass123'))
+        
+        # No SQLite, pks da faixa do shard não podem voltar para o default
+        with self.assertRaises(CommandError):
+            call_command('move_organization', self.remote.pk, 'default', stdout=StringIO())
+    
+    def test_move_organization_freezes_source(self):
+        """
+        Testa se a organização fica bloqueada na origem antes da cópia e só é removida no mesmo commit.
+        """
+        from .management.commands.move_organization import Command
+        
+        copy_tenant = Command._copy_tenant
+        before_copy = []
+        
+        def copy_and_record(command, *args):
+            before_copy.extend(query['sql'] for query in source.captured_queries)
+            return copy_tenant(command, *args)
+        
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as source, \
+                mock.patch.object(Command, '_copy_tenant', copy_and_record):
+            call_command('move_organization', self.local.pk, self.shard, stdout=StringIO())
+        self.assertTrue(any(sql.startswith('UPDATE "organizations_organization"') for sql in before_copy))
+        self.assertFalse(any(sql.startswith('DELETE') for sql in before_copy))
+        self.assertTrue(Organization.objects.using(self.shard).filter(pk=self.local.pk).exists())
+    
+    def test_live_events_wait_for_the_shard_commit(self):
+        """
+        Testa se os eventos ao vivo de gravações no shard saem no commit do shard, e não no do default.
+        """
+        with mock.patch.object(live, '_dispatch') as dispatch:
+            with self.captureOnCommitCallbacks(using=self.shard, execute=True):
+                with sharding.use_shard(self.shard), transaction.atomic(using=self.shard):
+                    company = Company.objects.create(organization=self.remote, name='Nova Empresa Remota')
+                    live.publish('organization', live.UPDATED, self.remote.pk, [self.remote.pk])
+                self.assertFalse(dispatch.called)
+        self.assertEqual(
+            [(event.kind, event.pk) for (event,), _ in dispatch.call_args_list],
+            [('company', company.pk), ('organization', self.remote.pk)]
+        )
+    
+    def test_move_companies_within_a_shard(self):
+        """
+        Testa se empresas só mudam de organização dentro do mesmo shard.
+        """
+        with self.assertRaises(CommandError):
+            call_command('move_companies', self.local.pk, self.company.pk, stdout=StringIO())
+        self.assertEqual(Company.objects.using(self.shard).get(pk=self.company.pk).organization_id, self.remote.pk)
+        
+        with sharding.use_shard(self.shard):
+            merged = Organization.objects.create(name='Organização Incorporadora')
+        call_command('move_companies', merged.pk, self.company.pk, stdout=StringIO())
+        self.assertEqual(Company.objects.using(self.shard).get(pk=self.company.pk).organization_id, merged.pk)
+        self.assertEqual(User.objects.for_org(merged.pk).across_shards().count(), 1)
+
+
+class TunedSQLiteTest(SimpleTestCase):
+    """
+    Testes do backend SQLite de produção (core.sqlite) em um arquivo temporário.
+    """
+    alias = 'sqlite-tuned'
+    threads = 8
+    operations = 25
+    
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        connections.settings[self.alias] = connections.configure_settings({
+            DEFAULT_DB_ALIAS: {},
+            self.alias: {'ENGINE': 'core.sqlite', 'NAME': str(Path(directory) / 'tuned.sqlite3')},
+        })[self.alias]
+        self.addCleanup(connections.settings.pop, self.alias)
+        self.addCleanup(self.close_connection)
+        
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)')
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY AUTOINCREMENT, worker INTEGER NOT NULL)')
+            cursor.execute('INSERT INTO counter (id, value) VALUES (1, 0)')
+    
+    def close_connection(self):
+        connections[self.alias].close()
+        del connections[self.alias]
+    
+    def test_connection_pragmas(self):
+        """
+        Testa se as conexões abrem em WAL, com synchronous=NORMAL, mmap e busy timeout.
+        """
+        with connections[self.alias].cursor() as cursor:
+            values = {}
+            for name in ('journal_mode', 'synchronous', 'mmap_size', 'busy_timeout'):
+                cursor.execute(f'PRAGMA {name}')
+                values[name] = cursor.fetchone()[0]
+        self.assertEqual(values, {
+            'journal_mode': 'wal', 'synchronous': 1, 'mmap_size': 128 * 1024 * 1024, 'busy_timeout': 5000,
+        })
+    
+    def test_concurrent_reads_and_writes(self):
+        """
+        Testa leituras e escritas de várias threads em paralelo: nenhuma falha
+        de lock, nenhuma atualização perdida e vazão mínima.
+        """
+        errors = []
+        start = threading.Barrier(self.threads)
+        
+        def work(worker):
+            connection = connections[self.alias]
+            try:
+                start.wait()
+                for _ in range(self.operations):
+                    # Lê e depois escreve na mesma transação: com BEGIN deferred é
+                    # onde o SQLite falharia sem esperar pelo busy timeout
+                    with transaction.atomic(using=self.alias), connection.cursor() as cursor:
+                        cursor.execute('SELECT value FROM counter WHERE id = 1')
+                        value = cursor.fetchone()[0]
+                        cursor.execute('UPDATE counter SET value = %s WHERE id = 1', [value + 1])
+                        cursor.execute('INSERT INTO item (worker) VALUES (%s)', [worker])
+                    with connection.cursor() as cursor:
+                        cursor.execute('SELECT COUNT(*) FROM item')
+                        cursor.fetchone()
+            except OperationalError as exc:
+                errors.append(exc)
+            finally:
+                self.close_connection()
+        
+        workers = [threading.Thread(target=work, args=(index,)) for index in range(self.threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        
+        self.assertEqual(errors, [])
+        total = self.threads * self.operations
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('SELECT value FROM counter WHERE id = 1')
+            self.assertEqual(cursor.fetchone()[0], total)
+            cursor.execute('SELECT COUNT(*) FROM item')
+            self.assertEqual(cursor.fetchone()[0], total)
+        # Folga larga para máquinas de CI lentas; localmente passa de milhares por segundo
+        self.assertGreater(total / elapsed, 50)
+
+
+
+class ArchiveTest(TestCase):
+    """
+    Testes do arquivamento de usuários e empresas inativos (core.archive).
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        old = timezone.now() - datetime.timedelta(days=settings.ARCHIVE_AFTER_DAYS + 10)
+        self.organization = Organization.objects.create(name='Organização Teste')
+        self.company = Company.objects.create(organization=self.organization, name='Empresa Ativa')
+        self.closed = Company.objects.create(organization=self.organization, name='Empresa Encerrada', is_active=False)
+        self.group = Group.objects.create(name='Gerentes')
+        self.active = User.objects.create_user(
+            username='ativo', email='ativo@example.com', password='testpass123', company=self.company
+        )
+        self.gone = User.objects.create_user(
+            username='antigo', email='antigo@example.com', password='testpass123', company=self.company,
+            is_active=False
+        )
+        self.former = User.objects.create_user(
+            username='ex', email='ex@example.com', password='testpass123', company=self.closed, is_active=False
+        )
+        self.former.groups.add(self.group)
+        User.objects.filter(pk__in=[self.gone.pk, self.former.pk]).update(date_joined=old)
+        Company.objects.filter(pk=self.closed.pk).update(updated_at=old)
+    
+    def archive_all(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return list(archive.archive_inactive(pause=0, **kwargs))
+    
+    def test_archives_inactive_users_then_empty_companies(self):
+        """
+        Testa se usuários e empresas inativos saem das tabelas principais e dos totais.
+        """
+        batches = self.archive_all()
+        self.assertEqual([(batch.model, batch.count) for batch in batches], [('accounts.user', 2), ('organizations.company', 1)])
+        self.assertEqual(list(User.objects.values_list('username', flat=True)), ['ativo'])
+        self.assertEqual(list(Company.objects.values_list('name', flat=True)), ['Empresa Ativa'])
+        self.assertEqual(ArchivedUser.objects.get(pk=self.former.pk).organization_id, self.organization.pk)
+        self.assertTrue(ArchivedCompany.objects.filter(pk=self.closed.pk).exists())
+        
+        rollup = OrganizationRollup.objects.get(organization=self.organization)
+        self.assertEqual((rollup.active_users, rollup.inactive_users, rollup.inactive_companies), (1, 0, 0))
+        # Nada mais a arquivar
+        self.assertEqual(self.archive_all(), [])
+    
+    def test_batches_and_command_limit(self):
+        """
+        Testa os lotes do comando (tamanho e limite de lotes por execução).
+        """
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_inactive', batch_size=1, sleep=0, max_batches=1, stdout=out)
+        self.assertIn('1 registro(s) arquivado(s)', out.getvalue())
+        self.assertEqual(ArchivedUser.objects.count(), 1)
+        
+        out = StringIO()
+        call_command('archive_inactive', dry_run=True, stdout=out)
+        self.assertIn('1 usuário(s) e 0 empresa(s)', out.getvalue())
+    
+    def test_restore_company_with_users(self):
+        """
+        Testa se a restauração devolve empresa, usuários, senha e grupos.
+        """
+        self.archive_all()
+        with self.captureOnCommitCallbacks(execute=True):
+            archive.restore_company(self.closed.pk)
+        
+        user = User.objects.get(pk=self.former.pk)
+        self.assertEqual(user.company_id, self.closed.pk)
+        self.assertFalse(user.is_active)
+        self.assertTrue(user.check_password('testpass123'))
+        self.assertEqual(list(user.groups.all()), [self.group])
+        self.assertFalse(ArchivedCompany.objects.exists())
+        self.assertEqual(list(ArchivedUser.objects.values_list('pk', flat=True)), [self.gone.pk])
+        self.assertEqual(OrganizationRollup.objects.get(organization=self.organization).inactive_users, 1)
+    
+    def test_restore_conflicts(self):
+        """
+        Testa se a restauração é recusada quando o username foi reaproveitado.
+        """
+        self.archive_all()
+        User.objects.create_user(username='antigo', email='novo@example.com', password='testpass123')
+        with self.assertRaises(archive.ArchiveError):
+            archive.restore_user(self.gone.pk)
+        self.assertTrue(ArchivedUser.objects.filter(pk=self.gone.pk).exists())
+        with self.assertRaises(CommandError):
+            call_command('restore_archived', 'user', '999')
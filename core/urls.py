@@ -5,4 +5,16 @@ app_name = 'core'
 
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
+    path('reports/organization/', views.organization_report, name='organization_report'),
+    path('reports/activity.json', views.activity_series, name='activity_series'),
+    
+    # Jobs em segundo plano
+    path('jobs/<int:pk>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:pk>/status/', views.job_status, name='job_status'),
+    
+    # Eventos ao vivo (SSE)
+    path('events/', views.live_events, name='live_events'),
+    
+    # Instrumentação
+    path('metrics.json', views.metrics_snapshot, name='metrics'),
 ]
\ No newline at end of file
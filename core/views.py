@@ -1,70 +1,231 @@
-from django.shortcuts import render
-from django.contrib.auth.decorators import login_required
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.contrib.auth.decorators import login_required, permission_required
 from organizations.models import Organization, Company
 from django.contrib.auth import get_user_model
+from . import activity, live, metrics, sharding, stats
+from .decorators import read_from_replica
+from .rendering import render
+from .models import ActivityBucket, Job, OrganizationRollup, OrganizationGroupRollup, OrganizationSignupRollup
 
 User = get_user_model()
 
+REPORT_SIGNUP_WEEKS = 12
+
 @login_required
+@read_from_replica
 def dashboard(request):
     """
     Dashboard principal do sistema.
     Exibe estatísticas e links para as principais funcionalidades.
     """
     user = request.user
-    context = {}
-    
-    # Contagem de organizações, empresas e usuários
-    organization_count = Organization.objects.count()
-    company_count = Company.objects.count()
-    user_count = User.objects.count()
+    context = {'active_hours': settings.LAST_SEEN_ACTIVE_HOURS}
     
     # Filtra os dados com base no tipo de usuário
     if user.is_superuser:
         # Superusuário vê todas as estatísticas
-        context['organization_count'] = organization_count
-        context['company_count'] = company_count
-        context['user_count'] = user_count
+        context.update(stats.global_counts())
         
         # Organizações recentes
-        context['recent_organizations'] = Organization.objects.all().order_by('-created_at')[:5]
+        context['recent_organizations'] = Organization.objects.order_by('-created_at').across_shards()[:5]
         
         # Empresas recentes
-        context['recent_companies'] = Company.objects.all().order_by('-created_at')[:5]
+        context['recent_companies'] = Company.objects.order_by('-created_at').across_shards()[:5]
         
         # Usuários recentes
-        context['recent_users'] = User.objects.all().order_by('-date_joined')[:5]
+        context['recent_users'] = User.objects.order_by('-date_joined').across_shards()[:5]
         
     elif user.has_perm('organizations.view_all_organizations') and user.company and user.company.organization:
         # Administrador da Organização vê estatísticas da sua organização
         organization = user.company.organization
         context['organization'] = organization
-        context['organization_count'] = 1  # Apenas a própria organização
-        context['company_count'] = Company.objects.filter(organization=organization).count()
-        context['user_count'] = User.objects.filter(company__organization=organization).count()
+        context.update(stats.organization_counts(organization.pk))
         
         # Empresas recentes da organização
-        context['recent_companies'] = Company.objects.filter(
-            organization=organization
-        ).order_by('-created_at')[:5]
+        context['recent_companies'] = Company.objects.for_org(organization).order_by('-created_at')[:5]
         
         # Usuários recentes da organização
-        context['recent_users'] = User.objects.filter(
-            company__organization=organization
-        ).order_by('-date_joined')[:5]
+        context['recent_users'] = User.objects.for_org(organization).order_by('-date_joined')[:5]
         
     elif user.company:
         # Gerente da Empresa vê estatísticas da sua empresa
         company = user.company
         context['organization'] = company.organization
         context['company'] = company
-        context['organization_count'] = 1  # Apenas a própria organização
-        context['company_count'] = 1  # Apenas a própria empresa
-        context['user_count'] = User.objects.filter(company=company).count()
+        context.update(stats.company_counts(company.pk))
         
         # Usuários recentes da empresa
-        context['recent_users'] = User.objects.filter(
-            company=company
-        ).order_by('-date_joined')[:5]
+        context['recent_users'] = User.objects.for_company(company).order_by('-date_joined')[:5]
+    
+    return render(request, 'core/dashboard.html', context)
+
+def _get_job_for_user(request, pk):
+    """
+    Retorna o job se ele pertencer ao usuário logado (ou se for superusuário).
+    """
+    jobs = Job.objects.all()
+    if not request.user.is_superuser:
+        jobs = jobs.filter(created_by=request.user)
+    return get_object_or_404(jobs, pk=pk)
+
+@login_required
+def job_detail(request, pk):
+    """
+    Página de acompanhamento de um job em segundo plano.
+    """
+    job = _get_job_for_user(request, pk)
+    return render(request, 'core/job_detail.html', {'job': job})
+
+@login_required
+def job_status(request, pk):
+    """
+    Parcial com o status do job, consultada periodicamente via HTMX
+    enquanto o job não termina.
+    """
+    job = _get_job_for_user(request, pk)
+    return render(request, 'core/partials/job_status.html', {'job': job})
+
+@login_required
+@permission_required('organizations.view_organization', raise_exception=True)
+@read_from_replica
+def organization_report(request):
+    """
+    Relatório por organização lido apenas das tabelas de totais materializados.
+    Administradores veem a própria organização; superusuários escolhem qualquer uma.
+    """
+    user = request.user
+    organizations = None
+    
+    if user.is_superuser:
+        organizations = Organization.objects.order_by('name').only('pk', 'name').across_shards()
+        first = organizations[:1]
+        value = request.GET.get('organization', '')
+        organization_id = int(value) if value.isdigit() else (first[0].pk if first else None)
+    elif user.company:
+        organization_id = user.company.organization_id
+    else:
+        organization_id = None
+    
+    rollup = None
+    group_rollups = signup_rollups = []
+    # Os totais ficam no shard da organização (core.sharding)
+    with sharding.for_organization(organization_id):
+        if organization_id:
+            rollup = OrganizationRollup.objects.select_related('organization').filter(
+                organization_id=organization_id
+            ).first()
+        if rollup:
+            group_rollups = list(OrganizationGroupRollup.objects.filter(
+                organization_id=organization_id
+            ).select_related('group').order_by('-users', 'group__name'))
+            signup_rollups = list(OrganizationSignupRollup.objects.filter(
+                organization_id=organization_id
+            ).order_by('-week')[:REPORT_SIGNUP_WEEKS])
+    
+    context = {
+        'organizations': organizations,
+        'organization_id': str(organization_id or ''),
+        'rollup': rollup,
+        'group_rollups': group_rollups,
+        'signup_rollups': signup_rollups,
+    }
+    return render(request, 'core/organization_report.html', context)
+
+@login_required
+@read_from_replica
+def activity_series(request):
+    """
+    Série temporal em JSON para os gráficos do dashboard, lida dos baldes
+    pré-agregados e guardada em cache por alguns minutos.
+    Parâmetros: ``metric``, ``period`` (day, week, month) e ``points``.
+    """
+    metric = request.GET.get('metric', ActivityBucket.USERS_JOINED)
+    period = request.GET.get('period', ActivityBucket.WEEK)
+    if metric not in dict(ActivityBucket.METRIC_CHOICES) or period not in dict(ActivityBucket.PERIOD_CHOICES):
+        return JsonResponse({'error': 'Métrica ou período inválido.'}, status=400)
+    try:
+        points = int(request.GET.get('points', 0)) or None
+    except ValueError:
+        points = None
+    
+    user = request.user
+    if user.is_superuser:
+        scope = ActivityBucket.GLOBAL_SCOPE
+    elif user.company:
+        scope = user.company.organization_id
+    else:
+        return JsonResponse({'error': 'Sem acesso às estatísticas.'}, status=403)
+    
+    cache_key = f'activity-series:{metric}:{period}:{scope}:{points}:{timezone.localdate().isoformat()}'
+    payload = cache.get(cache_key)
+    if payload is None:
+        labels, data = activity.series(metric, period, scope, points)
+        payload = {'metric': metric, 'period': period, 'labels': labels, 'data': data}
+        cache.set(cache_key, payload, settings.ACTIVITY_SERIES_CACHE_SECONDS)
+    
+    response = JsonResponse(payload)
+    patch_cache_control(response, private=True, max_age=settings.ACTIVITY_SERIES_CACHE_SECONDS)
+    return response
+
+@login_required
+def metrics_snapshot(request):
+    """
+    Contadores operacionais (``core.metrics``) em JSON, apenas para superusuários.
+    """
+    if not request.user.is_superuser:
+        raise PermissionDenied
+    response = JsonResponse({'counters': metrics.snapshot()})
+    patch_cache_control(response, no_store=True)
+    return response
+
+
+def _live_filter(request):
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    return live.event_filter(user)
+
+async def live_events(request):
+    """
+    Stream SSE com as mudanças de usuários, empresas e organizações do escopo
+    do usuário logado. Só funciona sob ASGI; sob WSGI responde 204, o que
+    faz o ``EventSource`` desistir de reconectar.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    accepts = await sync_to_async(_live_filter)(request)
+    if accepts is None:
+        return HttpResponse(status=403)
+    
+    config = settings.LIVE_EVENTS
+    subscription = live.broker.subscribe(accepts)
+    
+    async def stream():
+        deadline = time.monotonic() + config['max_age']
+        try:
+            yield 'retry: 5000\n\n'
+            while time.monotonic() < deadline:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), config['keepalive'])
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield live.format_event(event)
+        finally:
+            live.broker.unsubscribe(subscription)
     
-    return render(request, 'core/dashboard.html', context)
\ No newline at end of file
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # sem buffer no nginx
+    return response
@@ -0,0 +1,159 @@
+"""
+Aquecimento de caches no deploy (``manage.py warm_caches``) e na subida do
+processo web (``WARM_CACHES_ON_STARTUP``).
+
+Etapas:
+
+- ``templates``: compila todos os templates de ``templates/``, enchendo o
+  cache do loader e acusando erros de sintaxe antes do primeiro acesso;
+- ``permissions``: catálogo de permissões e content types de todos os modelos;
+- ``data``: contagens do dashboard de cada escopo e a primeira página das
+  listagens de cada organização, distribuídas em um pool de threads.
+
+Os templates e os content types ficam na memória do processo; o catálogo e as
+contagens vão para o cache do Django (compartilhado entre processos quando o
+backend é Redis/Memcached).
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections
+from django.template import TemplateSyntaxError, engines
+
+logger = logging.getLogger(__name__)
+
+STEPS = ('templates', 'permissions', 'data')
+
+# Etapas locais a cada processo web: a de dados consulta todas as organizações
+# e fica para o ``warm_caches`` do deploy, não para cada worker que (re)inicia
+STARTUP_STEPS = ('templates', 'permissions')
+
+StepResult = namedtuple('StepResult', 'name items seconds errors')
+
+
+def _template_names(engine):
+    for directory in engine.engine.dirs:
+        root = Path(directory)
+        for path in sorted(root.rglob('*.html')):
+            yield path.relative_to(root).as_posix()
+
+
+def compile_templates():
+    """
+    Compila os templates dos diretórios ``DIRS`` de cada engine.
+    Retorna ``(quantidade, erros)``.
+    """
+    count, errors = 0, []
+    for engine in engines.all():
+        if not hasattr(engine, 'engine'):
+            continue
+        for name in _template_names(engine):
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError as exc:
+                errors.append(f'{name}: {exc}')
+            else:
+                count += 1
+    return count, errors
+
+
+def load_permission_catalog():
+    from accounts.catalog import permission_catalog
+    
+    ContentType.objects.get_for_models(*apps.get_models())
+    return len(permission_catalog()), []
+
+
+def _prime_organization(organization_id):
+    """
+    Contagens do dashboard da organização e das suas empresas, mais a primeira
+    página das listagens de empresas e de usuários (no shard da organização).
+    """
+    from accounts.models import User
+    from organizations.models import Company
+    from organizations.views import LIST_PAGE_SIZE
+    from . import sharding, stats
+    
+    try:
+        with sharding.for_organization(organization_id):
+            stats.organization_counts(organization_id)
+            company_ids = list(Company.objects.for_org(organization_id).values_list('pk', flat=True))
+            for company_id in company_ids:
+                stats.company_counts(company_id)
+            companies = Company.objects.for_org(organization_id).for_listing().with_user_counts().order_by('name')
+            list(companies[:LIST_PAGE_SIZE])
+            users = User.objects.for_org(organization_id).for_listing().order_by('username')
+            list(users[:LIST_PAGE_SIZE])
+    finally:
+        close_old_connections()
+
+
+def prime_data(workers):
+    from organizations.models import Organization
+    from organizations.views import LIST_PAGE_SIZE
+    from . import stats
+    
+    stats.global_counts()
+    list(Organization.objects.for_listing().with_company_counts().order_by('name').across_shards()[:LIST_PAGE_SIZE])
+    organizations = Organization.objects.active().order_by('pk').only('pk').across_shards()
+    organization_ids = [organization.pk for organization in organizations]
+    
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='warmup') as executor:
+        futures = {executor.submit(_prime_organization, pk): pk for pk in organization_ids}
+        for future, pk in futures.items():
+            try:
+                future.result()
+            except Exception as exc:
+                errors.append(f'organização {pk}: {exc}')
+    return len(organization_ids), errors
+
+
+def warm(steps=STEPS, workers=None):
+    """
+    Executa as etapas pedidas e retorna um ``StepResult`` por etapa.
+    """
+    workers = settings.WARM_CACHES_WORKERS if workers is None else workers
+    runners = {
+        'templates': compile_templates,
+        'permissions': load_permission_catalog,
+        'data': lambda: prime_data(workers),
+    }
+    results = []
+    for name in steps:
+        started = time.perf_counter()
+        items, errors = runners[name]()
+        results.append(StepResult(name, items, time.perf_counter() - started, errors))
+    return results
+
+
+def warm_on_startup():
+    """
+    Chamado por ``wsgi.py``/``asgi.py``: com ``WARM_CACHES_ON_STARTUP`` compila os
+    templates e carrega o catálogo de permissões (``STARTUP_STEPS``) em uma
+    thread daemon, sem atrasar a subida do processo.
+    """
+    if not settings.WARM_CACHES_ON_STARTUP:
+        return None
+    
+    def run():
+        try:
+            for result in warm(STARTUP_STEPS):
+                logger.info('warm_caches %s: %s itens em %.2fs', result.name, result.items, result.seconds)
+                for error in result.errors:
+                    logger.warning('warm_caches %s: %s', result.name, error)
+        except Exception:
+            logger.exception('Falha ao aquecer os caches na inicialização.')
+        finally:
+            close_old_connections()
+    
+    thread = threading.Thread(target=run, name='warm-caches', daemon=True)
+    thread.start()
+    return thread
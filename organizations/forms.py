@@ -1,5 +1,8 @@
 from django import forms
+from theme import widgets
+from core import sharding
 from .models import Organization, Company
+from .provisioning import SpecError, load_spec, spec_from_organization
 
 
 class OrganizationForm(forms.ModelForm):
@@ -9,15 +12,15 @@ class OrganizationForm(forms.ModelForm):
     is_active = forms.BooleanField(
         required=False,
         label='Ativa',
-        widget=forms.CheckboxInput(attrs={'class': 'h-5 w-5 text-blue-600 focus:ring-blue-600 border-gray-400 rounded'})
+        widget=widgets.CheckboxInput()
     )
     
     class Meta:
         model = Organization
         fields = ('name', 'description', 'is_active')
         widgets = {
-            'name': forms.TextInput(attrs={'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'}),
-            'description': forms.Textarea(attrs={'rows': 3, 'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'}),
+            'name': widgets.TextInput(),
+            'description': widgets.Textarea(attrs={'rows': 3}),
         }
 
 
@@ -28,15 +31,15 @@ class CompanyForm(forms.ModelForm):
     is_active = forms.BooleanField(
         required=False,
         label='Ativa',
-        widget=forms.CheckboxInput(attrs={'class': 'h-5 w-5 text-blue-600 focus:ring-blue-600 border-gray-400 rounded'})
+        widget=widgets.CheckboxInput()
     )
     
     class Meta:
         model = Company
         fields = ('name', 'description', 'is_active')
         widgets = {
-            'name': forms.TextInput(attrs={'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'}),
-            'description': forms.Textarea(attrs={'rows': 3, 'class': 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'}),
+            'name': widgets.TextInput(),
+            'description': widgets.Textarea(attrs={'rows': 3}),
         }
     
     def __init__(self, *args, **kwargs):
@@ -49,4 +52,58 @@ class CompanyForm(forms.ModelForm):
             instance.organization = self.organization
         if commit:
             instance.save()
-        return instance
\ No newline at end of file
+        return instance
+
+class ProvisionForm(forms.Form):
+    """
+    Formulário de provisionamento: uma especificação (JSON ou YAML) ou uma
+    organização existente usada como modelo para uma nova.
+    """
+    spec = forms.CharField(
+        required=False,
+        label='Especificação',
+        widget=widgets.Textarea(attrs={'rows': 16})
+    )
+    template = forms.TypedChoiceField(
+        coerce=int,
+        required=False,
+        empty_value=None,
+        label='Organização modelo',
+        widget=widgets.Select()
+    )
+    name = forms.CharField(
+        required=False,
+        max_length=100,
+        label='Nome da nova organização',
+        widget=widgets.TextInput()
+    )
+    
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+        # Apenas organizações do escopo do usuário logado; com shards, de todos os bancos (core.sharding)
+        organizations = Organization.objects.only('name').order_by('name')
+        if user:
+            organizations = organizations.visible_to(user)
+        self.fields['template'].choices = [('', '---------')] + [
+            (o.pk, o.name) for o in organizations.across_shards()
+        ]
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        text, template = cleaned_data.get('spec', '').strip(), cleaned_data.get('template')
+        if bool(text) == bool(template):
+            raise forms.ValidationError('Informe uma especificação ou uma organização modelo (apenas uma).')
+        if template:
+            if not cleaned_data.get('name', '').strip():
+                self.add_error('name', 'Informe o nome da nova organização.')
+                return cleaned_data
+            with sharding.for_organization(template):
+                organization = Organization.objects.get(pk=template)
+                cleaned_data['provision_spec'] = spec_from_organization(organization, cleaned_data['name'].strip())
+        else:
+            try:
+                cleaned_data['provision_spec'] = load_spec(text)
+            except SpecError as exc:
+                self.add_error('spec', str(exc))
+        return cleaned_data
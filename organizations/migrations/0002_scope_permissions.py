@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-19 14:49
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='organization',
+            options={'ordering': ['name'], 'permissions': [('view_all_organizations', 'Can view statistics of own organization')], 'verbose_name': 'organization', 'verbose_name_plural': 'organizations'},
+        ),
+    ]
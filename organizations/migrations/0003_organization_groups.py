@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('organizations', '0002_scope_permissions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='groups',
+            field=models.ManyToManyField(blank=True, related_name='organizations', to='auth.group', verbose_name='groups'),
+        ),
+    ]
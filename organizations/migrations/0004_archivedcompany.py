@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:40
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0003_organization_groups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedCompany',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('organization_id', models.BigIntegerField(db_index=True, verbose_name='organization')),
+                ('name', models.CharField(max_length=100, verbose_name='name')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='archived at')),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='data')),
+            ],
+            options={
+                'verbose_name': 'archived company',
+                'verbose_name_plural': 'archived companies',
+            },
+        ),
+    ]
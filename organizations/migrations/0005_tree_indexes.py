@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0004_archivedcompany'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['organization', 'name', 'id'], name='company_org_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='organization',
+            index=models.Index(fields=['name', 'id'], name='org_name_id_idx'),
+        ),
+    ]
@@ -1,7 +1,92 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 
+from core.sharding import ShardedQuerySetMixin
+from .projections import COMPANY_LIST, ORGANIZATION_LIST
+
+
+def count_related(queryset, field):
+    """
+    Contagem correlacionada (``SELECT COUNT(*) ... WHERE field = pk externo``).
+
+    Diferente de ``annotate(Count(...))``, não faz JOIN nem GROUP BY sobre a
+    listagem inteira: o banco conta apenas para as linhas da página retornada.
+    """
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+        count=Count('pk')
+    ).values('count')
+    return Coalesce(Subquery(counts), 0)
+
+
+class TenantQuerySet(ShardedQuerySetMixin, models.QuerySet):
+    """
+    Filtros comuns a organizações e empresas.
+    """
+    listing = None
+    
+    def active(self):
+        return self.filter(is_active=True)
+    
+    def search(self, q):
+        if not q:
+            return self
+        return self.filter(Q(name__icontains=q) | Q(description__icontains=q))
+    
+    def visible_to(self, user, action='view'):
+        """
+        Restringe ao escopo do usuário (ver ``accounts.permissions``).
+        """
+        from accounts.permissions import get_scope
+        return self.filter(get_scope(user, self.model, action).q)
+    
+    def for_listing(self):
+        """
+        Apenas as colunas exibidas nas listagens (ver ``projections.py``).
+        """
+        return self.listing.apply(self)
+
+
+class OrganizationQuerySet(TenantQuerySet):
+    listing = ORGANIZATION_LIST
+    
+    def with_company_counts(self):
+        """
+        Anota ``company_count`` (todas as empresas, ativas ou não).
+        """
+        return self.annotate(company_count=count_related(Company.objects.all(), 'organization'))
+    
+    def with_user_counts(self):
+        """
+        Anota ``user_count`` (todos os usuários das empresas da organização).
+        """
+        from django.contrib.auth import get_user_model
+        return self.annotate(user_count=count_related(get_user_model()._default_manager.all(), 'company__organization'))
+
+
+class CompanyQuerySet(TenantQuerySet):
+    listing = COMPANY_LIST
+    
+    def for_org(self, organization):
+        """
+        Empresas da organização (instância ou pk).
+        """
+        return self.filter(organization=organization)
+    
+    def with_user_counts(self):
+        """
+        Anota ``user_count`` (todos os usuários da empresa, ativos ou não).
+        """
+        from django.contrib.auth import get_user_model
+        return self.annotate(user_count=count_related(get_user_model()._default_manager.all(), 'company'))
+    
+    def with_organization(self):
+        return self.select_related('organization')
+
 
 class Organization(models.Model):
     """
@@ -10,13 +95,29 @@ class Organization(models.Model):
     name = models.CharField(_('name'), max_length=100)
     description = models.TextField(_('description'), blank=True, null=True)
     is_active = models.BooleanField(_('active'), default=True)
+    # Grupos (perfis de acesso) usados pela organização; os grupos são compartilhados
+    groups = models.ManyToManyField(
+        'auth.Group',
+        blank=True,
+        related_name='organizations',
+        verbose_name=_('groups')
+    )
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('updated at'), auto_now=True)
     
+    objects = OrganizationQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('organization')
         verbose_name_plural = _('organizations')
         ordering = ['name']
+        indexes = [
+            # Paginação por chave da árvore (ver ``core.paging``)
+            models.Index(fields=['name', 'id'], name='org_name_id_idx'),
+        ]
+        permissions = [
+            ('view_all_organizations', 'Can view statistics of own organization'),
+        ]
     
     def __str__(self):
         return self.name
@@ -38,10 +139,34 @@ class Company(models.Model):
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('updated at'), auto_now=True)
     
+    objects = CompanyQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('company')
         verbose_name_plural = _('companies')
         ordering = ['organization', 'name']
+        indexes = [
+            models.Index(fields=['organization', 'name', 'id'], name='company_org_name_id_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.name} ({self.organization.name})"
\ No newline at end of file
+        return f"{self.name} ({self.organization.name})"
+
+class ArchivedCompany(models.Model):
+    """
+    Empresa inativa arquivada (``core.archive``): a linha sai de
+    ``organizations_company`` e fica aqui, com o mesmo pk, até ser restaurada.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    organization_id = models.BigIntegerField(_('organization'), db_index=True)
+    name = models.CharField(_('name'), max_length=100)
+    archived_at = models.DateTimeField(_('archived at'), default=timezone.now)
+    # Campos da empresa como no serializador "python" do Django
+    data = models.JSONField(_('data'), encoder=DjangoJSONEncoder)
+    
+    class Meta:
+        verbose_name = _('archived company')
+        verbose_name_plural = _('archived companies')
+    
+    def __str__(self):
+        return self.name
@@ -0,0 +1,28 @@
+from django.db.models.functions import Left
+
+from core.projections import Column, Projection
+
+# A listagem mostra a descrição com truncatechars:50; não é preciso trazer o TEXT inteiro
+DESCRIPTION_PREVIEW_LENGTH = 50
+
+
+def description_preview():
+    return Left('description', DESCRIPTION_PREVIEW_LENGTH + 1)
+
+
+ORGANIZATION_LIST = Projection(
+    Column('name', 'Nome'),
+    Column('description_preview', 'Descrição', expression=description_preview(), export=False),
+    Column('description', 'Descrição', listing=False),
+    Column('is_active', 'Ativa'),
+    Column('company_count', 'Empresas', annotated=True),
+)
+
+COMPANY_LIST = Projection(
+    Column('organization', 'Organização', field='organization__name', listing=False),
+    Column('name', 'Nome'),
+    Column('description_preview', 'Descrição', expression=description_preview(), export=False),
+    Column('description', 'Descrição', listing=False),
+    Column('is_active', 'Ativa'),
+    Column('user_count', 'Usuários', annotated=True),
+)
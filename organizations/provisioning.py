@@ -0,0 +1,381 @@
+"""
+Provisionamento de organizações a partir de uma especificação declarativa.
+
+A especificação (JSON ou YAML) descreve a organização, os grupos, as empresas
+e os usuários iniciais::
+
+    {
+        "organization": {"name": "ACME", "description": "..."},
+        "groups": [{"name": "Gerentes", "permissions": ["organizations.view_company"]}],
+        "companies": [{"name": "ACME Matriz"}],
+        "users": [{"username": "ana", "email": "ana@acme.com", "company": "ACME Matriz",
+                   "groups": ["Gerentes"], "password": "opcional"}]
+    }
+
+``provision`` cria tudo em uma única transação, com inserções em lote, e é
+idempotente: organização, grupos e empresas são identificados pelo nome e
+usuários pelo ``username``; reexecutar a especificação cria apenas o que falta
+(e nunca remove nada). Grupos que já existem são apenas associados: as
+permissões da especificação valem só para os grupos criados por ela.
+``spec_from_organization`` monta a especificação de uma organização existente
+para usá-la como modelo de outra.
+
+Com ``actor`` (a view), o provisionamento respeita o escopo de quem o executa:
+uma organização existente só é completada se estiver no escopo de edição do
+usuário e os grupos criados só recebem permissões que ele próprio tem.
+"""
+import json
+import time
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, Permission
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core import activity, live, sharding, stats
+from core.models import ActivityBucket
+from core.rollups import refresh_organization
+from webhooks import outbox
+from .models import Organization, Company
+
+BATCH_SIZE = 500
+
+Step = namedtuple('Step', 'name created existing seconds')
+
+
+class SpecError(ValueError):
+    """
+    Especificação inválida ou em conflito com dados existentes.
+    """
+
+
+class Report:
+    """
+    Resultado de um provisionamento: quantidades e tempo de cada etapa.
+    """
+
+    def __init__(self):
+        self.organization = None
+        self.steps = []
+
+    @property
+    def seconds(self):
+        return sum(step.seconds for step in self.steps)
+
+    @property
+    def created(self):
+        return sum(step.created for step in self.steps)
+
+    def lines(self):
+        for step in self.steps:
+            yield f'{step.name}: {step.created} criado(s), {step.existing} existente(s) em {step.seconds * 1000:.0f} ms'
+        yield f'Total: {self.seconds * 1000:.0f} ms'
+
+
+class _Timer:
+    def __init__(self, report, name):
+        self.report = report
+        self.name = name
+        self.created = self.existing = 0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.report.steps.append(Step(self.name, self.created, self.existing, time.perf_counter() - self.started))
+
+
+# Especificação
+
+def load_spec(text):
+    """
+    Lê uma especificação em JSON ou, com o PyYAML instalado, em YAML.
+    """
+    text = text.strip()
+    if text.startswith('{'):
+        try:
+            return json.loads(text)
+        except ValueError as exc:
+            raise SpecError(f'JSON inválido: {exc}')
+    try:
+        import yaml
+    except ImportError:
+        raise SpecError('Especificações em YAML exigem o pacote PyYAML; use JSON.')
+    try:
+        return yaml.safe_load(text)
+    except yaml.YAMLError as exc:
+        raise SpecError(f'YAML inválido: {exc}')
+
+
+def spec_from_organization(organization, name):
+    """
+    Especificação com a estrutura (empresas e grupos) de uma organização existente.
+    Usuários não são copiados.
+    """
+    groups = Group.objects.filter(
+        Q(organizations=organization) | Q(user__company__organization=organization)
+    ).distinct().prefetch_related('permissions__content_type').order_by('name')
+    return {
+        'organization': {'name': name, 'description': organization.description or ''},
+        'groups': [
+            {
+                'name': group.name,
+                'permissions': sorted(
+                    f'{permission.content_type.app_label}.{permission.codename}'
+                    for permission in group.permissions.all()
+                ),
+            }
+            for group in groups
+        ],
+        'companies': [
+            {'name': company.name, 'description': company.description or '', 'is_active': company.is_active}
+            for company in Company.objects.for_org(organization).order_by('name')
+        ],
+        'users': [],
+    }
+
+
+def _items(spec, key, required):
+    items = spec.get(key) or []
+    if not isinstance(items, list):
+        raise SpecError(f'"{key}" deve ser uma lista.')
+    names = set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise SpecError(f'{key}[{index}] deve ser um objeto.')
+        for field in required:
+            if not str(item.get(field) or '').strip():
+                raise SpecError(f'{key}[{index}]: "{field}" é obrigatório.')
+        name = item[required[0]]
+        if name in names:
+            raise SpecError(f'{key}: "{name}" aparece mais de uma vez.')
+        names.add(name)
+    return items
+
+
+def normalize(spec):
+    """
+    Valida a estrutura da especificação e as referências internas.
+    """
+    if not isinstance(spec, dict):
+        raise SpecError('A especificação deve ser um objeto.')
+    organization = spec.get('organization')
+    if not isinstance(organization, dict) or not str(organization.get('name') or '').strip():
+        raise SpecError('"organization.name" é obrigatório.')
+    groups = _items(spec, 'groups', ('name',))
+    companies = _items(spec, 'companies', ('name',))
+    users = _items(spec, 'users', ('username', 'email'))
+
+    company_names = {company['name'] for company in companies}
+    group_names = {group['name'] for group in groups}
+    emails = set()
+    for user in users:
+        if user.get('company') and user['company'] not in company_names:
+            raise SpecError(f'Usuário "{user["username"]}": empresa "{user["company"]}" não está na especificação.')
+        if not isinstance(user.get('groups') or [], list):
+            raise SpecError(f'Usuário "{user["username"]}": "groups" deve ser uma lista.')
+        unknown = set(user.get('groups') or []) - group_names
+        if unknown:
+            raise SpecError(f'Usuário "{user["username"]}": grupos fora de "groups": {", ".join(sorted(unknown))}.')
+        if user['email'] in emails:
+            raise SpecError(f'users: o email "{user["email"]}" aparece mais de uma vez.')
+        emails.add(user['email'])
+    return {
+        'organization': organization,
+        'groups': groups,
+        'companies': companies,
+        'users': users,
+    }
+
+
+# Provisionamento
+
+def _target_shard(name):
+    """
+    Shard da organização (existente, pelo nome) ou o escolhido para uma nova.
+    """
+    if not sharding.fans_out():
+        return sharding.current_alias()
+    return sharding.find(Organization, name=name) or sharding.choose_shard()
+
+
+def _resolve_permissions(groups):
+    labels = {label for group in groups for label in group.get('permissions') or []}
+    lookup = Q(pk__in=[])
+    for label in labels:
+        app_label, _, codename = label.partition('.')
+        lookup |= Q(content_type__app_label=app_label, codename=codename)
+    found = {
+        f'{app_label}.{codename}': pk
+        for pk, app_label, codename in Permission.objects.filter(lookup).values_list(
+            'pk', 'content_type__app_label', 'codename'
+        )
+    }
+    missing = labels - set(found)
+    if missing:
+        raise SpecError(f'Permissões desconhecidas: {", ".join(sorted(missing))}.')
+    return found
+
+
+def _check_actor(actor, organization, created, groups, new_groups):
+    """
+    Recusa completar uma organização fora do escopo de edição do ator ou criar
+    grupos com permissões que ele não tem.
+    """
+    if not created and not Organization.objects.visible_to(actor, 'change').filter(pk=organization.pk).exists():
+        raise SpecError(f'A organização "{organization.name}" já existe e está fora do seu escopo.')
+    denied = {
+        label for group in groups if group['name'] in new_groups
+        for label in group.get('permissions') or [] if not actor.has_perm(label)
+    }
+    if denied:
+        raise SpecError(f'Permissões que você não tem: {", ".join(sorted(denied))}.')
+
+
+def _check_users(spec, organization):
+    """
+    Usuários da especificação que já existem (com o mesmo username e email, na
+    mesma organização ou, se a especificação não informa a empresa, sem empresa)
+    são mantidos; qualquer outro uso dos usernames ou emails, em qualquer shard,
+    é um conflito. Retorna os usernames já provisionados.
+    """
+    User = get_user_model()
+    emails = {user['username']: user['email'] for user in spec['users']}
+    organizations = {user['username']: organization.pk if user.get('company') else None for user in spec['users']}
+    existing = set()
+    current = router.db_for_write(User)
+    for alias in sharding.aliases() if sharding.is_enabled() else [current]:
+        rows = User.objects.using(alias).filter(
+            Q(username__in=list(emails)) | Q(email__in=list(emails.values()))
+        ).values_list('username', 'email', 'company__organization_id')
+        for username, email, organization_id in rows:
+            same_place = alias == current and username in organizations and organization_id == organizations[username]
+            if not same_place or emails.get(username) != email:
+                raise SpecError(f'O usuário "{username}" ({email}) já existe e não corresponde à especificação.')
+            existing.add(username)
+    return existing
+
+
+def provision(spec, actor=None):
+    """
+    Cria (ou completa) a organização descrita em ``spec`` em uma transação.
+    Retorna um ``Report``; especificações inválidas levantam ``SpecError``.
+    Com ``actor``, aplica o escopo e as permissões dele e registra a auditoria.
+    """
+    spec = normalize(spec)
+    report = Report()
+
+    # O hash das senhas é a parte cara: roda em paralelo e antes da transação
+    from accounts.hashing import get_executor
+    passwords = list(get_executor().map(make_password, [user.get('password') for user in spec['users']]))
+
+    with sharding.use_shard(_target_shard(spec['organization']['name'])):
+        with transaction.atomic(using=router.db_for_write(Organization)):
+            _provision(spec, passwords, report, actor)
+        # Contagens do dashboard e listagens abertas são atualizadas após o commit
+        organization = report.organization
+        stats.invalidate([organization.pk])
+        live.publish('organization', live.UPDATED, organization.pk, [organization.pk])
+
+    if actor is not None:
+        from audit import log as audit
+        from audit.models import AuditEvent
+        audit.record(actor, AuditEvent.CREATE, organization, {
+            'provisioned': {step.name: step.created for step in report.steps if step.created},
+        })
+    return report
+
+
+def _provision(spec, passwords, report, actor):
+    User = get_user_model()
+    now = timezone.now()
+
+    with _Timer(report, 'organização') as step:
+        data = spec['organization']
+        organization = Organization.objects.filter(name=data['name']).first()
+        if organization is None:
+            organization = Organization.objects.create(name=data['name'], description=data.get('description') or '')
+            step.created = 1
+        else:
+            step.existing = 1
+        report.organization = organization
+
+    names = [group['name'] for group in spec['groups']]
+    existing_groups = set(Group.objects.filter(name__in=names).values_list('name', flat=True))
+    new_groups = set(names) - existing_groups
+    if actor is not None:
+        _check_actor(actor, organization, step.created, spec['groups'], new_groups)
+    existing_users = _check_users(spec, organization)
+
+    with _Timer(report, 'grupos') as step:
+        permissions = _resolve_permissions(spec['groups'])
+        step.existing = len(existing_groups)
+        Group.objects.bulk_create([Group(name=name) for name in names if name in new_groups], batch_size=BATCH_SIZE)
+        groups = {group.name: group for group in Group.objects.filter(name__in=names)}
+        step.created = len(new_groups)
+        # Grupos existentes podem estar em uso por outras organizações: as permissões não mudam
+        Group.permissions.through.objects.bulk_create([
+            Group.permissions.through(group_id=groups[group['name']].pk, permission_id=permissions[label])
+            for group in spec['groups'] if group['name'] in new_groups for label in group.get('permissions') or []
+        ], batch_size=BATCH_SIZE, ignore_conflicts=True)
+        Organization.groups.through.objects.bulk_create([
+            Organization.groups.through(organization_id=organization.pk, group_id=group.pk)
+            for group in groups.values()
+        ], batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+    with _Timer(report, 'empresas') as step:
+        companies = {company.name: company for company in Company.objects.for_org(organization)}
+        new_companies = [
+            Company(
+                organization=organization,
+                name=company['name'],
+                description=company.get('description') or '',
+                is_active=company.get('is_active', True),
+            )
+            for company in spec['companies'] if company['name'] not in companies
+        ]
+        Company.objects.bulk_create(new_companies, batch_size=BATCH_SIZE)
+        step.created, step.existing = len(new_companies), len(spec['companies']) - len(new_companies)
+        companies = {company.name: company for company in Company.objects.for_org(organization)}
+        outbox.capture('company', outbox.CREATED, [
+            outbox.snapshot('company', companies[company.name]) for company in new_companies
+        ])
+
+    with _Timer(report, 'usuários') as step:
+        new_users = [
+            User(
+                username=user['username'],
+                email=user['email'],
+                first_name=user.get('first_name') or '',
+                last_name=user.get('last_name') or '',
+                company=companies[user['company']] if user.get('company') else None,
+                password=password,
+                date_joined=now,
+            )
+            for user, password in zip(spec['users'], passwords) if user['username'] not in existing_users
+        ]
+        User.objects.bulk_create(new_users, batch_size=BATCH_SIZE)
+        step.created, step.existing = len(new_users), len(existing_users)
+        user_ids = dict(User.objects.filter(
+            username__in=[user['username'] for user in spec['users']]
+        ).values_list('username', 'pk'))
+        User.groups.through.objects.bulk_create([
+            User.groups.through(user_id=user_ids[user['username']], group_id=groups[name].pk)
+            for user in spec['users'] for name in user.get('groups') or []
+        ], batch_size=BATCH_SIZE, ignore_conflicts=True)
+        outbox.capture('user', outbox.CREATED, outbox.rows('user', User.objects.filter(
+            pk__in=[user_ids[user.username] for user in new_users]
+        )))
+
+    # bulk_create não dispara sinais: totais e séries de atividade são feitos aqui
+    with _Timer(report, 'totais') as step:
+        refresh_organization(organization.pk)
+        if new_companies:
+            activity.record(ActivityBucket.COMPANIES_CREATED, now, organization.pk, len(new_companies))
+        if new_users:
+            activity.record(ActivityBucket.USERS_JOINED, now, organization.pk, len(new_users))
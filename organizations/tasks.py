@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+
+from core import sharding
+from core.jobs import task
+from core.rollups import refresh_organization
+from webhooks import outbox
+from .models import Organization, Company
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+@task('organizations.deactivate_organization')
+def deactivate_organization(job, organization_id):
+    """
+    Desativa uma organização, suas empresas e os usuários dessas empresas,
+    em lotes para não manter transações longas em organizações grandes.
+    """
+    # O worker não tem shard: executa no banco da organização
+    with sharding.for_organization(organization_id):
+        return _deactivate_organization(job, organization_id)
+
+
+def _deactivate_organization(job, organization_id):
+    # update() não dispara sinais: cada lote grava os eventos dos webhooks na própria transação
+    with transaction.atomic(using=router.db_for_write(Organization)):
+        organization = Organization.objects.filter(pk=organization_id)
+        organization.update(is_active=False)
+        outbox.capture('organization', outbox.DEACTIVATED, outbox.rows('organization', organization))
+    
+    company_ids = list(
+        Company.objects.filter(organization_id=organization_id, is_active=True).values_list('pk', flat=True)
+    )
+    user_ids = list(
+        User.objects.filter(company__organization_id=organization_id, is_active=True).values_list('pk', flat=True)
+    )
+    total = len(company_ids) + len(user_ids)
+    done = 0
+    
+    for start in range(0, len(company_ids), BATCH_SIZE):
+        batch = company_ids[start:start + BATCH_SIZE]
+        with transaction.atomic(using=router.db_for_write(Company)):
+            Company.objects.filter(pk__in=batch).update(is_active=False)
+            outbox.capture('company', outbox.DEACTIVATED, outbox.rows('company', Company.objects.filter(pk__in=batch)))
+        done += len(batch)
+        job.set_progress(done, total, f'{done} de {total} registros desativados')
+    
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        batch = user_ids[start:start + BATCH_SIZE]
+        with transaction.atomic(using=router.db_for_write(User)):
+            User.objects.filter(pk__in=batch).update(is_active=False)
+            outbox.capture('user', outbox.DEACTIVATED, outbox.rows('user', User.objects.filter(pk__in=batch)))
+        done += len(batch)
+        job.set_progress(done, total, f'{done} de {total} registros desativados')
+    
+    # update() não dispara sinais: os totais da organização são recalculados aqui
+    refresh_organization(organization_id)
+    
+    return {'companies': len(company_ids), 'users': len(user_ids)}
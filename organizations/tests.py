@@ -1,6 +1,21 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from audit.buffer import audit_buffer
+from core import sharding
+from core.paging import encode_cursor
+from core.models import ActivityBucket, OrganizationRollup
+from . import views
+from .forms import ProvisionForm
 from .models import Organization, Company
+from .provisioning import SpecError, provision
+from .transfers import MoveError, move_companies
 
 User = get_user_model()
 
@@ -88,4 +103,474 @@ class CompanyModelTest(TestCase):
         self.assertEqual(company.organization, self.organization)
         
         # Testa o relacionamento reverso
-        self.assertIn(company, self.organization.companies.all())
\ No newline at end of file
+        self.assertIn(company, self.organization.companies.all())
+
+
+class TenantQuerySetTest(TestCase):
+    """
+    Testes dos querysets por organização e das listagens que os usam.
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Organização A')
+        self.other = Organization.objects.create(name='Organização B')
+        self.company = Company.objects.create(organization=self.organization, name='Empresa A1')
+        Company.objects.create(organization=self.organization, name='Empresa A2', is_active=False)
+        Company.objects.create(organization=self.other, name='Empresa B1')
+        for index in range(3):
+            User.objects.create_user(
+                username=f'user{index}', email=f'user{index}@example.com',
+                password='testpass123', company=self.company
+            )
+    
+    def test_chained_filters_and_counts(self):
+        """
+        Testa a composição dos filtros com as contagens anotadas.
+        """
+        companies = Company.objects.for_org(self.organization).active().with_user_counts()
+        self.assertEqual([(c.name, c.user_count) for c in companies], [('Empresa A1', 3)])
+        
+        organizations = Organization.objects.with_company_counts().order_by('name')
+        self.assertEqual([o.company_count for o in organizations], [2, 1])
+        
+        self.assertEqual(User.objects.for_org(self.other).count(), 0)
+        self.assertEqual(User.objects.for_org(self.organization).search('user1').count(), 1)
+    
+    def test_visible_to_matches_scope(self):
+        """
+        Testa se os querysets restringem ao escopo do usuário.
+        """
+        manager = User.objects.get(username='user0')
+        self.assertEqual(list(Organization.objects.visible_to(manager)), [self.organization])
+        self.assertEqual(set(Company.objects.visible_to(manager)), set(Company.objects.for_org(self.organization)))
+        self.assertEqual(list(User.objects.visible_to(manager)), [manager])
+    
+    # Contagem no banco principal: com réplicas, parte das leituras iria para elas
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_list_views_query_count_is_constant(self):
+        """
+        Testa se as listagens não fazem uma consulta por linha.
+        """
+        # Eventos de auditoria de outros testes ainda em memória seriam gravados durante a contagem
+        audit_buffer.flush()
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        self.client.force_login(admin)
+        for index in range(5):
+            Organization.objects.create(name=f'Organização extra {index}')
+        
+        # sessão, usuário, contagem da paginação e a página com as contagens
+        with self.assertNumQueries(4):
+            self.client.get(reverse('organizations:organization_list'))
+        with self.assertNumQueries(5):
+            self.client.get(reverse('organizations:company_list', args=[self.organization.pk]))
+        # ... mais os grupos pré-carregados na listagem de usuários; com shards, a
+        # listagem mesclada (ver core.sharding) consulta existência e total em cada banco
+        with self.assertNumQueries(6 if sharding.is_enabled() else 4):
+            self.client.get(reverse('accounts:user_list'))
+    
+    def test_listing_defers_unused_columns(self):
+        """
+        Testa se a listagem não carrega a descrição inteira nem colunas não exibidas.
+        """
+        Company.objects.filter(pk=self.company.pk).update(description='x' * 500)
+        company = Company.objects.for_org(self.organization).for_listing().get(pk=self.company.pk)
+        self.assertEqual(len(company.description_preview), 51)
+        self.assertEqual(company.get_deferred_fields(), {'organization_id', 'description', 'created_at', 'updated_at'})
+        
+        user = User.objects.for_listing().get(username='user0')
+        self.assertIn('password', user.get_deferred_fields())
+        self.assertIn('date_joined', user.get_deferred_fields())
+    
+    def test_csv_exports(self):
+        """
+        Testa as exportações CSV com as colunas das projeções.
+        """
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        group = Group.objects.create(name='Gerentes')
+        User.objects.get(username='user1').groups.add(group)
+        self.client.force_login(admin)
+        
+        response = self.client.get(reverse('accounts:user_export'), {'q': 'user1'})
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[0], 'Usuário,Nome,Sobrenome,E-mail,Empresa,Organização,Grupos,Ativo')
+        self.assertEqual(lines[1:], ['user1,,,user1@example.com,Empresa A1,Organização A,Gerentes,Sim'])
+        
+        response = self.client.get(reverse('organizations:company_export', args=[self.organization.pk]))
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[1:], [
+            'Organização A,Empresa A1,,Sim,3',
+            'Organização A,Empresa A2,,Não,0',
+        ])
+
+
+class ProvisioningTest(TestCase):
+    """
+    Testes do provisionamento de organizações por especificação.
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        self.spec = {
+            'organization': {'name': 'ACME', 'description': 'Cliente novo'},
+            'groups': [{'name': 'Gerentes ACME', 'permissions': ['organizations.view_company']}],
+            'companies': [{'name': 'ACME Matriz'}, {'name': 'ACME Filial'}],
+            'users': [
+                {'username': f'acme{index}', 'email': f'acme{index}@example.com',
+                 'company': 'ACME Matriz', 'groups': ['Gerentes ACME'], 'password': 'testpass123'}
+                for index in range(3)
+            ],
+        }
+    
+    def test_provision_creates_everything(self):
+        """
+        Testa se a especificação cria organização, grupos, empresas e usuários.
+        """
+        report = provision(self.spec)
+        organization = report.organization
+        self.assertEqual(organization.name, 'ACME')
+        self.assertEqual(Company.objects.for_org(organization).count(), 2)
+        self.assertEqual(User.objects.for_org(organization).count(), 3)
+        self.assertEqual(list(organization.groups.values_list('name', flat=True)), ['Gerentes ACME'])
+        
+        user = User.objects.get(username='acme0')
+        self.assertTrue(user.check_password('testpass123'))
+        self.assertTrue(user.has_perm('organizations.view_company'))
+        self.assertEqual([step.name for step in report.steps], ['organização', 'grupos', 'empresas', 'usuários', 'totais'])
+        self.assertEqual(report.created, 1 + 1 + 2 + 3)
+    
+    def test_provision_is_idempotent(self):
+        """
+        Testa se reexecutar a especificação cria apenas o que falta.
+        """
+        provision(self.spec)
+        self.spec['companies'].append({'name': 'ACME Sul'})
+        report = provision(self.spec)
+        self.assertEqual(report.created, 1)
+        self.assertEqual(Organization.objects.filter(name='ACME').count(), 1)
+        self.assertEqual(Company.objects.filter(organization__name='ACME').count(), 3)
+        self.assertEqual(User.objects.filter(username__startswith='acme').count(), 3)
+    
+    def test_conflicts_are_rejected_without_changes(self):
+        """
+        Testa se referências inválidas e usuários de outra organização abortam o provisionamento.
+        """
+        other = Organization.objects.create(name='Outra')
+        User.objects.create_user(
+            username='acme2', email='acme2@example.com', password='testpass123',
+            company=Company.objects.create(organization=other, name='Outra Matriz')
+        )
+        with self.assertRaises(SpecError):
+            provision(self.spec)
+        self.assertFalse(Organization.objects.filter(name='ACME').exists())
+        
+        self.spec['users'][0]['groups'] = ['Inexistente']
+        with self.assertRaises(SpecError):
+            provision(self.spec)
+    
+    def test_clone_from_template_view(self):
+        """
+        Testa o provisionamento pela view usando uma organização como modelo.
+        """
+        template = provision(self.spec).organization
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        self.client.force_login(admin)
+        
+        response = self.client.post(reverse('organizations:organization_provision'), {
+            'template': template.pk, 'name': 'ACME 2',
+        })
+        self.assertContains(response, 'Total:')
+        # Com shards, a nova organização vai para o banco com menos organizações
+        with sharding.use_shard(sharding.find(Organization, name='ACME 2')):
+            clone = Organization.objects.get(name='ACME 2')
+            self.assertEqual(
+                list(Company.objects.for_org(clone).order_by('name').values_list('name', flat=True)),
+                ['ACME Filial', 'ACME Matriz']
+            )
+            self.assertEqual(list(clone.groups.values_list('name', flat=True)), ['Gerentes ACME'])
+            self.assertEqual(User.objects.for_org(clone).count(), 0)
+    
+    def test_existing_groups_keep_their_permissions(self):
+        """
+        Testa se a especificação não altera as permissões de um grupo já existente.
+        """
+        group = Group.objects.create(name='Gerentes ACME')
+        provision(self.spec)
+        self.assertFalse(group.permissions.exists())
+        self.assertFalse(User.objects.get(username='acme0').has_perm('organizations.view_company'))
+    
+    def test_provision_respects_actor_scope(self):
+        """
+        Testa se quem não é superusuário só completa organizações do seu escopo e só concede permissões que tem.
+        """
+        own = Organization.objects.create(name='Própria')
+        manager = User.objects.create_user(
+            username='gestor', email='gestor@example.com', password='testpass123',
+            company=Company.objects.create(organization=own, name='Própria Matriz')
+        )
+        manager.user_permissions.add(Permission.objects.get(codename='view_company'))
+        other = Organization.objects.create(name='ACME')
+        
+        with self.assertRaises(SpecError):
+            provision(self.spec, actor=manager)
+        self.assertFalse(other.groups.exists())
+        self.assertFalse(User.objects.filter(username__startswith='acme').exists())
+        
+        self.spec['organization']['name'] = 'ACME Nova'
+        self.spec['groups'][0]['permissions'].append('accounts.delete_user')
+        with self.assertRaises(SpecError):
+            provision(self.spec, actor=manager)
+        self.assertFalse(Group.objects.filter(name='Gerentes ACME').exists())
+        
+        self.spec['groups'][0]['permissions'].remove('accounts.delete_user')
+        self.assertEqual(provision(self.spec, actor=manager).organization.name, 'ACME Nova')
+        
+        form = ProvisionForm(user=manager)
+        self.assertEqual([pk for pk, _ in form.fields['template'].choices], ['', own.pk])
+    
+    def test_users_without_company_are_idempotent(self):
+        """
+        Testa se reexecutar a especificação mantém usuários sem empresa já criados por ela.
+        """
+        for user in self.spec['users']:
+            del user['company']
+        provision(self.spec)
+        report = provision(self.spec)
+        self.assertEqual(report.created, 0)
+        self.assertEqual(User.objects.filter(username__startswith='acme', company__isnull=True).count(), 3)
+
+
+class OrganizationTreeTest(TestCase):
+    """
+    Testes da árvore de organizações com carregamento sob demanda.
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Organização A')
+        self.other = Organization.objects.create(name='Organização B')
+        Company.objects.bulk_create([
+            Company(organization=self.organization, name=f'Empresa {index:02d}') for index in range(7)
+        ])
+        self.company = Company.objects.create(organization=self.other, name='Empresa B1')
+        for index in range(4):
+            User.objects.create_user(
+                username=f'tree{index}', email=f'tree{index}@example.com',
+                password='testpass123', company=self.company
+            )
+        self.admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+    
+    def _walk(self, url):
+        # Segue os cursores de "Carregar mais" e devolve as páginas
+        pages, cursor = [], None
+        while True:
+            response = self.client.get(url, {'after': cursor} if cursor else {}, HTTP_HX_REQUEST='true')
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.context)
+            cursor = response.context['next_cursor']
+            if cursor is None:
+                return pages
+    
+    def test_children_are_loaded_one_page_at_a_time(self):
+        """
+        Testa se cada requisição traz uma página de filhos, em ordem e sem repetições.
+        """
+        self.client.force_login(self.admin)
+        with mock.patch.object(views, 'TREE_PAGE_SIZE', 3):
+            pages = self._walk(reverse('organizations:tree_companies', args=[self.organization.pk]))
+        self.assertEqual([len(page['companies']) for page in pages], [3, 3, 1])
+        names = [company.name for page in pages for company in page['companies']]
+        self.assertEqual(names, [f'Empresa {index:02d}' for index in range(7)])
+        
+        with mock.patch.object(views, 'TREE_PAGE_SIZE', 3):
+            pages = self._walk(reverse('organizations:tree_users', args=[self.other.pk, self.company.pk]))
+        self.assertEqual([user.username for page in pages for user in page['users']], [f'tree{index}' for index in range(4)])
+    
+    def test_top_level_has_annotated_counts(self):
+        """
+        Testa o primeiro nível com as contagens de empresas e usuários.
+        """
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('organizations:organization_tree'))
+        self.assertEqual(
+            [(o.name, o.company_count, o.user_count) for o in response.context['organizations']],
+            [('Organização A', 7, 0), ('Organização B', 1, 4)]
+        )
+        self.assertContains(response, reverse('organizations:tree_companies', args=[self.organization.pk]))
+        self.assertNotContains(response, 'Empresa 00')
+    
+    # Contagem no banco principal: com réplicas, parte das leituras iria para elas
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_query_count_does_not_grow_with_children(self):
+        """
+        Testa se o número de consultas não depende da quantidade de filhos.
+        """
+        # Eventos de auditoria de outros testes ainda em memória seriam gravados durante a contagem
+        audit_buffer.flush()
+        self.client.force_login(self.admin)
+        url = reverse('organizations:tree_companies', args=[self.organization.pk])
+        # sessão, usuário e a página com as contagens
+        with self.assertNumQueries(3):
+            self.client.get(url, HTTP_HX_REQUEST='true')
+        Company.objects.bulk_create([
+            Company(organization=self.organization, name=f'Empresa extra {index}') for index in range(60)
+        ])
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_HX_REQUEST='true')
+        self.assertEqual(len(response.context['companies']), views.TREE_PAGE_SIZE)
+    
+    def test_scope_and_invalid_cursor(self):
+        """
+        Testa o escopo do usuário nos nós e a recusa de cursores inválidos.
+        """
+        manager = User.objects.get(username='tree0')
+        manager.user_permissions.add(*Permission.objects.filter(
+            codename__in=['view_organization', 'view_company', 'view_user']
+        ))
+        self.client.force_login(manager)
+        
+        response = self.client.get(reverse('organizations:organization_tree'))
+        self.assertEqual([o.name for o in response.context['organizations']], ['Organização B'])
+        response = self.client.get(reverse('organizations:tree_companies', args=[self.organization.pk]))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('organizations:tree_users', args=[self.organization.pk, self.company.pk]))
+        self.assertEqual(list(response.context['users']), [])
+        
+        response = self.client.get(reverse('organizations:tree_companies', args=[self.other.pk]), {'after': 'x!'})
+        self.assertEqual(response.status_code, 400)
+        # JSON válido com valores que não correspondem aos campos (pk não numérico)
+        response = self.client.get(reverse('organizations:tree_companies', args=[self.other.pk]), {
+            'after': encode_cursor(['Empresa', 'abc'])
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class CompanyMoveTest(TestCase):
+    """
+    Testes da movimentação de empresas entre organizações.
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        self.source = Organization.objects.create(name='Organização Origem')
+        self.target = Organization.objects.create(name='Organização Destino')
+        self.source_group = Group.objects.create(name='Gerentes Origem')
+        self.target_group = Group.objects.create(name='Gerentes Destino')
+        # Como nas organizações anteriores ao Organization.groups: grupos só em uso pelos usuários
+        User.objects.create_user(
+            username='destino', email='destino@example.com',
+            company=Company.objects.create(organization=self.target, name='Empresa Destino')
+        ).groups.add(self.target_group)
+        self.companies = [
+            Company.objects.create(organization=self.source, name=f'Empresa {index}') for index in range(2)
+        ]
+        self.remaining = Company.objects.create(organization=self.source, name='Empresa que fica')
+        self.users = []
+        for index in range(3):
+            user = User.objects.create_user(
+                username=f'user{index}', email=f'user{index}@example.com', company=self.companies[index % 2]
+            )
+            user.groups.add(self.source_group)
+            self.users.append(user)
+        self.users[0].groups.add(self.target_group)
+        self.ids = [company.pk for company in self.companies]
+    
+    def groups(self, user):
+        return sorted(user.groups.values_list('name', flat=True))
+    
+    def test_move_reassigns_companies_users_and_totals(self):
+        """
+        Testa se empresas, usuários, totais e séries de atividade passam para o destino.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            report = move_companies(self.ids, self.target.pk)
+        self.assertEqual(report.moved, self.ids)
+        self.assertEqual(report.users, 3)
+        moved = Company.objects.for_org(self.target).filter(pk__in=self.ids).order_by('pk')
+        self.assertEqual(list(moved), self.companies)
+        self.assertEqual(User.objects.for_org(self.target).count(), 4)
+        self.assertEqual(User.objects.for_org(self.source).count(), 0)
+        
+        source, target = (OrganizationRollup.objects.get(organization=org) for org in (self.source, self.target))
+        self.assertEqual((source.active_companies, source.active_users), (1, 0))
+        self.assertEqual((target.active_companies, target.active_users), (3, 4))
+        
+        today = timezone.localdate()
+        created = dict(ActivityBucket.objects.filter(
+            metric=ActivityBucket.COMPANIES_CREATED, period=ActivityBucket.DAY, start=today
+        ).values_list('scope', 'count'))
+        self.assertEqual(created, {ActivityBucket.GLOBAL_SCOPE: 4, self.source.pk: 1, self.target.pk: 3})
+    
+    def test_group_memberships_are_revalidated(self):
+        """
+        Testa se vínculos com grupos de fora do destino só são removidos com ``prune_groups``
+        e se os grupos já usados pelos usuários do destino são mantidos.
+        """
+        report = move_companies(self.ids[:1], self.target.pk, prune_groups=True)
+        self.assertEqual(dict(report.removed), {'Gerentes Origem': 2})
+        self.assertEqual(self.groups(self.users[0]), ['Gerentes Destino'])
+        self.assertEqual(self.groups(self.users[2]), [])
+        self.assertEqual(self.groups(self.users[1]), ['Gerentes Origem'])
+        
+        report = move_companies(self.ids[1:], self.target.pk)
+        self.assertEqual(dict(report.outside), {'Gerentes Origem': 1})
+        self.assertFalse(report.removed)
+        self.assertEqual(self.groups(self.users[1]), ['Gerentes Origem'])
+        self.assertFalse(self.target.groups.exists())
+    
+    def test_groups_can_be_adopted(self):
+        """
+        Testa se ``adopt_groups`` adiciona ao destino apenas os grupos que ele ainda não usa.
+        """
+        report = move_companies(self.ids, self.target.pk, adopt_groups=True)
+        self.assertEqual(report.adopted, ['Gerentes Origem'])
+        self.assertFalse(report.outside or report.removed)
+        self.assertEqual(list(self.target.groups.all()), [self.source_group])
+        self.assertEqual(self.groups(self.users[0]), ['Gerentes Destino', 'Gerentes Origem'])
+        
+        with self.assertRaises(MoveError):
+            move_companies([self.remaining.pk], self.target.pk, adopt_groups=True, prune_groups=True)
+    
+    def test_dry_run_reports_counts_without_writing(self):
+        """
+        Testa se a simulação informa as mesmas quantidades da movimentação e não grava nada.
+        """
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            simulated = move_companies(self.ids, self.target.pk, dry_run=True)
+        self.assertEqual(callbacks, [])
+        self.assertTrue(simulated.dry_run)
+        self.assertEqual(Company.objects.for_org(self.source).count(), 3)
+        self.assertEqual(self.groups(self.users[1]), ['Gerentes Origem'])
+        
+        report = move_companies(self.ids, self.target.pk)
+        self.assertEqual(list(simulated.lines())[1:], list(report.lines()))
+    
+    def test_invalid_moves_are_rejected(self):
+        """
+        Testa os erros de empresas ou organização inexistentes e as empresas que já estão no destino.
+        """
+        with self.assertRaises(MoveError):
+            move_companies([self.ids[0], 999999], self.target.pk)
+        with self.assertRaises(MoveError):
+            move_companies(self.ids, 999999)
+        self.assertEqual(Company.objects.for_org(self.source).count(), 3)
+        
+        report = move_companies([self.remaining.pk], self.source.pk)
+        self.assertEqual((report.moved, report.skipped), ([], 1))
+    
+    def test_management_command(self):
+        """
+        Testa o comando ``move_companies`` com ``--from`` e ``--dry-run``.
+        """
+        out = StringIO()
+        call_command('move_companies', str(self.target.pk), '--from', str(self.source.pk), '--dry-run', stdout=out)
+        self.assertIn('Simulação', out.getvalue())
+        self.assertIn('Empresas movidas para "Organização Destino": 3', out.getvalue())
+        self.assertEqual(Company.objects.for_org(self.target).count(), 1)
+        
+        call_command('move_companies', str(self.target.pk), *map(str, self.ids), '--prune-groups', stdout=StringIO())
+        self.assertEqual(Company.objects.for_org(self.target).count(), 3)
+        self.assertEqual(self.groups(self.users[1]), [])
+        with self.assertRaises(CommandError):
+            call_command('move_companies', str(self.target.pk), stdout=StringIO())
+
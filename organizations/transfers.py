@@ -0,0 +1,185 @@
+"""
+Movimentação de empresas, com seus usuários, entre organizações.
+
+``move_companies`` reatribui as empresas com ``update()`` em uma única
+transação e revalida os grupos dos usuários contra a organização de destino.
+Os grupos do destino são os de ``Organization.groups`` mais os que os usuários
+dele já usam (organizações anteriores ao ``Organization.groups`` não têm os
+grupos registrados). Vínculos com grupos de fora são mantidos e informados no
+relatório; com ``adopt_groups`` esses grupos passam a fazer parte do destino e,
+com ``prune_groups``, os vínculos são removidos.
+Totais (``core.rollups``), séries de atividade, contagens do dashboard e
+listagens abertas das organizações envolvidas são atualizados após o commit.
+
+Com ``dry_run`` os mesmos comandos são executados e a transação é desfeita no
+final: o relatório traz as quantidades exatas sem gravar nada.
+
+Com shards, empresas e organização de destino precisam estar no mesmo banco;
+para trocar de shard, mova antes a organização (``manage.py move_organization``).
+"""
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import router, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from core import activity, live, rollups, sharding, stats
+from webhooks import outbox
+from .models import Organization, Company
+
+BATCH_SIZE = 500
+
+
+class MoveError(ValueError):
+    """
+    Movimentação inválida (empresas ou organização inexistentes, shards diferentes).
+    """
+
+
+class Report:
+    """
+    Resultado de uma movimentação: linhas afetadas em cada tabela.
+    """
+
+    def __init__(self, organization, dry_run=False):
+        self.organization = organization
+        self.dry_run = dry_run
+        self.companies = Counter()
+        self.skipped = 0
+        self.users = 0
+        self.outside = Counter()
+        self.removed = Counter()
+        self.adopted = []
+        self.sources = set()
+        self.moved = []
+
+    def lines(self):
+        if self.dry_run:
+            yield 'Simulação: nenhuma alteração foi gravada.'
+        origins = ', '.join(f'{name}: {count}' for name, count in sorted(self.companies.items()))
+        yield f'Empresas movidas para "{self.organization.name}": {sum(self.companies.values())}' + (
+            f' ({origins})' if origins else ''
+        )
+        if self.skipped:
+            yield f'Empresas que já estavam na organização: {self.skipped}'
+        yield f'Usuários: {self.users}'
+        if self.adopted:
+            yield f'Grupos adicionados à organização: {", ".join(self.adopted)}'
+        if self.outside:
+            outside = ', '.join(f'{name}: {count}' for name, count in sorted(self.outside.items()))
+            yield f'Vínculos mantidos com grupos de fora da organização: {sum(self.outside.values())} ({outside})'
+        if self.removed:
+            removed = ', '.join(f'{name}: {count}' for name, count in sorted(self.removed.items()))
+            yield f'Vínculos com grupos removidos: {sum(self.removed.values())} ({removed})'
+
+
+def move_companies(company_ids, organization_id, actor=None, dry_run=False, adopt_groups=False, prune_groups=False):
+    """
+    Move as empresas para a organização ``organization_id`` em uma transação.
+    Retorna um ``Report``; movimentações inválidas levantam ``MoveError``.
+    """
+    company_ids = set(company_ids)
+    if not company_ids:
+        raise MoveError('Informe ao menos uma empresa.')
+    if adopt_groups and prune_groups:
+        raise MoveError('Escolha entre adotar os grupos e remover os vínculos (apenas um).')
+
+    with sharding.use_shard(sharding.shard_for_organization(organization_id)):
+        organization = Organization.objects.filter(pk=organization_id).first()
+        if organization is None:
+            raise MoveError(f'Organização {organization_id} não encontrada.')
+        with transaction.atomic(using=router.db_for_write(Company)):
+            report, audit_entries = _move(organization, company_ids, dry_run, adopt_groups, prune_groups)
+            if dry_run:
+                # Mesmos comandos, nada gravado: os callbacks pós-commit também são descartados
+                transaction.set_rollback(True)
+                return report
+
+    # Contagens do dashboard e listagens abertas das organizações envolvidas
+    if report.moved:
+        organization_ids = sorted(report.sources | {organization_id})
+        stats.invalidate(organization_ids, report.moved)
+        for pk in organization_ids:
+            live.publish('organization', live.UPDATED, pk, [pk])
+        for pk in report.moved:
+            live.publish('company', live.UPDATED, pk, organization_ids, [pk])
+
+    from audit import log as audit
+    from audit.models import AuditEvent
+    for instance, changes in audit_entries:
+        audit.record(actor, AuditEvent.UPDATE, instance, changes, organization_id=organization_id)
+    return report
+
+
+def _move(organization, company_ids, dry_run, adopt_groups, prune_groups):
+    User = get_user_model()
+    report = Report(organization, dry_run)
+    now = timezone.now()
+
+    rows = list(Company.objects.select_for_update().filter(pk__in=company_ids).values_list(
+        'pk', 'organization_id', 'organization__name'
+    ))
+    missing = company_ids - {pk for pk, _, _ in rows}
+    if missing:
+        where = ' no banco da organização de destino' if sharding.is_enabled() else ''
+        raise MoveError(f'Empresas não encontradas{where}: {", ".join(map(str, sorted(missing)))}.')
+    moving = {pk: (source, name) for pk, source, name in rows if source != organization.pk}
+    report.skipped = len(rows) - len(moving)
+    report.companies.update(name for _, name in moving.values())
+    ids = report.moved = sorted(moving)
+    if not ids:
+        return report, []
+    report.sources = {source for source, _ in moving.values()}
+
+    users = User.objects.filter(company_id__in=ids)
+    report.users = users.count()
+
+    # Grupos dos usuários que não pertencem ao destino (nem estão em uso nele)
+    allowed = Group.objects.filter(
+        Q(organizations=organization.pk) | Q(user__company__organization=organization.pk)
+    ).values('pk')
+    outside = User.groups.through.objects.filter(user__company_id__in=ids).exclude(group_id__in=allowed)
+    groups = {
+        row['group_id']: (row['group__name'], row['total'])
+        for row in outside.values('group_id', 'group__name').annotate(total=Count('pk')).order_by()
+    }
+    changed_users = {}
+    if groups and adopt_groups:
+        Organization.groups.through.objects.bulk_create([
+            Organization.groups.through(organization_id=organization.pk, group_id=group_id) for group_id in groups
+        ], batch_size=BATCH_SIZE, ignore_conflicts=True)
+        report.adopted = sorted(name for name, _ in groups.values())
+    elif groups and not prune_groups:
+        report.outside.update({name: total for name, total in groups.values()})
+    elif groups:
+        report.removed.update({name: total for name, total in groups.values()})
+        affected = outside.values('user_id')
+        for user_id, name in User.groups.through.objects.filter(user_id__in=affected).values_list(
+            'user_id', 'group__name'
+        ):
+            changed_users.setdefault(user_id, set()).add(name)
+        outside.delete()
+
+    # Baldes de atividade: calculados antes da mudança, aplicados após o commit
+    activity.transfer(ids, organization.pk)
+    Company.objects.filter(pk__in=ids).update(organization_id=organization.pk, updated_at=now)
+
+    # update() não dispara sinais: eventos dos webhooks, totais e caches ficam por conta daqui
+    outbox.capture('company', outbox.UPDATED, outbox.rows('company', Company.objects.filter(pk__in=ids)))
+    outbox.capture('user', outbox.UPDATED, outbox.rows('user', users))
+    if dry_run:
+        return report, []
+    rollups.schedule_refresh(*report.sources, organization.pk)
+
+    removed_names = {name for name, _ in groups.values()}
+    entries = [
+        (company, {'organization': [moving[company.pk][0], organization.pk]})
+        for company in Company.objects.filter(pk__in=ids)
+    ]
+    entries += [
+        (user, {'groups': [sorted(changed_users[user.pk]), sorted(changed_users[user.pk] - removed_names)]})
+        for user in User.objects.filter(pk__in=list(changed_users))
+    ]
+    return report, entries
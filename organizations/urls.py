@@ -6,12 +6,22 @@ app_name = 'organizations'
 urlpatterns = [
     # Gerenciamento de organizações
     path('', views.organization_list, name='organization_list'),
+    path('export.csv', views.organization_export, name='organization_export'),
+    path('<int:pk>/row/', views.organization_row, name='organization_row'),
     path('create/', views.organization_create, name='organization_create'),
+    path('provision/', views.organization_provision, name='organization_provision'),
     path('<int:pk>/edit/', views.organization_edit, name='organization_edit'),
     path('<int:pk>/delete/', views.organization_delete, name='organization_delete'),
     
+    # Árvore (nós carregados sob demanda)
+    path('tree/', views.organization_tree, name='organization_tree'),
+    path('tree/<int:org_pk>/companies/', views.tree_companies, name='tree_companies'),
+    path('tree/<int:org_pk>/companies/<int:pk>/users/', views.tree_users, name='tree_users'),
+    
     # Gerenciamento de empresas
     path('<int:org_pk>/companies/', views.company_list, name='company_list'),
+    path('<int:org_pk>/companies/export.csv', views.company_export, name='company_export'),
+    path('<int:org_pk>/companies/<int:pk>/row/', views.company_row, name='company_row'),
     path('<int:org_pk>/companies/create/', views.company_create, name='company_create'),
     path('<int:org_pk>/companies/<int:pk>/edit/', views.company_edit, name='company_edit'),
     path('<int:org_pk>/companies/<int:pk>/delete/', views.company_delete, name='company_delete'),
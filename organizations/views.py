@@ -1,39 +1,48 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.shortcuts import redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
-from django.http import HttpResponse
-from django.template.loader import render_to_string
+from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import Q
+from django.db import router, transaction
 
 from .models import Organization, Company
-from .forms import OrganizationForm, CompanyForm
+from .forms import OrganizationForm, CompanyForm, ProvisionForm
+from .projections import COMPANY_LIST, ORGANIZATION_LIST
+from .provisioning import SpecError, provision
+from accounts.permissions import get_scope
+from core import sharding
+from core.decorators import read_from_replica, route_to_shard
+from core.projections import csv_response
+from core.rendering import render
+from core.jobs import enqueue
+from core.paging import InvalidCursor, keyset_page
+from audit import log as audit
+from audit.models import AuditEvent
+
+# Itens por página nas listagens (também usado pelo warm_caches)
+LIST_PAGE_SIZE = 10
+
+# Nós carregados por vez em cada nível da árvore
+TREE_PAGE_SIZE = 50
 
 # Views para gerenciamento de organizações
 
 @login_required
 @permission_required('organizations.view_organization', raise_exception=True)
+@read_from_replica
 def organization_list(request):
     """
     Lista todas as organizações, filtradas de acordo com as permissões do usuário logado.
     """
-    if request.user.is_superuser:
-        # Administrador Master vê todas as organizações
-        organizations = Organization.objects.all()
-    elif request.user.groups.filter(name='Administrador da Organização').exists() and request.user.company:
-        # Administrador da Organização vê apenas sua organização
-        organizations = Organization.objects.filter(pk=request.user.company.organization.pk)
-    else:
-        # Outros usuários não têm acesso a esta view (será bloqueado pelo permission_required)
-        organizations = Organization.objects.none()
-    
-    # Busca
+    # Administrador Master vê todas as organizações; os demais, apenas a sua
     q = request.GET.get('q', '').strip()
-    if q:
-        organizations = organizations.filter(Q(name__icontains=q) | Q(description__icontains=q))
+    organizations = Organization.objects.visible_to(request.user).search(q).for_listing()
     
-    # Paginação
-    paginator = Paginator(organizations.order_by('name'), 10)
+    # Paginação (a contagem de empresas é calculada só para as linhas da página)
+    # Com shards, o superusuário pagina sobre todos os bancos (core.sharding)
+    paginator = Paginator(organizations.with_company_counts().order_by('name').across_shards(), LIST_PAGE_SIZE)
     page = request.GET.get('page')
     try:
         page_obj = paginator.page(page)
@@ -49,13 +58,38 @@ def organization_list(request):
         'q': q,
     }
     
-    if request.htmx:
-        return HttpResponse(render_to_string('organizations/partials/organization_list.html', context))
-    
-    return render(request, 'organizations/organization_list.html', context)
+    return render(request, 'organizations/organization_list.html', context,
+                  partial_template='organizations/partials/organization_list.html')
+
+@login_required
+@permission_required('organizations.view_organization', raise_exception=True)
+@read_from_replica
+def organization_export(request):
+    """
+    Exporta em CSV as organizações da listagem, com as colunas de ``ORGANIZATION_LIST``.
+    """
+    q = request.GET.get('q', '').strip()
+    organizations = Organization.objects.visible_to(request.user).search(q).with_company_counts().order_by('name')
+    return csv_response('organizacoes.csv', ORGANIZATION_LIST, organizations.across_shards())
+
+@login_required
+@permission_required('organizations.view_organization', raise_exception=True)
+@read_from_replica
+@route_to_shard(sharding.by_organization('pk'))
+def organization_row(request, pk):
+    """
+    Linha de uma organização na listagem, buscada pelo navegador ao receber um evento ao vivo.
+    Fora do escopo do usuário logado a resposta é vazia e a linha sai da tabela.
+    """
+    organization = (Organization.objects.visible_to(request.user).for_listing()
+                    .with_company_counts().filter(pk=pk).first())
+    if organization is None:
+        return HttpResponse('')
+    return render(request, 'organizations/partials/organization_row.html', {'organization': organization})
 
 @login_required
 @permission_required('organizations.add_organization', raise_exception=True)
+@route_to_shard(sharding.new_organization)
 def organization_create(request):
     """
     Cria uma nova organização.
@@ -63,7 +97,10 @@ def organization_create(request):
     if request.method == 'POST':
         form = OrganizationForm(request.POST)
         if form.is_valid():
-            organization = form.save()
+            # A mudança e os eventos dos webhooks (webhooks.outbox) no mesmo commit
+            with transaction.atomic(using=router.db_for_write(Organization)):
+                organization = form.save()
+            audit.record(request.user, AuditEvent.CREATE, organization, audit.form_changes(form))
             messages.success(request, f'Organização "{organization.name}" criada com sucesso!')
             return redirect('organizations:organization_list')
     else:
@@ -71,8 +108,34 @@ def organization_create(request):
     
     return render(request, 'organizations/organization_form.html', {'form': form})
 
+@login_required
+@permission_required(
+    ('organizations.add_organization', 'organizations.add_company', 'accounts.add_user'),
+    raise_exception=True
+)
+def organization_provision(request):
+    """
+    Provisiona uma organização (grupos, empresas e usuários) a partir de uma
+    especificação ou de uma organização modelo, exibindo o tempo de cada etapa.
+    """
+    report = None
+    if request.method == 'POST':
+        form = ProvisionForm(request.POST, user=request.user)
+        if form.is_valid():
+            try:
+                report = provision(form.cleaned_data['provision_spec'], actor=request.user)
+            except SpecError as exc:
+                form.add_error(None, str(exc))
+            else:
+                messages.success(request, f'Organização "{report.organization.name}" provisionada com sucesso!')
+    else:
+        form = ProvisionForm(user=request.user)
+    
+    return render(request, 'organizations/organization_provision.html', {'form': form, 'report': report})
+
 @login_required
 @permission_required('organizations.change_organization', raise_exception=True)
+@route_to_shard(sharding.by_organization('pk'))
 def organization_edit(request, pk):
     """
     Edita uma organização existente.
@@ -80,14 +143,17 @@ def organization_edit(request, pk):
     organization = get_object_or_404(Organization, pk=pk)
     
     # Verifica se o usuário tem permissão para editar esta organização específica
-    if not request.user.is_superuser and (not request.user.company or request.user.company.organization.pk != organization.pk):
+    if not request.user.has_perm('organizations.change_organization', organization):
         messages.error(request, 'Você não tem permissão para editar esta organização.')
         return redirect('organizations:organization_list')
     
     if request.method == 'POST':
         form = OrganizationForm(request.POST, instance=organization)
         if form.is_valid():
-            organization = form.save()
+            changes = audit.form_changes(form)
+            with transaction.atomic(using=router.db_for_write(Organization)):
+                organization = form.save()
+            audit.record(request.user, AuditEvent.UPDATE, organization, changes)
             messages.success(request, f'Organização "{organization.name}" atualizada com sucesso!')
             return redirect('organizations:organization_list')
     else:
@@ -97,6 +163,7 @@ def organization_edit(request, pk):
 
 @login_required
 @permission_required('organizations.delete_organization', raise_exception=True)
+@route_to_shard(sharding.by_organization('pk'))
 def organization_delete(request, pk):
     """
     Desativa uma organização (não exclui do banco de dados).
@@ -104,15 +171,20 @@ def organization_delete(request, pk):
     organization = get_object_or_404(Organization, pk=pk)
     
     # Verifica se o usuário tem permissão para desativar esta organização específica
-    if not request.user.is_superuser:
+    if not request.user.has_perm('organizations.delete_organization', organization):
         messages.error(request, 'Apenas o Administrador Master pode desativar organizações.')
         return redirect('organizations:organization_list')
     
     if request.method == 'POST':
-        organization.is_active = False
-        organization.save()
-        messages.success(request, f'Organização "{organization.name}" foi desativada com sucesso!')
-        return redirect('organizations:organization_list')
+        # Organizações grandes têm milhares de empresas e usuários: a desativação roda em segundo plano
+        job = enqueue(
+            'organizations.deactivate_organization',
+            {'organization_id': organization.pk},
+            user=request.user
+        )
+        audit.record(request.user, AuditEvent.DEACTIVATE, organization, {'is_active': [True, False], 'job': job.pk})
+        messages.success(request, f'A desativação da organização "{organization.name}" foi agendada.')
+        return redirect('core:job_detail', pk=job.pk)
     
     return render(request, 'organizations/organization_confirm_delete.html', {'organization': organization})
 
@@ -120,6 +192,8 @@ def organization_delete(request, pk):
 
 @login_required
 @permission_required('organizations.view_company', raise_exception=True)
+@read_from_replica
+@route_to_shard(sharding.by_organization('org_pk'))
 def company_list(request, org_pk):
     """
     Lista todas as empresas de uma organização específica.
@@ -127,19 +201,15 @@ def company_list(request, org_pk):
     organization = get_object_or_404(Organization, pk=org_pk)
     
     # Verifica se o usuário tem permissão para ver as empresas desta organização
-    if not request.user.is_superuser and (not request.user.company or request.user.company.organization.pk != organization.pk):
+    if not get_scope(request.user, Company, 'view').covers_organization(organization.pk):
         messages.error(request, 'Você não tem permissão para ver as empresas desta organização.')
         return redirect('organizations:organization_list')
     
-    companies = Company.objects.filter(organization=organization)
-    
-    # Busca
     q = request.GET.get('q', '').strip()
-    if q:
-        companies = companies.filter(Q(name__icontains=q) | Q(description__icontains=q))
+    companies = Company.objects.for_org(organization).visible_to(request.user).search(q).for_listing()
     
-    # Paginação
-    paginator = Paginator(companies.order_by('name'), 10)
+    # Paginação (a contagem de usuários é calculada só para as linhas da página)
+    paginator = Paginator(companies.with_user_counts().order_by('name'), LIST_PAGE_SIZE)
     page = request.GET.get('page')
     try:
         page_obj = paginator.page(page)
@@ -156,13 +226,48 @@ def company_list(request, org_pk):
         'q': q,
     }
     
-    if request.htmx:
-        return HttpResponse(render_to_string('organizations/partials/company_list.html', context))
+    return render(request, 'organizations/company_list.html', context,
+                  partial_template='organizations/partials/company_list.html')
+
+@login_required
+@permission_required('organizations.view_company', raise_exception=True)
+@read_from_replica
+@route_to_shard(sharding.by_organization('org_pk'))
+def company_export(request, org_pk):
+    """
+    Exporta em CSV as empresas da organização, com as colunas de ``COMPANY_LIST``.
+    """
+    organization = get_object_or_404(Organization, pk=org_pk)
+    if not get_scope(request.user, Company, 'view').covers_organization(organization.pk):
+        messages.error(request, 'Você não tem permissão para ver as empresas desta organização.')
+        return redirect('organizations:organization_list')
     
-    return render(request, 'organizations/company_list.html', context)
+    q = request.GET.get('q', '').strip()
+    companies = Company.objects.for_org(organization).visible_to(request.user).search(q).with_user_counts().order_by('name')
+    return csv_response(f'empresas-{organization.pk}.csv', COMPANY_LIST, companies)
+
+@login_required
+@permission_required('organizations.view_company', raise_exception=True)
+@read_from_replica
+@route_to_shard(sharding.by_organization('org_pk'))
+def company_row(request, org_pk, pk):
+    """
+    Linha de uma empresa na listagem, buscada pelo navegador ao receber um evento ao vivo.
+    Fora da organização ou do escopo do usuário logado a resposta é vazia e a linha sai da tabela.
+    """
+    organization = get_object_or_404(Organization, pk=org_pk)
+    company = (Company.objects.for_org(organization).visible_to(request.user).for_listing()
+               .with_user_counts().filter(pk=pk).first())
+    if company is None:
+        return HttpResponse('')
+    return render(request, 'organizations/partials/company_row.html', {
+        'organization': organization,
+        'company': company,
+    })
 
 @login_required
 @permission_required('organizations.add_company', raise_exception=True)
+@route_to_shard(sharding.by_organization('org_pk'))
 def company_create(request, org_pk):
     """
     Cria uma nova empresa em uma organização específica.
@@ -170,14 +275,16 @@ def company_create(request, org_pk):
     organization = get_object_or_404(Organization, pk=org_pk)
     
     # Verifica se o usuário tem permissão para adicionar empresas a esta organização
-    if not request.user.is_superuser and (not request.user.company or request.user.company.organization.pk != organization.pk):
+    if not get_scope(request.user, Company, 'add').covers_organization(organization.pk):
         messages.error(request, 'Você não tem permissão para adicionar empresas a esta organização.')
         return redirect('organizations:organization_list')
     
     if request.method == 'POST':
         form = CompanyForm(request.POST, organization=organization)
         if form.is_valid():
-            company = form.save()
+            with transaction.atomic(using=router.db_for_write(Company)):
+                company = form.save()
+            audit.record(request.user, AuditEvent.CREATE, company, audit.form_changes(form))
             messages.success(request, f'Empresa "{company.name}" criada com sucesso!')
             return redirect('organizations:company_list', org_pk=organization.pk)
     else:
@@ -187,22 +294,26 @@ def company_create(request, org_pk):
 
 @login_required
 @permission_required('organizations.change_company', raise_exception=True)
+@route_to_shard(sharding.by_organization('org_pk'))
 def company_edit(request, org_pk, pk):
     """
     Edita uma empresa existente.
     """
     organization = get_object_or_404(Organization, pk=org_pk)
-    company = get_object_or_404(Company, pk=pk, organization=organization)
+    company = get_object_or_404(Company.objects.for_org(organization), pk=pk)
     
     # Verifica se o usuário tem permissão para editar esta empresa específica
-    if not request.user.is_superuser and (not request.user.company or request.user.company.organization.pk != organization.pk):
+    if not request.user.has_perm('organizations.change_company', company):
         messages.error(request, 'Você não tem permissão para editar empresas desta organização.')
         return redirect('organizations:organization_list')
     
     if request.method == 'POST':
         form = CompanyForm(request.POST, instance=company, organization=organization)
         if form.is_valid():
-            company = form.save()
+            changes = audit.form_changes(form)
+            with transaction.atomic(using=router.db_for_write(Company)):
+                company = form.save()
+            audit.record(request.user, AuditEvent.UPDATE, company, changes)
             messages.success(request, f'Empresa "{company.name}" atualizada com sucesso!')
             return redirect('organizations:company_list', org_pk=organization.pk)
     else:
@@ -216,25 +327,102 @@ def company_edit(request, org_pk, pk):
 
 @login_required
 @permission_required('organizations.delete_company', raise_exception=True)
+@route_to_shard(sharding.by_organization('org_pk'))
 def company_delete(request, org_pk, pk):
     """
     Desativa uma empresa (não exclui do banco de dados).
     """
     organization = get_object_or_404(Organization, pk=org_pk)
-    company = get_object_or_404(Company, pk=pk, organization=organization)
+    company = get_object_or_404(Company.objects.for_org(organization), pk=pk)
     
     # Verifica se o usuário tem permissão para desativar esta empresa específica
-    if not request.user.is_superuser and (not request.user.company or request.user.company.organization.pk != organization.pk):
+    if not request.user.has_perm('organizations.delete_company', company):
         messages.error(request, 'Você não tem permissão para desativar empresas desta organização.')
         return redirect('organizations:organization_list')
     
     if request.method == 'POST':
         company.is_active = False
-        company.save()
+        with transaction.atomic(using=router.db_for_write(Company)):
+            company.save()
+        audit.record(request.user, AuditEvent.DEACTIVATE, company, {'is_active': [True, False]})
         messages.success(request, f'Empresa "{company.name}" foi desativada com sucesso!')
         return redirect('organizations:company_list', org_pk=organization.pk)
     
     return render(request, 'organizations/company_confirm_delete.html', {
         'organization': organization, 
         'company': company
-    })
\ No newline at end of file
+    })
+
+# Árvore Organização -> Empresa -> Usuário
+# Só o primeiro nível vem com a página; cada nó busca os filhos ao ser aberto,
+# uma página por vez (``core.paging``), com as contagens anotadas por linha.
+
+@login_required
+@permission_required('organizations.view_organization', raise_exception=True)
+@read_from_replica
+def organization_tree(request):
+    """
+    Árvore de organizações, empresas e usuários com carregamento sob demanda.
+    """
+    organizations = (Organization.objects.visible_to(request.user).only('pk', 'name', 'is_active')
+                     .with_company_counts().with_user_counts())
+    try:
+        page = keyset_page(organizations, ('name', 'pk'), request.GET.get('after'), TREE_PAGE_SIZE,
+                           across_shards=True)
+    except InvalidCursor:
+        return HttpResponseBadRequest('Cursor inválido.')
+    
+    context = {
+        'organizations': page.items,
+        'next_cursor': page.next_cursor,
+    }
+    
+    return render(request, 'organizations/organization_tree.html', context,
+                  partial_template='organizations/partials/tree_organizations.html')
+
+@login_required
+@permission_required('organizations.view_company', raise_exception=True)
+@read_from_replica
+@route_to_shard(sharding.by_organization('org_pk'))
+def tree_companies(request, org_pk):
+    """
+    Uma página das empresas de uma organização na árvore (``?after=<cursor>``).
+    """
+    if not get_scope(request.user, Company, 'view').covers_organization(org_pk):
+        raise PermissionDenied
+    
+    companies = (Company.objects.for_org(org_pk).visible_to(request.user)
+                 .only('pk', 'organization_id', 'name', 'is_active').with_user_counts())
+    try:
+        page = keyset_page(companies, ('name', 'pk'), request.GET.get('after'), TREE_PAGE_SIZE)
+    except InvalidCursor:
+        return HttpResponseBadRequest('Cursor inválido.')
+    
+    return render(request, 'organizations/partials/tree_companies.html', {
+        'org_pk': org_pk,
+        'companies': page.items,
+        'next_cursor': page.next_cursor,
+    })
+
+@login_required
+@permission_required('accounts.view_user', raise_exception=True)
+@read_from_replica
+@route_to_shard(sharding.by_organization('org_pk'))
+def tree_users(request, org_pk, pk):
+    """
+    Uma página dos usuários de uma empresa na árvore (``?after=<cursor>``).
+    """
+    User = get_user_model()
+    users = (User.objects.for_org(org_pk).for_company(pk).visible_to(request.user)
+             .only('pk', 'username', 'first_name', 'last_name', 'email', 'is_active'))
+    try:
+        page = keyset_page(users, ('username', 'pk'), request.GET.get('after'), TREE_PAGE_SIZE)
+    except InvalidCursor:
+        return HttpResponseBadRequest('Cursor inválido.')
+    
+    return render(request, 'organizations/partials/tree_users.html', {
+        'org_pk': org_pk,
+        'company_pk': pk,
+        'users': page.items,
+        'next_cursor': page.next_cursor,
+    })
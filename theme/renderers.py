@@ -0,0 +1,12 @@
+from django.forms.renderers import DjangoTemplates
+
+
+class ThemeFormRenderer(DjangoTemplates):
+    """
+    Renderer de formulários do projeto (``FORM_RENDERER``).
+
+    Os widgets do tema (``theme.widgets``) não usam templates; os demais
+    (erros, rótulos e layouts) vêm do engine do renderer, cujo loader com
+    cache já guarda os templates compilados e, em DEBUG, os descarta quando
+    os arquivos mudam.
+    """
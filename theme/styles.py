@@ -0,0 +1,11 @@
+"""
+Classes do Tailwind usadas pelos widgets de formulário.
+
+Mantidas em um único lugar para que os formulários não repitam as mesmas
+strings; o build do Tailwind (panel_tailwind) também precisa enxergar este
+arquivo para não descartar as classes.
+"""
+
+FIELD = 'shadow-sm focus:ring-blue-600 focus:border-blue-600 block w-full text-base border-gray-400 rounded-md bg-white text-gray-900'
+
+CHECKBOX = 'h-5 w-5 text-blue-600 focus:ring-blue-600 border-gray-400 rounded'
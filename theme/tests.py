@@ -1,3 +1,58 @@
-from django.test import TestCase
+import re
 
-# Create your tests here.
\ No newline at end of file
+from django.forms.renderers import DjangoTemplates
+from django.test import SimpleTestCase
+
+from . import styles, widgets
+from .renderers import ThemeFormRenderer
+
+
+def normalize(html):
+    return re.sub(r'\s+', ' ', re.sub(r'>\s+<', '><', str(html)))
+
+
+class ThemeWidgetsTest(SimpleTestCase):
+    """
+    Testes dos widgets do tema renderizados sem templates.
+    """
+    
+    def assertSameMarkup(self, widget, name, value):
+        django_class = next(cls for cls in type(widget).__mro__ if cls.__module__ == 'django.forms.widgets')
+        django_widget = django_class(attrs=widget.attrs)
+        if hasattr(widget, 'choices'):
+            django_widget.choices = widget.choices
+        attrs = {'id': f'id_{name}'}
+        self.assertEqual(
+            normalize(widget.render(name, value, attrs)),
+            normalize(django_widget.render(name, value, attrs, renderer=DjangoTemplates()))
+        )
+    
+    def test_theme_class_is_default(self):
+        """
+        Testa se a classe do tema é aplicada e pode ser sobrescrita.
+        """
+        self.assertEqual(widgets.TextInput().attrs['class'], styles.FIELD)
+        self.assertEqual(widgets.CheckboxInput().attrs['class'], styles.CHECKBOX)
+        self.assertEqual(widgets.TextInput(attrs={'class': 'custom'}).attrs['class'], 'custom')
+        self.assertEqual(widgets.Textarea(attrs={'rows': 3}).attrs['rows'], 3)
+    
+    def test_same_markup_as_django_templates(self):
+        """
+        Testa se a marcação é a mesma dos templates de widget do Django, com escape.
+        """
+        choices = [('', '---------'), ('1', 'Empresa <A>'), ('Grupo', [('2', 'B & C')])]
+        self.assertSameMarkup(widgets.TextInput(attrs={'required': True, 'disabled': False}), 'name', '"x" <y>')
+        self.assertSameMarkup(widgets.EmailInput(), 'email', None)
+        self.assertSameMarkup(widgets.CheckboxInput(), 'is_active', True)
+        self.assertSameMarkup(widgets.Textarea(attrs={'rows': 3}), 'description', 'a < b')
+        self.assertSameMarkup(widgets.Select(choices=choices), 'company', '1')
+        self.assertSameMarkup(widgets.SelectMultiple(choices=choices), 'groups', ['1', '2'])
+        self.assertSameMarkup(widgets.CheckboxSelectMultiple(choices=choices[1:]), 'permissions', ['2'])
+    
+    def test_renderer_reuses_compiled_templates(self):
+        """
+        Testa se o renderer reaproveita o template já compilado pelo loader com cache.
+        """
+        renderer = ThemeFormRenderer()
+        template = renderer.get_template('django/forms/errors/list/ul.html')
+        self.assertIs(renderer.get_template('django/forms/errors/list/ul.html').template, template.template)
@@ -0,0 +1,147 @@
+"""
+Widgets de formulário com o estilo do tema.
+
+O HTML é montado diretamente em Python, com a mesma marcação dos templates
+de ``django/forms/widgets`` a menos de espaços em branco entre as tags
+(conferido por ``manage.py benchmark forms``), em vez de renderizar um
+template por campo e outro por opção de escolha.
+"""
+from django import forms
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from . import styles
+
+
+def render_attrs(attrs):
+    """
+    Equivalente a ``attrs.html`` (mantém a ordem dos atributos).
+    """
+    return format_html_join('', ' {}{}', (
+        (name, '' if value is True else format_html('="{}"', value))
+        for name, value in attrs.items() if value is not False
+    ))
+
+
+def render_input(widget):
+    """
+    Equivalente a ``input.html``.
+    """
+    value_attr = ''
+    if widget['value'] is not None:
+        value_attr = format_html(' value="{}"', widget['value'])
+    return format_html(
+        '<input type="{}" name="{}"{}{}>',
+        widget['type'], widget['name'], value_attr, render_attrs(widget['attrs'])
+    )
+
+
+def render_input_option(option):
+    """
+    Equivalente a ``input_option.html`` (checkbox e radio).
+    """
+    if not option['wrap_label']:
+        return render_input(option)
+    label_for = ''
+    if option['attrs'].get('id'):
+        label_for = format_html(' for="{}"', option['attrs']['id'])
+    return format_html('<label{}>{} {}</label>', label_for, render_input(option), option['label'])
+
+
+class ThemeWidgetMixin:
+    """
+    Aplica a classe padrão do tema; ``attrs`` informados têm precedência.
+    """
+    theme_class = styles.FIELD
+    
+    def __init__(self, attrs=None, **kwargs):
+        super().__init__({'class': self.theme_class, **(attrs or {})}, **kwargs)
+    
+    def render(self, name, value, attrs=None, renderer=None):
+        return self.render_html(self.get_context(name, value, attrs)['widget'])
+
+
+class InputRenderMixin:
+    
+    def render_html(self, widget):
+        return render_input(widget)
+
+
+class TextInput(ThemeWidgetMixin, InputRenderMixin, forms.TextInput):
+    pass
+
+
+class EmailInput(ThemeWidgetMixin, InputRenderMixin, forms.EmailInput):
+    pass
+
+
+class PasswordInput(ThemeWidgetMixin, InputRenderMixin, forms.PasswordInput):
+    pass
+
+
+class CheckboxInput(ThemeWidgetMixin, InputRenderMixin, forms.CheckboxInput):
+    theme_class = styles.CHECKBOX
+
+
+class Textarea(ThemeWidgetMixin, forms.Textarea):
+    
+    def render_html(self, widget):
+        return format_html(
+            '<textarea name="{}"{}>\n{}</textarea>',
+            widget['name'], render_attrs(widget['attrs']), widget['value'] or ''
+        )
+
+
+class SelectRenderMixin:
+    """
+    Equivalente a ``select.html`` e ``select_option.html``.
+    """
+    
+    def render_html(self, widget):
+        parts = []
+        for group_name, options, index in widget['optgroups']:
+            if group_name:
+                parts.append(format_html('\n  <optgroup label="{}">', group_name))
+            for option in options:
+                parts.append(format_html(
+                    '\n  <option value="{}"{}>{}</option>',
+                    option['value'], render_attrs(option['attrs']), option['label']
+                ))
+            if group_name:
+                parts.append('\n  </optgroup>')
+        return format_html(
+            '<select name="{}"{}>{}\n</select>',
+            widget['name'], render_attrs(widget['attrs']), mark_safe(''.join(parts))
+        )
+
+
+class Select(ThemeWidgetMixin, SelectRenderMixin, forms.Select):
+    pass
+
+
+class SelectMultiple(ThemeWidgetMixin, SelectRenderMixin, forms.SelectMultiple):
+    pass
+
+
+class CheckboxSelectMultiple(ThemeWidgetMixin, forms.CheckboxSelectMultiple):
+    """
+    Equivalente a ``multiple_input.html`` com ``checkbox_option.html``.
+    """
+    theme_class = styles.CHECKBOX
+    
+    def render_html(self, widget):
+        attrs = widget['attrs']
+        parts = [format_html(
+            '<div{}{}>',
+            format_html(' id="{}"', attrs['id']) if attrs.get('id') else '',
+            format_html(' class="{}"', attrs['class']) if attrs.get('class') else '',
+        )]
+        for group, options, index in widget['optgroups']:
+            if group:
+                parts.append(format_html('\n  <div><label>{}</label>', group))
+            for option in options:
+                parts.append(format_html('<div>\n    {}</div>', render_input_option(option)))
+            if group:
+                parts.append('\n  </div>')
+        parts.append('\n</div>')
+        return mark_safe(''.join(parts))
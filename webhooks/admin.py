@@ -0,0 +1,37 @@
+from django.contrib import admin, messages
+
+from .delivery import retry_failed
+from .models import Endpoint, OutboxMessage
+
+
+@admin.register(Endpoint)
+class EndpointAdmin(admin.ModelAdmin):
+    """
+    Endpoints dos webhooks, com o estado das entregas.
+    """
+    list_display = ('name', 'url', 'is_active', 'failures', 'retry_after', 'last_success_at', 'last_error_at')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'url')
+    readonly_fields = ('failures', 'retry_after', 'last_success_at', 'last_error', 'last_error_at', 'created_at')
+    actions = ['retry_failed_messages']
+    
+    @admin.action(description='Reenviar as mensagens que falharam')
+    def retry_failed_messages(self, request, queryset):
+        count = retry_failed(list(queryset.values_list('pk', flat=True)))
+        self.message_user(request, f'{count} mensagem(ns) de volta à fila.', messages.SUCCESS)
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    """
+    Mensagens aguardando entrega ou que falharam (somente leitura; com shards,
+    apenas as do ``default``).
+    """
+    list_display = ('pk', 'endpoint_id', 'status', 'attempts', 'created_at', 'last_error')
+    list_filter = ('status',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
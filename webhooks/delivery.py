@@ -0,0 +1,236 @@
+"""
+Entrega dos webhooks (``manage.py run_webhooks``).
+
+A cada rodada o worker escolhe um endpoint com mensagens pendentes, reserva
+um lote de até ``batch_size`` mensagens (UPDATE condicional, como em
+``core.jobs``) e envia todos os eventos do lote em um único POST::
+
+    {"delivery": "<id do lote>", "events": [{"id", "type", "occurred_at", "data"}, ...]}
+
+O corpo é assinado com HMAC-SHA256 usando o segredo do endpoint, no cabeçalho
+``X-Webhook-Signature: sha256=<hex>``. Uma resposta 2xx apaga o lote. Qualquer
+outra resposta, ou erro de rede, devolve as mensagens à fila e põe o endpoint
+inteiro em recuo exponencial (respeitando ``Retry-After``), para não insistir
+em um destino fora do ar. Mensagens que esgotam ``WEBHOOKS_MAX_ATTEMPTS``
+ficam como ``failed`` e podem ser reenviadas pelo admin.
+
+``max_in_flight`` limita os lotes simultâneos de cada endpoint, somando
+todos os workers. A entrega é "pelo menos uma vez" e, com mais de um lote
+simultâneo ou após falhas, fora de ordem: os receptores devem ignorar ``id``
+repetidos e ordenar por ``occurred_at``.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import random
+import urllib.error
+import urllib.request
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core import metrics, sharding
+from .models import Endpoint, OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+DELIVERED = metrics.register('webhooks.delivered', 'Eventos entregues pelos webhooks')
+FAILURES = metrics.register('webhooks.failures', 'Entregas de webhooks com falha')
+
+
+class DeliveryError(Exception):
+    """
+    Entrega recusada pelo endpoint ou que não chegou até ele.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _queue(alias):
+    return OutboxMessage.objects.using(alias)
+
+
+def in_flight(endpoint):
+    """
+    Lotes do endpoint sendo entregues agora, somando todos os shards.
+    """
+    return sum(
+        _queue(alias).filter(endpoint_id=endpoint.pk, status=OutboxMessage.SENDING).values('batch').distinct().count()
+        for alias in sharding.aliases()
+    )
+
+
+def claim(endpoint, alias):
+    """
+    Reserva o próximo lote do endpoint no banco ``alias``. Retorna as
+    mensagens, ou uma lista vazia se não há pendentes ou se o endpoint já
+    está no limite de lotes simultâneos.
+    """
+    if in_flight(endpoint) >= endpoint.max_in_flight:
+        return []
+    candidates = list(
+        _queue(alias).filter(endpoint_id=endpoint.pk, status=OutboxMessage.PENDING).order_by('pk').values_list(
+            'pk', flat=True
+        )[:endpoint.batch_size]
+    )
+    if not candidates:
+        return []
+
+    batch = uuid.uuid4().hex
+    claimed = _queue(alias).filter(pk__in=candidates, status=OutboxMessage.PENDING).update(
+        status=OutboxMessage.SENDING, batch=batch, locked_at=timezone.now()
+    )
+    if not claimed:
+        return []
+    if in_flight(endpoint) > endpoint.max_in_flight:
+        # Outro worker reservou um lote ao mesmo tempo: este volta para a fila
+        _queue(alias).filter(batch=batch).update(status=OutboxMessage.PENDING, batch='', locked_at=None)
+        return []
+    return list(_queue(alias).filter(batch=batch).order_by('pk'))
+
+
+def _retry_after(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def send(endpoint, batch, messages):
+    """
+    Envia o lote em um POST assinado. Levanta ``DeliveryError`` se a
+    resposta não for 2xx ou se o endpoint não responder.
+    """
+    body = json.dumps({'delivery': batch, 'events': [message.event for message in messages]}).encode()
+    signature = hmac.new(endpoint.secret.encode(), body, hashlib.sha256).hexdigest()
+    request = urllib.request.Request(endpoint.url, data=body, method='POST', headers={
+        'Content-Type': 'application/json',
+        'User-Agent': 'panel-admin-webhooks',
+        'X-Webhook-Delivery': batch,
+        'X-Webhook-Signature': f'sha256={signature}',
+    })
+    try:
+        with urllib.request.urlopen(request, timeout=settings.WEBHOOKS_TIMEOUT) as response:
+            response.read()
+    except urllib.error.HTTPError as exc:
+        raise DeliveryError(f'HTTP {exc.code}', _retry_after(exc.headers.get('Retry-After')))
+    except (urllib.error.URLError, OSError) as exc:
+        raise DeliveryError(str(getattr(exc, 'reason', exc)))
+
+
+def _backoff(endpoint, error):
+    delay = min(settings.WEBHOOKS_RETRY_BACKOFF * 2 ** endpoint.failures, settings.WEBHOOKS_MAX_BACKOFF)
+    if error.retry_after is not None:
+        delay = max(delay, error.retry_after)
+    return delay
+
+
+def _failed(endpoint, alias, batch, error):
+    now = timezone.now()
+    message = str(error)
+    # Mensagens na última tentativa saem da fila; as demais voltam para ela
+    _queue(alias).filter(batch=batch, attempts__gte=settings.WEBHOOKS_MAX_ATTEMPTS - 1).update(
+        status=OutboxMessage.FAILED, batch='', locked_at=None, attempts=F('attempts') + 1, last_error=message
+    )
+    _queue(alias).filter(batch=batch).update(
+        status=OutboxMessage.PENDING, batch='', locked_at=None, attempts=F('attempts') + 1, last_error=message
+    )
+    Endpoint.objects.filter(pk=endpoint.pk).update(
+        failures=F('failures') + 1,
+        retry_after=now + timedelta(seconds=_backoff(endpoint, error)),
+        last_error=message,
+        last_error_at=now,
+    )
+    metrics.increment(FAILURES)
+    logger.warning('Falha na entrega do webhook %s: %s', endpoint, message)
+
+
+def deliver(endpoint, alias):
+    """
+    Entrega um lote do endpoint a partir do banco ``alias``. Retorna a
+    quantidade de mensagens do lote (0 se não havia o que enviar), tenha a
+    entrega dado certo ou não.
+    """
+    messages = claim(endpoint, alias)
+    if not messages:
+        return 0
+    batch = messages[0].batch
+    try:
+        send(endpoint, batch, messages)
+    except DeliveryError as exc:
+        _failed(endpoint, alias, batch, exc)
+    else:
+        _queue(alias).filter(batch=batch).delete()
+        Endpoint.objects.filter(pk=endpoint.pk).update(failures=0, retry_after=None, last_success_at=timezone.now())
+        metrics.increment(DELIVERED, len(messages))
+    return len(messages)
+
+
+def due_endpoints():
+    """
+    Endpoints ativos que não estão em recuo.
+    """
+    return list(Endpoint.objects.filter(is_active=True).filter(
+        Q(retry_after__isnull=True) | Q(retry_after__lte=timezone.now())
+    ))
+
+
+def deliver_next():
+    """
+    Entrega o próximo lote de qualquer endpoint. Retorna ``False`` quando não
+    há nada a enviar.
+    """
+    endpoints = due_endpoints()
+    # Ordem aleatória: um endpoint com muitos pendentes não monopoliza os workers
+    random.shuffle(endpoints)
+    for endpoint in endpoints:
+        for alias in sharding.aliases():
+            if deliver(endpoint, alias):
+                return True
+    return False
+
+
+def run_pending(limit=None):
+    """
+    Entrega, na thread atual, os lotes pendentes até esvaziar a fila (ou até
+    ``limit`` lotes). Retorna a quantidade de lotes enviados.
+    """
+    count = 0
+    while limit is None or count < limit:
+        if not deliver_next():
+            break
+        count += 1
+    return count
+
+
+def requeue_stale(timeout=None):
+    """
+    Devolve para a fila lotes presos em entrega por workers que morreram.
+    """
+    timeout = timeout if timeout is not None else settings.WEBHOOKS_LOCK_TIMEOUT
+    limit = timezone.now() - timedelta(seconds=timeout)
+    return sum(
+        _queue(alias).filter(status=OutboxMessage.SENDING, locked_at__lt=limit).update(
+            status=OutboxMessage.PENDING, batch='', locked_at=None
+        )
+        for alias in sharding.aliases()
+    )
+
+
+def retry_failed(endpoint_ids):
+    """
+    Devolve para a fila, com as tentativas zeradas, as mensagens que falharam.
+    """
+    Endpoint.objects.filter(pk__in=endpoint_ids).update(failures=0, retry_after=None)
+    return sum(
+        _queue(alias).filter(endpoint_id__in=endpoint_ids, status=OutboxMessage.FAILED).update(
+            status=OutboxMessage.PENDING, attempts=0
+        )
+        for alias in sharding.aliases()
+    )
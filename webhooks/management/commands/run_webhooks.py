@@ -0,0 +1,78 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from webhooks.delivery import requeue_stale, run_pending
+
+logger = logging.getLogger(__name__)
+
+# Espera máxima (em segundos) entre tentativas após erros seguidos
+MAX_BACKOFF = 60
+
+
+class Command(BaseCommand):
+    help = 'Entrega os eventos do outbox aos endpoints de webhooks.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.WEBHOOKS_CONCURRENCY,
+            help='Quantidade de threads entregando lotes em paralelo (cada endpoint respeita o seu max_in_flight).'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=settings.WEBHOOKS_POLL_INTERVAL,
+            help='Intervalo (em segundos) entre consultas ao outbox quando não há o que entregar.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Entrega os lotes pendentes e encerra quando não houver mais o que enviar.'
+        )
+    
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        self.poll_interval = options['poll_interval']
+        self.once = options['once']
+        self.stopping = False
+        
+        self.stdout.write(f'Worker de webhooks iniciado com {concurrency} thread(s).')
+        requeue_stale()
+        
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='webhooks') as executor:
+            futures = [executor.submit(self._loop) for _ in range(concurrency)]
+            try:
+                sent = sum(future.result() for future in futures)
+            except KeyboardInterrupt:
+                self.stopping = True
+                sent = sum(future.result() for future in futures)
+        
+        self.stdout.write(self.style.SUCCESS(f'{sent} lote(s) enviado(s).'))
+    
+    def _loop(self):
+        sent = 0
+        failures = 0
+        try:
+            while not self.stopping:
+                close_old_connections()
+                try:
+                    count = run_pending(limit=1)
+                    sent += count
+                    failures = 0
+                    if count:
+                        continue
+                    if self.once:
+                        break
+                    time.sleep(self.poll_interval)
+                    requeue_stale()
+                except Exception:
+                    if self.once:
+                        raise
+                    # Erros fora da entrega (ex.: banco indisponível) não derrubam a thread
+                    failures += 1
+                    logger.exception('Erro no worker de webhooks (%d seguido(s)).', failures)
+                    time.sleep(min(max(self.poll_interval, 1) * 2 ** (failures - 1), MAX_BACKOFF))
+        finally:
+            close_old_connections()
+        return sent
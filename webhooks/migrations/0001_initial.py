@@ -0,0 +1,61 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:58
+
+from django.db import migrations, models
+import django.utils.timezone
+import webhooks.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Endpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='name')),
+                ('url', models.URLField(max_length=500, verbose_name='URL')),
+                ('secret', models.CharField(default=webhooks.models._new_secret, help_text='Assina o corpo das entregas (HMAC-SHA256 no cabeçalho X-Webhook-Signature).', max_length=64, verbose_name='secret')),
+                ('events', models.JSONField(blank=True, default=list, help_text='Tipos de evento aceitos, ex.: ["user.created", "company.deactivated"]. Vazio: todos.', verbose_name='events')),
+                ('organization_id', models.BigIntegerField(blank=True, help_text='Apenas eventos desta organização. Vazio: todas.', null=True, verbose_name='organization')),
+                ('is_active', models.BooleanField(default=True, verbose_name='active')),
+                ('batch_size', models.PositiveSmallIntegerField(default=100, verbose_name='batch size')),
+                ('max_in_flight', models.PositiveSmallIntegerField(default=2, help_text='Entregas simultâneas para este endpoint, somando todos os workers.', verbose_name='max in flight')),
+                ('failures', models.PositiveIntegerField(default=0, verbose_name='consecutive failures')),
+                ('retry_after', models.DateTimeField(blank=True, null=True, verbose_name='retry after')),
+                ('last_success_at', models.DateTimeField(blank=True, null=True, verbose_name='last success at')),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+                ('last_error_at', models.DateTimeField(blank=True, null=True, verbose_name='last error at')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+            ],
+            options={
+                'verbose_name': 'webhook endpoint',
+                'verbose_name_plural': 'webhook endpoints',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint_id', models.BigIntegerField(verbose_name='endpoint')),
+                ('event', models.JSONField(verbose_name='event')),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('sending', 'sending'), ('failed', 'failed')], default='pending', max_length=20, verbose_name='status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='attempts')),
+                ('batch', models.CharField(blank=True, max_length=32, verbose_name='batch')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='locked at')),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+            ],
+            options={
+                'verbose_name': 'outbox message',
+                'verbose_name_plural': 'outbox messages',
+                'ordering': ['pk'],
+                'indexes': [models.Index(fields=['endpoint_id', 'status', 'id'], name='webhooks_outbox_queue_idx')],
+            },
+        ),
+    ]
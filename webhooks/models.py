@@ -0,0 +1,93 @@
+import secrets
+
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+def _new_secret():
+    return secrets.token_hex(32)
+
+
+class Endpoint(models.Model):
+    """
+    Sistema externo que recebe os eventos de mudança (``webhooks.outbox``).
+    
+    Fica sempre no ``default`` (ver ``core.sharding.GLOBAL_MODELS``), então a
+    organização é guardada como id, sem chave estrangeira. ``failures`` e
+    ``retry_after`` controlam o recuo do endpoint inteiro enquanto ele falha.
+    """
+    name = models.CharField(_('name'), max_length=100)
+    url = models.URLField(_('URL'), max_length=500)
+    secret = models.CharField(
+        _('secret'), max_length=64, default=_new_secret,
+        help_text='Assina o corpo das entregas (HMAC-SHA256 no cabeçalho X-Webhook-Signature).'
+    )
+    events = models.JSONField(
+        _('events'), default=list, blank=True,
+        help_text='Tipos de evento aceitos, ex.: ["user.created", "company.deactivated"]. Vazio: todos.'
+    )
+    organization_id = models.BigIntegerField(
+        _('organization'), null=True, blank=True,
+        help_text='Apenas eventos desta organização. Vazio: todas.'
+    )
+    is_active = models.BooleanField(_('active'), default=True)
+    batch_size = models.PositiveSmallIntegerField(_('batch size'), default=100)
+    max_in_flight = models.PositiveSmallIntegerField(
+        _('max in flight'), default=2,
+        help_text='Entregas simultâneas para este endpoint, somando todos os workers.'
+    )
+    failures = models.PositiveIntegerField(_('consecutive failures'), default=0)
+    retry_after = models.DateTimeField(_('retry after'), null=True, blank=True)
+    last_success_at = models.DateTimeField(_('last success at'), null=True, blank=True)
+    last_error = models.TextField(_('last error'), blank=True)
+    last_error_at = models.DateTimeField(_('last error at'), null=True, blank=True)
+    created_at = models.DateTimeField(_('created at'), default=timezone.now)
+    
+    class Meta:
+        verbose_name = _('webhook endpoint')
+        verbose_name_plural = _('webhook endpoints')
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+class OutboxMessage(models.Model):
+    """
+    Evento a entregar para um endpoint.
+    
+    Gravado no mesmo banco (shard) e na mesma transação da mudança que o
+    originou, então nenhum evento é perdido nem enviado por uma mudança
+    desfeita. Mensagens entregues são apagadas; as que esgotam as tentativas
+    ficam com ``status = failed`` até serem reenviadas pelo admin.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, _('pending')),
+        (SENDING, _('sending')),
+        (FAILED, _('failed')),
+    ]
+    
+    endpoint_id = models.BigIntegerField(_('endpoint'))
+    event = models.JSONField(_('event'))
+    status = models.CharField(_('status'), max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(_('attempts'), default=0)
+    batch = models.CharField(_('batch'), max_length=32, blank=True)
+    locked_at = models.DateTimeField(_('locked at'), null=True, blank=True)
+    last_error = models.TextField(_('last error'), blank=True)
+    created_at = models.DateTimeField(_('created at'), default=timezone.now)
+    
+    class Meta:
+        verbose_name = _('outbox message')
+        verbose_name_plural = _('outbox messages')
+        ordering = ['pk']
+        indexes = [
+            # Próximo lote de um endpoint, na ordem de gravação
+            models.Index(fields=['endpoint_id', 'status', 'id'], name='webhooks_outbox_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event.get('type')} -> {self.endpoint_id} ({self.status})"
@@ -0,0 +1,133 @@
+"""
+Captura dos eventos de mudança para os webhooks (padrão outbox).
+
+As mudanças em organizações, empresas e usuários gravam, no mesmo banco e na
+mesma transação, uma ``OutboxMessage`` por endpoint interessado: se a
+transação é desfeita, o evento some junto; se é confirmada, o worker
+(``manage.py run_webhooks``, ver ``webhooks.delivery``) entrega o evento mesmo
+que o processo web caia logo depois.
+
+Saves individuais são capturados pelos signals (``webhooks.signals``);
+caminhos em lote (``update()``, ``bulk_create``), que não disparam signals,
+chamam ``capture`` diretamente, com ``rows`` para montar os dados em uma
+consulta por lote. Sem endpoints ativos nada é gravado nem consultado, além
+da lista de endpoints em cache.
+"""
+import uuid
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import router
+from django.utils import timezone
+
+from .models import Endpoint, OutboxMessage
+
+CREATED, UPDATED, DEACTIVATED = 'created', 'updated', 'deactivated'
+
+# Dados de cada tipo no evento: chave -> atributo (ou lookup, em ``rows``)
+FIELDS = {
+    'organization': {
+        'id': 'pk', 'name': 'name', 'description': 'description', 'is_active': 'is_active',
+    },
+    'company': {
+        'id': 'pk', 'organization': 'organization_id', 'name': 'name', 'description': 'description',
+        'is_active': 'is_active',
+    },
+    'user': {
+        'id': 'pk', 'username': 'username', 'email': 'email', 'first_name': 'first_name',
+        'last_name': 'last_name', 'company': 'company_id', 'organization': 'company__organization_id',
+        'is_active': 'is_active',
+    },
+}
+
+ENDPOINTS_CACHE_KEY = 'webhooks:endpoints'
+
+# Validade da lista de endpoints em cache. Alterações pelo admin limpam o
+# cache na hora; com cache local por processo, os demais workers só as
+# enxergam depois desse prazo
+ENDPOINTS_CACHE_SECONDS = 300
+
+Route = namedtuple('Route', 'pk types organization_id')
+
+
+def routes():
+    """
+    Endpoints ativos, com os tipos de evento e a organização que aceitam.
+    """
+    cached = cache.get(ENDPOINTS_CACHE_KEY)
+    if cached is None:
+        cached = [
+            Route(pk, frozenset(types or ()), organization_id)
+            for pk, types, organization_id in Endpoint.objects.filter(is_active=True).values_list(
+                'pk', 'events', 'organization_id'
+            )
+        ]
+        cache.set(ENDPOINTS_CACHE_KEY, cached, ENDPOINTS_CACHE_SECONDS)
+    return cached
+
+
+def invalidate_routes():
+    cache.delete(ENDPOINTS_CACHE_KEY)
+
+
+def wants(kind):
+    """
+    Indica se algum endpoint pode receber eventos do tipo, para os signals
+    evitarem consultas quando não há quem receba.
+    """
+    prefix = f'{kind}.'
+    return any(not route.types or any(t.startswith(prefix) for t in route.types) for route in routes())
+
+
+def snapshot(kind, instance, organization_id=None):
+    """
+    Dados do objeto para o evento. Para usuários, informe a organização
+    (``core.signals.user_organization_id``).
+    """
+    data = {key: getattr(instance, attr) for key, attr in FIELDS[kind].items() if '__' not in attr}
+    if kind == 'user':
+        data['organization'] = organization_id
+    return data
+
+
+def rows(kind, queryset):
+    """
+    Dados dos objetos do queryset para os eventos, em uma consulta. O
+    queryset só é executado se ``capture`` encontrar endpoints interessados.
+    """
+    keys, lookups = zip(*FIELDS[kind].items())
+    for values in queryset.values_list(*lookups):
+        yield dict(zip(keys, values))
+
+
+def capture(kind, action, objects, using=None):
+    """
+    Grava no outbox os eventos ``<kind>.<action>`` dos ``objects`` (dados de
+    ``snapshot`` ou ``rows``) para os endpoints que os aceitam, na transação
+    corrente de ``using`` (por padrão, o banco de escrita do contexto atual).
+    Retorna a quantidade de mensagens gravadas.
+    """
+    active = routes()
+    if not active:
+        return 0
+    event_type = f'{kind}.{action}'
+    active = [route for route in active if not route.types or event_type in route.types]
+    if not active:
+        return 0
+
+    now = timezone.now()
+    messages = []
+    for data in objects:
+        organization_id = data['id'] if kind == 'organization' else data.get('organization')
+        event = None
+        for route in active:
+            if route.organization_id is not None and route.organization_id != organization_id:
+                continue
+            if event is None:
+                event = {'id': uuid.uuid4().hex, 'type': event_type, 'occurred_at': now.isoformat(), 'data': data}
+            messages.append(OutboxMessage(endpoint_id=route.pk, event=event, created_at=now))
+    if messages:
+        OutboxMessage.objects.using(using or router.db_for_write(OutboxMessage)).bulk_create(
+            messages, batch_size=500
+        )
+    return len(messages)
@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.signals import user_organization_id
+from organizations.models import Organization, Company
+from . import outbox
+from .models import Endpoint
+
+User = get_user_model()
+
+# Saves restritos a estes campos não geram eventos (login, rehash da senha)
+IGNORED_FIELDS = {'last_login', 'password'}
+
+
+def _action(created, was_active, is_active):
+    if created:
+        return outbox.CREATED
+    if was_active and not is_active:
+        return outbox.DEACTIVATED
+    return outbox.UPDATED
+
+
+@receiver(pre_save, sender=Organization, dispatch_uid='webhooks_organization_pre_save')
+def organization_pre_save(sender, instance, raw=False, **kwargs):
+    instance._webhook_was_active = None
+    if raw or instance.pk is None or not outbox.wants('organization'):
+        return
+    instance._webhook_was_active = Organization.objects.filter(pk=instance.pk).values_list(
+        'is_active', flat=True
+    ).first()
+
+
+@receiver(post_save, sender=Organization, dispatch_uid='webhooks_organization_post_save')
+def organization_post_save(sender, instance, created, raw=False, **kwargs):
+    if raw or not outbox.wants('organization'):
+        return
+    action = _action(created, getattr(instance, '_webhook_was_active', None), instance.is_active)
+    outbox.capture('organization', action, [outbox.snapshot('organization', instance)], using=instance._state.db)
+
+
+# Empresas e usuários: o estado anterior (``_rollup_previous``) já é
+# carregado pelos signals de ``core`` antes do save
+
+@receiver(post_save, sender=Company, dispatch_uid='webhooks_company_post_save')
+def company_post_save(sender, instance, created, raw=False, **kwargs):
+    if raw or not outbox.wants('company'):
+        return
+    previous = getattr(instance, '_rollup_previous', None) or {}
+    action = _action(created, previous.get('is_active'), instance.is_active)
+    outbox.capture('company', action, [outbox.snapshot('company', instance)], using=instance._state.db)
+
+
+@receiver(post_save, sender=User, dispatch_uid='webhooks_user_post_save')
+def user_post_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and set(update_fields) <= IGNORED_FIELDS) or not outbox.wants('user'):
+        return
+    previous = getattr(instance, '_rollup_previous', None) or {}
+    action = _action(created, previous.get('is_active'), instance.is_active)
+    data = outbox.snapshot('user', instance, user_organization_id(instance))
+    outbox.capture('user', action, [data], using=instance._state.db)
+
+
+# Endpoints alterados valem na próxima mudança capturada
+
+@receiver(post_save, sender=Endpoint, dispatch_uid='webhooks_endpoint_post_save')
+@receiver(post_delete, sender=Endpoint, dispatch_uid='webhooks_endpoint_post_delete')
+def endpoint_changed(sender, **kwargs):
+    outbox.invalidate_routes()
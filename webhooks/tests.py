@@ -0,0 +1,300 @@
+import hashlib
+import hmac
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from core import sharding
+from core.jobs import enqueue, run_pending as run_jobs
+from organizations.models import Organization, Company
+from . import outbox
+from .delivery import claim, requeue_stale, retry_failed, run_pending
+from .models import Endpoint, OutboxMessage
+
+User = get_user_model()
+
+
+class Receiver:
+    """
+    Servidor HTTP local no papel do sistema externo: guarda as requisições e
+    responde com ``status`` (e ``headers``).
+    """
+    
+    def __init__(self):
+        self.requests = []
+        self.status = 200
+        self.headers = {}
+        receiver = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                receiver.requests.append((self.headers, body))
+                self.send_response(receiver.status)
+                for name, value in receiver.headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+            
+            def log_message(self, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/eventos'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def events(self):
+        return [event for _, body in self.requests for event in json.loads(body)['events']]
+
+
+class WebhookTestMixin:
+    
+    def setUp(self):
+        self.addCleanup(outbox.invalidate_routes)
+        self.organization = Organization.objects.create(name='Organização A')
+        self.other = Organization.objects.create(name='Organização B')
+        self.company = Company.objects.create(organization=self.organization, name='Empresa A1')
+    
+    def types(self, endpoint=None):
+        messages = OutboxMessage.objects.order_by('pk')
+        if endpoint is not None:
+            messages = messages.filter(endpoint_id=endpoint.pk)
+        return [message.event['type'] for message in messages]
+
+
+class WebhookCaptureTest(WebhookTestMixin, TestCase):
+    """
+    Testes da captura dos eventos no outbox.
+    """
+    databases = '__all__'
+    
+    def test_nothing_is_written_without_endpoints(self):
+        """
+        Testa se, sem endpoints, as mudanças não gravam nada no outbox.
+        """
+        User.objects.create_user(username='ana', email='ana@example.com', company=self.company)
+        self.company.is_active = False
+        self.company.save()
+        self.assertFalse(OutboxMessage.objects.exists())
+    
+    def test_changes_are_captured(self):
+        """
+        Testa os eventos de criação, alteração e desativação, inclusive pelas views.
+        """
+        endpoint = Endpoint.objects.create(name='ERP', url='http://127.0.0.1:9/')
+        user = User.objects.create_user(username='ana', email='ana@example.com', company=self.company)
+        user.first_name = 'Ana'
+        user.save()
+        
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        self.client.force_login(admin)
+        self.client.post(reverse('accounts:user_delete', args=[user.pk]))
+        self.client.post(reverse('organizations:company_delete', args=[self.organization.pk, self.company.pk]))
+        
+        self.assertEqual(self.types(endpoint), [
+            'user.created', 'user.updated', 'user.created', 'user.deactivated', 'company.deactivated',
+        ])
+        event = OutboxMessage.objects.filter(event__type='user.deactivated').get().event
+        self.assertEqual(event['data']['id'], user.pk)
+        self.assertEqual(event['data']['organization'], self.organization.pk)
+        self.assertFalse(event['data']['is_active'])
+    
+    def test_rolled_back_changes_are_not_captured(self):
+        """
+        Testa se o evento é gravado na mesma transação da mudança.
+        """
+        Endpoint.objects.create(name='ERP', url='http://127.0.0.1:9/')
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Company.objects.create(organization=self.organization, name='Empresa A2')
+                raise RuntimeError
+        self.assertFalse(OutboxMessage.objects.exists())
+    
+    def test_endpoint_filters(self):
+        """
+        Testa se cada endpoint recebe apenas os tipos e a organização configurados.
+        """
+        deactivations = Endpoint.objects.create(name='RH', url='http://127.0.0.1:9/', events=['company.deactivated'])
+        tenant = Endpoint.objects.create(name='Filial', url='http://127.0.0.1:9/', organization_id=self.other.pk)
+        Company.objects.create(organization=self.organization, name='Empresa A2')
+        Company.objects.create(organization=self.other, name='Empresa B1')
+        self.company.is_active = False
+        self.company.save()
+        
+        self.assertEqual(self.types(deactivations), ['company.deactivated'])
+        self.assertEqual(self.types(tenant), ['company.created'])
+    
+    def test_bulk_deactivation_is_captured(self):
+        """
+        Testa os eventos da desativação em segundo plano, que usa update() em lotes.
+        """
+        endpoint = Endpoint.objects.create(name='ERP', url='http://127.0.0.1:9/')
+        User.objects.create_user(username='ana', email='ana@example.com', company=self.company)
+        OutboxMessage.objects.all().delete()
+        
+        enqueue('organizations.deactivate_organization', {'organization_id': self.organization.pk})
+        run_jobs()
+        self.assertEqual(self.types(endpoint), ['organization.deactivated', 'company.deactivated', 'user.deactivated'])
+
+
+@override_settings(WEBHOOKS_RETRY_BACKOFF=60)
+class WebhookDeliveryTest(WebhookTestMixin, TestCase):
+    """
+    Testes da entrega para um servidor HTTP local.
+    """
+    databases = '__all__'
+    
+    def setUp(self):
+        super().setUp()
+        self.receiver = Receiver()
+        self.addCleanup(self.receiver.close)
+        self.endpoint = Endpoint.objects.create(name='ERP', url=self.receiver.url, batch_size=2)
+        for index in range(5):
+            Company.objects.create(organization=self.organization, name=f'Filial {index}')
+    
+    def test_batches_are_signed_and_delivered(self):
+        """
+        Testa o envio em lotes de ``batch_size`` eventos, assinados, e a limpeza do outbox.
+        """
+        self.assertEqual(run_pending(), 3)
+        self.assertEqual(len(self.receiver.requests), 3)
+        self.assertEqual([event['data']['name'] for event in self.receiver.events()],
+                         [f'Filial {index}' for index in range(5)])
+        
+        headers, body = self.receiver.requests[0]
+        signature = hmac.new(self.endpoint.secret.encode(), body, hashlib.sha256).hexdigest()
+        self.assertEqual(headers['X-Webhook-Signature'], f'sha256={signature}')
+        self.assertEqual(headers['X-Webhook-Delivery'], json.loads(body)['delivery'])
+        
+        self.assertFalse(OutboxMessage.objects.exists())
+        self.assertIsNotNone(Endpoint.objects.get(pk=self.endpoint.pk).last_success_at)
+    
+    def test_failures_back_off_and_retry(self):
+        """
+        Testa se uma falha devolve o lote à fila e põe o endpoint em recuo (respeitando Retry-After).
+        """
+        self.receiver.status = 503
+        self.receiver.headers = {'Retry-After': '600'}
+        with self.assertLogs('webhooks.delivery', 'WARNING'):
+            self.assertEqual(run_pending(), 1)
+        self.assertEqual(len(self.receiver.requests), 1)
+        
+        endpoint = Endpoint.objects.get(pk=self.endpoint.pk)
+        self.assertEqual(endpoint.failures, 1)
+        self.assertEqual(endpoint.last_error, 'HTTP 503')
+        self.assertGreater(endpoint.retry_after, timezone.now() + timedelta(seconds=590))
+        self.assertEqual(list(OutboxMessage.objects.values_list('status', 'attempts').distinct().order_by('attempts')),
+                         [(OutboxMessage.PENDING, 0), (OutboxMessage.PENDING, 1)])
+        
+        # Em recuo, o endpoint não recebe nada
+        self.assertEqual(run_pending(), 0)
+        
+        self.receiver.status = 200
+        Endpoint.objects.filter(pk=self.endpoint.pk).update(retry_after=timezone.now())
+        self.assertEqual(run_pending(), 3)
+        self.assertEqual(len(self.receiver.events()), 7)
+        self.assertFalse(OutboxMessage.objects.exists())
+        self.assertEqual(Endpoint.objects.get(pk=self.endpoint.pk).failures, 0)
+    
+    @override_settings(WEBHOOKS_MAX_ATTEMPTS=2)
+    def test_messages_fail_after_max_attempts(self):
+        """
+        Testa se mensagens que esgotam as tentativas saem da fila até serem reenviadas.
+        """
+        self.receiver.status = 500
+        Endpoint.objects.filter(pk=self.endpoint.pk).update(batch_size=10)
+        with self.assertLogs('webhooks.delivery', 'WARNING'):
+            for _ in range(2):
+                run_pending()
+                Endpoint.objects.filter(pk=self.endpoint.pk).update(retry_after=None)
+        self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.FAILED).count(), 5)
+        self.assertEqual(run_pending(), 0)
+        
+        self.receiver.status = 200
+        self.assertEqual(retry_failed([self.endpoint.pk]), 5)
+        self.assertEqual(run_pending(), 1)
+        self.assertFalse(OutboxMessage.objects.exists())
+    
+    def test_in_flight_limit(self):
+        """
+        Testa o limite de lotes simultâneos por endpoint e a devolução de lotes presos.
+        """
+        self.endpoint.max_in_flight = 1
+        self.endpoint.save()
+        self.assertEqual(len(claim(self.endpoint, 'default')), 2)
+        self.assertEqual(claim(self.endpoint, 'default'), [])
+        self.assertEqual(run_pending(), 0)
+        self.assertEqual(self.receiver.requests, [])
+        
+        # Worker que morreu no meio da entrega: o lote volta para a fila
+        self.assertEqual(requeue_stale(timeout=-1), 2)
+        self.assertEqual(run_pending(), 3)
+        self.assertEqual(len(self.receiver.events()), 5)
+    
+    def test_worker_survives_errors(self):
+        """
+        Testa se um erro fora da entrega é registrado e o worker segue após uma espera.
+        """
+        from .management.commands import run_webhooks
+        
+        command = run_webhooks.Command()
+        command.poll_interval, command.once, command.stopping = 0, False, False
+        pauses = []
+        
+        def sleep(seconds):
+            # A espera por falta de trabalho (poll_interval) encerra o laço
+            pauses.append(seconds)
+            command.stopping = seconds == command.poll_interval
+        
+        results = [OperationalError('database is locked'), 1, 0]
+        with mock.patch.object(run_webhooks, 'run_pending', side_effect=results), \
+                mock.patch.object(run_webhooks, 'requeue_stale'), \
+                mock.patch.object(run_webhooks.time, 'sleep', sleep), \
+                self.assertLogs(run_webhooks.__name__, 'ERROR'):
+            self.assertEqual(command._loop(), 1)
+        self.assertEqual(pauses, [1, 0])
+        
+        # Com --once o erro encerra o comando em vez de tentar para sempre
+        command.once, command.stopping = True, False
+        with mock.patch.object(run_webhooks, 'run_pending', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                command._loop()
+
+
+@skipUnless(settings.TENANT_SHARDS, 'Defina PANEL_TENANT_SHARDS (ex.: shard1) para testar os shards.')
+class WebhookShardTest(TestCase):
+    """
+    Testes do outbox com shards por organização.
+    """
+    databases = '__all__'
+    
+    def test_outbox_lives_with_the_tenant(self):
+        """
+        Testa se o evento é gravado no shard da mudança e entregue a partir dele.
+        """
+        self.addCleanup(outbox.invalidate_routes)
+        receiver = Receiver()
+        self.addCleanup(receiver.close)
+        Endpoint.objects.create(name='ERP', url=receiver.url)
+        shard = settings.TENANT_SHARDS[0]
+        with sharding.use_shard(shard):
+            organization = Organization.objects.create(name='Organização Remota')
+            Company.objects.create(organization=organization, name='Empresa Remota')
+        
+        self.assertFalse(OutboxMessage.objects.using('default').exists())
+        self.assertEqual(OutboxMessage.objects.using(shard).count(), 2)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual([event['type'] for event in receiver.events()], ['organization.created', 'company.created'])
+        self.assertFalse(OutboxMessage.objects.using(shard).exists())